@@ -1,3 +1,4 @@
+import hashlib
 import json
 import os
 import math
@@ -92,6 +93,20 @@ class ReducerData:
         """En kona har inga tangenter och kan inte kapas."""
         return 0.0
 
+def catalog_fingerprint(catalog_path: str) -> str:
+    """
+    Katalogens version: en hash av alla JSON-filers namn och innehåll.
+    Ändras så fort någon katalogfil ändras, och används som del av cache-nycklar.
+    """
+    digest = hashlib.sha1()
+    if os.path.isdir(catalog_path):
+        for filename in sorted(os.listdir(catalog_path)):
+            if filename.endswith(".json"):
+                digest.update(filename.encode('utf-8'))
+                with open(os.path.join(catalog_path, filename), 'rb') as f:
+                    digest.update(f.read())
+    return digest.hexdigest()[:16]
+
 # Typ-alias för alla möjliga komponent-dataklasser
 ComponentData = Union[Bend90Data, Bend45Data, TeeData, ClampData, ReducerData]
 
@@ -108,6 +123,7 @@ class CatalogLoader:
     """Läser in rådata från JSON och omvandlar den till smarta Python-objekt."""
     def __init__(self, catalog_path: str):
         self.standards: Dict[str, PipeSpecData] = {}
+        self.version = catalog_fingerprint(catalog_path)
         if os.path.isdir(catalog_path):
             self._load_all(catalog_path)
         else:
@@ -5,42 +5,75 @@
 # === HOT-RELOADER FÖR UTVECKLING =================================
 # =================================================================
 # Denna kodsnutt säkerställer att alla våra projekt-moduler
-# laddas om från fil varje gång makrot körs. Detta låter oss
-# ändra i koden och se resultaten direkt utan att starta om FreeCAD.
+# laddas om från fil varje gång makrot körs. Detta låter oss ändra i
+# koden och se resultaten direkt utan att starta om FreeCAD.
+# Omladdningen görs först när pipelinen verkligen körs i FreeCAD-
+# processen. När den varma daemonen används görs ingen omladdning här
+# (daemonen har sin egen, se --watch), så den tunna klienten importerar
+# varken networkx eller pipelinen.
 import os, sys
 import importlib
+import threading
 
 # Lista med namnen på ALLA moduler i vårt projekt som vi kan tänkas redigera.
 # Python använder punkt-notation för paket.
 modules_to_reload = [
-    "main_runner",
     "pipeline.shared.types",
     "pipeline.sketch_parser.parser",
+    "pipeline.sketch_validator.validator",
     "pipeline.topology_builder.node_types_v2",
     "pipeline.planner.planner",
     "pipeline.topology_builder.builder",
     "pipeline.centerline_builder.builder",
     "pipeline.plan_adjuster.adjuster",
+    "pipeline.geometry_executor.tessellation",
+    "pipeline.geometry_executor.svg_preview",
+    "pipeline.clash_detector.detector",
+    "pipeline.spool_partitioner.partitioner",
+    "pipeline.bom.generator",
     "pipeline.geometry_executor.executor",
+    "pipeline.geometry_executor.backends",
+    "pipeline.geometry_executor.solid_templates",
+    "pipeline.geometry_executor.incremental",
     "components_catalog.loader",
     
-    "pipeline.component_factory.factory"
+    "pipeline.component_factory.bend_batch",
+    "pipeline.component_factory.factory",
+    "pipeline.service.protocol",
+    "pipeline.service.coalescer",
+    "pipeline.service.checkpoints",
+    "pipeline.service.runner",
+    "pipeline.service.client"
 ]
 
-print("--- Hot-reloader: Laddar om projekt-moduler... ---")
-for module_name in modules_to_reload:
-    # Vi kollar om modulen redan finns i cachen innan vi försöker ladda om den.
-    if module_name in sys.modules:
-        try:
-            importlib.reload(sys.modules[module_name])
-            # print(f"  -> Laddade om: {module_name}")
-        except Exception as e:
-            print(f"  -> FEL vid omladdning av {module_name}: {e}")
-
-print("--- Omladdning klar. Startar huvudskript. ---")
+_RELOAD_LOCK = threading.Lock()
+_MODULES_RELOADED = False
+
+def _reload_pipeline_modules():
+    """
+    Laddar om redan importerade projekt-moduler, en gång per laddning av
+    main_runner (dvs. per makrokörning) och bara före en körning i processen.
+    """
+    global _MODULES_RELOADED, _CATALOG
+    with _RELOAD_LOCK:
+        if _MODULES_RELOADED:
+            return
+        print("--- Hot-reloader: Laddar om projekt-moduler... ---")
+        for module_name in modules_to_reload:
+            # Vi kollar om modulen redan finns i cachen innan vi försöker ladda om den.
+            if module_name in sys.modules:
+                try:
+                    importlib.reload(sys.modules[module_name])
+                    # print(f"  -> Laddade om: {module_name}")
+                except Exception as e:
+                    print(f"  -> FEL vid omladdning av {module_name}: {e}")
+        # Katalogen byggs om med den omladdade loadern.
+        _CATALOG = None
+        _MODULES_RELOADED = True
+        print("--- Omladdning klar. Startar huvudskript. ---")
 # =================================================================
 
-from typing import List, Dict, Any
+from typing import Iterator, List, Dict, Any, Optional
 
 # Försök importera FreeCAD-bibliotek.
 # Detta gör att filen inte kraschar om den analyseras utanför FreeCAD.
@@ -54,83 +87,98 @@ except ImportError:
     Vector = None
     FREECAD_AVAILABLE = False
 
-# Importera alla våra pipeline-moduler
-from components_catalog.loader import CatalogLoader
-from pipeline.sketch_parser.parser import SketchParser
-from pipeline.topology_builder.builder import TopologyBuilder
-from pipeline.planner.planner import Planner
-from pipeline.centerline_builder.builder import CenterlineBuilder
-from pipeline.plan_adjuster.adjuster import PlanAdjuster, ImpossibleBuildError
-from pipeline.geometry_executor.executor import GeometryExecutor
+# Bara lätta moduler här. Pipelinen, katalogen och daemon-klienten
+# importeras i funktionerna, först när de verkligen behövs.
+# cancellation laddas om här och inte i _reload_pipeline_modules: tokens och
+# OperationCancelled som skapas före en omladdning ska vara samma klasser
+# som pipelinen kastar och som fångas nedan.
+if "pipeline.shared.cancellation" in sys.modules:
+    importlib.reload(sys.modules["pipeline.shared.cancellation"])
+from pipeline.shared.cancellation import CancellationToken, OperationCancelled, SupersedingRuns
+# Felklasserna laddas aldrig om (se pipeline/shared/errors.py), så de kan bindas här.
+from pipeline.shared.errors import ImpossibleBuildError, SketchValidationError
+from pipeline.service.coalescer import RequestCoalescer, canonical_sketch_bytes
+
+_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "components_catalog")
+_CATALOG = None
+# Samma standard som pipeline/service/client.py, så att klienten bara importeras när en daemon finns.
+_DAEMON_SOCKET_PATH = os.environ.get("LINESHAPE_DAEMON_SOCKET", "/tmp/lineshape_pipeline.sock")
 
-from pipeline.component_factory.factory import ComponentFactory
+def _catalog() -> 'CatalogLoader':
+    """Komponentkatalogen, laddad första gången den behövs och sedan återanvänd."""
+    global _CATALOG
+    if _CATALOG is None:
+        from components_catalog.loader import CatalogLoader
+        _CATALOG = CatalogLoader(_CATALOG_PATH)
+    return _CATALOG
 
+_CATALOG_VERSION = (None, "")
+
+def _catalog_version() -> str:
+    """
+    catalog_fingerprint, men hashen räknas bara om när någon katalogfils
+    namn, storlek eller mtime ändrats (en stat per fil och anrop).
+    """
+    global _CATALOG_VERSION
+    try:
+        stamp = tuple((entry.name, entry.stat().st_size, entry.stat().st_mtime_ns)
+                      for entry in sorted(os.scandir(_CATALOG_PATH), key=lambda e: e.name)
+                      if entry.name.endswith(".json"))
+    except OSError:
+        stamp = ()
+    cached_stamp, version = _CATALOG_VERSION
+    if stamp != cached_stamp:
+        from components_catalog.loader import catalog_fingerprint
+        version = catalog_fingerprint(_CATALOG_PATH)
+        _CATALOG_VERSION = (stamp, version)
+    return version
 
+def _plans_from_daemon(proto_data: bytes, cancel_token: CancellationToken) -> Optional[List[List[Dict[str, Any]]]]:
+    """Ritningsplanerna från den varma daemonen, eller None om ingen daemon svarar."""
+    if not os.path.exists(_DAEMON_SOCKET_PATH):
+        return None
+    from pipeline.service.client import request_drawing_plans
+    try:
+        plans = request_drawing_plans(proto_data, _DAEMON_SOCKET_PATH, cancel_token=cancel_token)
+    except ConnectionError as e:
+        print(f"VARNING: {e} Kör pipelinen i processen istället.")
+        return None
+    print("INFO: Ritningsplaner hämtade från pipeline-daemonen.")
+    return plans
 
 
-def process_sketch_to_shape(proto_data: bytes) -> 'Part.Shape':
+def process_sketch_to_shape(proto_data: bytes, backend: Optional['GeometryBackend'] = None, use_daemon: bool = True, check_clashes: bool = True, cancel_token: Optional[CancellationToken] = None) -> 'Part.Shape':
     """
     Huvudfunktion som kör hela pipeline, från rådata till färdig 3D-modell.
+    Utan backend används FreeCAD. Med t.ex. MeshBackend körs pipelinen helt
+    utan FreeCAD och returnerar ett triangelnät istället.
+    Om pipeline-daemonen (pipeline/service/daemon.py) körs används den.
+    cancel_token avbryter körningen (None returneras), se pipeline/shared/cancellation.py.
     """
+    cancel_token = cancel_token or CancellationToken()
     try:
-        # --- Steg 0, 1, 2 (oförändrade) ---
-        project_root = os.path.dirname(os.path.abspath(__file__))
-        catalog_path = os.path.join(project_root, "components_catalog")
-        catalog = CatalogLoader(catalog_path)
-        
-        parser = SketchParser()
-        parsed_sketch = parser.parse(proto_data)
-
-        builder = TopologyBuilder(parsed_sketch, catalog)
-        nodes, graph = builder.build()
-
-        # === NY, KORREKT KEDJA ===
-
-        # STEG 3: Skapa logiska resplaner
-        planner = Planner(nodes=nodes, topology=graph, catalog=catalog)
-        travel_plans = planner.create_plans()
-
-        # STEG 4: Skapa instans av Adjuster (för dependency injection)
-        # Den skapas här men kommer bara att användas inuti CenterlineBuilder vid behov.
-        factory = ComponentFactory(catalog=catalog)
-
-        adjuster = PlanAdjuster(
-            semantic_plans=travel_plans, 
-            nodes=nodes, 
-            topology=graph, 
-            catalog=catalog
-        )
-        # STEG 5: Bygg den detaljerade geometriska planen
-        centerline_builder = CenterlineBuilder(
-            travel_plans=travel_plans,
-            nodes=nodes,
-            topology=graph,  
-            catalog=catalog,
-            factory=factory,
-            adjuster=adjuster
-        )
-
-        final_drawing_plans = centerline_builder.build_drawing_plans()
-
-        # STEG 7: Exekvera och rita modellen (Återställd till den gamla, fungerande logiken)
-        all_wires = []
-        # Loopa igenom varje plan som vår nya kedja har producerat
-        for plan in final_drawing_plans:
-            if not plan:
-                continue
-
-            # Skapa en Executor för varje enskild plan, precis som förut
-            executor = GeometryExecutor(
-                explicit_plan=plan, # Använd det korrekta argumentnamnet
-                freecad_part_module=Part,
-                freecad_vector_class=Vector
-            )
-            wire = executor.build_model()
-            if wire:
-                all_wires.append(wire)
-
-        # Foga samman alla trådar till ett enda objekt för visualisering
-        final_model = Part.Compound(all_wires) if all_wires else None
+        # STEG 1-5: Från Protobuf till ritningsplaner. Körs i den varma
+        # daemonen om en sådan lyssnar, annars här i processen.
+        final_drawing_plans = _plans_from_daemon(proto_data, cancel_token) if use_daemon else None
+        if final_drawing_plans is None:
+            _reload_pipeline_modules()
+            from pipeline.service.runner import build_drawing_plans
+            final_drawing_plans = build_drawing_plans(proto_data, _catalog(), cancel_token=cancel_token)
+
+        # STEG 6: Kollisionskontroll (rapporterar, stoppar inte bygget)
+        if check_clashes:
+            from pipeline.clash_detector.detector import ClashDetector
+            for clash in ClashDetector(_catalog()).detect(final_drawing_plans):
+                print(f"VARNING: Kollision mellan {clash.component_a} och {clash.component_b} "
+                      f"({clash.penetration:.1f} mm överlapp vid {tuple(round(c, 1) for c in clash.point_a)}).")
+
+        # STEG 7: Exekvera och rita modellen. Alla planer byggs i ett enda
+        # batch-anrop av vald backend (standard: en platt FreeCAD-Compound).
+        cancel_token.check('executor')
+        if backend is None:
+            from pipeline.geometry_executor.backends import FreeCADBackend
+            backend = FreeCADBackend(freecad_part_module=Part, freecad_vector_class=Vector, cancel_token=cancel_token)
+        final_model = backend.build(final_drawing_plans, _catalog())
 
         print("===================================")
         print("=== Pipeline slutförd framgångsrikt ===")
@@ -138,14 +186,86 @@ def process_sketch_to_shape(proto_data: bytes) -> 'Part.Shape':
         
         return final_model
 
+    except OperationCancelled as e:
+        print(f"INFO: Körningen avbröts i steg '{e.stage}' ({e.reason}).")
+        return None
     except ImpossibleBuildError as e:
         print("\n!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
         print(f"FEL: Bygget är geometriskt omöjligt.")
         print(f"Anledning: {e}")
         print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!\n")
         return None
+    except SketchValidationError as e:
+        print("\n!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
+        print(f"FEL: Skissen är ogiltig ({len(e.issues)} fel).")
+        for issue in e.issues:
+            print(f"  [{issue.code}] {issue.message} Segment: {', '.join(map(str, issue.segment_ids))}")
+        print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!\n")
+        return None
     except Exception as e:
         print(f"\nEtt oväntat fel inträffade i pipelinen: {e}")
         import traceback
         traceback.print_exc()
-        return None
\ No newline at end of file
+        return None
+
+# Interaktiva körningar: en ny redigering avbryter den föregående körningen.
+_INTERACTIVE_RUNS = SupersedingRuns()
+
+def stream_sketch_to_shape(proto_data: bytes, cancel_token: Optional[CancellationToken] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Strömmande variant av process_sketch_to_shape. Ger en händelse per
+    resplan så fort den är klar, istället för en färdig Compound på slutet:
+      {'status': 'preview', 'index': i, 'plan': [...], 'shape': Part.Shape}
+          trådmodell mellan noderna, för alla resplaner innan bygget börjar
+      {'status': 'plan', 'index': i, 'plan': [...], 'shape': Part.Shape}
+          färdig ritningsplan med sin centrumlinje; ersätter förhandsvisning i
+    Trådarna byggs i anroparens tråd (FreeCAD är inte trådsäkert), pipelinen
+    i en bakgrundstråd. Utan FreeCAD är 'shape' None.
+    Utan cancel_token avbryter varje nytt anrop det föregående (pågående)
+    anropets körning, så bara den senaste redigeringen byggs klart.
+    """
+    _reload_pipeline_modules()
+    from pipeline.service.runner import iter_drawing_plans
+    from pipeline.geometry_executor.executor import GeometryExecutor
+
+    cancel_token = cancel_token or _INTERACTIVE_RUNS.begin()
+    try:
+        for event in iter_drawing_plans(proto_data, _catalog(), cancel_token=cancel_token):
+            if event['status'] == 'done':
+                print(f"=== Pipeline slutförd: {event['count']} planer strömmade ===")
+                return
+            shape = None
+            if FREECAD_AVAILABLE:
+                shape = GeometryExecutor(event['plan'], freecad_part_module=Part, freecad_vector_class=Vector,
+                                         cancel_token=cancel_token).build_model()
+            yield {**event, 'shape': shape}
+
+    except OperationCancelled as e:
+        print(f"INFO: Körningen avbröts i steg '{e.stage}' ({e.reason}).")
+    except ImpossibleBuildError as e:
+        print(f"FEL: Bygget är geometriskt omöjligt. Anledning: {e}")
+    except SketchValidationError as e:
+        print(f"FEL: Skissen är ogiltig ({len(e.issues)} fel).")
+        for issue in e.issues:
+            print(f"  [{issue.code}] {issue.message} Segment: {', '.join(map(str, issue.segment_ids))}")
+
+# Samtidiga anrop med samma skiss (autosave, flera vyer) körs bara en gång.
+_SHAPE_COALESCER = RequestCoalescer(
+    compute=process_sketch_to_shape,
+    catalog_version=_catalog_version,
+    canonicalize=canonical_sketch_bytes,
+)
+
+def process_sketch_to_shape_coalesced(proto_data: bytes, backend: Optional['GeometryBackend'] = None) -> 'Part.Shape':
+    """
+    Som process_sketch_to_shape, men identiska samtidiga förfrågningar (samma
+    innehåll, katalogversion och backend) delar på en enda körning.
+    Backenden nycklas på objektet, inte på namnet: två backends av samma typ
+    kan vara olika konfigurerade (t.ex. MeshBackend med olika upplösning).
+    Se _SHAPE_COALESCER.stats för hur många som slagits ihop.
+    """
+    backend_key = "default" if backend is None else f"{type(backend).__qualname__}@{id(backend):x}"
+    return _SHAPE_COALESCER.run(
+        proto_data, backend_key,
+        compute=lambda data: process_sketch_to_shape(data, backend)
+    )
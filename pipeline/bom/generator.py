@@ -0,0 +1,115 @@
+# pipeline/bom/generator.py
+
+import csv
+import json
+import math
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, TextIO, Tuple
+
+FITTING_COMPONENT_TYPES = {'BEND_90', 'BEND_45', 'BEND_CUSTOM', 'TEE', 'REDUCED_TEE', 'REDUCER_CONCENTRIC', 'REDUCER_ECCENTRIC'}
+
+
+class CutPiece(NamedTuple):
+    """En rak rörlängd i kaplistan."""
+    position: int
+    component_id: str
+    pipe_spec: str
+    length: float
+
+
+class BOMAggregator:
+    """
+    Materialförteckning i ett enda pass över ritningsplanerna. Kopplingsdelar
+    räknas per (component_type, spec), en gång per component_id (primitiver
+    utan component_id räknas var för sig), och raka rör
+    summeras per spec. Kaplistan strömmas ut via consume() medan aggregaten
+    byggs, utan mellanliggande strukturer per primitiv.
+    """
+    def __init__(self):
+        self.fittings: Counter = Counter()
+        self.straight_length: Dict[str, float] = defaultdict(float)
+        self.straight_count: Counter = Counter()
+        self._seen_components = set()
+
+    def consume(self, explicit_plans: Iterable[List[Dict[str, Any]]]) -> Iterator[CutPiece]:
+        position = 0
+        for plan_index, plan in enumerate(explicit_plans):
+            for item_index, item in enumerate(plan):
+                component_type = item.get('component_type')
+                component_id = item.get('component_id')
+
+                if component_type == 'PIPE' and item.get('type') == 'LINE':
+                    length = math.dist(item['start'], item['end'])
+                    spec = item.get('pipe_spec') or "OKÄND"
+                    self.straight_length[spec] += length
+                    self.straight_count[spec] += 1
+                    position += 1
+                    yield CutPiece(position, component_id, spec, length)
+
+                elif component_type in FITTING_COMPONENT_TYPES:
+                    key = component_id if component_id is not None else ('anon', plan_index, item_index)
+                    if key not in self._seen_components:
+                        self._seen_components.add(key)
+                        self.fittings[(component_type, self._fitting_spec(item))] += 1
+
+    @staticmethod
+    def _fitting_spec(item: Dict[str, Any]) -> str:
+        """Konor anges som stor->liten, T-rör med avstick som run->branch."""
+        spec = item.get('pipe_spec') or "OKÄND"
+        if item.get('component_type', '').startswith('REDUCER') and item.get('to_pipe_spec'):
+            large, small = spec, item['to_pipe_spec']
+            if item.get('small_pipe_spec') == spec:
+                large, small = small, large
+            return f"{large}->{small}"
+        if item.get('component_type') == 'REDUCED_TEE' and item.get('branch_pipe_spec'):
+            return f"{item.get('run_pipe_spec') or spec}->{item['branch_pipe_spec']}"
+        return spec
+
+    def fitting_rows(self) -> List[Tuple[str, str, int]]:
+        return sorted((kind, spec, count) for (kind, spec), count in self.fittings.items())
+
+    def straight_rows(self) -> List[Tuple[str, int, float]]:
+        return sorted((spec, self.straight_count[spec], total) for spec, total in self.straight_length.items())
+
+
+def write_cut_list_csv(explicit_plans: Iterable[List[Dict[str, Any]]], stream: TextIO,
+                       aggregator: Optional[BOMAggregator] = None) -> BOMAggregator:
+    """Skriver kaplistan rad för rad som CSV. Returnerar aggregatorn med BOM-summorna."""
+    aggregator = aggregator or BOMAggregator()
+    writer = csv.writer(stream)
+    writer.writerow(["position", "component_id", "pipe_spec", "length_mm"])
+    for piece in aggregator.consume(explicit_plans):
+        writer.writerow([piece.position, piece.component_id, piece.pipe_spec, f"{piece.length:.1f}"])
+    return aggregator
+
+
+def write_bom_csv(aggregator: BOMAggregator, stream: TextIO):
+    """Skriver BOM-summorna (kopplingsdelar och rakrör per spec) som CSV."""
+    writer = csv.writer(stream)
+    writer.writerow(["item", "component_type", "pipe_spec", "quantity", "total_length_mm"])
+    for kind, spec, count in aggregator.fitting_rows():
+        writer.writerow(["FITTING", kind, spec, count, ""])
+    for spec, count, total in aggregator.straight_rows():
+        writer.writerow(["STRAIGHT", "PIPE", spec, count, f"{total:.1f}"])
+
+
+def write_bom_json(explicit_plans: Iterable[List[Dict[str, Any]]], stream: TextIO) -> BOMAggregator:
+    """
+    Skriver kaplista och BOM som ett JSON-objekt. Kaplistan strömmas först,
+    post för post; summorna skrivs sist när passet är klart.
+    """
+    aggregator = BOMAggregator()
+    stream.write('{"cut_list": [')
+    for piece in aggregator.consume(explicit_plans):
+        if piece.position > 1:
+            stream.write(', ')
+        stream.write(json.dumps({'position': piece.position, 'component_id': piece.component_id,
+                                 'pipe_spec': piece.pipe_spec, 'length_mm': round(piece.length, 1)}))
+    stream.write('], "fittings": ')
+    stream.write(json.dumps([{'component_type': kind, 'pipe_spec': spec, 'quantity': count}
+                             for kind, spec, count in aggregator.fitting_rows()]))
+    stream.write(', "straight_totals": ')
+    stream.write(json.dumps([{'pipe_spec': spec, 'pieces': count, 'total_length_mm': round(total, 1)}
+                             for spec, count, total in aggregator.straight_rows()]))
+    stream.write('}')
+    return aggregator
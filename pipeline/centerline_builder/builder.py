@@ -1,14 +1,33 @@
 # pipeline/centerline_builder/builder.py
 
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional, Callable
 from pipeline.topology_builder.node_types_v2 import NodeInfo
+from pipeline.topology_builder.node_store import NodeStore
 from pipeline.shared.types import BuildPlanItem
+from pipeline.shared.cancellation import CancellationToken, OperationCancelled
 
+import hashlib
 import math
 import uuid
+import numpy as np
+from components_catalog.loader import PipeSpecData
 from pipeline.topology_builder.builder import Vec3
 from pipeline.topology_builder.node_types_v2 import BendNodeInfo, EndpointNodeInfo, TeeNodeInfo
+from pipeline.plan_adjuster.adjuster import CuttableTangent
+from pipeline.component_factory.bend_batch import BendRecipeBuffer
 
+# Vilken katalogkomponent en primitivs component_type ska hämta sina
+# kapningsregler (physical_min_tangent) från.
+CATALOG_KEY_BY_COMPONENT_TYPE = {
+    'BEND_90': 'BEND_90',
+    'BEND_45': 'BEND_45',
+    'BEND_CUSTOM': 'BEND_90',
+    'TEE': 'TEE',
+    'REDUCED_TEE': 'TEE',
+}
+
+# Komponenter vars primitiver aldrig får kapas av Adjuster.
+NON_CUTTABLE_COMPONENT_TYPES = {'REDUCER_CONCENTRIC', 'REDUCER_ECCENTRIC'}
 
 
 # Lägg till denna klassdefinition
@@ -27,40 +46,83 @@ class CenterlineBuilder:
     (FÖR TILLFÄLLET: Implementerar en enkel översättning för att skapa en
     trådmodell för visualisering, precis som den gamla PlanAdjuster gjorde.)
     """
-    def __init__(self, travel_plans: List[List[BuildPlanItem]], nodes: List[NodeInfo], topology: Any, catalog: Any, adjuster: Any, factory: Any):
+    # Höjs när utdata ändras, så stegets checkpoints ogiltigförklaras.
+    CHECKPOINT_VERSION = "2"
+
+    def __init__(self, travel_plans: List[List[BuildPlanItem]], nodes: List[NodeInfo], topology: Any, catalog: Any, adjuster: Any, factory: Any, min_straight_length: float = 0.0, eccentric_reducers: bool = False, cancel_token: Optional[CancellationToken] = None):
         self.travel_plans = travel_plans
-        self.nodes_by_id = {node.id: node for node in nodes}
+        self.nodes_by_id = NodeStore(nodes)
         self.topology = topology
         self.catalog = catalog
         self.adjuster = adjuster
 
         self.factory = factory
+        # Kortaste tillåtna raka rör mellan två komponenter.
+        self.min_straight_length = min_straight_length
+        # Om konor vid dimensionsövergångar ska vara excentriska istället för koncentriska.
+        self.eccentric_reducers = eccentric_reducers
+        # Kontrolleras per nod. Med partial-policy returneras de planer som
+        # hunnit byggas klart när tidsbudgeten tar slut.
+        self.cancel_token = cancel_token or CancellationToken()
 
         # "3D-pennans" tillstånd
         self.pen_position: Vec3 = None
         self.pen_direction: Vec3 = None
-
-    def build_drawing_plans(self) -> List[List[Dict[str, Any]]]:
+        # Sidoförskjutning (in, ut) per nod. En excentrisk kona flyttar hela
+        # fortsättningen av loppet i sidled; allt efter konan placeras och
+        # ansluts i förskjutna koordinater så att rören möter konans utlopp.
+        self._node_shifts: Dict[Any, Tuple[Vec3, Vec3]] = {}
+        # Primitiverna för varje redan placerad komponent (component_id -> recept).
+        self._placed_components: Dict[str, List[Dict[str, Any]]] = {}
+
+    def build_drawing_plans(self, on_plan: Optional[Callable[[int, List[Dict[str, Any]]], None]] = None) -> List[List[Dict[str, Any]]]:
         """
         Huvudmetod som exekverar byggprocessen i två pass.
         Returnerar en lista av explicita planer, en för varje gren.
+        on_plan(index, plan) anropas så fort varje plan är klar, för strömmande anropare.
+        Tar tidsbudgeten slut med partial-policy returneras bara de färdiga planerna.
         """
         print("--- Modul 5 (CenterlineBuilder): Startar bygge av DrawingPlan ---")
         all_explicit_plans = []
+        self._node_shifts = {}
+        self._placed_components = {}
 
         for conceptual_plan in self.travel_plans:
             drawing_plan = DrawingPlan()
 
-            # Pass 1: Placera ut all komponentgeometri (just nu bara böjar)
-            self._place_components(conceptual_plan, drawing_plan)
+            try:
+                # Pass 1: Placera ut all komponentgeometri (just nu bara böjar)
+                self._place_components(conceptual_plan, drawing_plan)
 
-            # Pass 2: Anslut komponenterna med raka rör (implementeras senare)
-            self._connect_components(conceptual_plan, drawing_plan)
+                # Pass 2: Anslut komponenterna med raka rör (implementeras senare)
+                self._connect_components(conceptual_plan, drawing_plan)
+            except OperationCancelled as e:
+                if not self.cancel_token.allows_partial(e):
+                    raise
+                self.cancel_token.mark_truncated('centerline', len(all_explicit_plans), len(self.travel_plans))
+                break
 
             all_explicit_plans.append(drawing_plan.build_plan)
+            if on_plan:
+                on_plan(len(all_explicit_plans) - 1, drawing_plan.build_plan)
 
         return all_explicit_plans
     
+    def build_preview_plans(self, on_preview: Optional[Callable[[int, List[Dict[str, Any]]], None]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Billig trådmodell per resplan (raka linjer mellan noderna), för att
+        visa modellen innan build_drawing_plans har placerat komponenterna.
+        on_preview(index, plan) anropas för varje plan.
+        """
+        print(f"--- Modul 5 (CenterlineBuilder): Förhandsvisning av {len(self.travel_plans)} resplaner ---")
+        previews = []
+        for conceptual_plan in self.travel_plans:
+            preview = self._create_explicit_plan_from_conceptual(conceptual_plan)
+            previews.append(preview)
+            if on_preview:
+                on_preview(len(previews) - 1, preview)
+        return previews
+
     def _place_components(self, conceptual_plan: list, drawing_plan: DrawingPlan):
         """Pass 1: Loopar igenom resplanen och placerar komponenternas geometri."""
         print("   -> Pass 1: Placerar komponenter...")
@@ -68,7 +130,9 @@ class CenterlineBuilder:
         # Initiera "3D-pennan" vid startpunkten
         start_node_id = conceptual_plan[0]['id']
         start_node = self.nodes_by_id[start_node_id]
-        self.pen_position = Vec3(*start_node.coords)
+        # En plan som börjar i en redan placerad nod (T-rör) ärver dess förskjutning.
+        shift = self._node_shifts.get(start_node_id, (Vec3(), Vec3()))[1]
+        self.pen_position = Vec3(*start_node.coords) + shift
         if isinstance(start_node, EndpointNodeInfo):
             self.pen_direction = Vec3(*start_node.direction)
         else:
@@ -76,26 +140,27 @@ class CenterlineBuilder:
             next_node = self.nodes_by_id[next_node_id]
             self.pen_direction = (Vec3(*next_node.coords) - Vec3(*start_node.coords)).normalize()
 
+        # Beräkna alla böjar i planen i en vektoriserad batch
+        bend_buffer = self._compute_plan_bends(conceptual_plan)
+
         # Loopa igenom planen och bygg komponenter
         for i, item in enumerate(conceptual_plan):
             if item['type'] == 'NODE':
+                self.cancel_token.check('centerline')
                 node = self.nodes_by_id[item['id']]
                 component_recipe, new_pos, new_dir = None, None, None
+                shift = self._node_shifts.get(node.id, (shift, shift))[0]
+                shift_in = shift
+
+                if isinstance(node, BendNodeInfo) and self._is_inline_transition(node, conceptual_plan, i):
+                    # Rak dimensionsövergång: bara en kona, centrerad över noden.
+                    shift = shift + self._place_reducer(node, conceptual_plan, i, drawing_plan, centered=True, shift=shift)
+                    self._node_shifts.setdefault(node.id, (shift_in, shift))
+                    continue
 
                 if isinstance(node, BendNodeInfo):
-                    # ... (All kod för böjar är helt oförändrad) ...
-                    corner_pos = Vec3(*node.coords)
-                    kwargs_for_factory = {}
-                    if not math.isclose(node.angle, 90.0) and not math.isclose(node.angle, 45.0):
-                        incoming_length = conceptual_plan[i-1].get('length') if i > 0 else None
-                        outgoing_length = conceptual_plan[i+1].get('length') if i < len(conceptual_plan) - 1 else None
-                        compare_in = incoming_length if incoming_length is not None else float('inf')
-                        compare_out = outgoing_length if outgoing_length is not None else float('inf')
-                        if compare_in < compare_out:
-                            kwargs_for_factory['tangent_placement'] = 'INCOMING'
-                        else:
-                            kwargs_for_factory['tangent_placement'] = 'OUTGOING'
-                    component_recipe, new_pos, new_dir = self.factory.create_bend_recipe(node, corner_pos, self.pen_direction, **kwargs_for_factory)
+                    row = bend_buffer.row_by_node_id[node.id]
+                    component_recipe, new_pos, new_dir = bend_buffer.to_recipe(row)
                 
                 # --- ANROPA DEN NYA HJÄLPMETODEN ---
                 elif isinstance(node, TeeNodeInfo):
@@ -103,10 +168,112 @@ class CenterlineBuilder:
 
                 # Gemensam logik för att uppdatera planen och pennan
                 if component_recipe:
-                    drawing_plan.build_plan.extend(component_recipe)
+                    if shift.get_length() > 1e-9:
+                        self._translate_recipe(component_recipe, shift)
+                        new_pos = new_pos + shift
+                    self._register_component(drawing_plan, node.id, component_recipe)
                     self.pen_position = new_pos
                     self.pen_direction = new_dir
 
+                # Kona direkt an mot böjen om dimensionen byts i noden
+                if isinstance(node, BendNodeInfo) and node.requires_reducer:
+                    shift = shift + self._place_reducer(node, conceptual_plan, i, drawing_plan, centered=False, shift=shift)
+                self._node_shifts.setdefault(node.id, (shift_in, shift))
+
+    @staticmethod
+    def _translate_recipe(recipe: List[Dict[str, Any]], offset: Vec3):
+        """Flyttar ett recepts alla punkter med offset (på plats)."""
+        for primitive in recipe:
+            for key in ('start', 'mid', 'end'):
+                if key in primitive:
+                    x, y, z = primitive[key]
+                    primitive[key] = (x + offset.x, y + offset.y, z + offset.z)
+
+
+    def _edge_spec(self, conceptual_plan: list, index: int) -> Any:
+        """Hämtar pipe_spec för EDGE-steget på given position i planen, om det finns."""
+        if index < 0 or index >= len(conceptual_plan) or conceptual_plan[index]['type'] != 'EDGE':
+            return None
+        edge_id = conceptual_plan[index]['id']
+        if not self.topology.has_edge(*edge_id):
+            return None
+        return self.topology.edges[edge_id].get('pipe_spec')
+
+    def _is_inline_transition(self, node: BendNodeInfo, conceptual_plan: list, index: int) -> bool:
+        """En rak (0°) nod mellan två olika specar är en ren konaövergång, inte en böj."""
+        if not node.requires_reducer or node.angle is None or abs(node.angle) > 1e-3:
+            return False
+        in_spec, out_spec = self._edge_spec(conceptual_plan, index - 1), self._edge_spec(conceptual_plan, index + 1)
+        return bool(in_spec and out_spec and in_spec != out_spec)
+
+    def _place_reducer(self, node: BendNodeInfo, conceptual_plan: list, index: int, drawing_plan: DrawingPlan,
+                       centered: bool, shift: Optional[Vec3] = None) -> Vec3:
+        """
+        Konplacering: lägger en kona vid en dimensionsövergång i noden.
+        Centrerad över noden för raka övergångar, annars direkt efter böjen.
+        shift är loppets nuvarande sidoförskjutning. Returnerar konans egen
+        sidoförskjutning (noll för koncentriska konor).
+        """
+        shift = shift or Vec3()
+        in_spec, out_spec = self._edge_spec(conceptual_plan, index - 1), self._edge_spec(conceptual_plan, index + 1)
+        if not in_spec or not out_spec or in_spec == out_spec:
+            return Vec3()
+
+        if centered:
+            reducer = self.factory.get_reducer(in_spec, out_spec, self.eccentric_reducers)
+            half_length = reducer.axial_length / 2.0 if reducer else 0.0
+            if index >= 2:
+                previous = self.nodes_by_id[conceptual_plan[index - 2]['id']]
+                direction = (Vec3(*node.coords) - Vec3(*previous.coords)).normalize()
+            else:
+                direction = self.pen_direction
+            start_pos = Vec3(*node.coords) + shift - direction * half_length
+        else:
+            start_pos, direction = self.pen_position, self.pen_direction
+
+        recipe, new_pos, new_dir = self.factory.create_reducer_recipe(
+            start_pos, direction, in_spec, out_spec, eccentric=self.eccentric_reducers
+        )
+        if not recipe:
+            return Vec3()
+        self._register_component(drawing_plan, node.id, recipe)
+        self.pen_position = new_pos
+        self.pen_direction = new_dir
+        # Det som inte ligger längs röret är den excentriska förskjutningen.
+        travel = new_pos - start_pos
+        return travel - direction * travel.dot(direction)
+
+    def _compute_plan_bends(self, conceptual_plan: list) -> BendRecipeBuffer:
+        """
+        Samlar alla böjar i planen och låter fabriken beräkna dem i en batch.
+        Inkommande riktning är alltid riktningen från föregående nod i planen.
+        """
+        bend_nodes, incoming_dirs, placements, pipe_specs = [], [], [], []
+        for i, item in enumerate(conceptual_plan):
+            if item['type'] != 'NODE':
+                continue
+            node = self.nodes_by_id[item['id']]
+            if not isinstance(node, BendNodeInfo):
+                continue
+
+            if i >= 2:
+                previous = self.nodes_by_id[conceptual_plan[i-2]['id']]
+                incoming = (Vec3(*node.coords) - Vec3(*previous.coords)).normalize()
+            else:
+                incoming = self.pen_direction
+            incoming_dirs.append((incoming.x, incoming.y, incoming.z))
+
+            # Specialböjar: lägg tangenten på den kortare sidan
+            incoming_length = conceptual_plan[i-1].get('length') if i > 0 else None
+            outgoing_length = conceptual_plan[i+1].get('length') if i < len(conceptual_plan) - 1 else None
+            compare_in = incoming_length if incoming_length is not None else float('inf')
+            compare_out = outgoing_length if outgoing_length is not None else float('inf')
+            placements.append('INCOMING' if compare_in < compare_out else 'OUTGOING')
+            # Böjen får inkommande kants dimension; en eventuell kona placeras efter den.
+            pipe_specs.append(self._edge_spec(conceptual_plan, i - 1))
+            bend_nodes.append(node)
+
+        return self.factory.create_bend_recipes(bend_nodes, incoming_dirs, placements, pipe_specs)
 
     def _handle_tee_node(self, node: TeeNodeInfo, conceptual_plan: list) -> Tuple[List[Dict], Vec3, Vec3]:
         """
@@ -114,7 +281,7 @@ class CenterlineBuilder:
         för att säkerställa att alla tre anslutningar analyseras korrekt.
         """
         center_pos = Vec3(*node.coords)
-        print(f"   -> Hanterar T-RÖR vid nod {node.id[:8]}")
+        print(f"   -> Hanterar T-RÖR vid nod {node.id}")
 
         # Steg 1: Hämta alla tre anslutna kanter direkt från topologi-grafen.
         # Detta är den enda källan till sanning.
@@ -147,60 +314,229 @@ class CenterlineBuilder:
         print(f"         - Run specs: {run_pipe_specs}")
         print(f"         - Branch spec: {branch_pipe_spec}")
 
-        # Default-värden för ett standard T-rör
-        tee_type_name = f"TEE_{main_run_spec}"
-        kwargs_for_factory = {}
+        kwargs_for_factory = {'run_pipe_spec': main_run_spec}
 
         # Om branch har en annan dimension, välj ett nedminskat T-rör
         if branch_pipe_spec and main_run_spec and branch_pipe_spec != main_run_spec:
             print(f"      -> Upptäckt dimensionsskillnad: Run är {main_run_spec}, Branch är {branch_pipe_spec}.")
-            tee_type_name = f"REDUCED_TEE_{main_run_spec}"
             kwargs_for_factory['branch_pipe_spec'] = branch_pipe_spec
-            print(f"      -> BESLUT: Använder {tee_type_name}.")
+            print(f"      -> BESLUT: Använder nedminskat T-rör.")
         else:
             print(f"      -> Inga dimensionsskillnader. BESLUT: Använder standard T-rör.")
 
         # Steg 4: Anropa fabriken med rätt instruktioner.
-        kwargs_for_factory['tee_type_name'] = tee_type_name
         return self.factory.create_tee_recipe(
             node, center_pos, self.nodes_by_id, **kwargs_for_factory
         )
 
     
 
+    def _edge_key(self, edge_id: Tuple[str, str]) -> str:
+        """Skissens segment-ID(n) för en kant (stabilt mellan körningar), annars ändnodernas nycklar."""
+        if self.topology.has_edge(*edge_id):
+            edge = self.topology.edges[edge_id]
+            segment_ids = edge.get('segment_ids') or ([edge['segment_id']] if edge.get('segment_id') else [])
+            if segment_ids:
+                return "+".join(sorted(str(segment_id) for segment_id in segment_ids))
+        return "-".join(sorted(self._node_key(node_id) for node_id in edge_id))
+
+    def _node_key(self, node_id: Any) -> str:
+        """
+        En nods stabila namn när dess kanter saknar segment-ID:n. Nod-ID:t är
+        ett positionsindex (NodeStore) och duger inte; nodens label (skissens
+        segment-ID:n, satt av TopologyBuilder) eller dess avrundade koordinater gör det.
+        """
+        node = self.nodes_by_id.get(node_id)
+        if node is None:
+            return str(node_id)
+        if node.label:
+            return node.label
+        return ",".join(f"{c:.3f}" for c in node.coords)
+
+    def _stable_component_id(self, component_type: str, node_id: str) -> str:
+        """
+        Ett component_id som överlever en ny körning: noden identifieras av
+        skiss-segmenten som möts i den, inte av dess positionsberoende nod-ID.
+        Används av den inkrementella executorn för att hitta oförändrade objekt.
+        """
+        segment_keys = []
+        if self.topology.has_node(node_id):
+            segment_keys = sorted(self._edge_key(tuple(sorted(edge))) for edge in self.topology.edges(node_id))
+        if not segment_keys:
+            segment_keys = [self._node_key(node_id)]
+        digest = hashlib.sha1("|".join(segment_keys).encode('utf-8')).hexdigest()[:10]
+        return f"{component_type.lower()}_{digest}"
+
+    def _register_component(self, drawing_plan: DrawingPlan, node_id: str, recipe: List[Dict[str, Any]]):
+        """
+        Lägger till en placerad komponent i planen och dess assembly_map, med ett
+        stabilt component_id. Ett T-rör ligger i både löpets och grenens resplan;
+        den andra placeringen återanvänder den första (samma primitiver) istället
+        för att lägga komponenten i planerna två gånger. Pass 2 i den senare
+        planen kapar då samma tangenter som ligger i den första.
+        """
+        component_id = self._stable_component_id(recipe[0]['component_type'], node_id)
+        placed = self._placed_components.get(component_id)
+        if placed is None:
+            for primitive in recipe:
+                primitive['component_id'] = component_id
+            self._placed_components[component_id] = recipe
+            drawing_plan.build_plan.extend(recipe)
+        else:
+            recipe = placed
+        drawing_plan.assembly_map[component_id] = {
+            'component_type': recipe[0]['component_type'],
+            'source_node_id': node_id,
+            'primitives': [primitive['id'] for primitive in recipe],
+        }
+
     def _connect_components(self, conceptual_plan: list, drawing_plan: DrawingPlan):
-        """Pass 2: Ansluter komponenterna. IMPLEMENTERAS SENARE."""
-        print("   -> Pass 2: Ansluter komponenter (hoppar över för nu).")
-        pass
+        """
+        Pass 2: Beräknar alla raka rör i planen på en gång.
+
+        Längs en resplan med noderna N0..NK gäller för varje kant i:
+            rakt_rör[i] = avstånd(Ni, Ni+1) - ut[Ni] - in[Ni+1] >= min_straight_length
+        där ut/in är hur långt komponenten i respektive nod sträcker sig längs
+        kanten. Systemet är bidiagonalt och löses vektoriserat, så kostnaden
+        är linjär i planens längd. Alla överlapp samlas och skickas till
+        Adjuster i ett enda anrop.
+        """
+        print("   -> Pass 2: Ansluter komponenter...")
+        node_ids = [item['id'] for item in conceptual_plan if item['type'] == 'NODE']
+        edge_ids = [item['id'] for item in conceptual_plan if item['type'] == 'EDGE']
+        if not edge_ids:
+            return
+
+        coords = np.array([self.nodes_by_id[n_id].coords for n_id in node_ids], dtype=float)
+        # Excentriska konor: kanten lämnar noden i utloppets förskjutning och
+        # når nästa nod i dess inloppsförskjutning (samma längs ett lopp).
+        zero = (Vec3(), Vec3())
+        shift_in = np.array([[v.x, v.y, v.z] for v in (self._node_shifts.get(n_id, zero)[0] for n_id in node_ids)], dtype=float)
+        shift_out = np.array([[v.x, v.y, v.z] for v in (self._node_shifts.get(n_id, zero)[1] for n_id in node_ids)], dtype=float)
+        coords_out = coords + shift_out
+        spans = (coords[1:] + shift_in[1:]) - coords_out[:-1]
+        distances = np.linalg.norm(spans, axis=1)
+        directions = spans / np.where(distances > 0.0, distances, 1.0)[:, None]
+
+        # Steg 1: Samla kandidatpunkter (primitivernas ändpunkter) per nod.
+        points, owners, refs, offsets = self._collect_port_candidates(node_ids, drawing_plan, coords_out)
+        last_edge = len(edge_ids) - 1
+        relative = points - coords_out[owners]
+        out_proj = np.einsum('ij,ij->i', relative, directions[np.minimum(owners, last_edge)])
+        in_proj = np.einsum('ij,ij->i', relative, -directions[np.maximum(owners - 1, 0)])
+
+        # Steg 2: Hur långt varje komponent når längs sina två kanter.
+        reach_out = np.maximum.reduceat(out_proj, offsets)
+        reach_in = np.maximum.reduceat(in_proj, offsets)
+        straight = distances - reach_out[:-1] - reach_in[1:]
+
+        # Steg 3: Flagga alla överlapp och lös dem i ett enda anrop.
+        overlapping = np.nonzero(straight < self.min_straight_length - 1e-6)[0]
+        if overlapping.size:
+            print(f"      -> {overlapping.size} överlappande segment hittade. Anropar Adjuster.")
+            segments, ports = [], {}
+            bounds = np.append(offsets, len(refs))
+            for i in overlapping:
+                tangents = []
+                for node_index, proj in ((i, out_proj), (i + 1, in_proj)):
+                    start, stop = bounds[node_index], bounds[node_index + 1]
+                    ref = refs[start + int(np.argmax(proj[start:stop]))]
+                    tangent = self._as_cuttable_tangent(node_ids[node_index], ref)
+                    if tangent:
+                        tangents.append(tangent)
+                        ports[tangent.primitive_id] = (ref, node_index, i)
+                segments.append((tangents, float(self.min_straight_length - straight[i])))
+
+            cuts = self.adjuster.resolve_shortfalls(segments)
+            for primitive_id, cut in cuts.items():
+                (primitive, key), node_index, edge_index = ports[primitive_id]
+                self._cut_tangent(primitive, key, cut)
+                if node_index == edge_index:
+                    reach_out[node_index] -= cut
+                else:
+                    reach_in[node_index] -= cut
+            straight = distances - reach_out[:-1] - reach_in[1:]
+
+        # Steg 4: Skapa LINE-primitiver för alla raka rör.
+        starts = coords_out[:-1] + directions * reach_out[:-1, None]
+        ends = coords[1:] + shift_in[1:] - directions * reach_in[1:, None]
+        for i, edge_id in enumerate(edge_ids):
+            if straight[i] <= 1e-6:
+                continue
+            edge_data = self.topology.edges[edge_id] if self.topology.has_edge(*edge_id) else {}
+            component_id = f"pipe_{hashlib.sha1(self._edge_key(edge_id).encode('utf-8')).hexdigest()[:10]}"
+            primitive = {
+                'id': f"line_{uuid.uuid4().hex[:8]}", 'component_id': component_id, 'component_type': 'PIPE',
+                'type': 'LINE', 'start': tuple(starts[i].tolist()), 'end': tuple(ends[i].tolist()),
+                'pipe_spec': edge_data.get('pipe_spec'),
+            }
+            drawing_plan.build_plan.append(primitive)
+            drawing_plan.assembly_map[component_id] = {
+                'component_type': 'PIPE', 'source_edge_id': edge_id, 'primitives': [primitive['id']],
+            }
+
+    def _collect_port_candidates(self, node_ids: List[str], drawing_plan: DrawingPlan, centers: np.ndarray):
+        """
+        Bygger platta arrayer med alla primitiv-ändpunkter grupperade per nod.
+        Nodens eget (ev. förskjutna) centrum läggs alltid först, så en nod utan
+        komponent (t.ex. en öppen ändpunkt) når 0 mm längs sina kanter.
+        """
+        primitives_by_id = {primitive['id']: primitive
+                            for component_id in drawing_plan.assembly_map
+                            for primitive in self._placed_components.get(component_id, ())}
+        primitive_ids_by_node: Dict[str, List[str]] = {}
+        for entry in drawing_plan.assembly_map.values():
+            if 'source_node_id' in entry:
+                primitive_ids_by_node.setdefault(entry['source_node_id'], []).extend(entry['primitives'])
+
+        points, owners, refs, offsets = [], [], [], []
+        for index, node_id in enumerate(node_ids):
+            offsets.append(len(points))
+            points.append(tuple(centers[index]))
+            owners.append(index)
+            refs.append(None)
+            for primitive_id in primitive_ids_by_node.get(node_id, []):
+                primitive = primitives_by_id[primitive_id]
+                for key in ('start', 'end'):
+                    points.append(primitive[key])
+                    owners.append(index)
+                    refs.append((primitive, key))
+
+        return np.array(points, dtype=float), np.array(owners), refs, np.array(offsets)
+
+    def _as_cuttable_tangent(self, node_id: str, ref) -> Any:
+        """Omvandlar en port-referens till en CuttableTangent om den är en kapbar LINE."""
+        if ref is None or ref[0]['type'] != 'LINE' or ref[0]['component_type'] in NON_CUTTABLE_COMPONENT_TYPES:
+            return None
+        primitive = ref[0]
+        length = math.dist(primitive['start'], primitive['end'])
+        spec = self.nodes_by_id[node_id].assigned_spec
+        catalog_key = CATALOG_KEY_BY_COMPONENT_TYPE.get(primitive['component_type'])
+        component_data = spec.components.get(catalog_key) if isinstance(spec, PipeSpecData) else None
+        if component_data:
+            return CuttableTangent.from_component(primitive['id'], length, component_data)
+        return CuttableTangent(primitive['id'], length)
+
+    def _cut_tangent(self, primitive: Dict[str, Any], port_key: str, cut: float):
+        """Kortar en tangent genom att flytta dess fria ände (porten) mot komponenten."""
+        fixed_key = 'start' if port_key == 'end' else 'end'
+        port = Vec3(*primitive[port_key])
+        fixed = Vec3(*primitive[fixed_key])
+        new_port = port + (fixed - port).normalize() * cut
+        primitive[port_key] = (new_port.x, new_port.y, new_port.z)
 
     def _create_explicit_plan_from_conceptual(self, conceptual_plan: List[BuildPlanItem]) -> List[Dict[str, Any]]:
         """
-        TEMPORÄR METOD: Bygger en enkel trådmodell för visualisering.
-        Denna metod ignorerar kanter och drar bara raka linjer mellan
-        nodernas centrum-koordinater.
+        Bygger en enkel trådmodell för förhandsvisning: raka linjer mellan
+        nodernas centrum-koordinater, utan komponenter och kanter.
         """
-        print("   -> (Visualiseringsläge: Skapar enkel trådmodell från nod-koordinater)")
-        explicit_primitives = []
-
         # Hämta alla noder från planen i rätt ordning
-        node_ids_in_plan = [item['id'] for item in conceptual_plan if item.get('type') == 'NODE']
+        node_ids_in_plan = [item['id'] for item in conceptual_plan
+                            if item.get('type') == 'NODE' and item['id'] in self.nodes_by_id]
 
         if len(node_ids_in_plan) < 2:
             return []
 
-        # Loopa igenom nod-paren och skapa en 'LINE'-primitiv för varje par
-        for i in range(len(node_ids_in_plan) - 1):
-            start_node_id = node_ids_in_plan[i]
-            end_node_id = node_ids_in_plan[i+1]
-
-            start_node = self.nodes_by_id.get(start_node_id)
-            end_node = self.nodes_by_id.get(end_node_id)
-
-            if start_node and end_node:
-                explicit_primitives.append({
-                    'type': 'LINE',
-                    'start': start_node.coords,
-                    'end': end_node.coords
-                })
-
-        return explicit_primitives
\ No newline at end of file
+        # En 'LINE'-primitiv för varje nod-par, koordinaterna hämtas i en batch
+        points = [tuple(row) for row in self.nodes_by_id.coords_of(node_ids_in_plan).tolist()]
+        return [{'type': 'LINE', 'start': start, 'end': end} for start, end in zip(points, points[1:])]
\ No newline at end of file
@@ -0,0 +1,327 @@
+# pipeline/clash_detector/detector.py
+
+from dataclasses import dataclass
+from typing import Any, List, Dict, Optional, Set, Tuple
+
+import numpy as np
+
+from components_catalog.loader import CatalogLoader
+from pipeline.geometry_executor.tessellation import ArcTessellator
+
+# Största kordafel (mm) när bågar delas i kapslar. Felet läggs på
+# kapselradien, så en mindre tolerans ger fler men mindre uppblåsta kapslar.
+CLASH_CHORD_TOLERANCE = 1.0
+LEAF_SIZE = 4
+
+
+@dataclass
+class Clash:
+    """En kollision mellan två komponenter som inte sitter ihop."""
+    component_a: str
+    component_b: str
+    distance: float
+    penetration: float
+    point_a: Tuple[float, float, float]
+    point_b: Tuple[float, float, float]
+
+
+@dataclass
+class CapsuleSet:
+    """
+    Alla kapslar som platta arrayer: segment p->q med radie r.
+    owner[i] är index i components (ett component_id per ägare).
+    """
+    p: np.ndarray
+    q: np.ndarray
+    radius: np.ndarray
+    owner: np.ndarray
+    components: List[str]
+
+    def __len__(self) -> int:
+        return len(self.radius)
+
+
+def _cell(point, tolerance: float) -> Tuple[int, int, int]:
+    return tuple(int(round(c / tolerance)) for c in point)
+
+
+def components_by_endpoint(explicit_plans: List[List[Dict[str, Any]]], tolerance: float = 1e-3) -> Dict[Tuple[int, int, int], Set[str]]:
+    """Hashar alla primitivers ändpunkter till ett rutnät: cell -> komponenter som slutar där."""
+    by_point: Dict[Tuple[int, int, int], Set[str]] = {}
+    for plan_index, plan in enumerate(explicit_plans):
+        for item_index, item in enumerate(plan):
+            component_id = item.get('component_id') or f"anon_{plan_index}_{item_index}"
+            for key in ('start', 'end'):
+                if key in item:
+                    by_point.setdefault(_cell(item[key], tolerance), set()).add(component_id)
+    return by_point
+
+
+def adjacent_component_pairs(by_point: Dict[Tuple[int, int, int], Set[str]]) -> Set[Tuple[str, str]]:
+    """Komponenter som delar en ändpunkt (port) sitter ihop och får överlappa."""
+    pairs: Set[Tuple[str, str]] = set()
+    for components in by_point.values():
+        ordered = sorted(components)
+        for i in range(len(ordered)):
+            for j in range(i + 1, len(ordered)):
+                pairs.add((ordered[i], ordered[j]))
+    return pairs
+
+
+def _trim(p: np.ndarray, q: np.ndarray, radius: float, trim_p: bool, trim_q: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Kortar segmentet med radien vid portar, så att kapselns halvsfär slutar
+    i skarven istället för att sticka in i grannkomponenten (och vidare in
+    i komponenten efter ett kort rör).
+    """
+    span = q - p
+    length = float(np.linalg.norm(span))
+    if length < 1e-12 or not (trim_p or trim_q):
+        return p, q
+    direction = span / length
+    budget = length / 2.0 if (trim_p and trim_q) else length
+    cut = min(radius, budget)
+    return (p + direction * cut if trim_p else p), (q - direction * cut if trim_q else q)
+
+
+def build_capsules(explicit_plans: List[List[Dict[str, Any]]], catalog: CatalogLoader,
+                   by_point: Optional[Dict[Tuple[int, int, int], Set[str]]] = None, tolerance: float = 1e-3,
+                   chord_tolerance: float = CLASH_CHORD_TOLERANCE) -> CapsuleSet:
+    """
+    Omvandlar alla LINE/ARC-primitiver till kapslar med specens ytterradie.
+    Bågarna delas i kordor i en batch; kordafelet läggs på radien så att
+    kordorna täcker hela bågen.
+    """
+    if by_point is None:
+        by_point = components_by_endpoint(explicit_plans, tolerance)
+    arc_items = [item for plan in explicit_plans for item in plan if item.get('type') == 'ARC']
+    arcs = ArcTessellator(chord_tolerance).tessellate(arc_items)
+    arc_row = {id(item): row for row, item in enumerate(arc_items)}
+    p_list, q_list, r_list, owner_list = [], [], [], []
+    component_index: Dict[str, int] = {}
+
+    def is_port(point) -> bool:
+        return len(by_point.get(_cell(point, tolerance), ())) > 1
+
+    for plan_index, plan in enumerate(explicit_plans):
+        for item_index, item in enumerate(plan):
+            spec = catalog.get_spec(item.get('pipe_spec')) if item.get('pipe_spec') else None
+            if spec is None:
+                continue
+            component_id = item.get('component_id') or f"anon_{plan_index}_{item_index}"
+            owner = component_index.setdefault(component_id, len(component_index))
+            outer_radius = spec.diameter / 2.0
+
+            if item.get('type') == 'LINE':
+                segments, extra = [(np.asarray(item['start'], dtype=float), np.asarray(item['end'], dtype=float))], 0.0
+            elif item.get('type') == 'ARC':
+                row = arc_row[id(item)]
+                points = arcs.polyline(row)
+                segments, extra = list(zip(points[:-1], points[1:])), float(arcs.sagitta[row])
+            else:
+                continue
+            start_is_port, end_is_port = is_port(item['start']), is_port(item['end'])
+            for k, (p, q) in enumerate(segments):
+                radius = outer_radius + extra
+                p, q = _trim(p, q, radius, k == 0 and start_is_port, k == len(segments) - 1 and end_is_port)
+                p_list.append(p)
+                q_list.append(q)
+                r_list.append(radius)
+                owner_list.append(owner)
+
+    count = len(r_list)
+    return CapsuleSet(
+        p=np.array(p_list, dtype=float).reshape(count, 3),
+        q=np.array(q_list, dtype=float).reshape(count, 3),
+        radius=np.array(r_list, dtype=float),
+        owner=np.array(owner_list, dtype=np.int64),
+        components=list(component_index),
+    )
+
+
+# =================================================================
+# === BVH (platta arrayer) och parvis sökning ===
+# =================================================================
+
+@dataclass
+class BVH:
+    """
+    Binärt AABB-träd i platta arrayer. Nod n har lådan lo[n]..hi[n]. Interna
+    noder har barnen left[n]/right[n]; löv har left = -1 och äger
+    order[start[n] : start[n] + count[n]].
+    """
+    lo: np.ndarray
+    hi: np.ndarray
+    left: np.ndarray
+    right: np.ndarray
+    start: np.ndarray
+    count: np.ndarray
+    order: np.ndarray
+
+
+def build_bvh(box_lo: np.ndarray, box_hi: np.ndarray, leaf_size: int = LEAF_SIZE) -> BVH:
+    """Bygger trädet uppifrån och ned med mediansplit längs centroidernas längsta axel, O(n log n)."""
+    count = len(box_lo)
+    centroids = (box_lo + box_hi) * 0.5
+    order = np.arange(count)
+    lo, hi, left, right, start, size = [], [], [], [], [], []
+
+    def new_node(begin: int, end: int) -> int:
+        indices = order[begin:end]
+        lo.append(box_lo[indices].min(axis=0) if end > begin else np.zeros(3))
+        hi.append(box_hi[indices].max(axis=0) if end > begin else np.zeros(3))
+        left.append(-1)
+        right.append(-1)
+        start.append(begin)
+        size.append(end - begin)
+        return len(lo) - 1
+
+    root = new_node(0, count)
+    stack = [(root, 0, count)]
+    while stack:
+        node, begin, end = stack.pop()
+        if end - begin <= leaf_size:
+            continue
+        indices = order[begin:end]
+        spread = centroids[indices].max(axis=0) - centroids[indices].min(axis=0)
+        axis = int(np.argmax(spread))
+        if spread[axis] <= 0.0:
+            continue
+        half = (end - begin) // 2
+        partition = np.argpartition(centroids[indices, axis], half)
+        order[begin:end] = indices[partition]
+        middle = begin + half
+        left[node] = new_node(begin, middle)
+        right[node] = new_node(middle, end)
+        size[node] = 0
+        stack.append((left[node], begin, middle))
+        stack.append((right[node], middle, end))
+
+    return BVH(np.array(lo).reshape(-1, 3), np.array(hi).reshape(-1, 3), np.array(left), np.array(right),
+               np.array(start), np.array(size), order)
+
+
+def candidate_pairs(bvh: BVH, box_lo: np.ndarray, box_hi: np.ndarray) -> np.ndarray:
+    """
+    Alla par (i, j), i < j, vars lådor överlappar. Alla kapslar söker
+    samtidigt: fronten av (kapsel, nod)-par expanderas nivå för nivå med
+    NumPy, så kostnaden blir O(n log n + antal träffar).
+    """
+    count = len(box_lo)
+    if count < 2:
+        return np.empty((0, 2), dtype=np.int64)
+
+    queries = np.arange(count)
+    nodes = np.zeros(count, dtype=np.int64)
+    found = []
+    while len(queries):
+        overlap = np.all((box_lo[queries] <= bvh.hi[nodes]) & (bvh.lo[nodes] <= box_hi[queries]), axis=1)
+        queries, nodes = queries[overlap], nodes[overlap]
+        is_leaf = bvh.left[nodes] < 0
+
+        leaf_queries, leaf_nodes = queries[is_leaf], nodes[is_leaf]
+        if len(leaf_queries):
+            sizes = bvh.count[leaf_nodes]
+            repeated = np.repeat(leaf_queries, sizes)
+            offsets = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+            others = bvh.order[np.repeat(bvh.start[leaf_nodes], sizes) + offsets]
+            keep = others > repeated
+            found.append(np.stack([repeated[keep], others[keep]], axis=1))
+
+        inner_queries, inner_nodes = queries[~is_leaf], nodes[~is_leaf]
+        queries = np.concatenate([inner_queries, inner_queries])
+        nodes = np.concatenate([bvh.left[inner_nodes], bvh.right[inner_nodes]])
+
+    if not found:
+        return np.empty((0, 2), dtype=np.int64)
+    pairs = np.concatenate(found)
+    # Slutlig lådkontroll mellan kapslarna själva (lövets låda var bara en gräns).
+    i, j = pairs[:, 0], pairs[:, 1]
+    overlap = np.all((box_lo[i] <= box_hi[j]) & (box_lo[j] <= box_hi[i]), axis=1)
+    return pairs[overlap]
+
+
+def segment_distances(p1: np.ndarray, q1: np.ndarray, p2: np.ndarray, q2: np.ndarray, eps: float = 1e-12):
+    """
+    Kortaste avstånd mellan segmentpar (p1q1, p2q2), radvis (Ericson,
+    Real-Time Collision Detection 5.1.9). Returnerar avstånd och närmaste punkter.
+    """
+    d1, d2, r = q1 - p1, q2 - p2, p1 - p2
+    a = np.einsum('ij,ij->i', d1, d1)
+    e = np.einsum('ij,ij->i', d2, d2)
+    f = np.einsum('ij,ij->i', d2, r)
+    c = np.einsum('ij,ij->i', d1, r)
+    b = np.einsum('ij,ij->i', d1, d2)
+    denom = a * e - b * b
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s = np.where(denom > eps, np.clip((b * f - c * e) / denom, 0.0, 1.0), 0.0)
+        t = np.where(e > eps, (b * s + f) / e, 0.0)
+        s = np.where(t < 0.0, np.where(a > eps, np.clip(-c / a, 0.0, 1.0), 0.0), s)
+        s = np.where(t > 1.0, np.where(a > eps, np.clip((b - c) / a, 0.0, 1.0), 0.0), s)
+        t = np.clip(t, 0.0, 1.0)
+        # Degenererade segment (punkter)
+        s = np.where(a <= eps, 0.0, s)
+        t = np.where((a <= eps) & (e > eps), np.clip(f / e, 0.0, 1.0), t)
+        t = np.where(e <= eps, 0.0, t)
+        s = np.where((e <= eps) & (a > eps), np.clip(-c / a, 0.0, 1.0), s)
+
+    closest_1 = p1 + d1 * s[:, None]
+    closest_2 = p2 + d2 * t[:, None]
+    return np.linalg.norm(closest_1 - closest_2, axis=1), closest_1, closest_2
+
+
+class ClashDetector:
+    """
+    Kollisionskontroll över ritningsplanerna. Varje LINE/ARC blir kapslar
+    med specens ytterdiameter, kapslarna läggs i en BVH och alla par av
+    komponenter som inte sitter ihop och som överlappar mer än tolerance rapporteras.
+    """
+    def __init__(self, catalog: CatalogLoader, tolerance: float = 0.01, chord_tolerance: float = CLASH_CHORD_TOLERANCE):
+        self.catalog = catalog
+        self.tolerance = tolerance
+        self.chord_tolerance = chord_tolerance
+
+    def detect(self, explicit_plans: List[List[Dict[str, Any]]]) -> List[Clash]:
+        print("--- Kollisionskontroll: Startar ---")
+        by_point = components_by_endpoint(explicit_plans)
+        capsules = build_capsules(explicit_plans, self.catalog, by_point, chord_tolerance=self.chord_tolerance)
+        if len(capsules) < 2:
+            return []
+
+        box_lo = np.minimum(capsules.p, capsules.q) - capsules.radius[:, None]
+        box_hi = np.maximum(capsules.p, capsules.q) + capsules.radius[:, None]
+        pairs = candidate_pairs(build_bvh(box_lo, box_hi), box_lo, box_hi)
+
+        # Samma komponent eller komponenter som delar en port är inga kollisioner.
+        owner_a, owner_b = capsules.owner[pairs[:, 0]], capsules.owner[pairs[:, 1]]
+        adjacent = adjacent_component_pairs(by_point)
+        names = capsules.components
+        keep = np.array([
+            a != b and tuple(sorted((names[a], names[b]))) not in adjacent
+            for a, b in zip(owner_a.tolist(), owner_b.tolist())
+        ], dtype=bool)
+        pairs = pairs[keep] if len(pairs) else pairs
+        print(f"  -> {len(capsules)} kapslar, {len(pairs)} kandidatpar efter BVH och grannfilter.")
+        if not len(pairs):
+            return []
+
+        i, j = pairs[:, 0], pairs[:, 1]
+        distances, closest_i, closest_j = segment_distances(capsules.p[i], capsules.q[i], capsules.p[j], capsules.q[j])
+        penetration = capsules.radius[i] + capsules.radius[j] - distances
+        hits = np.nonzero(penetration > self.tolerance)[0]
+
+        worst: Dict[Tuple[str, str], Clash] = {}
+        for k in hits.tolist():
+            a, b = names[capsules.owner[i[k]]], names[capsules.owner[j[k]]]
+            point_a, point_b = closest_i[k], closest_j[k]
+            if a > b:
+                a, b, point_a, point_b = b, a, point_b, point_a
+            clash = Clash(a, b, float(distances[k]), float(penetration[k]),
+                          tuple(point_a.tolist()), tuple(point_b.tolist()))
+            if (a, b) not in worst or clash.penetration > worst[(a, b)].penetration:
+                worst[(a, b)] = clash
+
+        clashes = sorted(worst.values(), key=lambda clash: -clash.penetration)
+        print(f"  -> {len(clashes)} kollision(er) hittade.")
+        return clashes
@@ -0,0 +1,162 @@
+# pipeline/component_factory/bend_batch.py
+import math
+import uuid
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Tuple, Optional
+
+import numpy as np
+
+from pipeline.topology_builder.builder import Vec3
+from pipeline.topology_builder.node_types_v2 import BendNodeInfo
+
+
+# =================================================================
+# === Kolumnbuffert för böj-recept ===
+# =================================================================
+
+@dataclass
+class BendRecipeBuffer:
+    """
+    Kolumnvis lagring av alla böjars geometri. Rad i motsvarar node_ids[i].
+    Alla punkt- och riktningsfält är (N, 3)-arrayer, längder är (N,)-arrayer.
+    """
+    node_ids: List[str]
+    component_types: List[str]
+    pipe_specs: List[Optional[str]]
+    build_operations: List[str]
+    valid: np.ndarray
+    corner: np.ndarray
+    incoming_dir: np.ndarray
+    outgoing_dir: np.ndarray
+    arc_start: np.ndarray
+    arc_mid: np.ndarray
+    arc_end: np.ndarray
+    tangent_in_start: np.ndarray
+    tangent_out_end: np.ndarray
+    tangent_in_len: np.ndarray
+    tangent_out_len: np.ndarray
+    row_by_node_id: Dict[str, int] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def pen_position(self, row: int) -> np.ndarray:
+        """Pennans position efter böjen: slutet på utgående tangent, annars bågens slut."""
+        return self.tangent_out_end[row] if self.tangent_out_len[row] > 1e-6 else self.arc_end[row]
+
+    def to_recipe(self, row: int) -> Tuple[List[Dict[str, Any]], Vec3, Vec3]:
+        """
+        Materialiserar en rad till samma format som BaseBend.create_recipe,
+        så att CenterlineBuilder kan lägga in den i sin DrawingPlan.
+        """
+        if not self.valid[row]:
+            return [], Vec3(*self.corner[row]), Vec3(*self.incoming_dir[row])
+
+        component_id = f"bend_{uuid.uuid4().hex[:8]}"
+        tags = {'component_id': component_id, 'component_type': self.component_types[row],
+                'pipe_spec': self.pipe_specs[row], 'build_operation': self.build_operations[row]}
+        arc_start = tuple(self.arc_start[row].tolist())
+        arc_end = tuple(self.arc_end[row].tolist())
+        recipe = []
+
+        if self.tangent_in_len[row] > 1e-6:
+            recipe.append({'id': f"line_{uuid.uuid4().hex[:8]}", **tags, 'type': 'LINE', 'start': tuple(self.tangent_in_start[row].tolist()), 'end': arc_start})
+        recipe.append({'id': f"arc_{uuid.uuid4().hex[:8]}", **tags, 'type': 'ARC', 'start': arc_start, 'mid': tuple(self.arc_mid[row].tolist()), 'end': arc_end})
+        if self.tangent_out_len[row] > 1e-6:
+            recipe.append({'id': f"line_{uuid.uuid4().hex[:8]}", **tags, 'type': 'LINE', 'start': arc_end, 'end': tuple(self.tangent_out_end[row].tolist())})
+
+        return recipe, Vec3(*self.pen_position(row)), Vec3(*self.outgoing_dir[row])
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Normaliserar varje rad. Nollvektorer förblir noll, precis som Vec3.normalize."""
+    lengths = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, lengths, out=np.zeros_like(vectors), where=lengths > 0.0)
+
+
+def _rowwise_dot(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return np.einsum('ij,ij->i', a, b)
+
+
+def compute_bend_batch(
+    nodes: List[BendNodeInfo],
+    incoming_dirs: np.ndarray,
+    dimensions: List[Optional[Any]],
+    tangent_placements: Optional[List[str]] = None,
+) -> BendRecipeBuffer:
+    """
+    Beräknar bågar, utgående riktningar och tangentändar för alla böjar i en
+    enda vektoriserad omgång. Matematiken är densamma som i
+    BaseBend._calculate_arc_geometry, men utförd på (N, 3)-arrayer.
+
+    Args:
+        nodes: Böj-noderna som ska beräknas.
+        incoming_dirs: (N, 3) normaliserade inkommande riktningar.
+        dimensions: ComponentDimensions per nod (None om spec saknas).
+        tangent_placements: 'INCOMING'/'OUTGOING' per nod, används av specialböjar.
+    """
+    count = len(nodes)
+    if tangent_placements is None:
+        tangent_placements = ['OUTGOING'] * count
+
+    corner = np.array([node.coords for node in nodes], dtype=float).reshape(count, 3)
+    v1 = np.array([node.vectors[0] for node in nodes], dtype=float).reshape(count, 3)
+    v2 = np.array([node.vectors[1] for node in nodes], dtype=float).reshape(count, 3)
+    angles = np.array([node.angle for node in nodes], dtype=float)
+    incoming = np.asarray(incoming_dirs, dtype=float).reshape(count, 3)
+
+    valid = np.array([dims is not None for dims in dimensions], dtype=bool)
+    radius = np.array([dims.radius if dims else 0.0 for dims in dimensions], dtype=float)
+    catalog_tangent = np.array([dims.tangent if dims else 0.0 for dims in dimensions], dtype=float)
+    center_to_end = np.array([dims.center_to_end if dims else 0.0 for dims in dimensions], dtype=float)
+
+    # Välj den grannvektor som INTE pekar tillbaka mot där vi kom ifrån.
+    reverse = -incoming
+    outgoing = np.where((_rowwise_dot(reverse, v1) > _rowwise_dot(reverse, v2))[:, None], v2, v1)
+
+    half_internal = (math.pi - np.radians(angles)) / 2.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dist_to_arcpoint = radius / np.tan(half_internal)
+        dist_to_center = radius / np.sin(half_internal)
+
+    arc_start = corner - incoming * dist_to_arcpoint[:, None]
+    arc_end = corner + outgoing * dist_to_arcpoint[:, None]
+    arc_center = corner + _normalize_rows(reverse + outgoing) * dist_to_center[:, None]
+    mid_chord = (arc_start + arc_end) * 0.5
+    arc_mid = arc_center + _normalize_rows(mid_chord - arc_center) * radius[:, None]
+
+    # Tangentlängder per expert-typ (se Bend90, Bend45 och CustomBend).
+    is_90 = np.isclose(angles, 90.0)
+    is_45 = np.isclose(angles, 45.0)
+    is_custom = ~(is_90 | is_45)
+    placement_in = np.array([p == 'INCOMING' for p in tangent_placements], dtype=bool)
+
+    tangent_45 = np.maximum(0.0, center_to_end - dist_to_arcpoint)
+    tangent_in = np.where(is_45, tangent_45, catalog_tangent)
+    tangent_out = tangent_in.copy()
+    tangent_in[is_custom & ~placement_in] = 0.0
+    tangent_out[is_custom & placement_in] = 0.0
+    tangent_in[~valid] = 0.0
+    tangent_out[~valid] = 0.0
+
+    component_types = np.where(is_90, 'BEND_90', np.where(is_45, 'BEND_45', 'BEND_CUSTOM')).tolist()
+    node_ids = [node.id for node in nodes]
+
+    return BendRecipeBuffer(
+        node_ids=node_ids,
+        component_types=component_types,
+        pipe_specs=[dims.pipe_spec if dims else None for dims in dimensions],
+        build_operations=[dims.build_operation if dims else 'unknown' for dims in dimensions],
+        valid=valid,
+        corner=corner,
+        incoming_dir=incoming,
+        outgoing_dir=outgoing,
+        arc_start=arc_start,
+        arc_mid=arc_mid,
+        arc_end=arc_end,
+        tangent_in_start=arc_start - incoming * tangent_in[:, None],
+        tangent_out_end=arc_end + outgoing * tangent_out[:, None],
+        tangent_in_len=tangent_in,
+        tangent_out_len=tangent_out,
+        row_by_node_id={node_id: row for row, node_id in enumerate(node_ids)},
+    )
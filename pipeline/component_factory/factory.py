@@ -1,55 +1,94 @@
 # pipeline/component_factory/factory.py
 import math
 import uuid
-from typing import List, Dict, Any, Tuple
+from dataclasses import dataclass
+from typing import List, Dict, Any, Tuple, Optional
 
 # Importera de klasser och typer vi behöver
+from components_catalog.loader import CatalogLoader, Bend90Data, Bend45Data, TeeData, ReducerData, PipeSpecData
 from pipeline.topology_builder.builder import Vec3
 from pipeline.topology_builder.node_types_v2 import BendNodeInfo, TeeNodeInfo, NodeInfo
+from .bend_batch import BendRecipeBuffer, compute_bend_batch
 
 
 # =================================================================
-# === Steg 1: Isolerad Testdata (Mock-katalog) ===
+# === Steg 1: Förberäknat dimensionsindex från katalogen ===
 # =================================================================
-# Enkel, global "mock" för att simulera den riktiga produktkatalogen.
-# Detta är vår enda sanningskälla för testdata.
-MOCK_COMPONENT_CATALOG = {
-    "BEND_90_SMS_38": {
-        "type": "BEND_90", "radius": 38.0, "center_to_end": 70.0
-    },
-    "BEND_45_SMS_38": {
-        "type": "BEND_45", "radius": 38.0, "b_measure": 34.0
-    },
-    "TEE_SMS_38": {
-        "type": "TEE", "branch_cte": 70.0, "run_cte": 70.0
-    },
-    "SHORT_TEE_SMS_38": {
-        "type": "TEE", "branch_cte": 70.0, "run_cte": 21.0
-    },
-    
-    "REDUCED_TEE_SMS_38": {
-        "type": "REDUCED_TEE",
-        "run_cte": 70.0,  # Huvudröret är fortfarande standard
-        "branch_options": {
-            "SMS_25": { "branch_cte": 60.0 }, # Exempel på A-mått för 25mm avstick
-            "SMS_18": { "branch_cte": 55.0 },
-            "SMS_12": { "branch_cte": 50.0 }
-        }
-    },
-    "SHORT_REDUCED_TEE_SMS_38": {
-    "type": "REDUCED_TEE",
-    "run_cte": 70.0,
-    "branch_options": {
-        "SMS_25": { "branch_cte": 21.0 },
-        "SMS_18": { "branch_cte": 21.0 },
-        "SMS_12": { "branch_cte": 21.0 }
-        }
-    }
-    #skapa komponent för konor (kanske inte ens behövs)
-}
 
+# Nyckel i indexet: (komponenttyp, spec-kod, branch-spec-kod eller None)
+DimensionKey = Tuple[str, str, Optional[str]]
 
-# =================================================================
+@dataclass(frozen=True)
+class ComponentDimensions:
+    """
+    Allt en expert-klass behöver för att bygga sitt recept, redan uträknat
+    via katalogens dataklasser (Bend90Data, Bend45Data, TeeData).
+    """
+    component_type: str
+    pipe_spec: str
+    build_operation: str
+    radius: float = 0.0
+    center_to_end: float = 0.0
+    tangent: float = 0.0
+    run_cte: float = 0.0
+    branch_cte: float = 0.0
+    branch_pipe_spec: Optional[str] = None
+    # Konor: längd, centrumlinjens excentriska förskjutning och den mindre dimensionen
+    length: float = 0.0
+    offset: float = 0.0
+    small_pipe_spec: Optional[str] = None
+
+def build_dimension_index(catalog: Optional[CatalogLoader]) -> Dict[DimensionKey, ComponentDimensions]:
+    """Bygger indexet en gång per katalog, så att varje nod kostar en enda uppslagning."""
+    index: Dict[DimensionKey, ComponentDimensions] = {}
+    if catalog is None:
+        return index
+
+    for spec_name, spec in catalog.standards.items():
+        for component in spec.components.values():
+            if isinstance(component, Bend90Data):
+                index[("BEND_90", spec_name, None)] = ComponentDimensions(
+                    component_type="BEND_90", pipe_spec=spec_name, build_operation=component.build_operation,
+                    radius=component.bend_radius, center_to_end=component.center_to_end, tangent=component.tangent
+                )
+            elif isinstance(component, Bend45Data):
+                index[("BEND_45", spec_name, None)] = ComponentDimensions(
+                    component_type="BEND_45", pipe_spec=spec_name, build_operation=component.build_operation,
+                    radius=component.bend_radius, center_to_end=component.center_to_end, tangent=component.tangent
+                )
+            elif isinstance(component, TeeData):
+                index[("TEE", spec_name, None)] = ComponentDimensions(
+                    component_type="TEE", pipe_spec=spec_name, build_operation=component.build_operation,
+                    run_cte=component.equal_cte_run, branch_cte=component.equal_cte_branch
+                )
+
+    # Nedminskade T-rör: katalogen saknar egna mått, så run-dimensionens
+    # T-rörskropp används för både run och branch.
+    for run_name, run_spec in catalog.standards.items():
+        run_tee = index.get(("TEE", run_name, None))
+        if not run_tee:
+            continue
+        for branch_name, branch_spec in catalog.standards.items():
+            if branch_spec.diameter < run_spec.diameter:
+                index[("REDUCED_TEE", run_name, branch_name)] = ComponentDimensions(
+                    component_type="REDUCED_TEE", pipe_spec=run_name, build_operation=run_tee.build_operation,
+                    run_cte=run_tee.run_cte, branch_cte=run_tee.branch_cte, branch_pipe_spec=branch_name
+                )
+
+    # Konor genereras av CatalogLoader som REDUCER_<stor>_<liten> i båda specarna.
+    for large_name, large_spec in catalog.standards.items():
+        for small_name, small_spec in catalog.standards.items():
+            if small_spec.diameter >= large_spec.diameter:
+                continue
+            reducer = large_spec.components.get(f"REDUCER_{int(large_spec.diameter)}_{int(small_spec.diameter)}")
+            if isinstance(reducer, ReducerData):
+                index[("REDUCER", large_name, small_name)] = ComponentDimensions(
+                    component_type="REDUCER", pipe_spec=large_name, build_operation=reducer.build_operation,
+                    length=reducer.length, offset=(reducer.large_diameter - reducer.small_diameter) / 2.0,
+                    small_pipe_spec=small_name
+                )
+
+    return index
 
 # =================================================================
 # === Klasser för olika typer av böjar ===
@@ -60,11 +99,12 @@ class BaseBend:
     Basklass för alla böjar. Innehåller nu all gemensam logik för
     att beräkna geometri OCH bygga det slutgiltiga receptet.
     """
-    def __init__(self, node: BendNodeInfo, corner_pos: Vec3, incoming_dir: Vec3, radius: float):
+    def __init__(self, node: BendNodeInfo, corner_pos: Vec3, incoming_dir: Vec3, dimensions: ComponentDimensions):
         self.node = node
         self.corner_pos = corner_pos
         self.incoming_dir = incoming_dir
-        self.radius = radius
+        self.dimensions = dimensions
+        self.radius = dimensions.radius
         # Subklasser förväntas sätta detta värde.
         self.component_type = 'BEND_BASE' 
 
@@ -103,6 +143,8 @@ class BaseBend:
         lägger BARA till tangenter om deras längd är större än noll.
         """
         component_id = f"bend_{uuid.uuid4().hex[:8]}"
+        tags = {'component_id': component_id, 'component_type': self.component_type,
+                'pipe_spec': self.dimensions.pipe_spec, 'build_operation': self.dimensions.build_operation}
         recipe = []
         
         # Pennans startposition är som standard i slutet av bågen
@@ -111,15 +153,15 @@ class BaseBend:
         # Bygg inkommande tangent BARA om längden är meningsfull
         if tangent_in_len > 1e-6:
             start_pos = arc_start - (self.incoming_dir * tangent_in_len)
-            recipe.append({'id': f"line_{uuid.uuid4().hex[:8]}", 'component_id': component_id, 'component_type': self.component_type, 'type': 'LINE', 'start': tuple(vars(start_pos).values()), 'end': tuple(vars(arc_start).values())})
+            recipe.append({'id': f"line_{uuid.uuid4().hex[:8]}", **tags, 'type': 'LINE', 'start': tuple(vars(start_pos).values()), 'end': tuple(vars(arc_start).values())})
         
         # Lägg alltid till den centrala bågen
-        recipe.append({'id': f"arc_{uuid.uuid4().hex[:8]}", 'component_id': component_id, 'component_type': self.component_type, 'type': 'ARC', 'start': tuple(vars(arc_start).values()), 'mid': tuple(vars(arc_mid).values()), 'end': tuple(vars(arc_end).values())})
+        recipe.append({'id': f"arc_{uuid.uuid4().hex[:8]}", **tags, 'type': 'ARC', 'start': tuple(vars(arc_start).values()), 'mid': tuple(vars(arc_mid).values()), 'end': tuple(vars(arc_end).values())})
 
         # Bygg utgående tangent BARA om längden är meningsfull
         if tangent_out_len > 1e-6:
             end_pos = arc_end + (outgoing_dir * tangent_out_len)
-            recipe.append({'id': f"line_{uuid.uuid4().hex[:8]}", 'component_id': component_id, 'component_type': self.component_type, 'type': 'LINE', 'start': tuple(vars(arc_end).values()), 'end': tuple(vars(end_pos).values())})
+            recipe.append({'id': f"line_{uuid.uuid4().hex[:8]}", **tags, 'type': 'LINE', 'start': tuple(vars(arc_end).values()), 'end': tuple(vars(end_pos).values())})
             # Om vi har en utgående tangent, är det den som bestämmer pennans nya position
             new_pen_position = end_pos
 
@@ -127,40 +169,37 @@ class BaseBend:
 
 class Bend90(BaseBend):
     """ Expert-klass för 90-gradersböjar. Extremt förenklad. """
-    def __init__(self, node: BendNodeInfo, corner_pos: Vec3, incoming_dir: Vec3, radius: float, center_to_end: float):
-        super().__init__(node, corner_pos, incoming_dir, radius)
-        self.center_to_end = center_to_end
+    def __init__(self, node: BendNodeInfo, corner_pos: Vec3, incoming_dir: Vec3, dimensions: ComponentDimensions):
+        super().__init__(node, corner_pos, incoming_dir, dimensions)
         self.component_type = 'BEND_90'
 
     def create_recipe(self) -> Tuple[List[Dict[str, Any]], Vec3, Vec3]:
         arc_start, arc_mid, arc_end, outgoing_dir, _ = self._calculate_arc_geometry()
-        tangent_length = max(0, self.center_to_end - self.radius)
+        tangent_length = self.dimensions.tangent
         return self._build_recipe_from_tangents(arc_start, arc_mid, arc_end, outgoing_dir, tangent_in_len=tangent_length, tangent_out_len=tangent_length)
 
 class Bend45(BaseBend):
     """ Expert-klass för 45-gradersböjar. Extremt förenklad. """
-    def __init__(self, node: BendNodeInfo, corner_pos: Vec3, incoming_dir: Vec3, radius: float, b_measure: float):
-        super().__init__(node, corner_pos, incoming_dir, radius)
-        self.b_measure = b_measure
+    def __init__(self, node: BendNodeInfo, corner_pos: Vec3, incoming_dir: Vec3, dimensions: ComponentDimensions):
+        super().__init__(node, corner_pos, incoming_dir, dimensions)
         self.component_type = 'BEND_45'
 
     def create_recipe(self) -> Tuple[List[Dict[str, Any]], Vec3, Vec3]:
         arc_start, arc_mid, arc_end, outgoing_dir, dist_to_arcpoint = self._calculate_arc_geometry()
-        center_to_end = self.b_measure * math.sqrt(2)
-        tangent_length = max(0, center_to_end - dist_to_arcpoint)
+        tangent_length = max(0, self.dimensions.center_to_end - dist_to_arcpoint)
         return self._build_recipe_from_tangents(arc_start, arc_mid, arc_end, outgoing_dir, tangent_in_len=tangent_length, tangent_out_len=tangent_length)
 
 class CustomBend(BaseBend):
     """ Expert-klass för specialkapade böjar. Extremt förenklad. """
-    def __init__(self, node: BendNodeInfo, corner_pos: Vec3, incoming_dir: Vec3, radius: float, center_to_end_90: float, tangent_placement: str):
-        super().__init__(node, corner_pos, incoming_dir, radius)
-        self.center_to_end_90 = center_to_end_90
+    def __init__(self, node: BendNodeInfo, corner_pos: Vec3, incoming_dir: Vec3, dimensions: ComponentDimensions, tangent_placement: str):
+        super().__init__(node, corner_pos, incoming_dir, dimensions)
         self.tangent_placement = tangent_placement
         self.component_type = 'BEND_CUSTOM'
 
     def create_recipe(self) -> Tuple[List[Dict[str, Any]], Vec3, Vec3]:
         arc_start, arc_mid, arc_end, outgoing_dir, _ = self._calculate_arc_geometry()
-        tangent_length = max(0, self.center_to_end_90 - self.radius)
+        # Specialböjen kapas ur en standard 90-gradersböj och ärver dess tangent.
+        tangent_length = self.dimensions.tangent
         
         tangent_in = tangent_length if self.tangent_placement == 'INCOMING' else 0.0
         tangent_out = tangent_length if self.tangent_placement == 'OUTGOING' else 0.0
@@ -177,9 +216,10 @@ class BaseTee:
     Basklass för T-rör. Innehåller nu all gemensam logik för att
     beräkna riktningar OCH bygga det slutgiltiga receptet.
     """
-    def __init__(self, node: TeeNodeInfo, center_pos: Vec3):
+    def __init__(self, node: TeeNodeInfo, center_pos: Vec3, dimensions: ComponentDimensions):
         self.node = node
         self.center_pos = center_pos
+        self.dimensions = dimensions
         self.component_type = 'TEE_BASE'
 
     def _get_directions(self, nodes_by_id: Dict[str, NodeInfo]) -> Dict[str, Vec3]:
@@ -201,28 +241,35 @@ class BaseTee:
         """
         directions = self._get_directions(nodes_by_id)
         component_id = f"tee_{uuid.uuid4().hex[:8]}"
+        branch_spec = self.dimensions.branch_pipe_spec or self.dimensions.pipe_spec
+        # Alla tre benen bär både run- och avstickets spec, så t.ex. BOM:en kan
+        # ange ett nedminskat T-rör som run->branch oavsett vilket ben den ser.
+        tags = {'component_id': component_id, 'component_type': self.component_type,
+                'pipe_spec': self.dimensions.pipe_spec, 'build_operation': self.dimensions.build_operation,
+                'run_pipe_spec': self.dimensions.pipe_spec, 'branch_pipe_spec': branch_spec}
+        branch_tags = {**tags, 'pipe_spec': branch_spec}
         recipe = []
 
         # Skapa de två "run"-tangenterna
         run1_end = self.center_pos + (directions['run1'] * run_tangent_len)
-        recipe.append({'id': f"line_{uuid.uuid4().hex[:8]}", 'component_id': component_id, 'component_type': self.component_type, 'type': 'LINE', 'start': tuple(vars(self.center_pos).values()), 'end': tuple(vars(run1_end).values())})
+        recipe.append({'id': f"line_{uuid.uuid4().hex[:8]}", **tags, 'type': 'LINE', 'start': tuple(vars(self.center_pos).values()), 'end': tuple(vars(run1_end).values())})
 
         run2_end = self.center_pos + (directions['run2'] * run_tangent_len)
-        recipe.append({'id': f"line_{uuid.uuid4().hex[:8]}", 'component_id': component_id, 'component_type': self.component_type, 'type': 'LINE', 'start': tuple(vars(self.center_pos).values()), 'end': tuple(vars(run2_end).values())})
+        recipe.append({'id': f"line_{uuid.uuid4().hex[:8]}", **tags, 'type': 'LINE', 'start': tuple(vars(self.center_pos).values()), 'end': tuple(vars(run2_end).values())})
 
         # Skapa "branch"-tangenten
         branch_end = self.center_pos + (directions['branch'] * branch_tangent_len)
-        recipe.append({'id': f"line_{uuid.uuid4().hex[:8]}", 'component_id': component_id, 'component_type': self.component_type, 'type': 'LINE', 'start': tuple(vars(self.center_pos).values()), 'end': tuple(vars(branch_end).values())})
+        recipe.append({'id': f"line_{uuid.uuid4().hex[:8]}", **branch_tags, 'type': 'LINE', 'start': tuple(vars(self.center_pos).values()), 'end': tuple(vars(branch_end).values())})
         
         # Pennans tillstånd efter ett T-rör är speciellt. Vi återgår till centrum.
         return recipe, self.center_pos, directions['run1']
 
 class TeeEqual(BaseTee):
     """ Expert-klass för ett standard, liksidigt T-rör. Nu förenklad. """
-    def __init__(self, node: TeeNodeInfo, center_pos: Vec3, run_cte: float, branch_cte: float):
-        super().__init__(node, center_pos)
-        self.run_tangent_len = run_cte
-        self.branch_tangent_len = branch_cte
+    def __init__(self, node: TeeNodeInfo, center_pos: Vec3, dimensions: ComponentDimensions):
+        super().__init__(node, center_pos, dimensions)
+        self.run_tangent_len = dimensions.run_cte
+        self.branch_tangent_len = dimensions.branch_cte
         self.component_type = 'TEE'
 
     def create_recipe(self, nodes_by_id: Dict[str, NodeInfo]) -> Tuple[List[Dict[str, Any]], Vec3, Vec3]:
@@ -231,10 +278,10 @@ class TeeEqual(BaseTee):
 
 class TeeReduced(BaseTee):
     """ Expert-klass för ett nedminskat T-rör. Nu förenklad. """
-    def __init__(self, node: TeeNodeInfo, center_pos: Vec3, run_cte: float, branch_cte: float):
-        super().__init__(node, center_pos)
-        self.run_tangent_len = run_cte
-        self.branch_tangent_len = branch_cte
+    def __init__(self, node: TeeNodeInfo, center_pos: Vec3, dimensions: ComponentDimensions):
+        super().__init__(node, center_pos, dimensions)
+        self.run_tangent_len = dimensions.run_cte
+        self.branch_tangent_len = dimensions.branch_cte
         self.component_type = 'REDUCED_TEE'
 
     def create_recipe(self, nodes_by_id: Dict[str, NodeInfo]) -> Tuple[List[Dict[str, Any]], Vec3, Vec3]:
@@ -246,112 +293,201 @@ class TeeReduced(BaseTee):
 # === Klasser för olika typer av konor (reducers) ===
 # =================================================================
 
-# TODO
-# 1.1 skapa basklass för konor 
-# 1.2 skapa subklass för koncentriska konor
-# 2 (senare skapar vi subklass för excentriska konor)
+class BaseReducer:
+    """
+    Basklass för konor. Geometrin beräknas en gång i ett lokalt koordinat-
+    system (axiell längd, lateral förskjutning) och återanvänds sedan för
+    varje placering, som bara är en transformation av den lokala mallen.
+    """
+    def __init__(self, dimensions: ComponentDimensions):
+        self.dimensions = dimensions
+        self.component_type = 'REDUCER_BASE'
+        self.axial_length = dimensions.length
+        self.lateral_offset = 0.0
+
+    def create_recipe(self, start_pos: Vec3, direction: Vec3, lateral_dir: Vec3, from_spec: str, to_spec: str) -> Tuple[List[Dict[str, Any]], Vec3, Vec3]:
+        """
+        Placerar konan med start i start_pos längs direction. from_spec/to_spec
+        anger flödesriktningen, så samma kona kan användas som expansion.
+        """
+        component_id = f"reducer_{uuid.uuid4().hex[:8]}"
+        # Vid expansion (liten -> stor) vänds den excentriska förskjutningen.
+        sign = 1.0 if from_spec == self.dimensions.pipe_spec else -1.0
+        end_pos = start_pos + (direction * self.axial_length) + (lateral_dir * (self.lateral_offset * sign))
+        recipe = [{
+            'id': f"line_{uuid.uuid4().hex[:8]}", 'component_id': component_id, 'component_type': self.component_type,
+            'pipe_spec': from_spec, 'small_pipe_spec': self.dimensions.small_pipe_spec, 'to_pipe_spec': to_spec,
+            'build_operation': self.dimensions.build_operation, 'axial_dir': tuple(vars(direction).values()),
+            'type': 'LINE', 'start': tuple(vars(start_pos).values()), 'end': tuple(vars(end_pos).values())
+        }]
+        return recipe, end_pos, direction
+
+class ConcentricReducer(BaseReducer):
+    """ Expert-klass för koncentriska konor. Centrumlinjen är rak. """
+    def __init__(self, dimensions: ComponentDimensions):
+        super().__init__(dimensions)
+        self.component_type = 'REDUCER_CONCENTRIC'
+
+class EccentricReducer(BaseReducer):
+    """ Expert-klass för excentriska konor. Centrumlinjen förskjuts (A-B)/2 i sidled. """
+    def __init__(self, dimensions: ComponentDimensions):
+        super().__init__(dimensions)
+        self.component_type = 'REDUCER_ECCENTRIC'
+        self.lateral_offset = dimensions.offset
 
 # =================================================================
 # === Huvudklass som anropas av centerline_builder ===
 # =================================================================
 class ComponentFactory:
     """ Arbetsledaren som delegerar jobbet till rätt expert. """
-    def __init__(self, catalog: Any = None):
-        # Ignorerar katalogen för nu, vi använder MOCK_COMPONENT_CATALOG.
+    # Höjs när recepten ändras, så ritningsstegets checkpoints ogiltigförklaras.
+    CHECKPOINT_VERSION = "2"
+
+    def __init__(self, catalog: Optional[CatalogLoader] = None):
         self.catalog = catalog
-    
+        # Byggs en gång, därefter kostar varje nod en enda uppslagning.
+        self.dimension_index = build_dimension_index(catalog)
+        # Förberäknade kon-experter per (stor spec, liten spec, excentrisk)
+        self._reducer_cache: Dict[Tuple[str, str, bool], BaseReducer] = {}
+
+    def get_dimensions(self, component_type: str, pipe_spec: Optional[str], branch_pipe_spec: Optional[str] = None) -> Optional[ComponentDimensions]:
+        """Slår upp förberäknade mått för (komponenttyp, spec, branch-spec)."""
+        return self.dimension_index.get((component_type, pipe_spec, branch_pipe_spec))
+
+    @staticmethod
+    def _spec_name(node: NodeInfo) -> Optional[str]:
+        """Hämtar spec-koden från nodens tilldelade katalogobjekt."""
+        spec = node.assigned_spec
+        return spec.name if isinstance(spec, PipeSpecData) else None
 
     def create_bend_recipe(self, node: BendNodeInfo, corner_pos: Vec3, incoming_dir: Vec3, tangent_placement: str = 'OUTGOING') -> Tuple[List[Dict[str, Any]], Vec3, Vec3]:
         """
         Dispatcher-metod. Väljer rätt expert (90, 45, eller Custom) baserat på vinkel.
         """
-        print(f"   -> (Factory) Anropar expert för BÖJ vid nod {node.id[:8]} med vinkel {node.angle}...")
+        print(f"   -> (Factory) Anropar expert för BÖJ vid nod {node.id} med vinkel {node.angle}...")
         
-        component_data = None
+        pipe_spec = self._spec_name(node)
         bend_expert = None
 
         # Välj expert baserat på vinkel
         if math.isclose(node.angle, 90.0):
-            component_data = MOCK_COMPONENT_CATALOG.get("BEND_90_SMS_38")
-            if component_data:
-                bend_expert = Bend90(
-                    node=node, corner_pos=corner_pos, incoming_dir=incoming_dir,
-                    radius=component_data['radius'], center_to_end=component_data['center_to_end']
-                )
+            dimensions = self.get_dimensions("BEND_90", pipe_spec)
+            if dimensions:
+                bend_expert = Bend90(node=node, corner_pos=corner_pos, incoming_dir=incoming_dir, dimensions=dimensions)
         elif math.isclose(node.angle, 45.0):
-            component_data = MOCK_COMPONENT_CATALOG.get("BEND_45_SMS_38")
-            if component_data:
-                bend_expert = Bend45(
-                    node=node, corner_pos=corner_pos, incoming_dir=incoming_dir,
-                    radius=component_data['radius'], b_measure=component_data['b_measure']
-                )
+            dimensions = self.get_dimensions("BEND_45", pipe_spec)
+            if dimensions:
+                bend_expert = Bend45(node=node, corner_pos=corner_pos, incoming_dir=incoming_dir, dimensions=dimensions)
         else: # "Catch-all" för alla andra vinklar
-            component_data = MOCK_COMPONENT_CATALOG.get("BEND_90_SMS_38")
-            if component_data:
+            dimensions = self.get_dimensions("BEND_90", pipe_spec)
+            if dimensions:
                 bend_expert = CustomBend(
                     node=node, corner_pos=corner_pos, incoming_dir=incoming_dir,
-                    radius=component_data['radius'], 
-                    center_to_end_90=component_data['center_to_end'],
+                    dimensions=dimensions,
                     tangent_placement=tangent_placement  # Skicka vidare instruktionen
                 )
 
         # Kontrollera och exekvera
-        if bend_expert and component_data:
+        if bend_expert:
             return bend_expert.create_recipe()
         
         # Fallback om något gick fel
-        print(f"    -> FEL: Kunde inte skapa böj för nod {node.id[:8]}. Kontrollera vinkel ({node.angle}) och mock-data.")
+        print(f"    -> FEL: Kunde inte skapa böj för nod {node.id}. Kontrollera vinkel ({node.angle}) och spec ({pipe_spec}).")
         return [], corner_pos, incoming_dir
 
+    def create_bend_recipes(
+        self,
+        nodes: List[BendNodeInfo],
+        incoming_dirs: Optional[Any] = None,
+        tangent_placements: Optional[List[str]] = None,
+        pipe_specs: Optional[List[Optional[str]]] = None
+    ) -> BendRecipeBuffer:
+        """
+        Batch-version av create_bend_recipe. Beräknar alla böjar i en plan
+        (eller hela topologin) på en gång och returnerar en kolumnbuffert.
+
+        Utan incoming_dirs antas flödet komma från nodens första granne,
+        vilket är rimligt när hela topologin beräknas utan en resplan.
+        pipe_specs kan ange spec per nod (t.ex. inkommande kants spec vid en
+        dimensionsövergång), annars används nodens tilldelade spec.
+        """
+        print(f"   -> (Factory) Beräknar {len(nodes)} böjar i batch...")
+        if incoming_dirs is None:
+            incoming_dirs = [tuple(-c for c in node.vectors[0]) for node in nodes]
+
+        dimensions = []
+        for i, node in enumerate(nodes):
+            pipe_spec = (pipe_specs[i] if pipe_specs else None) or self._spec_name(node)
+            component_type = "BEND_45" if math.isclose(node.angle, 45.0) else "BEND_90"
+            dims = self.get_dimensions(component_type, pipe_spec)
+            if not dims:
+                print(f"    -> FEL: Kunde inte skapa böj för nod {node.id}. Kontrollera vinkel ({node.angle}) och spec ({pipe_spec}).")
+            dimensions.append(dims)
+
+        return compute_bend_batch(nodes, incoming_dirs, dimensions, tangent_placements)
+
     def create_tee_recipe(
         self, 
         node: TeeNodeInfo, 
         center_pos: Vec3, 
         nodes_by_id: Dict[str, NodeInfo],
-        tee_type_name: str,          # T.ex. "TEE_SMS_38" eller "REDUCED_TEE_SMS_38"
-        branch_pipe_spec: str = None # T.ex. "SMS_25", behövs bara för nedminskade
+        run_pipe_spec: str,                    # T.ex. "SMS_38"
+        branch_pipe_spec: Optional[str] = None # T.ex. "SMS_25", bara för nedminskade
     ) -> Tuple[List[Dict[str, Any]], Vec3, Vec3]:
         """
-        Uppdaterad dispatcher för T-rör. Hanterar nu både vanliga och nedminskade.
+        Uppdaterad dispatcher för T-rör. Hanterar både vanliga och nedminskade.
         """
-        print(f"   -> (Factory) Anropar expert för T-RÖR vid nod {node.id[:8]} med typ '{tee_type_name}'...")
-        
-        component_data = MOCK_COMPONENT_CATALOG.get(tee_type_name)
-
-        if not component_data:
-            print(f"    -> FEL: Hittade inte '{tee_type_name}' i MOCK_COMPONENT_CATALOG.")
+        reduced = bool(branch_pipe_spec) and branch_pipe_spec != run_pipe_spec
+        print(f"   -> (Factory) Anropar expert för T-RÖR vid nod {node.id} ({'nedminskat' if reduced else 'standard'}, {run_pipe_spec})...")
+
+        if reduced:
+            dimensions = self.get_dimensions("REDUCED_TEE", run_pipe_spec, branch_pipe_spec)
+            if dimensions:
+                return TeeReduced(node=node, center_pos=center_pos, dimensions=dimensions).create_recipe(nodes_by_id)
+            print(f"    -> FEL: Hittade inget nedminskat T-rör {run_pipe_spec} -> {branch_pipe_spec} i katalogen.")
             return [], center_pos, Vec3(1, 0, 0)
 
-        # Välj och instansiera rätt expert-klass.
-        component_type = component_data.get('type')
-        tee_expert = None
-
-        if component_type == "TEE":
-            tee_expert = TeeEqual(
-                node=node,
-                center_pos=center_pos,
-                run_cte=component_data['run_cte'],
-                branch_cte=component_data['branch_cte']
-            )
-        
-        elif component_type == "REDUCED_TEE":
-            # Hämta de specifika måtten för den valda branch-storleken
-            branch_options = component_data.get('branch_options', {})
-            selected_branch_data = branch_options.get(branch_pipe_spec)
-
-            if not selected_branch_data:
-                print(f"    -> FEL: Hittade inte branch-spec '{branch_pipe_spec}' för '{tee_type_name}'.")
-                return [], center_pos, Vec3(1, 0, 0)
-
-            tee_expert = TeeReduced(
-                node=node,
-                center_pos=center_pos,
-                run_cte=component_data['run_cte'],
-                branch_cte=selected_branch_data['branch_cte']
-            )
-
-        if tee_expert:
-            return tee_expert.create_recipe(nodes_by_id)
-        
-        print(f"    -> VARNING: Ingen expert-klass matchade typen '{component_type}'.")
-        return [], center_pos, Vec3(1, 0, 0)
\ No newline at end of file
+        dimensions = self.get_dimensions("TEE", run_pipe_spec)
+        if dimensions:
+            return TeeEqual(node=node, center_pos=center_pos, dimensions=dimensions).create_recipe(nodes_by_id)
+
+        print(f"    -> FEL: Hittade inget T-rör för '{run_pipe_spec}' i katalogen.")
+        return [], center_pos, Vec3(1, 0, 0)
+
+    def get_reducer(self, spec_a: str, spec_b: str, eccentric: bool = False) -> Optional[BaseReducer]:
+        """
+        Hämtar en kon-expert mellan två specar, oavsett ordning. Experten
+        cachas per (stor, liten, typ) så upprepade övergångar återanvänder den.
+        """
+        dimensions = self.get_dimensions("REDUCER", spec_a, spec_b) or self.get_dimensions("REDUCER", spec_b, spec_a)
+        if not dimensions:
+            return None
+
+        cache_key = (dimensions.pipe_spec, dimensions.small_pipe_spec, eccentric)
+        reducer = self._reducer_cache.get(cache_key)
+        if reducer is None:
+            reducer = EccentricReducer(dimensions) if eccentric else ConcentricReducer(dimensions)
+            self._reducer_cache[cache_key] = reducer
+        return reducer
+
+    def create_reducer_recipe(
+        self,
+        start_pos: Vec3,
+        direction: Vec3,
+        from_spec: str,
+        to_spec: str,
+        eccentric: bool = False,
+        lateral_dir: Optional[Vec3] = None
+    ) -> Tuple[List[Dict[str, Any]], Vec3, Vec3]:
+        """Dispatcher för konor vid en övergång from_spec -> to_spec."""
+        print(f"   -> (Factory) Anropar expert för KONA {from_spec} -> {to_spec}...")
+        reducer = self.get_reducer(from_spec, to_spec, eccentric)
+        if not reducer:
+            print(f"    -> FEL: Hittade ingen kona mellan '{from_spec}' och '{to_spec}' i katalogen.")
+            return [], start_pos, direction
+
+        if lateral_dir is None:
+            # Standard: förskjut mot global Z, eller X om röret själv går längs Z.
+            reference = Vec3(1.0, 0.0, 0.0) if abs(direction.z) > 0.9 else Vec3(0.0, 0.0, 1.0)
+            lateral_dir = (reference - direction * reference.dot(direction)).normalize()
+        return reducer.create_recipe(start_pos, direction, lateral_dir, from_spec, to_spec)
@@ -0,0 +1,255 @@
+# pipeline/geometry_executor/backends.py
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, List, Dict, Optional, Tuple
+
+import numpy as np
+
+from components_catalog.loader import CatalogLoader
+from pipeline.shared.cancellation import CancellationToken
+from .executor import BatchGeometryExecutor
+from .tessellation import ArcTessellator
+
+# =================================================================
+# === Gränssnitt för geometri-backends ===
+# =================================================================
+
+class GeometryBackend(ABC):
+    """
+    Basklass för alla backends bakom executorn. En backend tar emot de
+    färdiga ritplanerna och returnerar sitt eget resultat (en FreeCAD-form,
+    ett triangelnät, statistik, ...).
+    """
+    name = "base"
+
+    @abstractmethod
+    def build(self, explicit_plans: List[List[Dict[str, Any]]], catalog: Optional[CatalogLoader] = None) -> Any:
+        ...
+
+
+class FreeCADBackend(GeometryBackend):
+    """Bygger en platt Part.Compound via BatchGeometryExecutor."""
+    name = "freecad"
+
+    def __init__(self, freecad_part_module: Any, freecad_vector_class: Any, cancel_token: Optional[CancellationToken] = None):
+        self.Part = freecad_part_module
+        self.Vector = freecad_vector_class
+        self.cancel_token = cancel_token
+
+    def build(self, explicit_plans: List[List[Dict[str, Any]]], catalog: Optional[CatalogLoader] = None) -> Any:
+        executor = BatchGeometryExecutor(
+            explicit_plans=explicit_plans,
+            freecad_part_module=self.Part,
+            freecad_vector_class=self.Vector,
+            cancel_token=self.cancel_token
+        )
+        return executor.build_model()
+
+
+class NullBackend(GeometryBackend):
+    """Bygger ingenting, räknar bara primitiver. Används för benchmarking av pipelinen."""
+    name = "null"
+
+    def build(self, explicit_plans: List[List[Dict[str, Any]]], catalog: Optional[CatalogLoader] = None) -> Dict[str, int]:
+        stats = {'plans': 0, 'LINE': 0, 'ARC': 0}
+        for plan in explicit_plans:
+            stats['plans'] += 1
+            for item in plan:
+                item_type = item.get('type')
+                if item_type in stats:
+                    stats[item_type] += 1
+        return stats
+
+
+# =================================================================
+# === Ren NumPy-backend: svepta rör som triangelnät ===
+# =================================================================
+
+@dataclass
+class TriangleMesh:
+    """Ett indexerat triangelnät: vertices (V, 3) och faces (F, 3)."""
+    vertices: np.ndarray
+    faces: np.ndarray
+
+    @property
+    def triangle_count(self) -> int:
+        return len(self.faces)
+
+    def face_normals(self) -> np.ndarray:
+        tri = self.vertices[self.faces]
+        normals = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+        lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+        return np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0.0)
+
+    def write_stl(self, path: str):
+        """Skriver binär STL i ett enda block."""
+        record = np.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attr', '<u2')])
+        data = np.zeros(self.triangle_count, dtype=record)
+        data['normal'] = self.face_normals()
+        data['vertices'] = self.vertices[self.faces]
+        with open(path, 'wb') as f:
+            f.write(b'backendv2 binary STL'.ljust(80, b' '))
+            f.write(np.uint32(self.triangle_count).tobytes())
+            data.tofile(f)
+
+    def write_ply(self, path: str):
+        """Skriver binär (little endian) PLY i ett enda block."""
+        header = (
+            "ply\nformat binary_little_endian 1.0\n"
+            f"element vertex {len(self.vertices)}\n"
+            "property float x\nproperty float y\nproperty float z\n"
+            f"element face {self.triangle_count}\n"
+            "property list uchar int vertex_indices\nend_header\n"
+        )
+        face_record = np.dtype([('count', 'u1'), ('indices', '<i4', (3,))])
+        faces = np.empty(self.triangle_count, dtype=face_record)
+        faces['count'] = 3
+        faces['indices'] = self.faces
+        with open(path, 'wb') as f:
+            f.write(header.encode('ascii'))
+            self.vertices.astype('<f4').tofile(f)
+            faces.tofile(f)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    lengths = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, lengths, out=np.zeros_like(vectors), where=lengths > 0.0)
+
+
+def _perpendicular(axes: np.ndarray) -> np.ndarray:
+    """En godtycklig enhetsvektor vinkelrät mot varje axel (global Z, eller X för vertikala rör)."""
+    reference = np.zeros_like(axes)
+    vertical = np.abs(axes[:, 2]) > 0.9
+    reference[~vertical, 2] = 1.0
+    reference[vertical, 0] = 1.0
+    return _normalize(np.cross(axes, reference))
+
+
+def _tube_face_template(path_points: int, ring_segments: int) -> np.ndarray:
+    """
+    Trianglar för ett ihåligt rör med path_points ringar. Vertexordning:
+    först alla yttre ringar (path_points * ring_segments), sedan alla inre.
+    """
+    m, n = path_points, ring_segments
+    inner = m * n
+    ring = np.arange(m - 1)[:, None] * n
+    j = np.arange(n)[None, :]
+    j_next = (j + 1) % n
+    a, b = (ring + j).ravel(), (ring + j_next).ravel()
+    c, d = (ring + n + j_next).ravel(), (ring + n + j).ravel()
+
+    outer_wall = np.concatenate([np.stack([a, b, c], 1), np.stack([a, c, d], 1)])
+    inner_wall = np.concatenate([np.stack([a, c, b], 1), np.stack([a, d, c], 1)]) + inner
+
+    j, j_next = j.ravel(), j_next.ravel()
+    last = (m - 1) * n
+    start_cap = np.concatenate([np.stack([j, inner + j, j_next], 1), np.stack([j_next, inner + j, inner + j_next], 1)])
+    end_cap = np.concatenate([np.stack([last + j, last + j_next, inner + last + j], 1),
+                              np.stack([last + j_next, inner + last + j_next, inner + last + j], 1)])
+    return np.concatenate([outer_wall, inner_wall, start_cap, end_cap])
+
+
+def _sweep_paths(centers: np.ndarray, frame_u: np.ndarray, frame_v: np.ndarray,
+                 outer_radius: np.ndarray, inner_radius: np.ndarray, ring_segments: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sveper rörprofilen längs N banor med M punkter vardera, helt vektoriserat.
+    centers/frame_u/frame_v: (N, M, 3). Radier: (N,).
+    """
+    count, path_points = centers.shape[:2]
+    theta = np.linspace(0.0, 2.0 * np.pi, ring_segments, endpoint=False)
+    # (N, M, n, 3) enhetsriktningar runt varje ring
+    directions = np.cos(theta)[None, None, :, None] * frame_u[:, :, None, :] + np.sin(theta)[None, None, :, None] * frame_v[:, :, None, :]
+    outer = centers[:, :, None, :] + directions * outer_radius[:, None, None, None]
+    inner = centers[:, :, None, :] + directions * inner_radius[:, None, None, None]
+
+    per_path = 2 * path_points * ring_segments
+    vertices = np.concatenate([outer.reshape(count, -1, 3), inner.reshape(count, -1, 3)], axis=1).reshape(-1, 3)
+    template = _tube_face_template(path_points, ring_segments)
+    faces = (template[None, :, :] + (np.arange(count) * per_path)[:, None, None]).reshape(-1, 3)
+    return vertices, faces
+
+
+class MeshBackend(GeometryBackend):
+    """
+    FreeCAD-fri backend som sveper rörprofilen (diameter och godstjocklek
+    från PipeSpecData) längs alla LINE- och ARC-primitiver och returnerar
+    ett TriangleMesh. Alla primitiver av samma typ sveps i en enda batch;
+    bågarnas banor kommer från ArcTessellator med arc_segments kordor var.
+    """
+    name = "mesh"
+
+    def __init__(self, ring_segments: int = 16, arc_segments: int = 8):
+        self.ring_segments = ring_segments
+        self.arc_segments = arc_segments
+        self.tessellator = ArcTessellator(segments=arc_segments)
+
+    def _radii(self, items: List[Dict[str, Any]], catalog: Optional[CatalogLoader]) -> Tuple[np.ndarray, np.ndarray]:
+        outer, inner = [], []
+        for item in items:
+            spec = catalog.get_spec(item.get('pipe_spec')) if catalog else None
+            radius = spec.diameter / 2.0 if spec else 0.0
+            outer.append(radius)
+            inner.append(max(0.0, radius - spec.thickness) if spec else 0.0)
+        return np.array(outer, dtype=float), np.array(inner, dtype=float)
+
+    def build(self, explicit_plans: List[List[Dict[str, Any]]], catalog: Optional[CatalogLoader] = None) -> TriangleMesh:
+        print("  -> MeshBackend: Sveper rörprofiler med NumPy...")
+        lines = [item for plan in explicit_plans for item in plan if item.get('type') == 'LINE']
+        arcs = [item for plan in explicit_plans for item in plan if item.get('type') == 'ARC']
+        missing = sum(1 for item in lines + arcs if not (catalog and catalog.get_spec(item.get('pipe_spec'))))
+        if missing:
+            print(f"VARNING: MeshBackend - {missing} primitiver saknar (känd) pipe_spec och sveps inte.")
+
+        chunks: List[Tuple[np.ndarray, np.ndarray]] = []
+        line_chunk = self._sweep_lines(lines, catalog)
+        if line_chunk:
+            chunks.append(line_chunk)
+        arc_chunk = self._sweep_arcs(arcs, catalog)
+        if arc_chunk:
+            chunks.append(arc_chunk)
+
+        vertices, faces, offset = [], [], 0
+        for chunk_vertices, chunk_faces in chunks:
+            vertices.append(chunk_vertices)
+            faces.append(chunk_faces + offset)
+            offset += len(chunk_vertices)
+
+        mesh = TriangleMesh(
+            vertices=np.concatenate(vertices) if vertices else np.zeros((0, 3)),
+            faces=np.concatenate(faces) if faces else np.zeros((0, 3), dtype=int),
+        )
+        print(f"  -> MeshBackend: {len(lines)} linjer, {len(arcs)} bågar -> {mesh.triangle_count} trianglar.")
+        return mesh
+
+    def _sweep_lines(self, lines: List[Dict[str, Any]], catalog: Optional[CatalogLoader]):
+        outer, inner = self._radii(lines, catalog)
+        starts = np.array([item['start'] for item in lines], dtype=float).reshape(-1, 3)
+        ends = np.array([item['end'] for item in lines], dtype=float).reshape(-1, 3)
+        keep = (outer > 0.0) & (np.linalg.norm(ends - starts, axis=1) > 1e-9)
+        if not keep.any():
+            return None
+
+        starts, ends, outer, inner = starts[keep], ends[keep], outer[keep], inner[keep]
+        axes = _normalize(ends - starts)
+        u = _perpendicular(axes)
+        v = np.cross(axes, u)
+        centers = np.stack([starts, ends], axis=1)
+        return _sweep_paths(centers, np.repeat(u[:, None], 2, 1), np.repeat(v[:, None], 2, 1), outer, inner, self.ring_segments)
+
+    def _sweep_arcs(self, arcs: List[Dict[str, Any]], catalog: Optional[CatalogLoader]):
+        outer, inner = self._radii(arcs, catalog)
+        batch = self.tessellator.tessellate(arcs)
+        keep = (outer > 0.0) & batch.arcs.valid
+        if not keep.any():
+            return None
+
+        # Fast antal kordor: alla banor har lika många punkter.
+        centers = batch.points.reshape(len(arcs), self.arc_segments + 1, 3)[keep]
+        center, normal = batch.arcs.center[keep], batch.arcs.normal[keep]
+        outer, inner = outer[keep], inner[keep]
+
+        frame_u = np.repeat(normal[:, None], self.arc_segments + 1, 1)
+        tangents = np.cross(frame_u, _normalize(centers - center[:, None]))
+        frame_v = np.cross(tangents, frame_u)
+        return _sweep_paths(centers, frame_u, frame_v, outer, inner, self.ring_segments)
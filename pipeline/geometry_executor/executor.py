@@ -1,6 +1,9 @@
 # pipeline/geometry_executor/executor.py
 
-from typing import Any, List, Dict
+import math
+from typing import Any, List, Dict, Optional, Tuple
+
+from pipeline.shared.cancellation import CancellationToken, OperationCancelled
 
 # Inga direkta FreeCAD-importer här!
 # Inga importer från andra pipeline-moduler behövs längre!
@@ -12,13 +15,14 @@ class GeometryExecutor:
     Denna klass är en "dum" byggare som blint följer instruktionerna.
     Alla beroenden injiceras via __init__.
     """
-    def __init__(self, explicit_plan: List[Dict[str, Any]], freecad_part_module: Any, freecad_vector_class: Any):
+    def __init__(self, explicit_plan: List[Dict[str, Any]], freecad_part_module: Any, freecad_vector_class: Any, cancel_token: Optional[CancellationToken] = None):
         """
         Konstruktorn tar emot en explicit plan och de nödvändiga FreeCAD-klasserna.
         """
         self.explicit_plan = explicit_plan
         self.Part = freecad_part_module
         self.Vector = freecad_vector_class
+        self.cancel_token = cancel_token or CancellationToken()
 
     def build_model(self) -> 'Part.Shape':
         """
@@ -33,7 +37,14 @@ class GeometryExecutor:
 
         for item in self.explicit_plan:
             item_type = item.get('type')
-            
+            try:
+                self.cancel_token.check('executor')
+            except OperationCancelled as e:
+                if not self.cancel_token.allows_partial(e):
+                    raise
+                self.cancel_token.mark_truncated('executor', len(edges), len(self.explicit_plan))
+                break
+
             try:
                 if item_type == 'LINE':
                     start_vec = self.Vector(item['start'])
@@ -57,3 +68,159 @@ class GeometryExecutor:
             return self.Part.Shape()
             
         return self.Part.Compound(edges)
+
+
+# =================================================================
+# === Batch-läge: alla planer i ett anrop ===
+# =================================================================
+
+Point3D = Tuple[float, float, float]
+
+def _is_collinear_continuation(a: Point3D, b: Point3D, c: Point3D, tolerance: float) -> bool:
+    """Sant om segmentet b->c fortsätter rakt i samma riktning som a->b."""
+    ab = [b[k] - a[k] for k in range(3)]
+    bc = [c[k] - b[k] for k in range(3)]
+    len_ab = math.sqrt(sum(v * v for v in ab))
+    len_bc = math.sqrt(sum(v * v for v in bc))
+    if len_ab < tolerance or len_bc < tolerance:
+        return True
+    cross = (ab[1] * bc[2] - ab[2] * bc[1], ab[2] * bc[0] - ab[0] * bc[2], ab[0] * bc[1] - ab[1] * bc[0])
+    dot = sum(ab[k] * bc[k] for k in range(3))
+    return dot > 0 and math.sqrt(sum(v * v for v in cross)) <= tolerance * len_ab * len_bc
+
+def _point_key(point: Point3D, tolerance: float) -> Tuple[int, int, int]:
+    """Punkten kvantiserad till ett rutnät med steget tolerance (nyckel för delade ändpunkter)."""
+    return tuple(int(round(c / tolerance)) for c in point)
+
+def merge_line_chains(explicit_plan: List[Dict[str, Any]], tolerance: float = 1e-6) -> List[Tuple[str, List[Point3D]]]:
+    """
+    Slår ihop LINE-primitiver som delar ändpunkt till polylinjer, och tar
+    bort mellanliggande punkter där linjerna är kolinjära. Linjerna kopplas
+    via sina ändpunkter (inom tolerance), inte via ordningen i planen, så
+    pass 2:s raka rör (som ligger sist i planen) kedjas ihop ändå. En kedja
+    bryts i punkter där fler eller färre än två linjer möts (T-rör, ändar).
+
+    Returnerar en lista av ('POLYLINE', punkter) och ('ARC', [start, mid, end]),
+    ordnade efter första primitivens plats i planen.
+    """
+    entries: List[Tuple[int, str, List[Point3D]]] = []
+    lines: List[Tuple[int, Point3D, Point3D]] = []
+    for index, item in enumerate(explicit_plan):
+        item_type = item.get('type')
+        if item_type == 'LINE':
+            start, end = tuple(item['start']), tuple(item['end'])
+            if math.dist(start, end) >= tolerance:
+                lines.append((index, start, end))
+        elif item_type == 'ARC':
+            entries.append((index, 'ARC', [tuple(item['start']), tuple(item['mid']), tuple(item['end'])]))
+
+    keys = [(_point_key(start, tolerance), _point_key(end, tolerance)) for _, start, end in lines]
+    incident: Dict[Tuple[int, int, int], List[int]] = {}
+    for line_index, (start_key, end_key) in enumerate(keys):
+        incident.setdefault(start_key, []).append(line_index)
+        incident.setdefault(end_key, []).append(line_index)
+    used = [False] * len(lines)
+
+    def walk(line_index: int, from_start: bool):
+        first = line_index
+        chain = [lines[line_index][1 if from_start else 2]]
+        at = keys[line_index][0 if from_start else 1]
+        while True:
+            used[line_index] = True
+            _, start, end = lines[line_index]
+            start_key, end_key = keys[line_index]
+            point, at = (end, end_key) if start_key == at else (start, start_key)
+            if len(chain) >= 2 and _is_collinear_continuation(chain[-2], chain[-1], point, tolerance):
+                chain.pop()
+            chain.append(point)
+            first = min(first, line_index)
+            neighbours = incident[at]
+            if len(neighbours) != 2:
+                break
+            line_index = neighbours[0] if neighbours[1] == line_index else neighbours[1]
+            if used[line_index]:
+                break
+        entries.append((lines[first][0], 'POLYLINE', chain))
+
+    # Öppna kedjor startas i en ände (en punkt som inte har exakt två linjer) ...
+    for line_index, (start_key, end_key) in enumerate(keys):
+        if used[line_index]:
+            continue
+        if len(incident[start_key]) != 2:
+            walk(line_index, from_start=True)
+        elif len(incident[end_key]) != 2:
+            walk(line_index, from_start=False)
+    # ... och det som återstår är slutna slingor.
+    for line_index in range(len(lines)):
+        if not used[line_index]:
+            walk(line_index, from_start=True)
+
+    entries.sort(key=lambda entry: entry[0])
+    return [(kind, points) for _, kind, points in entries]
+
+
+class BatchGeometryExecutor:
+    """
+    Batch-variant av GeometryExecutor som tar ALLA planer på en gång och
+    returnerar en enda platt Part.Compound. Delade ändpunkter återanvänder
+    samma Vector-objekt, kolinjära linjer slås ihop och linjekedjor byggs
+    med en enda makePolygon, så antalet FreeCAD-anrop blir så litet som möjligt.
+    """
+    def __init__(self, explicit_plans: List[List[Dict[str, Any]]], freecad_part_module: Any, freecad_vector_class: Any, tolerance: float = 1e-6, cancel_token: Optional[CancellationToken] = None):
+        self.explicit_plans = explicit_plans
+        self.Part = freecad_part_module
+        self.Vector = freecad_vector_class
+        self.tolerance = tolerance
+        # Kontrolleras per plan; med partial-policy blir formen de planer som hann byggas.
+        self.cancel_token = cancel_token or CancellationToken()
+        self._vector_pool: Dict[Tuple[int, int, int], Any] = {}
+
+    def _vector(self, point: Point3D) -> Any:
+        """Hämtar en delad Vector för punkten (kvantiserad till toleransen)."""
+        key = _point_key(point, self.tolerance)
+        vector = self._vector_pool.get(key)
+        if vector is None:
+            vector = self.Vector(*point)
+            self._vector_pool[key] = vector
+        return vector
+
+    def build_model(self) -> 'Part.Shape':
+        """Bygger en platt Part.Compound av alla planers primitiver."""
+        if not self.Part or not self.Vector or not self.explicit_plans:
+            print("VARNING: BatchExecutor - Nödvändiga moduler eller byggplaner saknas.")
+            return None
+
+        print(f"  -> BatchExecutor: Bygger {len(self.explicit_plans)} planer i ett anrop...")
+        shapes = []
+        primitive_count = 0
+
+        for index, plan in enumerate(self.explicit_plans):
+            try:
+                self.cancel_token.check('executor')
+            except OperationCancelled as e:
+                if not self.cancel_token.allows_partial(e):
+                    raise
+                self.cancel_token.mark_truncated('executor', index, len(self.explicit_plans))
+                break
+            if not plan:
+                continue
+            primitive_count += len(plan)
+            for kind, points in merge_line_chains(plan, self.tolerance):
+                try:
+                    vectors = [self._vector(p) for p in points]
+                    if kind == 'ARC':
+                        shapes.append(self.Part.ArcOfCircle(*vectors).toShape())
+                    elif len(vectors) == 2:
+                        shapes.append(self.Part.LineSegment(*vectors).toShape())
+                    else:
+                        shapes.append(self.Part.makePolygon(vectors))
+                except Exception as e:
+                    print(f"    -> FEL: Kunde inte skapa {kind} genom {points}. Fel: {e}")
+                    continue
+
+        print(f"  -> BatchExecutor: {primitive_count} primitiver -> {len(shapes)} former, {len(self._vector_pool)} unika punkter.")
+        if not shapes:
+            print("VARNING: Inga kanter skapades för centrumlinjen.")
+            return self.Part.Shape()
+
+        return self.Part.Compound(shapes)
@@ -0,0 +1,182 @@
+# pipeline/geometry_executor/incremental.py
+
+import ast
+import hashlib
+from dataclasses import dataclass, field
+from typing import Any, List, Dict, Optional, Tuple
+
+from .backends import GeometryBackend
+from .executor import BatchGeometryExecutor
+
+Point3D = Tuple[float, float, float]
+# (ankarpunkt, hash av formen relativt ankaret)
+ComponentSignature = Tuple[Point3D, str]
+
+SIGNATURE_PROPERTY = "ComponentSignature"
+ID_PROPERTY = "ComponentId"
+
+
+@dataclass
+class ComponentDiff:
+    """Resultatet av en jämförelse mellan föregående och ny ritningsplan."""
+    created: List[str] = field(default_factory=list)
+    moved: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+
+    @property
+    def touched(self) -> int:
+        return len(self.created) + len(self.moved) + len(self.changed) + len(self.deleted)
+
+
+def group_by_component(explicit_plans: List[List[Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Grupperar alla primitiver per component_id, i planernas ordning. Finns
+    samma komponent i flera planer (äldre planer har T-röret både i löpets
+    och grenens plan) används bara den första planens placering.
+    """
+    components: Dict[str, List[Dict[str, Any]]] = {}
+    owner_plan: Dict[str, int] = {}
+    for plan_index, plan in enumerate(explicit_plans):
+        for item_index, item in enumerate(plan):
+            component_id = item.get('component_id') or f"anon_{plan_index}_{item_index}"
+            if owner_plan.setdefault(component_id, plan_index) != plan_index:
+                continue
+            components.setdefault(component_id, []).append(item)
+    return components
+
+
+def _points(item: Dict[str, Any]) -> List[Point3D]:
+    keys = ('start', 'mid', 'end') if item.get('type') == 'ARC' else ('start', 'end')
+    return [tuple(item[k]) for k in keys if k in item]
+
+
+def component_signature(primitives: List[Dict[str, Any]], decimals: int = 6) -> ComponentSignature:
+    """
+    Delar upp komponentens geometri i en ankarpunkt (första punkten) och en
+    hash av formen relativt ankaret. Samma hash men nytt ankare = ren flytt.
+    """
+    anchor = _points(primitives[0])[0]
+    relative = []
+    for item in primitives:
+        points = tuple(tuple(round(p[k] - anchor[k], decimals) for k in range(3)) for p in _points(item))
+        relative.append((item.get('type'), item.get('pipe_spec'), points))
+    digest = hashlib.sha1(repr(relative).encode('utf-8')).hexdigest()
+    return tuple(round(c, decimals) for c in anchor), digest
+
+
+def diff_components(previous: Dict[str, ComponentSignature], current: Dict[str, ComponentSignature]) -> ComponentDiff:
+    """Klassificerar varje component_id som ny, flyttad, ändrad, borttagen eller oförändrad."""
+    diff = ComponentDiff()
+    for component_id, signature in current.items():
+        old = previous.get(component_id)
+        if old is None:
+            diff.created.append(component_id)
+        elif old == signature:
+            diff.unchanged.append(component_id)
+        elif old[1] == signature[1]:
+            diff.moved.append(component_id)
+        else:
+            diff.changed.append(component_id)
+    diff.deleted = [component_id for component_id in previous if component_id not in current]
+    return diff
+
+
+class IncrementalDocumentExecutor:
+    """
+    Håller ett FreeCAD-dokument i synk med ritningsplanerna, ett Part::Feature
+    per component_id. Varje ny körning diffas mot föregående: bara nya,
+    flyttade, ändrade och borttagna komponenter rörs. Formen byggs relativt
+    komponentens ankare så att en flytt bara ändrar Placement.
+    Kartan återskapas från dokumentets egenskaper, så den överlever omladdning.
+    """
+    def __init__(self, document: Any, freecad_part_module: Any, freecad_vector_class: Any, tolerance: float = 1e-6):
+        self.document = document
+        self.Part = freecad_part_module
+        self.Vector = freecad_vector_class
+        self.tolerance = tolerance
+        self._objects: Dict[str, Any] = {}
+        self._signatures: Dict[str, ComponentSignature] = {}
+        self._adopt_existing()
+
+    def _adopt_existing(self):
+        """Läser in objekt som en tidigare körning har skapat i dokumentet."""
+        for obj in list(getattr(self.document, 'Objects', [])):
+            component_id = getattr(obj, ID_PROPERTY, None)
+            if not component_id:
+                continue
+            try:
+                signature = ast.literal_eval(getattr(obj, SIGNATURE_PROPERTY, ""))
+            except (ValueError, SyntaxError):
+                continue
+            self._objects[component_id] = obj
+            self._signatures[component_id] = signature
+
+    def _build_shape(self, primitives: List[Dict[str, Any]], anchor: Point3D) -> Any:
+        """Bygger komponentens form förskjuten så att ankaret hamnar i origo."""
+        relative = []
+        for item in primitives:
+            moved = dict(item)
+            for key in ('start', 'mid', 'end'):
+                if key in item:
+                    moved[key] = tuple(item[key][k] - anchor[k] for k in range(3))
+            relative.append(moved)
+        return BatchGeometryExecutor([relative], self.Part, self.Vector, self.tolerance).build_model()
+
+    def _place(self, obj: Any, anchor: Point3D):
+        placement = obj.Placement
+        placement.Base = self.Vector(*anchor)
+        obj.Placement = placement
+
+    def _create(self, component_id: str, primitives: List[Dict[str, Any]], signature: ComponentSignature):
+        obj = self.document.addObject("Part::Feature", component_id)
+        obj.Label = component_id
+        obj.addProperty("App::PropertyString", ID_PROPERTY, "Pipeline")
+        obj.addProperty("App::PropertyString", SIGNATURE_PROPERTY, "Pipeline")
+        setattr(obj, ID_PROPERTY, component_id)
+        self._objects[component_id] = obj
+        self._rebuild(component_id, primitives, signature)
+
+    def _rebuild(self, component_id: str, primitives: List[Dict[str, Any]], signature: ComponentSignature):
+        obj = self._objects[component_id]
+        obj.Shape = self._build_shape(primitives, signature[0])
+        self._place(obj, signature[0])
+        setattr(obj, SIGNATURE_PROPERTY, repr(signature))
+
+    def update(self, explicit_plans: List[List[Dict[str, Any]]]) -> ComponentDiff:
+        """Applicerar de nya planerna på dokumentet och returnerar vad som ändrades."""
+        components = group_by_component(explicit_plans)
+        signatures = {cid: component_signature(prims) for cid, prims in components.items()}
+        diff = diff_components(self._signatures, signatures)
+
+        for component_id in diff.deleted:
+            obj = self._objects.pop(component_id, None)
+            if obj is not None:
+                self.document.removeObject(obj.Name)
+        for component_id in diff.created:
+            self._create(component_id, components[component_id], signatures[component_id])
+        for component_id in diff.changed:
+            self._rebuild(component_id, components[component_id], signatures[component_id])
+        for component_id in diff.moved:
+            obj = self._objects[component_id]
+            self._place(obj, signatures[component_id][0])
+            setattr(obj, SIGNATURE_PROPERTY, repr(signatures[component_id]))
+
+        self._signatures = signatures
+        print(f"  -> IncrementalExecutor: {len(diff.created)} nya, {len(diff.moved)} flyttade, "
+              f"{len(diff.changed)} ändrade, {len(diff.deleted)} borttagna, {len(diff.unchanged)} oförändrade.")
+        if diff.touched:
+            self.document.recompute()
+        return diff
+
+
+class IncrementalDocumentBackend(GeometryBackend):
+    """Backend-omslag så att process_sketch_to_shape kan uppdatera ett öppet dokument."""
+    name = "freecad_incremental"
+
+    def __init__(self, document: Any, freecad_part_module: Any, freecad_vector_class: Any):
+        self.executor = IncrementalDocumentExecutor(document, freecad_part_module, freecad_vector_class)
+
+    def build(self, explicit_plans: List[List[Dict[str, Any]]], catalog: Optional[Any] = None) -> ComponentDiff:
+        return self.executor.update(explicit_plans)
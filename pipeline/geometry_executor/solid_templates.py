@@ -0,0 +1,338 @@
+# pipeline/geometry_executor/solid_templates.py
+
+import hashlib
+import math
+import os
+from dataclasses import dataclass
+from typing import Any, List, Dict, Optional, Tuple
+
+import numpy as np
+
+from components_catalog.loader import CatalogLoader
+from .backends import GeometryBackend
+from .tessellation import fit_arcs
+
+# Höj denna när mallarnas geometri ändras, så att gamla BREP-filer ignoreras.
+TEMPLATE_VERSION = "1"
+
+Point3D = Tuple[float, float, float]
+TemplateKey = Tuple[Any, ...]
+
+# =================================================================
+# === Ren matematik: mallnycklar och lokala koordinatsystem ===
+# =================================================================
+
+@dataclass(frozen=True)
+class Frame:
+    """Ett högerhänt koordinatsystem: mallens origo och X/Y/Z-axlar i världen."""
+    origin: Point3D
+    x_axis: Point3D
+    y_axis: Point3D
+    z_axis: Point3D
+
+@dataclass(frozen=True)
+class SolidOccurrence:
+    """
+    En förekomst av en mall: vilken mall och var den ska placeras. Raka rör
+    har ingen längd i nyckeln (då skulle varje längd bli en egen mall);
+    deras längd bärs istället av length.
+    """
+    key: TemplateKey
+    frame: Frame
+    component_id: Optional[str]
+    length: Optional[float] = None
+
+
+def _sub(a, b): return (a[0] - b[0], a[1] - b[1], a[2] - b[2])
+def _scale(a, s): return (a[0] * s, a[1] * s, a[2] * s)
+def _dot(a, b): return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+def _cross(a, b): return (a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0])
+def _length(a): return math.sqrt(_dot(a, a))
+def _unit(a):
+    length = _length(a)
+    return _scale(a, 1.0 / length) if length > 0 else (0.0, 0.0, 0.0)
+
+def _any_perpendicular(axis: Point3D) -> Point3D:
+    reference = (1.0, 0.0, 0.0) if abs(axis[2]) > 0.9 else (0.0, 0.0, 1.0)
+    return _unit(_cross(reference, axis))
+
+def _rounded(value: float, step: float = 0.01) -> float:
+    """Avrundar mått så att numeriskt brus inte ger nya mallar."""
+    return round(round(value / step) * step, 6)
+
+
+def arc_occurrences(items: List[Dict[str, Any]]) -> List[Optional[SolidOccurrence]]:
+    """
+    Mallens lokala system för en båge: origo i bågens start, X längs den
+    inkommande tangenten och Y mot bågens centrum. Nyckeln är
+    (build_operation, spec, radie, vinkel), oberoende av var bågen ligger.
+    Alla bågar anpassas i en batch (fit_arcs); rätlinjiga bågar ger None.
+    """
+    p1, p2, p3 = (np.array([item[k] for item in items], dtype=float).reshape(-1, 3) for k in ('start', 'mid', 'end'))
+    fit = fit_arcs(p1, p2, p3)
+    angles = np.degrees(fit.sweep)
+
+    occurrences: List[Optional[SolidOccurrence]] = []
+    for index, item in enumerate(items):
+        if not fit.valid[index]:
+            occurrences.append(None)
+            continue
+        # fit_arcs ger e1 från centrum mot start och e2 i rörelseriktningen.
+        x_axis, y_axis, z_axis = (tuple(v.tolist()) for v in (fit.e2[index], -fit.e1[index], fit.normal[index]))
+        key = (item.get('build_operation', 'sweep_arc'), item.get('pipe_spec'),
+               _rounded(float(fit.radius[index])), _rounded(float(angles[index])))
+        occurrences.append(SolidOccurrence(key, Frame(tuple(item['start']), x_axis, y_axis, z_axis), item.get('component_id')))
+    return occurrences
+
+
+def arc_occurrence(item: Dict[str, Any]) -> Optional[SolidOccurrence]:
+    """Som arc_occurrences, för en enda båge."""
+    return arc_occurrences([item])[0]
+
+
+def line_occurrence(item: Dict[str, Any]) -> Optional[SolidOccurrence]:
+    """
+    Mallens lokala system för ett rakt rör eller en kona: origo i start,
+    X längs röret. Konors excentricitet läggs i XY-planet. Raka rör nycklas
+    bara på spec; längden läggs i förekomsten.
+    """
+    start, end = tuple(item['start']), tuple(item['end'])
+    span = _sub(end, start)
+    length = _length(span)
+    if length < 1e-9:
+        return None
+
+    if item.get('build_operation') == 'loft':
+        # Kona: X är konans axel (axial_dir), en excentrisk förskjutning ligger längs Y.
+        x_axis = _unit(tuple(item.get('axial_dir') or span))
+        axial = _dot(span, x_axis)
+        lateral = _sub(span, _scale(x_axis, axial))
+        offset = _length(lateral)
+        y_axis = _unit(lateral) if offset > 1e-6 else _any_perpendicular(x_axis)
+        z_axis = _cross(x_axis, y_axis)
+        key = ('loft', item.get('pipe_spec'), item.get('to_pipe_spec'), _rounded(axial), _rounded(offset))
+        return SolidOccurrence(key, Frame(start, x_axis, y_axis, z_axis), item.get('component_id'))
+
+    x_axis = _unit(span)
+    y_axis = _any_perpendicular(x_axis)
+    z_axis = _cross(x_axis, y_axis)
+    key = ('straight', item.get('pipe_spec'))
+    return SolidOccurrence(key, Frame(start, x_axis, y_axis, z_axis), item.get('component_id'), length)
+
+
+def plan_occurrences(explicit_plans: List[List[Dict[str, Any]]]) -> List[SolidOccurrence]:
+    """Omvandlar alla primitiver i alla planer till mall-förekomster."""
+    items = [item for plan in explicit_plans for item in plan]
+    arcs = iter(arc_occurrences([item for item in items if item.get('type') == 'ARC']))
+    occurrences: List[SolidOccurrence] = []
+    for item in items:
+        if item.get('type') == 'ARC':
+            occurrence = next(arcs)
+        elif item.get('type') == 'LINE':
+            occurrence = line_occurrence(item)
+        else:
+            occurrence = None
+        if occurrence:
+            occurrences.append(occurrence)
+    return occurrences
+
+
+# =================================================================
+# === FreeCAD: mall-cache i minne och på disk ===
+# =================================================================
+
+class SolidTemplateCache:
+    """
+    Bygger varje mall-solid EN gång i sitt lokala koordinatsystem och
+    cachar den som BREP, både i minnet och (valfritt) på disk. Raka rör
+    cachas inte som solider: bara deras ringprofil per spec, som sedan
+    extruderas till rätt längd (billigt, ingen boolesk operation), så att
+    cachen inte växer med varje ny rörlängd.
+    Alla FreeCAD-beroenden injiceras, precis som i GeometryExecutor.
+    """
+    def __init__(self, freecad_part_module: Any, freecad_vector_class: Any, catalog: CatalogLoader, cache_dir: Optional[str] = None):
+        self.Part = freecad_part_module
+        self.Vector = freecad_vector_class
+        self.catalog = catalog
+        self.cache_dir = cache_dir
+        self._memory: Dict[TemplateKey, Any] = {}
+        self._profiles: Dict[Optional[str], Any] = {}
+        self.hits = 0
+        self.misses = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _brep_path(self, key: TemplateKey) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        # Nyckeln bär bara specnamnen. Katalogens upplösta radier tas med i
+        # filnamnet, så att en ändrad diameter eller godstjocklek inte läser
+        # in en BREP som byggts med de gamla måtten.
+        specs = key[1:3] if key[0] == 'loft' else key[1:2]
+        radii = tuple(self._profile_radii(spec) for spec in specs)
+        digest = hashlib.sha1(repr((TEMPLATE_VERSION, key, radii)).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.brep")
+
+    def get(self, key: TemplateKey) -> Any:
+        """Hämtar mallen från minnet, disken eller bygger den som sista utväg."""
+        shape = self._memory.get(key)
+        if shape is not None:
+            self.hits += 1
+            return shape
+
+        path = self._brep_path(key)
+        if path and os.path.exists(path):
+            shape = self.Part.Shape()
+            shape.importBrep(path)
+            self.hits += 1
+        else:
+            shape = self._build_template(key)
+            self.misses += 1
+            if path and shape is not None:
+                shape.exportBrep(path)
+
+        self._memory[key] = shape
+        return shape
+
+    def _profile_radii(self, pipe_spec: Optional[str]) -> Tuple[float, float]:
+        spec = self.catalog.get_spec(pipe_spec) if self.catalog and pipe_spec else None
+        if not spec:
+            return 0.0, 0.0
+        outer = spec.diameter / 2.0
+        return outer, max(0.0, outer - spec.thickness)
+
+    def _profile(self, pipe_spec: Optional[str]) -> Any:
+        """Rörets ringprofil (yttre cirkel med inre hål) i YZ-planet, en per spec."""
+        if pipe_spec not in self._profiles:
+            outer, inner = self._profile_radii(pipe_spec)
+            profile = None
+            if outer > 0.0:
+                origin, axis = self.Vector(0, 0, 0), self.Vector(1, 0, 0)
+                wires = [self.Part.Wire(self.Part.makeCircle(outer, origin, axis))]
+                if inner > 0.0:
+                    wires.append(self.Part.Wire(self.Part.makeCircle(inner, origin, axis)))
+                profile = self.Part.Face(wires)
+            self._profiles[pipe_spec] = profile
+        return self._profiles[pipe_spec]
+
+    def straight(self, pipe_spec: Optional[str], length: float) -> Any:
+        """Ett rakt rör längs +X, extruderat från specens cachade profil."""
+        profile = self._profile(pipe_spec)
+        return profile.extrude(self.Vector(length, 0, 0)) if profile is not None else None
+
+    def _build_template(self, key: TemplateKey) -> Any:
+        """Bygger en mall i lokala koordinater (se arc_occurrence/line_occurrence)."""
+        operation = key[0]
+        print(f"    -> Mall-cache: Bygger ny mall {key}...")
+
+        if operation == 'loft':
+            _, from_spec, to_spec, axial, lateral = key
+            r_from, _ = self._profile_radii(from_spec)
+            r_to, _ = self._profile_radii(to_spec)
+            if r_from <= 0.0 or r_to <= 0.0:
+                return None
+            start_circle = self.Part.Wire(self.Part.makeCircle(r_from, self.Vector(0, 0, 0), self.Vector(1, 0, 0)))
+            end_circle = self.Part.Wire(self.Part.makeCircle(r_to, self.Vector(axial, lateral, 0), self.Vector(1, 0, 0)))
+            return self.Part.makeLoft([start_circle, end_circle], True)
+
+        # Övriga (sweep_arc): svep profilen längs en båge i XY-planet.
+        _, pipe_spec, radius, angle = key
+        outer, inner = self._profile_radii(pipe_spec)
+        if outer <= 0.0:
+            return None
+        theta = math.radians(angle)
+        half = theta / 2.0
+        center = self.Vector(0, radius, 0)
+        start = self.Vector(0, 0, 0)
+        mid = center + self.Vector(math.sin(half) * radius, -math.cos(half) * radius, 0)
+        end = center + self.Vector(math.sin(theta) * radius, -math.cos(theta) * radius, 0)
+        path = self.Part.Wire(self.Part.ArcOfCircle(start, mid, end).toShape())
+
+        def sweep(r: float) -> Any:
+            profile = self.Part.Wire(self.Part.makeCircle(r, start, self.Vector(1, 0, 0)))
+            return path.makePipeShell([profile], True, True)
+
+        solid = sweep(outer)
+        return solid.cut(sweep(inner)) if inner > 0.0 else solid
+
+
+class FreeCADSolidBackend(GeometryBackend):
+    """
+    Bygger solider (FR-7.2) med mall-cachen. Varje förekomst blir en
+    transformerad kopia av mallen, eller, med ett FreeCAD-dokument, en
+    App::Link som bara bär en placering. Raka rör extruderas direkt och
+    läggs som egna Part::Feature.
+    """
+    name = "freecad_solid"
+
+    def __init__(self, freecad_module: Any, freecad_part_module: Any, freecad_vector_class: Any,
+                 cache_dir: Optional[str] = None, document: Any = None):
+        self.FreeCAD = freecad_module
+        self.Part = freecad_part_module
+        self.Vector = freecad_vector_class
+        self.cache_dir = cache_dir
+        self.document = document
+        self.template_cache: Optional[SolidTemplateCache] = None
+        self._template_features: Dict[TemplateKey, Any] = {}
+
+    def _placement(self, frame: Frame) -> Any:
+        o, x, y, z = frame.origin, frame.x_axis, frame.y_axis, frame.z_axis
+        matrix = self.FreeCAD.Matrix(
+            x[0], y[0], z[0], o[0],
+            x[1], y[1], z[1], o[1],
+            x[2], y[2], z[2], o[2],
+            0.0, 0.0, 0.0, 1.0
+        )
+        return self.FreeCAD.Placement(matrix)
+
+    def _link(self, occurrence: SolidOccurrence, template: Any) -> Any:
+        """Skapar en App::Link mot mallens (dolda) Part::Feature."""
+        feature = self._template_features.get(occurrence.key)
+        if feature is None:
+            feature = self.document.addObject("Part::Feature", "Template")
+            feature.Shape = template
+            feature.Visibility = False
+            self._template_features[occurrence.key] = feature
+        link = self.document.addObject("App::Link", occurrence.component_id or "Component")
+        link.LinkedObject = feature
+        link.Placement = self._placement(occurrence.frame)
+        return link
+
+    def build(self, explicit_plans: List[List[Dict[str, Any]]], catalog: Optional[CatalogLoader] = None) -> Any:
+        if self.template_cache is None or self.template_cache.catalog is not catalog:
+            self.template_cache = SolidTemplateCache(self.Part, self.Vector, catalog, self.cache_dir)
+
+        occurrences = plan_occurrences(explicit_plans)
+        print(f"  -> SolidBackend: {len(occurrences)} förekomster av {len({o.key for o in occurrences})} unika mallar.")
+
+        shapes, links = [], []
+        for occurrence in occurrences:
+            if occurrence.key[0] == 'straight':
+                shape = self.template_cache.straight(occurrence.key[1], occurrence.length)
+                if shape is None:
+                    continue
+                if self.document is not None:
+                    feature = self.document.addObject("Part::Feature", occurrence.component_id or "Component")
+                    feature.Shape = shape
+                    feature.Placement = self._placement(occurrence.frame)
+                    links.append(feature)
+                else:
+                    shape.Placement = self._placement(occurrence.frame)
+                    shapes.append(shape)
+                continue
+
+            template = self.template_cache.get(occurrence.key)
+            if template is None:
+                continue
+            if self.document is not None:
+                links.append(self._link(occurrence, template))
+            else:
+                shape = template.copy()
+                shape.Placement = self._placement(occurrence.frame)
+                shapes.append(shape)
+
+        print(f"  -> SolidBackend: Mall-cache {self.template_cache.hits} träffar, {self.template_cache.misses} byggen.")
+        if self.document is not None:
+            self.document.recompute()
+            return links
+        return self.Part.Compound(shapes) if shapes else self.Part.Shape()
@@ -0,0 +1,190 @@
+# pipeline/geometry_executor/svg_preview.py
+
+import argparse
+import json
+import math
+import os
+import pickle
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+
+import numpy as np
+
+from pipeline.topology_builder.builder import TopologyBuilder
+from .tessellation import ArcTessellator
+
+# Färg per component_type; okända typer (och primitiver utan typ) ritas grå.
+COMPONENT_COLORS = {
+    'PIPE': "#4a6fa5",
+    'BEND_90': "#d9822b",
+    'BEND_45': "#d9822b",
+    'BEND_CUSTOM': "#c05a1c",
+    'TEE': "#3f9b4f",
+    'REDUCED_TEE': "#2e7d3c",
+    'REDUCER_CONCENTRIC': "#9b4fb3",
+    'REDUCER_ECCENTRIC': "#7a3b8f",
+}
+DEFAULT_COLOR = "#808080"
+
+# Förhandsvisningen behöver inte mm-precision; bågarna delas grovt.
+PREVIEW_CHORD_TOLERANCE = 1.0
+# Antal segment som formateras och skrivs per skrivning.
+WRITE_CHUNK = 8192
+
+
+def iso_projection() -> np.ndarray:
+    """
+    (2, 3)-matrisen som avbildar 3D på skissens isometriska 2D-plan. Kolumn k
+    är skissriktningen för +axel k, hämtad från TopologyBuilder.ISO_DIRECTIONS,
+    så projektionen är exakt inversen av _get_3d_direction_from_angle för
+    iso-riktningarna (en axelparallell sträcka får samma längd och vinkel
+    som i skissen).
+    """
+    matrix = np.zeros((2, 3))
+    for angle, direction in TopologyBuilder.ISO_DIRECTIONS.items():
+        axis = int(np.argmax(np.abs(direction)))
+        if direction[axis] > 0:
+            matrix[:, axis] = (math.cos(math.radians(angle)), math.sin(math.radians(angle)))
+    return matrix
+
+
+class IsometricSvgRenderer:
+    """
+    FreeCAD-fri förhandsvisning: ritningsplanernas centrumlinjer projiceras
+    tillbaka till skissens isometriska vy och skrivs som SVG, en <path> per
+    component_type. Bågarna diskretiseras i en batch (ArcTessellator),
+    projektion och skalning görs på hela punktmängden på en gång, och
+    SVG-texten skrivs i bitar till en ström så att stora modeller aldrig
+    byggs upp som en sträng i minnet.
+    """
+    def __init__(self, width: int = 800, height: int = 600, margin: float = 10.0, stroke_width: float = 1.5,
+                 chord_tolerance: float = PREVIEW_CHORD_TOLERANCE, colors: Optional[Dict[str, str]] = None):
+        self.width = width
+        self.height = height
+        self.margin = margin
+        self.stroke_width = stroke_width
+        self.tessellator = ArcTessellator(chord_tolerance)
+        self.colors = colors or COMPONENT_COLORS
+        self.projection = iso_projection()
+
+    def _segments(self, explicit_plans: List[List[Dict[str, Any]]]) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """Alla LINE-primitiver och bågarnas kordor som (N, 3)-arrayer p och q, plus typen per segment."""
+        line_points, line_types, arcs = [], [], []
+        for plan in explicit_plans:
+            for item in plan:
+                if item.get('type') == 'LINE':
+                    line_points.append((item['start'], item['end']))
+                    line_types.append(item.get('component_type'))
+                elif item.get('type') == 'ARC':
+                    arcs.append(item)
+
+        lines = np.array(line_points, dtype=float).reshape(-1, 2, 3)
+        batch = self.tessellator.tessellate(arcs)
+        chord_start = np.delete(np.arange(len(batch.points)), batch.offsets[1:] - 1)
+        arc_types = np.repeat(np.array([item.get('component_type') for item in arcs], dtype=object), batch.segment_counts)
+
+        p = np.concatenate([lines[:, 0], batch.points[chord_start]])
+        q = np.concatenate([lines[:, 1], batch.points[chord_start + 1]])
+        return p, q, line_types + arc_types.tolist()
+
+    def _to_canvas(self, p: np.ndarray, q: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Projicerar och skalar segmenten så att modellen fyller bilden (med marginal)."""
+        p2, q2 = p @ self.projection.T, q @ self.projection.T
+        if not len(p2):
+            return p2, q2
+        both = np.concatenate([p2, q2])
+        lo, hi = both.min(axis=0), both.max(axis=0)
+        span = np.maximum(hi - lo, 1e-9)
+        scale = min((self.width - 2 * self.margin) / span[0], (self.height - 2 * self.margin) / span[1])
+        # Centrera modellen i bilden
+        offset = (np.array([self.width, self.height]) - span * scale) / 2.0 - lo * scale
+        return p2 * scale + offset, q2 * scale + offset
+
+    def render(self, explicit_plans: List[List[Dict[str, Any]]], out: TextIO) -> int:
+        """Skriver SVG-bilden till out. Returnerar antalet ritade segment."""
+        p, q, types = self._segments(explicit_plans)
+        p2, q2 = self._to_canvas(p, q)
+        coords = np.hstack([p2, q2])
+
+        out.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{self.width}" height="{self.height}" '
+                  f'viewBox="0 0 {self.width} {self.height}">\n')
+        out.write(f'<g fill="none" stroke-width="{self.stroke_width}" stroke-linecap="round">\n')
+        type_array = np.array(types, dtype=object)
+        for component_type in sorted(set(types), key=str):
+            rows = coords[type_array == component_type]
+            color = self.colors.get(component_type, DEFAULT_COLOR)
+            out.write(f'<path data-component-type="{component_type or ""}" stroke="{color}" d="')
+            for start in range(0, len(rows), WRITE_CHUNK):
+                chunk = rows[start:start + WRITE_CHUNK]
+                out.write("".join("M%.1f %.1fL%.1f %.1f" % tuple(row) for row in chunk.tolist()))
+            out.write('"/>\n')
+        out.write('</g>\n</svg>\n')
+        return len(coords)
+
+    def render_file(self, explicit_plans: List[List[Dict[str, Any]]], path: str) -> int:
+        with open(path, 'w', encoding='utf-8') as f:
+            return self.render(explicit_plans, f)
+
+    def render_directory(self, directory: str, out_dir: Optional[str] = None) -> List[str]:
+        """
+        Renderar alla cachade ritningsplaner i en katalog: checkpoint-filer
+        (.pkl från CheckpointStore, andra steg än ritningsplaner hoppas över)
+        och JSON (en lista av planer, eller ett daemon-svar med 'plans').
+        Returnerar sökvägarna till de skrivna SVG-filerna.
+        """
+        out_dir = out_dir or directory
+        os.makedirs(out_dir, exist_ok=True)
+        written = []
+        for name in sorted(os.listdir(directory)):
+            stem, extension = os.path.splitext(name)
+            plans = _load_drawing_plans(os.path.join(directory, name), extension)
+            if plans is None:
+                continue
+            path = os.path.join(out_dir, f"{stem}.svg")
+            self.render_file(plans, path)
+            written.append(path)
+        print(f"--- SVG-förhandsvisning: {len(written)} bilder skrivna till {out_dir} ---")
+        return written
+
+
+# Primitivtyper i en ritningsplan. Resplaner (Planner) har också 'type'
+# ('NODE', 'EDGE', 'STRAIGHT') och får inte misstas för ritningsplaner.
+DRAWING_PRIMITIVE_TYPES = ('LINE', 'ARC')
+
+
+def _is_drawing_plans(value: Any) -> bool:
+    if not isinstance(value, list) or not all(isinstance(plan, list) for plan in value):
+        return False
+    return all(isinstance(item, dict) and item.get('type') in DRAWING_PRIMITIVE_TYPES
+               for plan in value for item in plan[:1])
+
+
+def _load_drawing_plans(path: str, extension: str) -> Optional[List[List[Dict[str, Any]]]]:
+    try:
+        if extension == '.pkl':
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        elif extension == '.json':
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            if isinstance(value, dict):
+                value = value.get('plans')
+        else:
+            return None
+    except (OSError, EOFError, pickle.UnpicklingError, json.JSONDecodeError, AttributeError, ImportError):
+        return None
+    return value if _is_drawing_plans(value) else None
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Isometriska SVG-förhandsvisningar av cachade ritningsplaner.")
+    arg_parser.add_argument("directory", help="Katalog med .pkl-checkpoints eller .json-planer.")
+    arg_parser.add_argument("--out", default=None, help="Utkatalog (standard: samma katalog).")
+    arg_parser.add_argument("--width", type=int, default=800)
+    arg_parser.add_argument("--height", type=int, default=600)
+    arg_parser.add_argument("--tolerance", type=float, default=PREVIEW_CHORD_TOLERANCE, help="Kordafel för bågar (mm).")
+    args = arg_parser.parse_args(argv)
+    IsometricSvgRenderer(args.width, args.height, chord_tolerance=args.tolerance).render_directory(args.directory, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# pipeline/geometry_executor/tessellation.py
+
+from dataclasses import dataclass
+from typing import Any, List, Dict, Optional
+
+import numpy as np
+
+# Största tillåtna avstånd (mm) mellan bågen och en korda (pilhöjden).
+DEFAULT_CHORD_TOLERANCE = 0.1
+MAX_SEGMENTS_PER_ARC = 256
+
+
+@dataclass
+class FittedArcs:
+    """
+    Cirklarna genom en batch bågars start/mid/end, radvis. e1 pekar från
+    centrum mot start och e2 = normal x e1 i bågens rörelseriktning, så att
+    punkten vid vinkeln θ är center + radius * (cos θ * e1 + sin θ * e2).
+    Rader där valid är False är rätlinjiga (degenererade) bågar; deras
+    övriga fält är ändliga men meningslösa.
+    """
+    center: np.ndarray
+    radius: np.ndarray
+    normal: np.ndarray
+    e1: np.ndarray
+    e2: np.ndarray
+    sweep: np.ndarray
+    valid: np.ndarray
+
+
+def fit_arcs(p1: np.ndarray, p2: np.ndarray, p3: np.ndarray) -> FittedArcs:
+    """Anpassar cirkeln genom tre punkter för varje rad i (N, 3)-arrayerna p1, p2 och p3."""
+    a, b = p1 - p3, p2 - p3
+    axb = np.cross(a, b)
+    axb_sq = np.einsum('ij,ij->i', axb, axb)
+    valid = axb_sq > 1e-12
+    safe_sq = np.where(valid, axb_sq, 1.0)
+    numerator = np.cross(np.einsum('ij,ij->i', a, a)[:, None] * b - np.einsum('ij,ij->i', b, b)[:, None] * a, axb)
+    center = p3 + numerator / (2.0 * safe_sq[:, None])
+
+    radius_vec = p1 - center
+    radius = np.linalg.norm(radius_vec, axis=1)
+    e1 = radius_vec / np.where(radius > 0.0, radius, 1.0)[:, None]
+    normal = axb / np.sqrt(safe_sq)[:, None]  # orienterad så att vinkeln växer start -> mid -> end
+    e2 = np.cross(normal, e1)
+    to_end = p3 - center
+    sweep = np.mod(np.arctan2(np.einsum('ij,ij->i', to_end, e2), np.einsum('ij,ij->i', to_end, e1)), 2.0 * np.pi)
+    return FittedArcs(center=center, radius=radius, normal=normal, e1=e1, e2=e2, sweep=sweep, valid=valid)
+
+
+@dataclass
+class TessellatedArcs:
+    """
+    Polylinjer för en batch bågar, i CSR-form: punkterna för båge i ligger
+    i points[offsets[i]:offsets[i + 1]]. sagitta[i] är bågens faktiska
+    kordafel, som t.ex. kollisionskontrollen lägger på kapselradien.
+    arcs är de anpassade cirklarna som punkterna ligger på.
+    """
+    points: np.ndarray
+    offsets: np.ndarray
+    sagitta: np.ndarray
+    arcs: FittedArcs
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def polyline(self, index: int) -> np.ndarray:
+        return self.points[self.offsets[index]:self.offsets[index + 1]]
+
+    @property
+    def segment_counts(self) -> np.ndarray:
+        return np.diff(self.offsets) - 1
+
+
+def segments_for_tolerance(radius: np.ndarray, sweep: np.ndarray, chord_tolerance: float,
+                           max_segments: int = MAX_SEGMENTS_PER_ARC) -> np.ndarray:
+    """
+    Minsta antal kordor så att pilhöjden r(1 - cos(θ/2)) ≤ chord_tolerance.
+    Stora böjradier (och långa bågar) får alltså fler kordor än små.
+    """
+    radius = np.asarray(radius, dtype=float)
+    ratio = np.clip(1.0 - chord_tolerance / np.maximum(radius, 1e-12), -1.0, 1.0)
+    max_step = 2.0 * np.arccos(ratio)
+    counts = np.ceil(np.asarray(sweep, dtype=float) / np.maximum(max_step, 1e-9))
+    return np.clip(counts, 1, max_segments).astype(np.int64)
+
+
+class ArcTessellator:
+    """
+    Vektoriserad diskretisering av ARC-primitiver (start/mid/end) till
+    polylinjer, utan FreeCAD. Alla bågar i en eller flera planer görs i en
+    batch: cirklarna anpassas radvis och punkterna genereras i en enda
+    array. Antalet kordor per båge följer av chord_tolerance och böjradien
+    (som för katalogens böjar är specens bend_radius), om inte ett fast
+    antal ges med segments.
+    """
+    def __init__(self, chord_tolerance: float = DEFAULT_CHORD_TOLERANCE, max_segments: int = MAX_SEGMENTS_PER_ARC,
+                 segments: Optional[int] = None):
+        if chord_tolerance <= 0.0:
+            raise ValueError("chord_tolerance måste vara positiv.")
+        self.chord_tolerance = chord_tolerance
+        self.max_segments = max_segments
+        self.segments = segments
+
+    def tessellate(self, arcs: List[Dict[str, Any]]) -> TessellatedArcs:
+        """Diskretiserar alla bågar i ett anrop. Rätlinjiga (degenererade) bågar blir en rak korda (delad i segments, om det är satt)."""
+        count = len(arcs)
+        p1 = np.array([item['start'] for item in arcs], dtype=float).reshape(count, 3)
+        p2 = np.array([item['mid'] for item in arcs], dtype=float).reshape(count, 3)
+        p3 = np.array([item['end'] for item in arcs], dtype=float).reshape(count, 3)
+
+        fit = fit_arcs(p1, p2, p3)
+        center, radius, e1, e2, sweep, valid = fit.center, fit.radius, fit.e1, fit.e2, fit.sweep, fit.valid
+
+        if self.segments:
+            segments = np.full(count, self.segments, dtype=np.int64)
+        else:
+            segments = segments_for_tolerance(radius, sweep, self.chord_tolerance, self.max_segments)
+            segments[~valid] = 1
+        offsets = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(segments + 1, out=offsets[1:])
+
+        # Båge och kordindex för varje utdatapunkt
+        owner = np.repeat(np.arange(count), segments + 1)
+        k = np.arange(offsets[-1]) - offsets[owner]
+        t = k / segments[owner]
+        angle = (sweep[owner] * t)[:, None]
+        points = center[owner] + radius[owner, None] * (np.cos(angle) * e1[owner] + np.sin(angle) * e2[owner])
+
+        # Degenererade bågar: rak korda. Ändpunkterna sätts exakt, så
+        # polylinjerna ansluter till grannprimitiverna utan glapp.
+        straight = ~valid[owner]
+        points[straight] = p1[owner[straight]] + t[straight, None] * (p3 - p1)[owner[straight]]
+        points[offsets[:-1]] = p1
+        points[offsets[1:] - 1] = p3
+
+        sagitta = np.where(valid, radius * (1.0 - np.cos(sweep / segments / 2.0)), 0.0)
+        return TessellatedArcs(points=points, offsets=offsets, sagitta=sagitta, arcs=fit)
+
+    def tessellate_plans(self, explicit_plans: List[List[Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+        """
+        Returnerar kopior av planerna där varje ARC är ersatt av LINE-primitiver
+        (med bågens övriga fält, t.ex. component_id och pipe_spec, och
+        'source_id' = bågens id). Alla planers bågar görs i samma batch.
+        """
+        arcs = [item for plan in explicit_plans for item in plan if item.get('type') == 'ARC']
+        batch = self.tessellate(arcs)
+        print(f"  -> Tessellator: {len(arcs)} bågar -> {int(batch.segment_counts.sum())} kordor "
+              f"(tolerans {self.chord_tolerance} mm).")
+
+        result, arc_index = [], 0
+        for plan in explicit_plans:
+            flat: List[Dict[str, Any]] = []
+            for item in plan:
+                if item.get('type') != 'ARC':
+                    flat.append(item)
+                    continue
+                points = [tuple(p) for p in batch.polyline(arc_index).tolist()]
+                arc_index += 1
+                fields = {key: value for key, value in item.items() if key not in ('id', 'type', 'start', 'mid', 'end')}
+                for k, (start, end) in enumerate(zip(points, points[1:])):
+                    flat.append({**fields, 'id': f"{item.get('id')}_{k}", 'source_id': item.get('id'),
+                                 'type': 'LINE', 'start': start, 'end': end})
+            result.append(flat)
+        return result
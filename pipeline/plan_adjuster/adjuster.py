@@ -1,14 +1,31 @@
 import math
-from typing import Dict, Any, List
+from dataclasses import dataclass
+from typing import Dict, Any, List, Tuple
 
 # Importera endast det vi faktiskt behöver för detta steg
-from components_catalog.loader import CatalogLoader
+from components_catalog.loader import CatalogLoader, ComponentData
 from pipeline.topology_builder.node_types_v2 import NodeInfo
+from pipeline.topology_builder.node_store import NodeStore
 from pipeline.shared.types import BuildPlan
+from pipeline.shared.errors import ImpossibleBuildError
 
-class ImpossibleBuildError(Exception):
-    """Ett anpassat fel som kastas när en design är geometriskt omöjlig."""
-    pass
+
+@dataclass
+class CuttableTangent:
+    """En kapbar tangent (LINE-primitiv) i ett segment, med sitt fysiska minimimått."""
+    primitive_id: str
+    length: float
+    physical_min_tangent: float = 0.0
+
+    @property
+    def slack(self) -> float:
+        """Spelrummet: nuvarande längd minus den fysiska minimilängden."""
+        return max(0.0, self.length - self.physical_min_tangent)
+
+    @classmethod
+    def from_component(cls, primitive_id: str, length: float, component_data: ComponentData) -> 'CuttableTangent':
+        """Skapar en tangent vars minimimått hämtas från katalogens dataklass."""
+        return cls(primitive_id, length, getattr(component_data, 'physical_min_tangent', 0.0))
 
 class PlanAdjuster:
     """
@@ -16,12 +33,76 @@ class PlanAdjuster:
     Ansvar: Att omvandla en semantisk byggplan till en geometriskt
     explicit ritning som är redo att skickas till den "dumma" executorn.
     """
+    # Höjs när utdata ändras, så ritningsstegets checkpoints ogiltigförklaras.
+    CHECKPOINT_VERSION = "1"
+
     def __init__(self, semantic_plans: List[BuildPlan], nodes: List[NodeInfo], topology: Any, catalog: CatalogLoader):
         self.semantic_plans = semantic_plans
-        self.nodes_by_id = {node.id: node for node in nodes}
+        self.nodes_by_id = NodeStore(nodes)
         self.topology = topology
         self.catalog = catalog
 
+    def resolve_shortfall(self, tangents: List[CuttableTangent], shortfall: float) -> Dict[str, float]:
+        """
+        "Svetsarens Prioriterings-algoritm" (FABRICATION_RULES 3.1).
+        Returnerar en operationsrapport {primitive_id: kaplängd}.
+
+        1. En-kaps-lösning: tangenten med störst spelrum hittas i O(n). Räcker
+           den inte, finns ingen en-kaps-lösning alls.
+        2. Få-kaps-lösning: tangenterna sorteras på spelrum (O(n log n)). Det
+           minsta antalet kap är det kortaste prefixet vars spelrum täcker
+           underskottet, så inga delmängder behöver provas.
+        """
+        if shortfall <= 1e-9:
+            return {}
+
+        total_slack = sum(t.slack for t in tangents)
+        if total_slack + 1e-9 < shortfall:
+            raise ImpossibleBuildError(
+                f"Underskott på {shortfall:.2f} mm men bara {total_slack:.2f} mm spelrum i segmentet."
+            )
+
+        # Prioritet 1: En-kaps-lösning
+        best = max(tangents, key=lambda t: t.slack)
+        if best.slack + 1e-9 >= shortfall:
+            print(f"    -> Underskott {shortfall:.2f} mm löst med ett kap på {best.primitive_id}.")
+            return {best.primitive_id: shortfall}
+
+        # Prioritet 2: Få-kaps-lösning
+        by_slack = sorted(tangents, key=lambda t: t.slack, reverse=True)
+        accumulated = 0.0
+        count = 0
+        for tangent in by_slack:
+            accumulated += tangent.slack
+            count += 1
+            if accumulated + 1e-9 >= shortfall:
+                break
+        selected = by_slack[:count]
+
+        # Fördela kapningen så jämnt som möjligt. Tangenterna med minst spelrum
+        # hanteras först så att de som slår i taket lämnar över resten.
+        cuts: Dict[str, float] = {}
+        remaining = shortfall
+        for i, tangent in enumerate(reversed(selected)):
+            share = remaining / (count - i)
+            cut = min(tangent.slack, share)
+            cuts[tangent.primitive_id] = cut
+            remaining -= cut
+
+        print(f"    -> Underskott {shortfall:.2f} mm fördelat på {count} kap.")
+        return cuts
+
+    def resolve_shortfalls(self, segments: List[Tuple[List[CuttableTangent], float]]) -> Dict[str, float]:
+        """
+        Löser alla överlappande segment från en plan i ett anrop.
+        Varje tangent tillhör exakt ett segment, så rapporterna kan slås ihop.
+        """
+        print(f"--- Modul 4 (PlanAdjuster): Löser {len(segments)} underskott ---")
+        cuts: Dict[str, float] = {}
+        for tangents, shortfall in segments:
+            cuts.update(self.resolve_shortfall(tangents, shortfall))
+        return cuts
+
     def create_explicit_plans(self) -> List[List[Dict[str, Any]]]:
         """
         Huvudmetod som producerar en lista av explicita geometriska planer.
@@ -5,19 +5,27 @@ import networkx as nx
 
 from components_catalog.loader import CatalogLoader
 from pipeline.topology_builder.node_types_v2 import NodeInfo, EndpointNodeInfo, BendNodeInfo, TeeNodeInfo
+from pipeline.topology_builder.node_store import NodeStore
 from pipeline.shared.types import BuildPlanItem
+from pipeline.shared.cancellation import CancellationToken
 
 
 class Planner:
     """
     Översätter en berikad topologi-graf till en lista av sekventiella byggplaner.
     """
-    def __init__(self, nodes: List[NodeInfo], topology: nx.Graph, catalog: CatalogLoader):
+    # Höjs när utdata ändras, så stegets checkpoints ogiltigförklaras.
+    CHECKPOINT_VERSION = "1"
+
+    def __init__(self, nodes: List[NodeInfo], topology: nx.Graph, catalog: CatalogLoader, cancel_token: Optional[CancellationToken] = None):
         self.nodes = nodes
-        self.nodes_by_id = {node.id: node for node in nodes}
+        self.nodes_by_id = NodeStore(nodes)
         self.topology = topology
         self.catalog = catalog
         self.visited_edges = set()
+        # Kontrolleras per nod under vandringen. Resplanerna är bara
+        # användbara kompletta, så här kastas OperationCancelled alltid.
+        self.cancel_token = cancel_token or CancellationToken()
 
     def create_plans(self) -> List[List[Dict[str, Any]]]: # Returtypen är nu mer generell
         """
@@ -78,13 +86,14 @@ class Planner:
         Implementerar "vandringen" för att bygga en enskild, linjär och
         konceptuell resplan som bara består av nod- och kant-ID:n.
         """
-        print(f"   -> Bygger resplan som startar från nod {start_node.id[:8]}...")
+        print(f"   -> Bygger resplan som startar från nod {start_node.id}...")
 
         plan: List[Dict[str, Any]] = []
         current_node = start_node
         previous_node_id = None
 
         while current_node:
+            self.cancel_token.check('planner')
             # Lägg bara till nodens ID
             plan.append({'type': 'NODE', 'id': current_node.id})
 
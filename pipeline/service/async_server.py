@@ -0,0 +1,247 @@
+# pipeline/service/async_server.py
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from pipeline.shared.errors import ImpossibleBuildError, SketchValidationError
+from pipeline.shared.cancellation import CancellationToken, OperationCancelled
+from pipeline.service.protocol import read_message_async, write_message_async, ProtocolError
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_CATALOG_PATH = os.path.join(PROJECT_ROOT, "components_catalog")
+
+# Händelser som strömmas till klienten, en per meddelande:
+#   {'status': 'preview', 'index': i, 'plan': [...]} trådmodell, alla resplaner före första 'plan'
+#   {'status': 'plan', 'index': i, 'plan': [...]}   en färdig resplan
+#   {'status': 'done', 'count': n}                   alla planer skickade
+#   {'status': 'rejected', 'reason': 'overloaded'}   kön är full
+#   {'status': 'deadline_exceeded', 'stage': ...}    deadline passerad i kö eller bygge
+#   {'status': 'impossible_build' | 'error', 'message': ...}
+#   {'status': 'invalid_sketch', 'message': ..., 'issues': [...]}
+TERMINAL_STATUSES = {'done', 'rejected', 'deadline_exceeded', 'impossible_build', 'invalid_sketch', 'error'}
+
+# Hur länge (s) reläet blockerar på händelsekön innan det ser efter om
+# jobbet dött eller om klienten lämnat.
+RELAY_POLL_S = 0.2
+
+# Katalogen laddas en gång per arbetsprocess och återanvänds mellan jobb.
+_WORKER_CATALOGS: Dict[str, Any] = {}
+
+
+def run_pipeline_job(proto_data: bytes, catalog_path: str, events: Any, deadline_s: Optional[float] = None) -> int:
+    """
+    Körs i en arbetsprocess. Lägger först en 'preview'-händelse (trådmodell)
+    per resplan, sedan en 'plan'-händelse för varje resplan så fort den är
+    byggd, och avslutar med en terminal händelse. deadline_s är det som är
+    kvar av förfrågans budget; när den tar slut avbryts bygget i processen
+    istället för att köra klart åt en klient som redan gett upp.
+    """
+    from components_catalog.loader import CatalogLoader
+    from pipeline.service import runner
+
+    catalog = _WORKER_CATALOGS.get(catalog_path)
+    if catalog is None:
+        catalog = _WORKER_CATALOGS[catalog_path] = CatalogLoader(catalog_path)
+    try:
+        plans = runner.build_drawing_plans(
+            proto_data, catalog,
+            on_plan=lambda index, plan: events.put({'status': 'plan', 'index': index, 'plan': plan}),
+            on_preview=lambda index, plan: events.put({'status': 'preview', 'index': index, 'plan': plan}),
+            cancel_token=CancellationToken(deadline_s)
+        )
+        events.put({'status': 'done', 'count': len(plans)})
+        return len(plans)
+    except ImpossibleBuildError as e:
+        events.put({'status': 'impossible_build', 'message': str(e)})
+    except OperationCancelled as e:
+        events.put({'status': 'deadline_exceeded', 'stage': e.stage})
+    except SketchValidationError as e:
+        events.put({'status': 'invalid_sketch', 'message': str(e), 'issues': [vars(issue) for issue in e.issues]})
+    except Exception as e:
+        events.put({'status': 'error', 'message': str(e)})
+    return 0
+
+
+def _relay_events(events: Any, job: Future, loop: asyncio.AbstractEventLoop, inbox: asyncio.Queue, stop: threading.Event):
+    """
+    Körs i en egen tråd per förfrågan: blockerar på jobbets händelsekö och
+    lägger varje händelse i inbox på event-loopen, till och med den
+    terminala. Dör jobbet utan terminal händelse skickas ett 'error'.
+    stop sätts när förfrågan är avslutad (t.ex. deadline), så tråden går ur.
+    """
+    def deliver(event: Dict[str, Any]) -> bool:
+        try:
+            loop.call_soon_threadsafe(inbox.put_nowait, event)
+        except RuntimeError:  # event-loopen är stängd
+            return False
+        return event['status'] not in TERMINAL_STATUSES
+
+    while not stop.is_set():
+        try:
+            event = events.get(timeout=RELAY_POLL_S)
+        except queue.Empty:
+            if not job.done():
+                continue
+            # Jobbet är klart: det som finns kvar i kön kom före dess slut.
+            try:
+                event = events.get_nowait()
+            except queue.Empty:
+                error = job.exception()
+                deliver({'status': 'error', 'message': str(error) if error else "Jobbet avslutades utan slutstatus."})
+                return
+        if not deliver(event):
+            return
+
+
+class AsyncPipelineServer:
+    """
+    Asyncio-front för pipelinen. CPU-tunga steg körs i en processpool med
+    max_workers platser. Högst max_queue förfrågningar får vänta på en plats,
+    därutöver avvisas nya direkt ('rejected'). Varje förfrågan har en deadline
+    som omfattar både kötid och bygge, och resultatet strömmas per resplan.
+
+    En plats släpps först när arbetsprocessen faktiskt är klar, även om
+    klienten redan fått 'deadline_exceeded', så poolen aldrig överbokas.
+    """
+    def __init__(
+        self,
+        catalog_path: str = DEFAULT_CATALOG_PATH,
+        max_workers: int = 2,
+        max_queue: int = 8,
+        default_deadline_s: float = 60.0,
+        job: Callable[[bytes, str, Any, Optional[float]], int] = run_pipeline_job,
+        executor: Optional[Executor] = None,
+    ):
+        self.catalog_path = catalog_path
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.default_deadline_s = default_deadline_s
+        self.job = job
+        # Med en egen processpool måste händelsekön gå via en Manager;
+        # en injicerad (t.ex. tråd-)pool klarar sig med en vanlig kö.
+        self._owns_executor = executor is None
+        self._executor = executor or ProcessPoolExecutor(max_workers=max_workers)
+        self._manager = multiprocessing.Manager() if self._owns_executor else None
+        self._slots = asyncio.Semaphore(max_workers)
+        self._waiting = 0
+        self.stats = {'accepted': 0, 'rejected': 0, 'deadline_exceeded': 0, 'completed': 0, 'failed': 0}
+
+    def _new_event_queue(self) -> Any:
+        return self._manager.Queue() if self._manager else queue.Queue()
+
+    async def submit(self, proto_data: bytes, deadline_s: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Schemalägger en förfrågan och strömmar dess händelser tills en terminal händelse."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (deadline_s if deadline_s is not None else self.default_deadline_s)
+
+        if self._slots.locked() and self._waiting >= self.max_queue:
+            self.stats['rejected'] += 1
+            yield {'status': 'rejected', 'reason': 'overloaded'}
+            return
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            self.stats['deadline_exceeded'] += 1
+            yield {'status': 'deadline_exceeded', 'stage': 'queued'}
+            return
+        finally:
+            self._waiting -= 1
+
+        self.stats['accepted'] += 1
+        events = self._new_event_queue()
+        try:
+            job = self._executor.submit(self.job, proto_data, self.catalog_path, events, max(0.0, deadline - loop.time()))
+        except Exception:
+            self._slots.release()
+            raise
+        asyncio.wrap_future(job, loop=loop).add_done_callback(lambda _: self._slots.release())
+
+        # Kön läses av en egen relätråd, inte av loopens standard-executor,
+        # så långa strömmar inte tar dess trådar från annat arbete.
+        inbox: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        threading.Thread(target=_relay_events, args=(events, job, loop, inbox, stop), daemon=True,
+                         name="pipeline-event-relay").start()
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(inbox.get(), timeout=max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    self.stats['deadline_exceeded'] += 1
+                    yield {'status': 'deadline_exceeded', 'stage': 'building'}
+                    return
+                yield event
+                if event['status'] in TERMINAL_STATUSES:
+                    self.stats['completed' if event['status'] == 'done' else 'failed'] += 1
+                    return
+        finally:
+            stop.set()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """En förfrågan per anslutning: ett JSON-huvud ({'deadline_s': ...}) följt av Protobuf-bytes."""
+        try:
+            header = await read_message_async(reader)
+            proto_data = await read_message_async(reader)
+            if header is None or proto_data is None:
+                return
+            options = json.loads(header.decode('utf-8') or "{}")
+            async for event in self.submit(proto_data, options.get('deadline_s')):
+                await write_message_async(writer, json.dumps(event).encode('utf-8'))
+        except (ProtocolError, ValueError) as e:
+            await write_message_async(writer, json.dumps({'status': 'error', 'message': str(e)}).encode('utf-8'))
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, socket_path: Optional[str] = None, host: str = "127.0.0.1", port: Optional[int] = None) -> asyncio.AbstractServer:
+        """Startar servern på en Unix-socket eller, om port anges, på loopback-TCP."""
+        if port is not None:
+            server = await asyncio.start_server(self._handle_connection, host, port)
+            print(f"--- AsyncServer: Lyssnar på {host}:{port} ({self.max_workers} arbetare, kö {self.max_queue}) ---")
+        else:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            server = await asyncio.start_unix_server(self._handle_connection, socket_path)
+            print(f"--- AsyncServer: Lyssnar på {socket_path} ({self.max_workers} arbetare, kö {self.max_queue}) ---")
+        return server
+
+    def close(self):
+        if self._owns_executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._manager:
+            self._manager.shutdown()
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Asyncio-server för pipelinen med begränsad arbetspool.")
+    arg_parser.add_argument("--socket", default="/tmp/lineshape_async.sock")
+    arg_parser.add_argument("--port", type=int, default=None, help="Lyssna på 127.0.0.1:PORT istället för en Unix-socket.")
+    arg_parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    arg_parser.add_argument("--queue", type=int, default=8)
+    arg_parser.add_argument("--deadline", type=float, default=60.0)
+    args = arg_parser.parse_args(argv)
+
+    async def serve():
+        pipeline_server = AsyncPipelineServer(max_workers=args.workers, max_queue=args.queue, default_deadline_s=args.deadline)
+        server = await pipeline_server.start(args.socket, port=args.port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            pipeline_server.close()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
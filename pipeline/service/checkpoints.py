@@ -0,0 +1,141 @@
+# pipeline/service/checkpoints.py
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple, Union
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Skiljer "inget i cachen" från ett cachat None.
+MISSING = object()
+
+
+def stage_key(stage: str, version: str, *inputs: Union[str, bytes]) -> str:
+    """Nyckel för ett steg: stegets namn och versionstagg plus hashen av dess indata."""
+    digest = hashlib.sha1(f"{stage}:{version}".encode('utf-8'))
+    for item in inputs:
+        data = item if isinstance(item, bytes) else str(item).encode('utf-8')
+        digest.update(len(data).to_bytes(8, 'big'))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class CheckpointStore:
+    """
+    Diskcache för stegresultat, en pickle-fil per nyckel, begränsad till
+    max_bytes. När gränsen passeras kastas de minst nyligen använda filerna
+    (LRU, via filernas mtime som uppdateras vid varje träff).
+    """
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # key -> (storlek, senast använd)
+        self._index: Dict[str, Tuple[int, float]] = {}
+        for name in os.listdir(directory):
+            if name.endswith('.pkl'):
+                stat = os.stat(os.path.join(directory, name))
+                self._index[name[:-4]] = (stat.st_size, stat.st_mtime)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(size for size, _ in self._index.values())
+
+    def get(self, key: str) -> Any:
+        """Returnerar det cachade värdet, eller MISSING."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            with self._lock:
+                self._index.pop(key, None)
+            return MISSING
+        try:
+            os.utime(path)
+            with self._lock:
+                self._index[key] = (os.path.getsize(path), os.path.getmtime(path))
+        except OSError:
+            pass
+        return value
+
+    def put(self, key: str, value: Any):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        # Skriv till en temporär fil och byt atomiskt, så en läsare aldrig ser en halv fil.
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(key))
+        with self._lock:
+            self._index[key] = (len(data), os.path.getmtime(self._path(key)))
+            self._evict()
+
+    def _evict(self):
+        total = self.total_bytes
+        if total <= self.max_bytes:
+            return
+        for key, (size, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            del self._index[key]
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+
+class StageResult(NamedTuple):
+    key: str
+    value: Any
+    cached: bool
+
+
+class StageCheckpoints:
+    """
+    Kör pipelinens steg genom en CheckpointStore. Varje stegs nyckel bygger
+    på föregående stegs nyckel, så en ändring (indata, versionstagg eller
+    katalog) ogiltigförklarar bara steget där den sker och stegen efter.
+    Utan store körs stegen rakt av.
+    """
+    def __init__(self, store: Optional[CheckpointStore] = None):
+        self.store = store
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+
+    def run(
+        self,
+        stage: str,
+        version: str,
+        inputs: Tuple[Union[str, bytes], ...],
+        compute: Callable[[], Any],
+        encode: Callable[[Any], Any] = lambda value: value,
+        decode: Callable[[Any], Any] = lambda value: value,
+        cacheable: Callable[[Any], bool] = lambda value: True,
+    ) -> StageResult:
+        """
+        Kör steget, eller hämtar dess resultat från cachen om möjligt.
+        Resultat som cacheable underkänner (t.ex. avkortade av en tidsbudget) sparas inte.
+        """
+        key = stage_key(stage, version, *inputs)
+        if self.store is not None:
+            cached = self.store.get(key)
+            if cached is not MISSING:
+                self.hits[stage] = self.hits.get(stage, 0) + 1
+                print(f"  -> Checkpoint: '{stage}' hämtat från cachen.")
+                return StageResult(key, decode(cached), True)
+        value = compute()
+        if self.store is not None:
+            self.misses[stage] = self.misses.get(stage, 0) + 1
+            if cacheable(value):
+                self.store.put(key, encode(value))
+        return StageResult(key, value, False)
@@ -0,0 +1,116 @@
+# pipeline/service/client.py
+
+import json
+import os
+import select
+import socket
+import time
+from typing import Any, Iterator, List, Dict, Optional, Tuple, Union
+
+from pipeline.shared.errors import ImpossibleBuildError, SketchValidationError, ValidationIssue
+from pipeline.service.protocol import (
+    send_message, recv_message, encode_options, decode_response, restore_points, ProtocolError,
+)
+from pipeline.shared.cancellation import CancellationToken, OperationCancelled
+
+# Hur ofta (s) en väntande klient kontrollerar sin CancellationToken.
+CANCEL_POLL_S = 0.1
+
+DEFAULT_SOCKET_PATH = os.environ.get("LINESHAPE_DAEMON_SOCKET", "/tmp/lineshape_pipeline.sock")
+
+
+def daemon_available(socket_path: str = DEFAULT_SOCKET_PATH) -> bool:
+    return os.path.exists(socket_path)
+
+
+def _wait_for_response(sock: socket.socket, timeout: Optional[float], cancel_token: CancellationToken):
+    """
+    Väntar tills svaret börjar komma, men kontrollerar cancel_token var
+    CANCEL_POLL_S:e sekund. Avbryts körningen stängs anslutningen (av anroparen)
+    och OperationCancelled kastas, precis som i processen.
+    """
+    waited_until = None if timeout is None else time.monotonic() + timeout
+    while True:
+        cancel_token.check('daemon')
+        poll = CANCEL_POLL_S
+        if waited_until is not None:
+            poll = min(poll, waited_until - time.monotonic())
+            if poll <= 0.0:
+                raise socket.timeout("timed out")
+        readable, _, _ = select.select([sock], [], [], poll)
+        if readable:
+            return
+
+
+def request_drawing_plans(proto_data: bytes, socket_path: str = DEFAULT_SOCKET_PATH, timeout: Optional[float] = 60.0,
+                          cancel_token: Optional[CancellationToken] = None) -> List[List[Dict[str, Any]]]:
+    """
+    Tunn klient: skickar Protobuf-bytes till daemonen och returnerar ritningsplanerna.
+    Kastar ConnectionError om daemonen inte svarar och ImpossibleBuildError
+    om bygget är geometriskt omöjligt, precis som pipelinen i processen.
+    Med cancel_token slutar klienten vänta (OperationCancelled) så fort
+    körningen avbryts eller budgeten tar slut. Bara en token med deadline
+    skickar sin återstående budget till daemonen, som då kör förfrågan för
+    sig och avbryter bygget själv (även om klienten lägger på). Utan deadline
+    går förfrågan via daemonens RequestCoalescer som vanligt.
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+            if cancel_token is not None and cancel_token.deadline is not None:
+                send_message(sock, encode_options({'deadline_s': cancel_token.remaining_s,
+                                                   'on_expiry': cancel_token.on_expiry}))
+            send_message(sock, proto_data)
+            if cancel_token is not None:
+                _wait_for_response(sock, timeout, cancel_token)
+            payload = recv_message(sock)
+    except (OSError, ProtocolError) as e:
+        raise ConnectionError(f"Daemonen på {socket_path} svarade inte: {e}")
+    if payload is None:
+        raise ConnectionError(f"Daemonen på {socket_path} stängde anslutningen.")
+
+    response = decode_response(payload)
+    if response['status'] == 'cancelled':
+        raise OperationCancelled(response.get('stage', 'daemon'), response.get('reason', 'cancelled'))
+    if response['status'] == 'impossible_build':
+        raise ImpossibleBuildError(response.get('message', ''))
+    if response['status'] == 'invalid_sketch':
+        raise SketchValidationError([ValidationIssue(**issue) for issue in response.get('issues', [])])
+    if response['status'] != 'ok':
+        raise RuntimeError(f"Daemon-fel: {response.get('message', '')}")
+    return response['plans']
+
+
+def _connect(address: Union[str, Tuple[str, int]]) -> socket.socket:
+    """Ansluter till en Unix-socket (sökväg) eller TCP ((värd, port), t.ex. AsyncPipelineServer --port)."""
+    if isinstance(address, tuple):
+        return socket.create_connection(address)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(address)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def stream_drawing_plans(proto_data: bytes, address: Union[str, Tuple[str, int]],
+                         deadline_s: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Klient för AsyncPipelineServer: skickar förfrågan och ger varje
+    händelse ('plan', 'done', 'rejected', ...) så fort den kommer.
+    address är en Unix-socket-sökväg eller (värd, port) för TCP.
+    """
+    header = json.dumps({'deadline_s': deadline_s} if deadline_s is not None else {}).encode('utf-8')
+    with _connect(address) as sock:
+        send_message(sock, header)
+        send_message(sock, proto_data)
+        while True:
+            payload = recv_message(sock)
+            if payload is None:
+                return
+            event = decode_response(payload)
+            if event.get('plan') is not None:
+                restore_points(event['plan'])
+            yield event
@@ -0,0 +1,96 @@
+# pipeline/service/coalescer.py
+
+import hashlib
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+
+@dataclass
+class CoalescingStats:
+    """Mätvärden för hur mycket dubbelarbete som undvikits."""
+    requests: int = 0
+    executed: int = 0
+    coalesced: int = 0
+    failed: int = 0
+
+    @property
+    def coalesced_ratio(self) -> float:
+        return self.coalesced / self.requests if self.requests else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {'requests': self.requests, 'executed': self.executed, 'coalesced': self.coalesced,
+                'failed': self.failed, 'coalesced_ratio': round(self.coalesced_ratio, 3)}
+
+
+class RequestCoalescer:
+    """
+    Slår ihop samtidiga, identiska förfrågningar. Nyckeln är en hash av
+    Protobuf-bytes plus katalogversionen (och valfria extra delar, t.ex.
+    backend). Den första anroparen kör compute; alla som kommer medan den
+    pågår väntar på samma resultat (eller samma undantag).
+    Inget cachas efter att körningen är klar: bara pågående arbete delas.
+    """
+    def __init__(self, compute: Callable[[bytes], Any], catalog_version: Callable[[], str],
+                 canonicalize: Optional[Callable[[bytes], bytes]] = None):
+        self.compute = compute
+        self.catalog_version = catalog_version
+        self.canonicalize = canonicalize
+        self.stats = CoalescingStats()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def request_key(self, proto_data: bytes, *extra: str) -> str:
+        data = self.canonicalize(proto_data) if self.canonicalize else proto_data
+        digest = hashlib.sha256(data)
+        for part in (self.catalog_version(), *extra):
+            digest.update(b"\0" + str(part).encode('utf-8'))
+        return digest.hexdigest()
+
+    def run(self, proto_data: bytes, *extra: str, compute: Optional[Callable[[bytes], Any]] = None) -> Any:
+        """
+        Kör (eller ansluter till en pågående körning av) compute(proto_data).
+        En compute per anrop kan anges när resultatet beror på något som
+        redan ingår i nyckeln via extra (t.ex. vald backend).
+        """
+        key = self.request_key(proto_data, *extra)
+        with self._lock:
+            self.stats.requests += 1
+            future = self._inflight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = self._inflight[key] = Future()
+                self.stats.executed += 1
+            else:
+                self.stats.coalesced += 1
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            future.set_result((compute or self.compute)(proto_data))
+        except BaseException as e:
+            with self._lock:
+                self.stats.failed += 1
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return future.result()
+
+
+def canonical_sketch_bytes(proto_data: bytes) -> bytes:
+    """
+    Normaliserar en SketchData-payload till deterministisk serialisering,
+    så att samma skiss med annan fältordning ger samma nyckel.
+    Ogiltiga bytes lämnas orörda (pipelinen rapporterar felet själv).
+    """
+    from contracts.generated.python import sketch_pb2
+
+    sketch = sketch_pb2.SketchData()
+    try:
+        sketch.ParseFromString(proto_data)
+    except Exception:
+        return proto_data
+    return sketch.SerializeToString(deterministic=True)
@@ -0,0 +1,210 @@
+# pipeline/service/daemon.py
+
+import argparse
+import importlib
+import os
+import select
+import socket
+import socketserver
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+from components_catalog.loader import CatalogLoader
+from pipeline.shared.errors import ImpossibleBuildError, SketchValidationError
+from pipeline.shared.cancellation import CancellationToken, OperationCancelled, ON_EXPIRY_RAISE
+from pipeline.service import runner
+from pipeline.service.protocol import send_message, recv_message, encode_response, decode_options, ProtocolError
+from pipeline.service.reloader import ModuleReloader
+from pipeline.service.coalescer import RequestCoalescer, canonical_sketch_bytes
+from pipeline.service.checkpoints import CheckpointStore, StageCheckpoints, DEFAULT_MAX_BYTES
+
+DEFAULT_SOCKET_PATH = os.environ.get("LINESHAPE_DAEMON_SOCKET", "/tmp/lineshape_pipeline.sock")
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Hur ofta (s) en körning med tidsbudget kontrollerar om klienten lagt på.
+HANGUP_POLL_S = 0.1
+
+
+def _cancel_on_hangup(connection: socket.socket, token: CancellationToken, done: threading.Event):
+    """Avbryter token om klienten stänger anslutningen innan svaret är klart."""
+    while not done.is_set():
+        readable, _, _ = select.select([connection], [], [], HANGUP_POLL_S)
+        if not readable:
+            continue
+        try:
+            hung_up = not connection.recv(1, socket.MSG_PEEK)
+        except OSError:
+            hung_up = True
+        if hung_up:
+            token.cancel()
+        return
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    """
+    En anslutning = en eller flera förfrågningar med Protobuf-bytes, var och
+    en eventuellt föregången av ett options-meddelande (se protocol.py).
+    """
+    def handle(self):
+        daemon: "PipelineDaemon" = self.server.daemon
+        while True:
+            try:
+                proto_data = recv_message(self.request)
+                options = None if proto_data is None else decode_options(proto_data)
+                if options is not None:
+                    proto_data = recv_message(self.request)
+            except ProtocolError as e:
+                send_message(self.request, encode_response('error', message=str(e)))
+                return
+            if proto_data is None:
+                return
+            response = daemon.handle(proto_data, options, self.request)
+            try:
+                send_message(self.request, response)
+            except OSError:
+                return  # klienten har lagt på (t.ex. avbrutit körningen)
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class PipelineDaemon:
+    """
+    Långlivad arbetsprocess som håller moduler, networkx och katalogen varma.
+    FreeCAD-makrot blir en tunn klient (se client.py) som skickar Protobuf-
+    bytes och får tillbaka serialiserade ritningsplaner.
+
+    Med watch=True kontrolleras modulernas mtime före varje förfrågan och
+    bara ändrade moduler laddas om (plus runner, som binder stegens klasser).
+    Katalogen byggs då också om så fort en katalogfil ändras.
+
+    Varje anslutning hanteras i en egen tråd; samtidiga identiska skisser
+    (autosave, flera vyer) slås ihop av en RequestCoalescer.
+
+    Med checkpoint_dir sparas varje stegs resultat på disk (se checkpoints.py),
+    så t.ex. en katalogjustering bara kör om ritningssteget.
+
+    Med topology_workers > 0 startas en långlivad processpool som
+    TopologyBuilder använder för skisser med flera separata system.
+
+    En förfrågan med tidsbudget (options med 'deadline_s') slås inte ihop med
+    andra: den körs med en egen CancellationToken, som också avbryts om
+    klienten lägger på, och svarar 'cancelled' om den hinner avbrytas.
+    """
+    def __init__(
+        self,
+        socket_path: str = DEFAULT_SOCKET_PATH,
+        catalog_path: Optional[str] = None,
+        watch: bool = False,
+        checkpoint_dir: Optional[str] = None,
+        checkpoint_max_bytes: int = DEFAULT_MAX_BYTES,
+        topology_workers: int = 0,
+    ):
+        self.socket_path = socket_path
+        self.catalog_path = catalog_path or os.path.join(PROJECT_ROOT, "components_catalog")
+        self.reloader = ModuleReloader() if watch else None
+        self.catalog = CatalogLoader(self.catalog_path)
+        self.requests_served = 0
+        # handle() körs i en tråd per anslutning (ThreadingMixIn).
+        self._counter_lock = threading.Lock()
+        self.coalescer = RequestCoalescer(self._build_response, lambda: self.catalog.version, canonical_sketch_bytes)
+        self._refresh_lock = threading.Lock()
+        store = CheckpointStore(checkpoint_dir, checkpoint_max_bytes) if checkpoint_dir else None
+        self.checkpoints = StageCheckpoints(store)
+        self.topology_pool = ProcessPoolExecutor(max_workers=topology_workers) if topology_workers > 0 else None
+
+    def _refresh(self):
+        """
+        Utvecklingsläge: ladda om ändrade moduler, och bygg om katalogen när
+        loadern laddats om eller någon katalogfil ändrats (nytt fingeravtryck).
+        """
+        reloaded = self.reloader.reload_changed()
+        if reloaded and "pipeline.service.runner" not in reloaded:
+            importlib.reload(runner)
+        loader = sys.modules["components_catalog.loader"]
+        if ("components_catalog.loader" in reloaded
+                or loader.catalog_fingerprint(self.catalog_path) != self.catalog.version):
+            self.catalog = loader.CatalogLoader(self.catalog_path)
+            print(f"  -> Daemon: Katalogen omladdad (version {self.catalog.version[:12]}).")
+
+    def handle(self, proto_data: bytes, options: Optional[Dict[str, Any]] = None,
+               connection: Optional[socket.socket] = None) -> bytes:
+        """Kör (eller delar en pågående körning av) pipelinen och returnerar det serialiserade svaret."""
+        if self.reloader:
+            with self._refresh_lock:
+                self._refresh()
+        with self._counter_lock:
+            self.requests_served += 1
+            served = self.requests_served
+        if options is None or options.get('deadline_s') is None:
+            response = self.coalescer.run(proto_data)
+        else:
+            response = self._run_cancellable(proto_data, options, connection)
+        if served % 100 == 0:
+            print(f"  -> Daemon: {self.coalescer.stats.snapshot()}")
+        return response
+
+    def _run_cancellable(self, proto_data: bytes, options: Dict[str, Any], connection: Optional[socket.socket]) -> bytes:
+        token = CancellationToken(options.get('deadline_s'), options.get('on_expiry', ON_EXPIRY_RAISE))
+        done = threading.Event()
+        watcher = None
+        if connection is not None:
+            watcher = threading.Thread(target=_cancel_on_hangup, args=(connection, token, done), daemon=True)
+            watcher.start()
+        try:
+            return self._build_response(proto_data, token)
+        finally:
+            done.set()
+            if watcher is not None:
+                watcher.join()
+
+    def _build_response(self, proto_data: bytes, cancel_token: Optional[CancellationToken] = None) -> bytes:
+        try:
+            plans = runner.build_drawing_plans(proto_data, self.catalog, checkpoints=self.checkpoints,
+                                               cancel_token=cancel_token, topology_executor=self.topology_pool)
+            return encode_response('ok', plans)
+        except OperationCancelled as e:
+            print(f"  -> Daemon: {e}")
+            return encode_response('cancelled', message=str(e), stage=e.stage, reason=e.reason)
+        except ImpossibleBuildError as e:
+            return encode_response('impossible_build', message=str(e))
+        except SketchValidationError as e:
+            return encode_response('invalid_sketch', message=str(e), issues=[vars(issue) for issue in e.issues])
+        except Exception as e:
+            print(f"  -> Daemon: Oväntat fel i pipelinen: {e}")
+            return encode_response('error', message=str(e))
+
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        with _UnixServer(self.socket_path, _RequestHandler) as server:
+            server.daemon = self
+            print(f"--- Daemon: Lyssnar på {self.socket_path} (watch={'på' if self.reloader else 'av'}) ---")
+            try:
+                server.serve_forever()
+            finally:
+                if self.topology_pool is not None:
+                    self.topology_pool.shutdown(cancel_futures=True)
+                if os.path.exists(self.socket_path):
+                    os.unlink(self.socket_path)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Varm pipeline-daemon över en Unix-socket.")
+    arg_parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH)
+    arg_parser.add_argument("--catalog", default=None)
+    arg_parser.add_argument("--watch", action="store_true", help="Ladda om ändrade moduler (utvecklingsläge).")
+    arg_parser.add_argument("--checkpoints", default=None, help="Katalog för stegens checkpoint-cache.")
+    arg_parser.add_argument("--checkpoint-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024))
+    arg_parser.add_argument("--topology-workers", type=int, default=0,
+                            help="Processer för att bygga separata system parallellt (0 = i daemonens process).")
+    args = arg_parser.parse_args(argv)
+    PipelineDaemon(args.socket, args.catalog, args.watch, args.checkpoints, args.checkpoint_mb * 1024 * 1024,
+                   args.topology_workers).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# pipeline/service/protocol.py
+
+import asyncio
+import json
+import socket
+import struct
+from typing import Any, List, Dict, Optional
+
+# Varje meddelande på socketen: 4 byte längd (big-endian) + nyttolast.
+HEADER = struct.Struct(">I")
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+
+# Valfritt meddelande före skissen med klientens körningsval (JSON), t.ex.
+# tidsbudgeten. En Protobuf-skiss kan inte börja med 0x00 (fältnummer 0 är
+# ogiltigt), så prefixet skiljer dem åt utan att ändra ramningen.
+OPTIONS_PREFIX = b"\x00lineshape-options\x00"
+
+# Primitivfält som är punkter; JSON gör tupler till listor, så de återställs vid avkodning.
+POINT_KEYS = ('start', 'mid', 'end', 'axial_dir')
+
+
+class ProtocolError(Exception):
+    """Fel i ramningen eller innehållet i ett meddelande."""
+    pass
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    chunks, remaining = [], size
+    while remaining:
+        chunk = sock.recv(min(remaining, 1 << 16))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def send_message(sock: socket.socket, payload: bytes):
+    """Skickar ett längdprefixat meddelande."""
+    sock.sendall(HEADER.pack(len(payload)) + payload)
+
+
+def recv_message(sock: socket.socket) -> Optional[bytes]:
+    """Tar emot ett längdprefixat meddelande. None om motparten stängde."""
+    header = _recv_exact(sock, HEADER.size)
+    if header is None:
+        return None
+    (size,) = HEADER.unpack(header)
+    if size > MAX_MESSAGE_BYTES:
+        raise ProtocolError(f"Meddelandet är för stort ({size} byte).")
+    payload = _recv_exact(sock, size)
+    if payload is None:
+        raise ProtocolError("Anslutningen stängdes mitt i ett meddelande.")
+    return payload
+
+
+async def read_message_async(reader: "asyncio.StreamReader") -> Optional[bytes]:
+    """Asyncio-variant av recv_message. None om motparten stängde."""
+    try:
+        header = await reader.readexactly(HEADER.size)
+    except asyncio.IncompleteReadError:
+        return None
+    (size,) = HEADER.unpack(header)
+    if size > MAX_MESSAGE_BYTES:
+        raise ProtocolError(f"Meddelandet är för stort ({size} byte).")
+    try:
+        return await reader.readexactly(size)
+    except asyncio.IncompleteReadError:
+        raise ProtocolError("Anslutningen stängdes mitt i ett meddelande.")
+
+
+async def write_message_async(writer: "asyncio.StreamWriter", payload: bytes):
+    """Asyncio-variant av send_message; väntar in skrivbufferten (mottryck mot långsamma klienter)."""
+    writer.write(HEADER.pack(len(payload)) + payload)
+    await writer.drain()
+
+
+def encode_options(options: Dict[str, Any]) -> bytes:
+    return OPTIONS_PREFIX + json.dumps(options).encode('utf-8')
+
+
+def decode_options(payload: bytes) -> Optional[Dict[str, Any]]:
+    """Körningsvalen om payload är ett options-meddelande, annars None (då är det skissen)."""
+    if not payload.startswith(OPTIONS_PREFIX):
+        return None
+    try:
+        options = json.loads(payload[len(OPTIONS_PREFIX):].decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ProtocolError(f"Ogiltiga körningsval: {e}")
+    if not isinstance(options, dict):
+        raise ProtocolError("Körningsvalen måste vara ett JSON-objekt.")
+    return options
+
+
+def encode_response(status: str, plans: Optional[List[List[Dict[str, Any]]]] = None, **extra: Any) -> bytes:
+    """Serialiserar ett svar. status är 'ok', 'impossible_build', 'invalid_sketch', 'cancelled' eller 'error'."""
+    return json.dumps({'status': status, 'plans': plans or [], **extra}).encode('utf-8')
+
+
+def decode_response(payload: bytes) -> Dict[str, Any]:
+    """Avkodar ett svar och återställer primitivernas punkter till tupler."""
+    try:
+        response = json.loads(payload.decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ProtocolError(f"Ogiltigt svar: {e}")
+    for plan in response.get('plans', []):
+        restore_points(plan)
+    return response
+
+
+def restore_points(plan: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Gör primitivernas punktlistor (från JSON) till tupler igen, på plats."""
+    for item in plan:
+        for key in POINT_KEYS:
+            if isinstance(item.get(key), list):
+                item[key] = tuple(item[key])
+    return plan
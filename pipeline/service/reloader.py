@@ -0,0 +1,70 @@
+# pipeline/service/reloader.py
+
+import importlib
+import os
+import sys
+from typing import List, Dict, Optional
+
+# Projektets moduler i beroendeordning: en modul står alltid efter det den importerar.
+# pipeline.shared.errors och pipeline.shared.cancellation saknas med avsikt:
+# daemonen fångar deras klasser, som måste vara samma objekt före och efter
+# en omladdning (ändras de krävs en omstart).
+PIPELINE_MODULES = [
+    "pipeline.shared.types",
+    "components_catalog.loader",
+    "pipeline.topology_builder.node_types_v2",
+    "pipeline.topology_builder.builder",
+    "pipeline.sketch_parser.parser",
+    "pipeline.sketch_validator.validator",
+    "pipeline.planner.planner",
+    "pipeline.plan_adjuster.adjuster",
+    "pipeline.component_factory.bend_batch",
+    "pipeline.component_factory.factory",
+    "pipeline.centerline_builder.builder",
+    "pipeline.geometry_executor.tessellation",
+    "pipeline.geometry_executor.svg_preview",
+    "pipeline.clash_detector.detector",
+    "pipeline.spool_partitioner.partitioner",
+    "pipeline.geometry_executor.executor",
+    "pipeline.geometry_executor.backends",
+    "pipeline.service.checkpoints",
+    "pipeline.service.runner",
+]
+
+
+class ModuleReloader:
+    """
+    Utvecklingsläge för daemonen: laddar bara om moduler vars fil har fått
+    ny mtime sedan förra kontrollen, istället för hela listan varje gång.
+    """
+    def __init__(self, module_names: Optional[List[str]] = None):
+        self.module_names = list(module_names or PIPELINE_MODULES)
+        self._mtimes: Dict[str, float] = {}
+        for name in self.module_names:
+            self._mtimes[name] = self._mtime(name)
+
+    @staticmethod
+    def _mtime(module_name: str) -> float:
+        module = sys.modules.get(module_name)
+        path = getattr(module, '__file__', None)
+        if not path or not os.path.exists(path):
+            return 0.0
+        return os.path.getmtime(path)
+
+    def changed_modules(self) -> List[str]:
+        """Moduler (i beroendeordning) vars källfil ändrats sedan senaste kontrollen."""
+        return [name for name in self.module_names
+                if name in sys.modules and self._mtime(name) != self._mtimes.get(name)]
+
+    def reload_changed(self) -> List[str]:
+        """Laddar om ändrade moduler och returnerar deras namn."""
+        reloaded = []
+        for name in self.changed_modules():
+            try:
+                importlib.reload(sys.modules[name])
+                reloaded.append(name)
+                print(f"  -> Reloader: Laddade om {name}")
+            except Exception as e:
+                print(f"  -> FEL vid omladdning av {name}: {e}")
+            self._mtimes[name] = self._mtime(name)
+        return reloaded
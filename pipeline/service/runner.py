@@ -0,0 +1,189 @@
+# pipeline/service/runner.py
+
+import queue
+import threading
+from concurrent.futures import Executor
+from dataclasses import replace
+from typing import Any, Iterator, List, Dict, Optional, Callable
+
+from components_catalog.loader import CatalogLoader
+from pipeline.sketch_parser.parser import SketchParser
+from pipeline.sketch_validator.validator import SketchValidator, SketchValidationError
+from pipeline.topology_builder.builder import TopologyBuilder
+from pipeline.planner.planner import Planner
+from pipeline.centerline_builder.builder import CenterlineBuilder
+from pipeline.plan_adjuster.adjuster import PlanAdjuster
+from pipeline.component_factory.factory import ComponentFactory
+from pipeline.service.checkpoints import StageCheckpoints
+from pipeline.shared.cancellation import CancellationToken
+
+
+def _strip_specs(topology_result):
+    """Topologin sparas med specnamn istället för katalogobjekt, så katalogjusteringar inte ogiltigförklarar den."""
+    nodes, graph = topology_result
+    spec_names = [node.assigned_spec.name if node.assigned_spec is not None else None for node in nodes]
+    return [replace(node, assigned_spec=None) for node in nodes], graph, spec_names
+
+
+def _bind_specs(catalog: CatalogLoader):
+    def decode(stored):
+        nodes, graph, spec_names = stored
+        for node, name in zip(nodes, spec_names):
+            node.assigned_spec = catalog.get_spec(name) if name is not None else None
+        return nodes, graph
+    return decode
+
+
+def build_drawing_plans(
+    proto_data: bytes,
+    catalog: CatalogLoader,
+    on_plan: Optional[Callable[[int, List[Dict[str, Any]]], None]] = None,
+    checkpoints: Optional[StageCheckpoints] = None,
+    on_preview: Optional[Callable[[int, List[Dict[str, Any]]], None]] = None,
+    cancel_token: Optional[CancellationToken] = None,
+    topology_executor: Optional[Executor] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Kör pipelinens Python-steg (Modul 1-5), från rå Protobuf-data till
+    explicita ritningsplaner. Inga FreeCAD-beroenden, så samma kedja kan
+    köras både i makrot och i den varma daemonen.
+    ImpossibleBuildError och SketchValidationError (med alla fel i skissen)
+    släpps vidare till anroparen. on_plan skickas vidare till
+    CenterlineBuilder och anropas per färdig resplan. on_preview anropas
+    först, med en billig trådmodell per resplan, innan ritningssteget börjar.
+
+    Med checkpoints hämtas varje steg (tolkad skiss, topologi, resplaner,
+    ritningsplaner) från cachen när dess indata och versionstagg är
+    oförändrade. Katalogen påverkar bara ritningssteget.
+
+    cancel_token kontrolleras mellan stegen och i TopologyBuilders, Planners
+    och CenterlineBuilders huvudloopar; OperationCancelled släpps vidare.
+    Med partial-policy blir resultatet de ritningsplaner som hann bli klara,
+    och ett sådant avkortat resultat cachas inte.
+
+    topology_executor (en processpool som anroparen äger, t.ex. daemonens)
+    låter TopologyBuilder bygga skissens separata system parallellt.
+    """
+    checkpoints = checkpoints or StageCheckpoints()
+    cancel_token = cancel_token or CancellationToken()
+
+    parsed = checkpoints.run(
+        'parsed_sketch', SketchParser.CHECKPOINT_VERSION, (proto_data,),
+        lambda: SketchParser().parse(proto_data)
+    )
+
+    cancel_token.check('parse')
+
+    # STEG 1b: Stoppa ogiltiga skisser innan de dyra stegen.
+    issues = SketchValidator(catalog).validate(parsed.value)
+    if issues:
+        raise SketchValidationError(issues)
+
+    topology = checkpoints.run(
+        'topology', TopologyBuilder.CHECKPOINT_VERSION, (parsed.key,),
+        lambda: TopologyBuilder(parsed.value, catalog, executor=topology_executor, cancel_token=cancel_token).build(),
+        encode=_strip_specs, decode=_bind_specs(catalog)
+    )
+    nodes, graph = topology.value
+    cancel_token.check('topology')
+
+    # STEG 3: Skapa logiska resplaner
+    travel = checkpoints.run(
+        'travel_plans', Planner.CHECKPOINT_VERSION, (topology.key,),
+        lambda: Planner(nodes=nodes, topology=graph, catalog=catalog, cancel_token=cancel_token).create_plans()
+    )
+    travel_plans = travel.value
+
+    # STEG 4a: Trådmodell per resplan, så något kan visas direkt.
+    if on_preview:
+        CenterlineBuilder(
+            travel_plans=travel_plans, nodes=nodes, topology=graph, catalog=catalog,
+            adjuster=None, factory=None
+        ).build_preview_plans(on_preview=on_preview)
+
+    def build_drawing() -> List[List[Dict[str, Any]]]:
+        # STEG 4: Adjuster och fabrik injiceras i CenterlineBuilder.
+        factory = ComponentFactory(catalog=catalog)
+        adjuster = PlanAdjuster(
+            semantic_plans=travel_plans,
+            nodes=nodes,
+            topology=graph,
+            catalog=catalog
+        )
+
+        # STEG 5: Bygg den detaljerade geometriska planen
+        centerline_builder = CenterlineBuilder(
+            travel_plans=travel_plans,
+            nodes=nodes,
+            topology=graph,
+            catalog=catalog,
+            factory=factory,
+            adjuster=adjuster,
+            cancel_token=cancel_token
+        )
+        return centerline_builder.build_drawing_plans(on_plan=on_plan)
+
+    # Ritningssteget är det enda som beror på katalogens innehåll.
+    drawing_version = "/".join((CenterlineBuilder.CHECKPOINT_VERSION, PlanAdjuster.CHECKPOINT_VERSION, ComponentFactory.CHECKPOINT_VERSION))
+    drawing = checkpoints.run(
+        'drawing_plans', drawing_version, (travel.key, getattr(catalog, 'version', '')),
+        build_drawing,
+        cacheable=lambda _: 'centerline' not in cancel_token.truncated
+    )
+    if on_plan and drawing.cached:
+        for index, plan in enumerate(drawing.value):
+            on_plan(index, plan)
+    return drawing.value
+
+
+_END_OF_STREAM = object()
+
+
+def iter_drawing_plans(
+    proto_data: bytes,
+    catalog: CatalogLoader,
+    checkpoints: Optional[StageCheckpoints] = None,
+    cancel_token: Optional[CancellationToken] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Strömmande variant av build_drawing_plans. Pipelinen körs i en egen tråd
+    och händelserna ges i samma form som AsyncPipelineServer skickar dem:
+      {'status': 'preview', 'index': i, 'plan': [...]}  trådmodell, alla resplaner först
+      {'status': 'plan', 'index': i, 'plan': [...]}     färdig ritningsplan
+      {'status': 'done', 'count': n}
+    Fel från pipelinen (ImpossibleBuildError, SketchValidationError, ...)
+    kastas vidare i anroparens tråd. Bryter anroparen loopen tidigt avbryts
+    bygget via cancel_token.
+    """
+    cancel_token = cancel_token or CancellationToken()
+    events: "queue.Queue[Any]" = queue.Queue()
+
+    def work():
+        try:
+            plans = build_drawing_plans(
+                proto_data, catalog, checkpoints=checkpoints,
+                on_preview=lambda index, plan: events.put({'status': 'preview', 'index': index, 'plan': plan}),
+                on_plan=lambda index, plan: events.put({'status': 'plan', 'index': index, 'plan': plan}),
+                cancel_token=cancel_token,
+            )
+            events.put({'status': 'done', 'count': len(plans)})
+        except BaseException as e:
+            events.put(e)
+        finally:
+            events.put(_END_OF_STREAM)
+
+    threading.Thread(target=work, name="drawing-plan-stream", daemon=True).start()
+    finished = False
+    try:
+        while True:
+            event = events.get()
+            if event is _END_OF_STREAM:
+                finished = True
+                return
+            if isinstance(event, BaseException):
+                finished = True
+                raise event
+            yield event
+    finally:
+        if not finished:
+            cancel_token.cancel()
@@ -0,0 +1,92 @@
+# pipeline/shared/cancellation.py
+
+import threading
+import time
+from typing import List, Optional
+
+# Vad ett steg gör när tidsbudgeten tar slut (inte vid cancel(), då är
+# körningen inaktuell och kastas alltid):
+#   RAISE:   kasta OperationCancelled, inget resultat.
+#   PARTIAL: de steg som producerar planer eller former returnerar det som
+#            hunnit bli helt klart (hela ritningsplaner, hela former).
+#            Steg vars delresultat inte går att använda (topologi, Planner)
+#            kastar ändå.
+ON_EXPIRY_RAISE = 'raise'
+ON_EXPIRY_PARTIAL = 'partial'
+
+
+class OperationCancelled(Exception):
+    """Körningen avbröts, antingen med cancel() ('cancelled') eller av tidsbudgeten ('deadline')."""
+    def __init__(self, stage: str, reason: str):
+        self.stage = stage
+        self.reason = reason
+        super().__init__(f"Avbrutet i steg '{stage}' ({reason}).")
+
+
+class CancellationToken:
+    """
+    Avbrottssignal och tidsbudget som skickas genom alla pipelinens steg.
+    Stegen anropar check() i sina huvudloopar; kontrollen är en flagga och
+    en jämförelse mot time.monotonic(), så den kan göras per nod.
+    Trådsäker: cancel() får anropas från vilken tråd som helst.
+    """
+    def __init__(self, deadline_s: Optional[float] = None, on_expiry: str = ON_EXPIRY_RAISE):
+        if on_expiry not in (ON_EXPIRY_RAISE, ON_EXPIRY_PARTIAL):
+            raise ValueError(f"Okänd policy: {on_expiry!r}")
+        self.deadline = None if deadline_s is None else time.monotonic() + deadline_s
+        self.on_expiry = on_expiry
+        self._cancelled = threading.Event()
+        # Steg som returnerat ett avkortat resultat (sådant cachas aldrig).
+        self.truncated: List[str] = []
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def remaining_s(self) -> Optional[float]:
+        """Sekunder kvar av budgeten, None utan deadline."""
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    def reason(self) -> Optional[str]:
+        """'cancelled', 'deadline' eller None om körningen får fortsätta."""
+        if self._cancelled.is_set():
+            return 'cancelled'
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return 'deadline'
+        return None
+
+    def check(self, stage: str):
+        """Kastar OperationCancelled om körningen ska avbrytas."""
+        reason = self.reason()
+        if reason is not None:
+            raise OperationCancelled(stage, reason)
+
+    def allows_partial(self, error: OperationCancelled) -> bool:
+        """Sant om steget ska returnera sitt delresultat istället för att kasta error."""
+        return error.reason == 'deadline' and self.on_expiry == ON_EXPIRY_PARTIAL
+
+    def mark_truncated(self, stage: str, done: int, total: int):
+        self.truncated.append(stage)
+        print(f"  -> Tidsbudgeten slut i '{stage}': returnerar {done} av {total} färdiga delar.")
+
+
+class SupersedingRuns:
+    """
+    En token per interaktiv körning. begin() avbryter föregående körning,
+    så en ny redigering frigör direkt kapaciteten som den gamla höll.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._current: Optional[CancellationToken] = None
+
+    def begin(self, deadline_s: Optional[float] = None, on_expiry: str = ON_EXPIRY_RAISE) -> CancellationToken:
+        token = CancellationToken(deadline_s, on_expiry)
+        with self._lock:
+            previous, self._current = self._current, token
+        if previous is not None:
+            previous.cancel()
+        return token
@@ -0,0 +1,32 @@
+# pipeline/shared/errors.py
+
+from dataclasses import dataclass, field
+from typing import List
+
+# Felen som pipelinen kastar och som tunna klienter (client.py, main_runner)
+# återskapar från daemonens svar. De ligger här, utan beroenden, så att
+# klienten inte behöver importera validatorn eller adjustern (och därmed
+# numpy och katalogen). Modulen laddas aldrig om av hot-reloadern: klasserna
+# förblir samma objekt när validatorn eller adjustern laddas om.
+
+
+class ImpossibleBuildError(Exception):
+    """Ett anpassat fel som kastas när en design är geometriskt omöjlig."""
+    pass
+
+
+@dataclass
+class ValidationIssue:
+    """Ett fel i skissen, med de segment-ID:n som berörs."""
+    code: str
+    message: str
+    segment_ids: List[str] = field(default_factory=list)
+
+
+class SketchValidationError(Exception):
+    """Kastas när skissen är ogiltig; bär ALLA hittade fel på en gång."""
+    def __init__(self, issues: List[ValidationIssue]):
+        self.issues = issues
+        summary = "; ".join(f"[{issue.code}] {issue.message}" for issue in issues[:5])
+        more = f" (+{len(issues) - 5} till)" if len(issues) > 5 else ""
+        super().__init__(f"{len(issues)} fel i skissen: {summary}{more}")
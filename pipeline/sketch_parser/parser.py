@@ -12,6 +12,9 @@ class SketchParser:
     Ansvarar för att tolka rå Protobuf-data från frontend och omvandla
     den till en ren, intern Python-datastruktur.
     """
+    # Höjs när utdata ändras, så stegets checkpoints ogiltigförklaras.
+    CHECKPOINT_VERSION = "1"
+
     def __init__(self):
         """Initialiserar parsern."""
         pass
@@ -0,0 +1,187 @@
+# pipeline/sketch_validator/validator.py
+
+from typing import Any, Dict, List
+
+import numpy as np
+
+from components_catalog.loader import CatalogLoader
+# Felklasserna bor i pipeline/shared/errors.py; importeras även härifrån.
+from pipeline.shared.errors import SketchValidationError, ValidationIssue  # noqa: F401
+
+# Koordinater avrundas till denna upplösning när punkter jämförs (samma
+# som skissens Decimal-nycklar i praktiken).
+POINT_DECIMALS = 6
+# |cos| över denna gräns räknas som parallellt.
+PARALLEL_COS = 1.0 - 1e-9
+
+
+class SketchValidator:
+    """
+    Snabb kontroll direkt efter SketchParser, innan topologi och planering.
+    Segmenten läggs i kolumner (NumPy-arrayer) och alla regler körs i ett
+    linjärt pass, så en ogiltig skiss kostar millisekunder.
+
+    Kontroller:
+      * unknown_spec       - pipe_spec saknas i katalogen (ej konstruktionslinjer)
+      * zero_length        - start == slut, eller längdmått <= 0
+      * duplicate_id       - samma segment-ID förekommer flera gånger
+      * degree_too_high    - fler än tre rör möts i en punkt (FR-2.6)
+      * overlapping_edges  - två rör ur samma punkt är parallella åt samma håll,
+                             dvs. en "böj" på 180° (FR-2.7)
+      * dangling_construction - en konstruktionskedja slutar i en lös punkt
+      * undimensioned_part - en separat del av skissen (ett eget system)
+                             saknar mått helt och kan inte placeras
+      * unresolved_shortcut - ett måttlöst rör har en ändpunkt som varken
+                             mått eller konstruktionslinjer bestämmer
+    """
+    def __init__(self, catalog: CatalogLoader):
+        self.catalog = catalog
+
+    def validate(self, parsed_sketch: Dict[str, Any]) -> List[ValidationIssue]:
+        print("--- Modul 1b (Sketch Validator): Kontrollerar skissen ---")
+        segments = parsed_sketch.get("segments", [])
+        count = len(segments)
+        if count == 0:
+            return [ValidationIssue("empty", "Skissen innehåller inga segment.")]
+
+        # --- Kolumner ---
+        ids = np.array([s["id"] for s in segments], dtype=object)
+        specs = np.array([s.get("pipe_spec", "") for s in segments], dtype=object)
+        construction = np.array([bool(s.get("is_construction")) for s in segments], dtype=bool)
+        lengths = np.array([np.nan if s.get("length_dimension") is None else s["length_dimension"] for s in segments], dtype=float)
+        starts = np.array([self._xy(s["start_point"]) for s in segments], dtype=float)
+        ends = np.array([self._xy(s["end_point"]) for s in segments], dtype=float)
+
+        # Punkt-index: varje unik (avrundad) koordinat blir en nod.
+        points = np.round(np.concatenate([starts, ends]), POINT_DECIMALS)
+        _, point_ids = np.unique(points, axis=0, return_inverse=True)
+        point_ids = point_ids.reshape(-1)
+        start_ids, end_ids = point_ids[:count], point_ids[count:]
+        point_count = int(point_ids.max()) + 1
+
+        issues: List[ValidationIssue] = []
+        issues += self._check_specs(ids, specs, construction)
+        issues += self._check_lengths(ids, starts, ends, lengths)
+        issues += self._check_duplicates(ids)
+
+        valid = start_ids != end_ids
+        issues += self._check_nodes(ids, starts, ends, start_ids, end_ids, construction, valid, point_count)
+        issues += self._check_connectivity(ids, start_ids, end_ids, lengths, construction, valid, point_count)
+
+        if issues:
+            print(f"  -> {len(issues)} fel hittade. Stoppar före topologi och planering.")
+        else:
+            print(f"  -> Skissen är giltig ({count} segment).")
+        return issues
+
+    @staticmethod
+    def _xy(point: Any):
+        return (point['x'], point['y']) if isinstance(point, dict) else (point[0], point[1])
+
+    def _check_specs(self, ids, specs, construction) -> List[ValidationIssue]:
+        known = {spec: self.catalog.get_spec(spec) is not None for spec in set(specs[~construction].tolist())}
+        unknown = np.array([not construction[i] and not known.get(specs[i], False) for i in range(len(ids))], dtype=bool)
+        issues = []
+        for spec in sorted(set(specs[unknown].tolist())):
+            affected = ids[unknown & (specs == spec)].tolist()
+            issues.append(ValidationIssue("unknown_spec", f"Okänd rörspecifikation '{spec}'.", affected))
+        return issues
+
+    @staticmethod
+    def _check_lengths(ids, starts, ends, lengths) -> List[ValidationIssue]:
+        degenerate = np.all(np.isclose(starts, ends), axis=1)
+        non_positive = ~np.isnan(lengths) & (lengths <= 0.0)
+        bad = degenerate | non_positive
+        if not bad.any():
+            return []
+        return [ValidationIssue("zero_length", "Segment med noll-längd (eller längdmått <= 0).", ids[bad].tolist())]
+
+    @staticmethod
+    def _check_duplicates(ids) -> List[ValidationIssue]:
+        unique, counts = np.unique(ids.astype(str), return_counts=True)
+        duplicates = unique[counts > 1].tolist()
+        return [ValidationIssue("duplicate_id", f"Segment-ID '{d}' förekommer flera gånger.", [d]) for d in duplicates]
+
+    @staticmethod
+    def _check_nodes(ids, starts, ends, start_ids, end_ids, construction, valid, point_count) -> List[ValidationIssue]:
+        issues = []
+        pipe = valid & ~construction
+
+        # Gradtal per punkt, separat för rör och konstruktionslinjer.
+        pipe_degree = np.bincount(np.concatenate([start_ids[pipe], end_ids[pipe]]), minlength=point_count)
+        all_degree = np.bincount(np.concatenate([start_ids[valid], end_ids[valid]]), minlength=point_count)
+
+        for point in np.nonzero(pipe_degree > 3)[0].tolist():
+            affected = ids[pipe & ((start_ids == point) | (end_ids == point))].tolist()
+            issues.append(ValidationIssue("degree_too_high", f"{pipe_degree[point]} rör möts i samma punkt (max 3).", affected))
+
+        # Lösa ändar på konstruktionskedjor: en konstruktionsände som ingen annan linje rör.
+        construction_valid = valid & construction
+        dangling_point = (all_degree == 1) & (pipe_degree == 0)
+        dangling = construction_valid & (dangling_point[start_ids] | dangling_point[end_ids])
+        if dangling.any():
+            issues.append(ValidationIssue("dangling_construction", "Konstruktionskedja slutar i en lös punkt.", ids[dangling].tolist()))
+
+        # Överlappande rör ur samma punkt: riktningar ut ur punkten, grupperade per punkt.
+        pipe_index = np.nonzero(pipe)[0]
+        spans = ends[pipe_index] - starts[pipe_index]
+        units = spans / np.linalg.norm(spans, axis=1, keepdims=True)
+        incident_point = np.concatenate([start_ids[pipe_index], end_ids[pipe_index]])
+        incident_dir = np.concatenate([units, -units])
+        incident_segment = np.concatenate([pipe_index, pipe_index])
+        order = np.argsort(incident_point, kind='stable')
+        incident_point, incident_dir, incident_segment = incident_point[order], incident_dir[order], incident_segment[order]
+
+        # Jämför varje infall med de närmast följande i samma punkt; så många
+        # steg som den största punkten har infall.
+        overlapping = set()
+        max_incident = int(np.bincount(incident_point).max()) if len(incident_point) else 0
+        for offset in range(1, max_incident):
+            same_point = incident_point[offset:] == incident_point[:-offset]
+            cosines = np.einsum('ij,ij->i', incident_dir[offset:], incident_dir[:-offset])
+            for k in np.nonzero(same_point & (cosines > PARALLEL_COS))[0].tolist():
+                overlapping.add((int(incident_segment[k]), int(incident_segment[k + offset])))
+        for a, b in sorted(overlapping):
+            issues.append(ValidationIssue("overlapping_edges", "Två rör lämnar samma punkt i samma riktning (180°-böj).",
+                                          [ids[a], ids[b]]))
+        return issues
+
+    @staticmethod
+    def _check_connectivity(ids, start_ids, end_ids, lengths, construction, valid, point_count) -> List[ValidationIssue]:
+        issues = []
+        dimensioned = valid & ~np.isnan(lengths)
+        if not dimensioned.any():
+            return [ValidationIssue("undimensioned_part", "Skissen saknar måttsatta segment.")]
+
+        # Union-find över alla segment: varje del är ett eget system som byggs
+        # för sig och behöver minst ett mått.
+        parent = list(range(point_count))
+
+        def find(x: int) -> int:
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for a, b in zip(start_ids[valid].tolist(), end_ids[valid].tolist()):
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b:
+                parent[root_a] = root_b
+
+        roots = np.array([find(p) for p in start_ids.tolist()])
+        dimensioned_roots = np.unique(roots[dimensioned])
+        undimensioned = valid & ~np.isin(roots, dimensioned_roots)
+        if undimensioned.any():
+            issues.append(ValidationIssue("undimensioned_part", "En separat del av skissen saknar mått och kan inte placeras.",
+                                          ids[undimensioned].tolist()))
+
+        # Måttlösa konstruktionslinjer bestämmer punkter via konstruktionskedjor.
+        determining = valid & (~np.isnan(lengths) | construction)
+        has_dimension = np.zeros(point_count, dtype=bool)
+        has_dimension[start_ids[determining]] = True
+        has_dimension[end_ids[determining]] = True
+        shortcut = valid & np.isnan(lengths) & ~construction
+        unresolved = shortcut & ~(has_dimension[start_ids] & has_dimension[end_ids])
+        if unresolved.any():
+            issues.append(ValidationIssue("unresolved_shortcut", "Måttlöst segment saknar måttsatta ändpunkter.", ids[unresolved].tolist()))
+        return issues
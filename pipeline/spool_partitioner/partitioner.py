@@ -0,0 +1,342 @@
+# pipeline/spool_partitioner/partitioner.py
+
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from pipeline.geometry_executor.tessellation import ArcTessellator
+
+Point3D = Tuple[float, float, float]
+EPS = 1e-6
+# Ändpunkter närmare än så här räknas som samma port.
+PORT_TOLERANCE = 1e-3
+# Bågarnas kordafel när längd och omslutande låda för kopplingsdelar räknas ut.
+SPOOL_CHORD_TOLERANCE = 0.5
+
+
+@dataclass(frozen=True)
+class SpoolLimits:
+    """
+    Transport- och svetsgränser för en spool: största totala centrumlinjelängd
+    och största omslutande låda (mm). Lådans mått jämförs sorterade, så en
+    spool får vändas hur som helst på flaket.
+    """
+    max_length: float = 12000.0
+    max_box: Tuple[float, float, float] = (12000.0, 2400.0, 2400.0)
+
+    def fits(self, length: float, lo: List[float], hi: List[float]) -> bool:
+        if length > self.max_length + EPS:
+            return False
+        extents = sorted(hi[k] - lo[k] for k in range(3))
+        return all(e <= b + EPS for e, b in zip(extents, sorted(self.max_box)))
+
+    def max_straight(self, direction: Point3D) -> float:
+        """Längsta raka rör i riktningen direction som ryms inom gränserna."""
+        extents = sorted(abs(c) for c in direction)
+        limit = self.max_length
+        for e, b in zip(extents, sorted(self.max_box)):
+            if e > EPS:
+                limit = min(limit, b / e)
+        return limit
+
+
+@dataclass
+class Spool:
+    """En prefabricerad spool: dess delplan (primitiver i ritningsordning), längd och lådmått."""
+    index: int
+    plan: List[Dict[str, Any]]
+    length: float
+    extents: Tuple[float, float, float]
+    # Sant om gränserna inte gick att hålla (kopplingsdelar som sitter ihop utan rör emellan).
+    oversize: bool = False
+
+
+@dataclass
+class SpoolPartition:
+    spools: List[Spool]
+    # Fältsvetsarnas lägen, en per snitt.
+    field_welds: List[Point3D]
+
+    @property
+    def weld_count(self) -> int:
+        return len(self.field_welds)
+
+
+class _Component:
+    """En komponent (component_id) i ritningsplanerna, nod i komponentträdet."""
+    __slots__ = ('id', 'is_pipe', 'items', 'ports', 'length', 'lo', 'hi')
+
+    def __init__(self, component_id: str, is_pipe: bool):
+        self.id = component_id
+        self.is_pipe = is_pipe
+        self.items: List[Tuple[Tuple[int, int, float], Dict[str, Any]]] = []
+        self.ports: Dict[Tuple[int, int, int], Point3D] = {}
+        self.length = 0.0
+        self.lo = [math.inf] * 3
+        self.hi = [-math.inf] * 3
+
+    def add_points(self, points: List[Point3D]):
+        for point in points:
+            for k in range(3):
+                self.lo[k] = min(self.lo[k], point[k])
+                self.hi[k] = max(self.hi[k], point[k])
+
+
+@dataclass
+class _Open:
+    """Den ännu inte stängda spoolen som växer uppåt i trädet."""
+    length: float
+    lo: List[float]
+    hi: List[float]
+    parts: List[Tuple[Tuple[int, int, float], Dict[str, Any]]] = field(default_factory=list)
+    oversize: bool = False
+
+    @classmethod
+    def at(cls, point: Point3D) -> '_Open':
+        return cls(0.0, list(point), list(point))
+
+    def absorb(self, other: '_Open'):
+        self.length += other.length
+        self.lo = [min(a, b) for a, b in zip(self.lo, other.lo)]
+        self.hi = [max(a, b) for a, b in zip(self.hi, other.hi)]
+        # Den mindre listan flyttas in i den större, så varje primitiv flyttas få gånger.
+        if len(other.parts) > len(self.parts):
+            self.parts, other.parts = other.parts, self.parts
+        self.parts.extend(other.parts)
+        self.oversize = self.oversize or other.oversize
+
+
+def _cell(point: Point3D) -> Tuple[int, int, int]:
+    return tuple(int(round(c / PORT_TOLERANCE)) for c in point)
+
+
+class SpoolPartitioner:
+    """
+    Delar ett färdigt system i transporterbara spooler. Komponenterna
+    (component_id) i ritningsplanerna bildar ett träd via sina portar.
+    Snitt (fältsvetsar) läggs bara i raka rör (PIPE), som kan kapas var som
+    helst längs sin längd; kopplingsdelar som sitter direkt ihop delas aldrig.
+
+    Trädet bearbetas en gång nedifrån och upp (girig träd-partitionering i
+    stil med Kundu-Misra): varje nod slår ihop sina barns öppna spooler,
+    lättaste först, och stänger de barn som inte ryms. Längs ett rör växer
+    den öppna spoolen så långt gränserna tillåter innan den stängs, så minsta
+    möjliga rest går vidare uppåt. Varje nod och kant besöks ett konstant
+    antal gånger, så tiden är linjär i antalet komponenter (plus utdata).
+    """
+    def __init__(self, limits: Optional[SpoolLimits] = None):
+        self.limits = limits or SpoolLimits()
+
+    def partition(self, explicit_plans: List[List[Dict[str, Any]]]) -> SpoolPartition:
+        print("--- Spool-partitionering: Startar ---")
+        components, by_cell = self._collect(explicit_plans)
+        self._spools: List[Spool] = []
+        self._welds: List[Point3D] = []
+
+        visited = set()
+        for root_id in components:
+            if root_id in visited:
+                continue
+            # Bredden-först-ordning; baklänges blir den en giltig nedifrån-och-upp-ordning.
+            order, parent_cell = [root_id], {root_id: None}
+            visited.add(root_id)
+            children: Dict[str, List[Tuple[str, Tuple[int, int, int]]]] = {}
+            for component_id in order:
+                for cell in components[component_id].ports:
+                    for neighbor_id in by_cell[cell]:
+                        if neighbor_id in visited:
+                            continue
+                        visited.add(neighbor_id)
+                        parent_cell[neighbor_id] = cell
+                        children.setdefault(component_id, []).append((neighbor_id, cell))
+                        order.append(neighbor_id)
+
+            opens: Dict[str, _Open] = {}
+            for component_id in reversed(order):
+                component = components[component_id]
+                child_opens = [(components[child_id], cell, opens.pop(child_id))
+                               for child_id, cell in children.get(component_id, [])]
+                opens[component_id] = self._process(component, parent_cell[component_id], child_opens)
+            self._close(opens.pop(root_id))
+
+        oversize = sum(spool.oversize for spool in self._spools)
+        print(f"--- Spool-partitionering: {len(self._spools)} spooler, {len(self._welds)} fältsvetsar"
+              f"{f', {oversize} över gränserna' if oversize else ''}. ---")
+        return SpoolPartition(self._spools, self._welds)
+
+    def _collect(self, explicit_plans: List[List[Dict[str, Any]]]):
+        """Grupperar primitiverna per komponent och indexerar portarna (delade ändpunkter)."""
+        arcs = [item for plan in explicit_plans for item in plan if item.get('type') == 'ARC']
+        batch = ArcTessellator(SPOOL_CHORD_TOLERANCE).tessellate(arcs)
+        arc_row = {id(item): row for row, item in enumerate(arcs)}
+
+        components: Dict[str, _Component] = {}
+        # Planen där varje komponent först förekommer. Ett T-rör kan placeras
+        # i flera resplaner (med nya primitiv-ID:n varje gång); bara den
+        # första placeringen räknas, som i incremental.group_by_component.
+        owner_plan: Dict[str, int] = {}
+        endpoint_owners: Dict[Tuple[int, int, int], List[str]] = {}
+        for plan_index, plan in enumerate(explicit_plans):
+            for item_index, item in enumerate(plan):
+                if item.get('type') not in ('LINE', 'ARC'):
+                    continue
+                component_id = item.get('component_id') or f"anon_{plan_index}_{item_index}"
+                if owner_plan.setdefault(component_id, plan_index) != plan_index:
+                    continue
+                component = components.get(component_id)
+                if component is None:
+                    component = components[component_id] = _Component(component_id, item.get('component_type') == 'PIPE')
+                component.items.append(((plan_index, item_index, 0.0), item))
+
+                if item['type'] == 'ARC':
+                    points = [tuple(p) for p in batch.polyline(arc_row[id(item)]).tolist()]
+                else:
+                    points = [tuple(item['start']), tuple(item['end'])]
+                component.length += sum(math.dist(a, b) for a, b in zip(points, points[1:]))
+                component.add_points(points)
+                for point in (points[0], points[-1]):
+                    owners = endpoint_owners.setdefault(_cell(point), [])
+                    if component_id not in owners:
+                        owners.append(component_id)
+                    component.ports.setdefault(_cell(point), point)
+
+        # Ett rör kapas bara om det är en enda rak linje; annars behandlas det som en kopplingsdel.
+        for component in components.values():
+            if component.is_pipe and not (len(component.items) == 1 and component.items[0][1]['type'] == 'LINE'):
+                component.is_pipe = False
+
+        # Bara ändpunkter som delas med en annan komponent är portar.
+        by_cell = {cell: owners for cell, owners in endpoint_owners.items() if len(owners) > 1}
+        for component in components.values():
+            component.ports = {cell: point for cell, point in component.ports.items() if cell in by_cell}
+        return components, by_cell
+
+    def _fits(self, open_spool: _Open) -> bool:
+        return self.limits.fits(open_spool.length, open_spool.lo, open_spool.hi)
+
+    def _close(self, open_spool: _Open):
+        parts = sorted(open_spool.parts, key=lambda part: part[0])
+        extents = tuple(hi - lo for lo, hi in zip(open_spool.lo, open_spool.hi))
+        self._spools.append(Spool(len(self._spools), [item for _, item in parts], open_spool.length, extents, open_spool.oversize))
+
+    def _merge_children(self, base: _Open, host: _Component, child_opens: List[Tuple[_Component, Tuple[int, int, int], _Open]]):
+        """
+        Slår ihop barnens öppna spooler med base. Barn som sitter direkt på en
+        kopplingsdel utan rör emellan måste följa med; övriga tas lättaste
+        först och stängs vid porten (en fältsvets i rörets ände) om de inte ryms.
+        """
+        forced = [entry for entry in child_opens if not (host.is_pipe or entry[0].is_pipe)]
+        cuttable = sorted((entry for entry in child_opens if host.is_pipe or entry[0].is_pipe), key=lambda entry: entry[2].length)
+        for _, _, child in forced:
+            base.absorb(child)
+        if forced and not self._fits(base):
+            base.oversize = True
+        for child_component, cell, child in cuttable:
+            trial = _Open(base.length + child.length,
+                          [min(a, b) for a, b in zip(base.lo, child.lo)],
+                          [max(a, b) for a, b in zip(base.hi, child.hi)])
+            if self._fits(trial):
+                base.absorb(child)
+            else:
+                self._close(child)
+                self._welds.append(child_component.ports.get(cell) or host.ports[cell])
+
+    def _process(self, component: _Component, parent_cell, child_opens) -> _Open:
+        if not component.is_pipe:
+            base = _Open(component.length, list(component.lo), list(component.hi), list(component.items))
+            if not self._fits(base):
+                base.oversize = True
+            self._merge_children(base, component, child_opens)
+            return base
+
+        # Raka rör: börja i änden bort från föräldern och väx mot den.
+        item = component.items[0][1]
+        start, end = tuple(item['start']), tuple(item['end'])
+        far, near = (end, start) if parent_cell is not None and _cell(start) == parent_cell else (start, end)
+        far_cell = _cell(far)
+        base = _Open.at(far)
+        self._merge_children(base, component, [entry for entry in child_opens if entry[1] == far_cell])
+        base = self._grow_along_pipe(base, component, far, near)
+        self._merge_children(base, component, [entry for entry in child_opens if entry[1] != far_cell])
+        return base
+
+    def _grow_along_pipe(self, open_spool: _Open, component: _Component, far: Point3D, near: Point3D) -> _Open:
+        """Förlänger den öppna spoolen längs röret från far mot near och kapar där gränserna nås."""
+        length = math.dist(far, near)
+        if length < EPS:
+            return open_spool
+        direction = tuple((n - f) / length for f, n in zip(far, near))
+        max_straight = self.limits.max_straight(direction)
+        position = 0.0
+        while True:
+            remaining = length - position
+            here = tuple(f + d * position for f, d in zip(far, direction))
+            reach = self._max_reach(open_spool, here, direction, remaining)
+            if reach <= EPS and not open_spool.parts:
+                # Gränserna släpper inte igenom ens ett kort rör; ta resten som det är.
+                reach, open_spool.oversize = remaining, True
+            if reach > EPS:
+                self._add_piece(open_spool, component, far, direction, position, position + min(reach, remaining))
+            if reach >= remaining - EPS:
+                return open_spool
+            position += reach
+            self._close(open_spool)
+            cut = tuple(f + d * position for f, d in zip(far, direction))
+            self._welds.append(cut)
+            open_spool = _Open.at(cut)
+            # Rena raka spooler i rörets mitt behöver ingen sökning.
+            while length - position > max_straight + EPS:
+                piece = _Open.at(cut)
+                self._add_piece(piece, component, far, direction, position, position + max_straight)
+                self._close(piece)
+                position += max_straight
+                cut = tuple(f + d * position for f, d in zip(far, direction))
+                self._welds.append(cut)
+                open_spool = _Open.at(cut)
+
+    def _max_reach(self, open_spool: _Open, here: Point3D, direction: Point3D, remaining: float) -> float:
+        """Hur långt (högst remaining) den öppna spoolen kan växa längs röret och ändå rymmas."""
+        cap = min(remaining, self.limits.max_length - open_spool.length)
+        if cap <= 0.0:
+            return 0.0
+
+        def fits(reach: float) -> bool:
+            tip = [h + d * reach for h, d in zip(here, direction)]
+            return self.limits.fits(open_spool.length + reach,
+                                    [min(a, b) for a, b in zip(open_spool.lo, tip)],
+                                    [max(a, b) for a, b in zip(open_spool.hi, tip)])
+
+        if fits(cap):
+            return cap
+        # Lådans mått växer monotont med längden, så bisektion räcker.
+        low, high = 0.0, cap
+        for _ in range(40):
+            middle = (low + high) / 2.0
+            if fits(middle):
+                low = middle
+            else:
+                high = middle
+        return low
+
+    def _add_piece(self, open_spool: _Open, component: _Component, far: Point3D, direction: Point3D, s0: float, s1: float):
+        """Lägger rörbiten [s0, s1] (mätt från far) i den öppna spoolen, i primitivens egen riktning."""
+        (plan_index, item_index, _), item = component.items[0]
+        length = math.dist(item['start'], item['end'])
+        a = tuple(f + d * s0 for f, d in zip(far, direction))
+        b = tuple(f + d * s1 for f, d in zip(far, direction))
+        reversed_item = _cell(tuple(item['start'])) != _cell(far)
+        if reversed_item:
+            a, b = b, a
+            offset = length - s1
+        else:
+            offset = s0
+        if s1 - s0 >= length - EPS:
+            piece = item
+        else:
+            piece = {**item, 'id': f"{item.get('id')}_{int(round(offset))}", 'source_id': item.get('id'), 'start': a, 'end': b}
+        open_spool.parts.append(((plan_index, item_index, offset), piece))
+        open_spool.length += s1 - s0
+        for point in (a, b):
+            for k in range(3):
+                open_spool.lo[k] = min(open_spool.lo[k], point[k])
+                open_spool.hi[k] = max(open_spool.hi[k], point[k])
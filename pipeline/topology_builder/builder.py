@@ -1,13 +1,17 @@
 # pipeline/2_topology_builder/builder.py
 
 import math
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, FIRST_COMPLETED, wait
 from decimal import Decimal # <-- LÄGG TILL DENNA RAD
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Tuple, FrozenSet, Optional, Hashable
 import networkx as nx
 
 # Importera från andra V2-moduler
 from components_catalog.loader import CatalogLoader
+from pipeline.shared.cancellation import CancellationToken
 from .node_types_v2 import NodeInfo, BendNodeInfo, TeeNodeInfo, EndpointNodeInfo
+from .chain_resolver import ChainConstraint, ConstructionChainResolver, CLOSURE_WARNING_MM
 
 # =====================================================================
 # ### NYTT: Enkel, FreeCAD-fri 3D-vektor-klass för intern matematik ###
@@ -41,16 +45,106 @@ class Vec3:
         return self.x * other.x + self.y * other.y + self.z * other.z
 # =====================================================================
 
+# Under så här många segment byggs separata system i samma process även när
+# anroparen bett om max_workers > 1; en processpool kostar mer än den sparar.
+PARALLEL_MIN_SEGMENTS = 400
+# Hur ofta (s) cancel_token kontrolleras medan arbetsprocesserna bygger.
+CANCEL_POLL_S = 0.1
+
+
+def _renumber(nodes: List[NodeInfo], topology: nx.Graph, start: int = 0) -> nx.Graph:
+    """
+    Numrerar om noderna tätt (start, start+1, ...) i nodlistans ordning, så
+    att ID:t är nodens index i NodeStore. Returnerar den omdöpta grafen.
+    """
+    mapping = {node.id: start + i for i, node in enumerate(nodes)}
+    for node in nodes:
+        node.id = mapping[node.id]
+        if isinstance(node, TeeNodeInfo):
+            node.run_node_ids = tuple(mapping[n] for n in node.run_node_ids)
+            if node.branch_node_id is not None:
+                node.branch_node_id = mapping[node.branch_node_id]
+    return nx.relabel_nodes(topology, mapping)
+
+
+def _build_component(segments: List[Dict[str, Any]], catalog: CatalogLoader, collapse_collinear: bool,
+                     cancel_token: Optional[CancellationToken] = None):
+    """Bygger ett sammanhängande system från origo."""
+    builder = TopologyBuilder({"segments": segments}, catalog, collapse_collinear, cancel_token=cancel_token)
+    nodes, topology = builder.build()
+    return nodes, topology, builder.point_2d_to_3d, builder.anchor_2d
+
+
+def _build_component_chunk(chunk: List[List[Dict[str, Any]]], catalog: CatalogLoader, collapse_collinear: bool):
+    """Körs i en arbetsprocess: bygger en bunt system, så katalogen skickas en gång per bunt."""
+    return [_build_component(segments, catalog, collapse_collinear) for segments in chunk]
+
+
+def _chunk_components(components: List[List[Dict[str, Any]]], chunk_count: int) -> List[List[int]]:
+    """
+    Fördelar systemen (index) på chunk_count buntar med ungefär lika många
+    segment: störst först, till den minst belastade bunten. Tomma buntar tas bort.
+    """
+    chunks: List[List[int]] = [[] for _ in range(max(1, chunk_count))]
+    loads = [0] * len(chunks)
+    for index in sorted(range(len(components)), key=lambda i: -len(components[i])):
+        target = loads.index(min(loads))
+        chunks[target].append(index)
+        loads[target] += len(components[index])
+    return [sorted(chunk) for chunk in chunks if chunk]
+
 
 class TopologyBuilder:
     """
     Bygger en intelligent, berikad 3D-topologi från ren skissdata.
     """
-    def __init__(self, parsed_sketch: Dict[str, Any], catalog: CatalogLoader):
+    # Höjs när utdata ändras, så stegets checkpoints ogiltigförklaras.
+    CHECKPOINT_VERSION = "2"
+    # |cos| över denna gräns räknas som rakt igenom (0°-skarv).
+    COLLINEAR_COS = 1.0 - 1e-9
+    # Måttlösa konstruktionslinjer inom så här många grader från en iso-vinkel
+    # räknas som ritade längs axeln (riktningsvillkor i konstruktionskedjor).
+    ISO_CONSTRUCTION_TOLERANCE_DEG = 2.0
+    # 2D-isometriska vinklar och deras 3D-riktningar.
+    ISO_DIRECTIONS = {
+        30.0:  (1.0, 0.0, 0.0),    # +X
+        90.0:  (0.0, 0.0, -1.0),   # -Z
+        150.0: (0.0, -1.0, 0.0),   # -Y
+        210.0: (-1.0, 0.0, 0.0),   # -X
+        270.0: (0.0, 0.0, 1.0),    # +Z
+        330.0: (0.0, 1.0, 0.0)     # +Y
+    }
+
+    def __init__(
+        self,
+        parsed_sketch: Dict[str, Any],
+        catalog: CatalogLoader,
+        collapse_collinear: bool = True,
+        max_workers: Optional[int] = None,
+        executor: Optional[Executor] = None,
+        cancel_token: Optional[CancellationToken] = None,
+    ):
         self.parsed_sketch = parsed_sketch
         self.catalog = catalog
+        self.collapse_collinear = collapse_collinear
+        # Separata system byggs i arbetsprocesser bara på begäran: med en
+        # executor (t.ex. daemonens långlivade pool) eller max_workers > 1.
+        # Standard är i processen, så t.ex. FreeCAD-makrot aldrig startar en pool.
+        self.max_workers = max_workers
+        self.executor = executor
+        # Kontrolleras mellan stegen, per system, per nod och i slingjusteringen.
+        # Arbetsprocesserna får ingen token; deras buntar avbeställs istället.
+        self.cancel_token = cancel_token or CancellationToken()
+        # 2D-punkten som hamnar i origo, och varje systems origo i 3D.
+        self.anchor_2d: Optional[Tuple[Decimal, Decimal]] = None
+        self.component_origins: List[Tuple[float, float, float]] = []
         self.topology = nx.Graph()
         self.nodes: List[NodeInfo] = []
+        # Nodposterna under bygget, indexerade med nodens heltals-ID (grafens
+        # nod-nyckel). Grafen själv bär inga nodobjekt.
+        self._records: List[NodeInfo] = []
+        # Skiss-segmentens ändar ("line_1.end") som möts i varje nod; blir nodens label.
+        self._segment_ends: Dict[int, List[str]] = {}
         # Denna är för testet
         self.coord_map_2d_to_node_id: Dict[Tuple[Decimal, Decimal], str] = {}
         # Denna används för att bygga 3D-geometrin
@@ -61,8 +155,13 @@ class TopologyBuilder:
         """Huvudmetod som kör hela byggprocessen."""
         print("--- Modul 2 (Topology Builder): Startar ---")
 
+        components = self._split_components()
+        if len(components) > 1:
+            return self._build_components(components)
+
         three_d_segments = self._translate_2d_to_3d()
         print(f"  -> Steg 1: {len(three_d_segments)} 3D-segment skapade.")
+        self.cancel_token.check('topology')
 
         self._build_graph(three_d_segments)
         print(f"  -> Steg 2: Graf skapad med {self.topology.number_of_nodes()} noder och {self.topology.number_of_edges()} kanter.")
@@ -70,7 +169,11 @@ class TopologyBuilder:
         # LÄGG TILL DETTA ANROP INNAN _enrich_nodes
         self._cleanup_graph()
 
+        if self.collapse_collinear:
+            self._collapse_collinear_nodes()
+
         self._enrich_nodes()
+        self.topology = _renumber(self.nodes, self.topology)
         print(f"  -> Steg 3 & 4: Noder klassificerade och berikade.")
         
         print("--- Topology Builder: Klar ---")
@@ -83,25 +186,21 @@ class TopologyBuilder:
         Omvandlar en 2D-isometrisk vinkel till en normaliserad 3D-riktningsvektor.
         """
         angle_deg = angle_deg % 360
-        standard_directions = {
-            30.0:  Vec3(1.0, 0.0, 0.0),    # +X
-            90.0:  Vec3(0.0, 0.0, -1.0),   # -Z
-            150.0: Vec3(0.0, -1.0, 0.0),   # -Y
-            210.0: Vec3(-1.0, 0.0, 0.0),   # -X
-            270.0: Vec3(0.0, 0.0, 1.0),    # +Z
-            330.0: Vec3(0.0, 1.0, 0.0)     # +Y
-        }
-
-
-        def angle_distance(a1, a2):
-            phi = abs(a2 - a1) % 360
-            return min(phi, 360 - phi)
-        closest_angle = min(standard_directions.keys(), key=lambda std_angle: angle_distance(std_angle, angle_deg))
-        snapped_direction = standard_directions[closest_angle]
+        closest_angle = min(self.ISO_DIRECTIONS.keys(), key=lambda std_angle: self._angle_distance(std_angle, angle_deg))
+        snapped_direction = Vec3(*self.ISO_DIRECTIONS[closest_angle])
         if not math.isclose(closest_angle, angle_deg, abs_tol=1.0):
             print(f"    -> INFO: Vinkel {angle_deg:.1f}° tolkad som närmsta standardvinkel {closest_angle}°.")
         return snapped_direction
 
+    @staticmethod
+    def _angle_distance(a1: float, a2: float) -> float:
+        phi = abs(a2 - a1) % 360
+        return min(phi, 360 - phi)
+
+    def _iso_deviation(self, angle_deg: float) -> float:
+        """Antal grader till närmsta iso-vinkel."""
+        return min(self._angle_distance(std_angle, angle_deg % 360) for std_angle in self.ISO_DIRECTIONS)
+
     def _create_preliminary_2d_graph(self, segments: List[Dict[str, Any]]) -> nx.Graph:
         """
         Skapar en enkel graf baserad på 2D-koordinater för att förstå
@@ -123,97 +222,188 @@ class TopologyBuilder:
             g.add_edge(start_key, end_key, data=segment)
         return g
    
+    def _split_components(self) -> List[List[Dict[str, Any]]]:
+        """Delar skissens segment i fysiskt separata system (sammanhängande 2D-delar), i ritordning."""
+        segments = self.parsed_sketch.get("segments", [])
+        g = nx.Graph()
+        for segment in segments:
+            g.add_edge(self._point_key(segment["start_point"]), self._point_key(segment["end_point"]))
+        component_of = {}
+        for index, keys in enumerate(nx.connected_components(g)):
+            for key in keys:
+                component_of[key] = index
+        grouped: Dict[int, List[Dict[str, Any]]] = {}
+        for segment in segments:
+            grouped.setdefault(component_of[self._point_key(segment["start_point"])], []).append(segment)
+        return list(grouped.values())
+
+    def _build_components(self, components: List[List[Dict[str, Any]]]) -> Tuple[List[NodeInfo], nx.Graph]:
+        """
+        Bygger varje system för sig (i arbetsprocesser om anroparen bett om
+        det, se __init__) och slår ihop resultaten till en topologi. Varje
+        system byggs från origo och flyttas sedan till sitt eget origo: dess
+        startpunkt lyft från 2D-skissen till planet z=0, relativt det första
+        systemets startpunkt.
+        """
+        segment_count = sum(len(c) for c in components)
+        parallel = self.executor is not None or (
+            (self.max_workers or 1) > 1 and segment_count >= PARALLEL_MIN_SEGMENTS)
+        print(f"  -> {len(components)} separata system, byggs {'parallellt' if parallel else 'i tur och ordning'}.")
+
+        if not parallel:
+            results = []
+            for segments in components:
+                self.cancel_token.check('topology')
+                results.append(_build_component(segments, self.catalog, self.collapse_collinear, self.cancel_token))
+        else:
+            results = self._build_components_in_pool(components)
+
+        reference = None
+        for nodes, topology, point_map, anchor_2d in results:
+            if anchor_2d is None:
+                continue
+            lifted = self._lift_2d(anchor_2d)
+            if reference is None:
+                reference, self.anchor_2d = lifted, anchor_2d
+            offset = lifted - reference
+            origin = (round(offset.x, 6), round(offset.y, 6), round(offset.z, 6))
+            component_index = len(self.component_origins)
+            self.component_origins.append(origin)
+            for node in nodes:
+                node.coords = tuple(round(c + o, 6) for c, o in zip(node.coords, origin))
+            topology = _renumber(nodes, topology, start=len(self.nodes))
+            for node_id in topology.nodes:
+                topology.nodes[node_id]['component'] = component_index
+            for key, point in point_map.items():
+                self.point_2d_to_3d[key] = point + offset
+            self.topology.update(topology)
+            self.nodes.extend(nodes)
+
+        print(f"--- Topology Builder: Klar ({len(self.component_origins)} system, {self.topology.number_of_nodes()} noder) ---")
+        return self.nodes, self.topology
+
+    def _build_components_in_pool(self, components: List[List[Dict[str, Any]]]) -> list:
+        """En uppgift per arbetare (inte per system): systemen buntas och katalogen picklas en gång per bunt."""
+        workers = self.max_workers or os.cpu_count() or 1
+        chunks = _chunk_components(components, min(workers, len(components)))
+        if self.executor is not None:
+            chunk_results = self._run_chunks(self.executor, components, chunks)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunk_results = self._run_chunks(executor, components, chunks)
+
+        results = [None] * len(components)
+        for chunk, chunk_result in zip(chunks, chunk_results):
+            for index, result in zip(chunk, chunk_result):
+                results[index] = result
+        return results
+
+    def _run_chunks(self, executor: Executor, components: List[List[Dict[str, Any]]], chunks: List[List[int]]) -> list:
+        """Kör buntarna i executor och väntar in dem; vid avbrott avbeställs de som inte startat."""
+        futures = [executor.submit(_build_component_chunk, [components[i] for i in chunk], self.catalog, self.collapse_collinear)
+                   for chunk in chunks]
+        try:
+            pending = set(futures)
+            while pending:
+                self.cancel_token.check('topology')
+                _, pending = wait(pending, timeout=CANCEL_POLL_S, return_when=FIRST_COMPLETED)
+        finally:
+            for future in futures:
+                future.cancel()
+        return [future.result() for future in futures]
+
+    @staticmethod
+    def _lift_2d(key: Tuple[Decimal, Decimal]) -> Vec3:
+        """Den 3D-punkt i planet z=0 som projiceras på 2D-punkten (inversen av isometrin)."""
+        u = float(key[0]) / math.cos(math.radians(30))   # x + y
+        w = 2.0 * float(key[1])                           # x - y
+        return Vec3((u + w) / 2.0, (u - w) / 2.0, 0.0)
+
+    @staticmethod
+    def _point_key(point: Any) -> Tuple[Decimal, Decimal]:
+        """2D-nyckel för en skisspunkt (dict eller tuple)."""
+        x = point['x'] if isinstance(point, dict) else point[0]
+        y = point['y'] if isinstance(point, dict) else point[1]
+        return (Decimal(str(x)), Decimal(str(y)))
+
+    def _segment_constraint(self, segment: Dict[str, Any]) -> Optional[ChainConstraint]:
+        """
+        Villkoret ett segment ger: måttsatta segment en känd förskjutning längs
+        sin (snäppta) iso-riktning, måttlösa konstruktionslinjer ritade längs en
+        iso-axel bara riktningen. Måttlösa rör är speciallinjerna som ska lösas
+        fram och ger inget villkor.
+        """
+        start_key, end_key = self._point_key(segment["start_point"]), self._point_key(segment["end_point"])
+        if start_key == end_key:
+            return None
+        angle_deg = math.degrees(math.atan2(float(end_key[1] - start_key[1]), float(end_key[0] - start_key[0])))
+        length = segment.get("length_dimension")
+        if length is None:
+            if not segment.get("is_construction") or self._iso_deviation(angle_deg) > self.ISO_CONSTRUCTION_TOLERANCE_DEG:
+                return None
+        direction = self._get_3d_direction_from_angle(angle_deg)
+        return ChainConstraint(start_key, end_key, (direction.x, direction.y, direction.z), length)
+
     def _translate_2d_to_3d(self) -> List[Dict[str, Any]]:
         """
-        Översätter 2D-skissen till 3D-segment genom att traversera en 2D-graf,
-        vilket gör processen oberoende av rit-ordningen.
+        Översätter 2D-skissen till 3D-segment. Alla punkters 3D-positioner löses
+        på en gång av ConstructionChainResolver (mått, konstruktionskedjor och
+        slutna slingor tillsammans), vilket gör processen oberoende av
+        rit-ordningen.
         """
         all_segments = self.parsed_sketch.get("segments", [])
         dimensioned_segments = [s for s in all_segments if s.get("length_dimension") is not None]
-        shortcut_segments = [s for s in all_segments if s.get("length_dimension") is None]
 
         # --- STEG 1: Förstå den sanna topologin ---
         preliminary_graph = self._create_preliminary_2d_graph(dimensioned_segments)
         if not preliminary_graph.nodes:
             return []
-
-        # --- STEG 2: Traversera grafen för att bygga 3D-koordinater ---
-        three_d_segments = []
         # Hitta en startpunkt (helst en ändpunkt med grad 1)
         start_node_2d = next((n for n, d in preliminary_graph.degree() if d == 1), list(preliminary_graph.nodes)[0])
-        
-        # Använd en kö för Breadth-First Search (BFS) traversering
-        queue = [(start_node_2d, None)] # (nod, förälder)
-        visited = {start_node_2d}
-        self.point_2d_to_3d[start_node_2d] = Vec3(0.0, 0.0, 0.0)
-
-        while queue:
-            current_node_2d, parent_node_2d = queue.pop(0)
-            
-            for neighbor_node_2d in preliminary_graph.neighbors(current_node_2d):
-                if neighbor_node_2d not in visited:
-                    visited.add(neighbor_node_2d)
-                    
-                    # Hämta segmentdata från kanten
-                    segment_data = preliminary_graph.get_edge_data(current_node_2d, neighbor_node_2d)['data']
-                    length = segment_data["length_dimension"]
-                    
-                    # Bestäm riktning baserat på vilken väg vi traverserar
-                    start_x = current_node_2d[0]
-                    start_y = current_node_2d[1]
-                    end_x = neighbor_node_2d[0]
-                    end_y = neighbor_node_2d[1]
-
-                    dx = float(end_x - start_x)
-                    dy = float(end_y - start_y)
-                    angle_rad = math.atan2(dy, dx)
-                    angle_deg = math.degrees(angle_rad)
-                    direction = self._get_3d_direction_from_angle(angle_deg)
-                    
-                    # Beräkna 3D-position baserat på föräldern
-                    start_3d = self.point_2d_to_3d[current_node_2d]
-                    end_3d = start_3d + (direction * length)
-                    self.point_2d_to_3d[neighbor_node_2d] = end_3d
-
-                    three_d_segments.append({
-                        **segment_data,
-                        "start_point_3d": (round(start_3d.x, 6), round(start_3d.y, 6), round(start_3d.z, 6)),
-                        "end_point_3d": (round(end_3d.x, 6), round(end_3d.y, 6), round(end_3d.z, 6))
-                    })
-                    
-                    queue.append((neighbor_node_2d, current_node_2d))
+        self.anchor_2d = start_node_2d
+        self.component_origins = [(0.0, 0.0, 0.0)]
+
+        # --- STEG 2: Lös alla 3D-positioner tillsammans ---
+        constraints = [c for c in (self._segment_constraint(s) for s in all_segments) if c is not None]
+        resolver = ConstructionChainResolver(self.cancel_token)
+        positions = resolver.resolve(constraints, anchor=start_node_2d)
+        self.point_2d_to_3d = {key: Vec3(*coords) for key, coords in positions.items()}
+        if resolver.max_closure_error > CLOSURE_WARNING_MM:
+            print(f"    -> VARNING: Måttkedjorna stänger inte, största justering {resolver.max_closure_error:.2f} mm.")
+
+        # --- STEG 3: Skapa 3D-segment ---
+        # Måttsatta segment i BFS-ordning från startpunkten (som tidigare), därefter resten.
+        ordered = []
+        for current_node_2d, neighbor_node_2d in nx.bfs_edges(preliminary_graph, start_node_2d):
+            ordered.append((preliminary_graph.edges[current_node_2d, neighbor_node_2d]['data'], current_node_2d, neighbor_node_2d))
+        emitted = {id(segment) for segment, _, _ in ordered}
+        for segment in all_segments:
+            if id(segment) not in emitted:
+                ordered.append((segment, self._point_key(segment["start_point"]), self._point_key(segment["end_point"])))
 
-        # --- STEG 3: Hantera genvägar (som tidigare) ---
-        for segment in shortcut_segments:
-            # (Denna logik är oförändrad och bör fungera nu)
-            start_2d = segment["start_point"]
-            end_2d = segment["end_point"]
-            start_x = start_2d['x'] if isinstance(start_2d, dict) else start_2d[0]
-            start_y = start_2d['y'] if isinstance(start_2d, dict) else start_2d[1]
-            end_x = end_2d['x'] if isinstance(end_2d, dict) else end_2d[0]
-            end_y = end_2d['y'] if isinstance(end_2d, dict) else end_2d[1]
-            start_key = (Decimal(str(start_x)), Decimal(str(start_y)))
-            end_key = (Decimal(str(end_x)), Decimal(str(end_y)))
-
-            if start_key in self.point_2d_to_3d and end_key in self.point_2d_to_3d:
-                start_3d = self.point_2d_to_3d[start_key]
-                end_3d = self.point_2d_to_3d[end_key]
-
-                # --- START PÅ NY LOGIK ---
-                # Beräkna den faktiska geometriska längden på genvägen.
-                actual_length = (end_3d - start_3d).get_length()
-                
-                # Skapa en kopia av segmentdatan för att säkert kunna uppdatera den.
+        three_d_segments = []
+        unresolved_ids = []
+        for segment, start_key, end_key in ordered:
+            if start_key not in self.point_2d_to_3d or end_key not in self.point_2d_to_3d:
+                unresolved_ids.append(segment["id"])
+                continue
+            start_3d = self.point_2d_to_3d[start_key]
+            end_3d = self.point_2d_to_3d[end_key]
+
+            updated_segment_data = segment
+            if segment.get("length_dimension") is None:
+                # Måttlös linje (genväg eller konstruktionskedja): längden blir den lösta.
                 updated_segment_data = segment.copy()
-                updated_segment_data['length_dimension'] = actual_length
-                # --- SLUT PÅ NY LOGIK ---
+                updated_segment_data['length_dimension'] = (end_3d - start_3d).get_length()
 
-                three_d_segments.append({
-                    **updated_segment_data, # Använd den uppdaterade datan
-                    "start_point_3d": (round(start_3d.x, 6), round(start_3d.y, 6), round(start_3d.z, 6)),
-                    "end_point_3d": (round(end_3d.x, 6), round(end_3d.y, 6), round(end_3d.z, 6))
-                })
+            three_d_segments.append({
+                **updated_segment_data,
+                "start_point_3d": (round(start_3d.x, 6), round(start_3d.y, 6), round(start_3d.z, 6)),
+                "end_point_3d": (round(end_3d.x, 6), round(end_3d.y, 6), round(end_3d.z, 6))
+            })
 
+        if unresolved_ids:
+            print(f"    -> VARNING: {len(unresolved_ids)} segment kunde inte placeras i 3D: {', '.join(map(str, unresolved_ids))}")
         return three_d_segments
 
     def _build_graph(self, three_d_segments: List[Dict[str, Any]]):
@@ -221,7 +411,7 @@ class TopologyBuilder:
         Bygger en networkx-graf från listan av 3D-segment.
         """
         # Vi behöver en mappning från 3D-koordinat -> nod-ID
-        coord_3d_to_node_id: Dict[Tuple[float, float, float], str] = {}
+        coord_3d_to_node_id: Dict[Tuple[float, float, float], int] = {}
 
         for segment in three_d_segments:
             # --- NY DEBUG-LOGG ---
@@ -234,12 +424,21 @@ class TopologyBuilder:
 
             for coord in [start_coord, end_coord]:
                 if coord not in coord_3d_to_node_id:
-                    node = NodeInfo(coords=coord)
+                    node = NodeInfo(coords=coord, id=len(self._records))
+                    self._records.append(node)
                     coord_3d_to_node_id[coord] = node.id
-                    self.topology.add_node(node.id, data=node)
+                    self.topology.add_node(node.id, component=0)
 
             start_node_id = coord_3d_to_node_id[start_coord]
             end_node_id = coord_3d_to_node_id[end_coord]
+            if not segment.get("is_construction", False):
+                # 3D-segmenten följer BFS-ordningen; skissens egen start kan vara 3D-slutet.
+                own_start = self.point_2d_to_3d.get(self._point_key(segment["start_point"]))
+                flipped = own_start is not None and (
+                    (own_start - Vec3(*end_coord)).get_length() < (own_start - Vec3(*start_coord)).get_length())
+                ends = ("end", "start") if flipped else ("start", "end")
+                self._segment_ends.setdefault(start_node_id, []).append(f"{segment['id']}.{ends[0]}")
+                self._segment_ends.setdefault(end_node_id, []).append(f"{segment['id']}.{ends[1]}")
             
             # Använd rätt nyckel, "pipe_spec", från Protobuf-objektet
             spec_from_sketch = segment.get("pipe_spec", "") 
@@ -248,6 +447,7 @@ class TopologyBuilder:
             self.topology.add_edge(
                 start_node_id, end_node_id,
                 segment_id=segment["id"],
+                segment_ids=[segment["id"]],
                 pipe_spec=cleaned_pipe_spec,
                 is_construction=segment.get("is_construction", False),
                 length=segment.get("length_dimension")
@@ -258,31 +458,33 @@ class TopologyBuilder:
         Itererar igenom den färdiga grafen för att klassificera och berika
         varje nod med detaljerad information.
         """
-        enriched_nodes_map: Dict[str, NodeInfo] = {}
+        records = self._records
+        enriched_nodes: List[NodeInfo] = []
 
-        for node_id, node_data in self.topology.nodes(data=True):
-            base_node = node_data['data']
+        for node_id in self.topology.nodes:
+            self.cancel_token.check('topology')
+            base_node = records[node_id]
             degree = self.topology.degree(node_id)
             
             new_node = None
             if degree == 1:
                 new_node = EndpointNodeInfo(coords=base_node.coords, id=base_node.id)
                 neighbor_id = list(self.topology.neighbors(node_id))[0]
-                neighbor_node_data = self.topology.nodes[neighbor_id]['data']
+                neighbor_node_data = records[neighbor_id]
                 direction = Vec3(*neighbor_node_data.coords) - Vec3(*new_node.coords)
                 new_node.direction = (direction.normalize().x, direction.normalize().y, direction.normalize().z)
 
             elif degree == 2:
                 new_node = BendNodeInfo(coords=base_node.coords, id=base_node.id)
                 neighbors = list(self.topology.neighbors(node_id))
-                p1_coords = self.topology.nodes[neighbors[0]]['data'].coords
-                p2_coords = self.topology.nodes[neighbors[1]]['data'].coords
+                p1_coords = records[neighbors[0]].coords
+                p2_coords = records[neighbors[1]].coords
                 p_center = new_node.coords
                 
                 vec1 = (Vec3(*p1_coords) - Vec3(*p_center)).normalize()
                 vec2 = (Vec3(*p2_coords) - Vec3(*p_center)).normalize()
                 
-                new_node.vectors = [(vec1.x, vec1.y, vec1.z), (vec2.x, vec2.y, vec2.z)]
+                new_node.vectors = ((vec1.x, vec1.y, vec1.z), (vec2.x, vec2.y, vec2.z))
                 
                 dot_product = max(-1.0, min(1.0, vec1.dot(vec2)))
                 new_node.angle = math.degrees(math.pi - math.acos(dot_product))
@@ -290,7 +492,7 @@ class TopologyBuilder:
             elif degree >= 3:
                 new_node = TeeNodeInfo(coords=base_node.coords, id=base_node.id)
                 neighbors = list(self.topology.neighbors(node_id))
-                neighbor_vectors = [(Vec3(*self.topology.nodes[n_id]['data'].coords) - Vec3(*new_node.coords)).normalize() for n_id in neighbors]
+                neighbor_vectors = [(Vec3(*records[n_id].coords) - Vec3(*new_node.coords)).normalize() for n_id in neighbors]
                 
                 # Hitta de två mest motstående vektorerna (närmast 180 grader)
                 best_dot = 1.0
@@ -307,10 +509,12 @@ class TopologyBuilder:
                     all_indices = set(range(len(neighbors)))
                     branch_index = list(all_indices - set(run_indices))[0]
                     
-                    new_node.run_node_ids = [neighbors[run_indices[0]], neighbors[run_indices[1]]]
+                    new_node.run_node_ids = (neighbors[run_indices[0]], neighbors[run_indices[1]])
                     new_node.branch_node_id = neighbors[branch_index]
             
             if new_node:
+                # Stabilt namn oberoende av nod-ID:t (som är ett positionsindex).
+                new_node.label = "+".join(sorted(self._segment_ends.get(node_id, []))) or None
                 pipe_specs = {data['pipe_spec'] for _, _, data in self.topology.edges(node_id, data=True)}
                 if len(pipe_specs) > 1: new_node.requires_reducer = True
                 
@@ -320,10 +524,10 @@ class TopologyBuilder:
                     first_pipe_spec = list(pipe_specs)[0]
                     new_node.assigned_spec = self.catalog.get_spec(first_pipe_spec)
 
-                enriched_nodes_map[node_id] = new_node
-                self.topology.nodes[node_id]['data'] = new_node
+                enriched_nodes.append(new_node)
+                records[node_id] = new_node
 
-        self.nodes = list(enriched_nodes_map.values())
+        self.nodes = enriched_nodes
 
     def _cleanup_graph(self):
         """Tar bort konstruktionslinjer och isolerade noder från grafen."""
@@ -340,4 +544,53 @@ class TopologyBuilder:
             node_id for node_id, degree in self.topology.degree() if degree == 0
         ]
         self.topology.remove_nodes_from(isolated_nodes)
-        print(f"  -> Rensning: {len(isolated_nodes)} isolerade noder borttagna.")
\ No newline at end of file
+        print(f"  -> Rensning: {len(isolated_nodes)} isolerade noder borttagna.")
+
+    def _collapse_collinear_nodes(self):
+        """
+        Slår ihop raka skarvar: en nod med grad 2 där båda kanterna har samma
+        spec och går rakt igenom (t.ex. där ett mått bytts eller linjen ritats
+        om) försvinner, och de två kanterna blir en. Den nya kanten får summan
+        av längderna och behåller skissens segment-ID:n i ordning längs röret
+        i 'segment_ids'. Specbyten lämnas kvar så att konor fortfarande placeras.
+        """
+        # Ordningen i segment_ids gäller från denna nod; bara relevant under passet.
+        run_start: Dict[FrozenSet[Hashable], Hashable] = {}
+
+        def oriented_ids(a: Hashable, b: Hashable) -> List[Any]:
+            ids = list(self.topology.edges[a, b].get('segment_ids') or [self.topology.edges[a, b]['segment_id']])
+            start = run_start.get(frozenset((a, b)), a)
+            return ids if start == a else ids[::-1]
+
+        collapsed = 0
+        for node_id in list(self.topology.nodes):
+            if self.topology.degree(node_id) != 2:
+                continue
+            a, b = list(self.topology.neighbors(node_id))
+            if a == b or self.topology.has_edge(a, b):
+                continue
+            edge_a, edge_b = self.topology.edges[a, node_id], self.topology.edges[node_id, b]
+            if edge_a['pipe_spec'] != edge_b['pipe_spec']:
+                continue
+
+            center = Vec3(*self._records[node_id].coords)
+            vec_a = (Vec3(*self._records[a].coords) - center).normalize()
+            vec_b = (Vec3(*self._records[b].coords) - center).normalize()
+            if vec_a.dot(vec_b) > -self.COLLINEAR_COS:
+                continue
+
+            length_a, length_b = edge_a.get('length'), edge_b.get('length')
+            segment_ids = oriented_ids(a, node_id) + oriented_ids(node_id, b)
+            self.topology.remove_node(node_id)
+            self.topology.add_edge(
+                a, b,
+                segment_id=segment_ids[0],
+                segment_ids=segment_ids,
+                pipe_spec=edge_a['pipe_spec'],
+                is_construction=False,
+                length=None if length_a is None or length_b is None else length_a + length_b
+            )
+            run_start[frozenset((a, b))] = a
+            collapsed += 1
+
+        print(f"  -> Förenkling: {collapsed} raka skarvar sammanslagna.")
@@ -0,0 +1,165 @@
+# pipeline/topology_builder/chain_resolver.py
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from pipeline.shared.cancellation import CancellationToken
+
+# Avvikelse (mm) i en sluten måttkedja som är värd en varning.
+CLOSURE_WARNING_MM = 0.5
+# Konvergenskrav för slingjusteringen (relativt högerledets norm).
+CG_RELATIVE_TOLERANCE = 1e-12
+
+
+@dataclass
+class ChainConstraint:
+    """
+    Ett villkor mellan två skisspunkter: end - start = length * direction.
+    direction är alltid en iso-axel (±X, ±Y, ±Z). length=None betyder att
+    bara riktningen är känd (en måttlös konstruktionslinje).
+    """
+    start: Hashable
+    end: Hashable
+    direction: Tuple[float, float, float]
+    length: Optional[float] = None
+
+
+class ConstructionChainResolver:
+    """
+    Löser alla okända 3D-positioner i skissen på en gång, istället för att
+    gå igenom genvägar och konstruktionskedjor en i taget.
+
+    Eftersom alla villkor ligger längs iso-axlarna delar sig problemet i tre
+    oberoende axlar. Per axel ger ett måttsatt villkor en känd förskjutning
+    (length * direction[axel]), och ett måttlöst villkor en förskjutning 0 på
+    de två axlar det inte går längs. Varje axel blir då ett minsta-kvadrat-
+    problem på en graf: positionerna följer ett uppspännande träd från
+    ankaret, och om slutna slingor inte går ihop löses normalekvationerna
+    (grafens Laplace-matris) med en gles konjugerad gradient, så att en
+    måttkedja som inte går ihop fördelas jämnt istället för att "först vinner".
+
+    Punkter som inte nås från ankaret på alla tre axlar är obestämda och
+    returneras inte; de finns i self.unresolved efter resolve().
+    cancel_token kontrolleras per axel och per CG-iteration.
+    """
+    def __init__(self, cancel_token: Optional[CancellationToken] = None):
+        self.cancel_token = cancel_token or CancellationToken()
+        self.unresolved: Set[Hashable] = set()
+        self.max_closure_error = 0.0
+
+    def resolve(self, constraints: List[ChainConstraint], anchor: Hashable) -> Dict[Hashable, Tuple[float, float, float]]:
+        keys = list(dict.fromkeys([anchor] + [k for c in constraints for k in (c.start, c.end)]))
+        index = {key: i for i, key in enumerate(keys)}
+        count = len(keys)
+
+        starts = np.array([index[c.start] for c in constraints], dtype=np.int64)
+        ends = np.array([index[c.end] for c in constraints], dtype=np.int64)
+        directions = np.array([c.direction for c in constraints], dtype=float).reshape(-1, 3)
+        lengths = np.array([np.nan if c.length is None else c.length for c in constraints], dtype=float)
+        known_length = ~np.isnan(lengths)
+
+        positions = np.zeros((count, 3))
+        determined = np.ones(count, dtype=bool)
+        self.max_closure_error = 0.0
+        for axis in range(3):
+            self.cancel_token.check('topology')
+            along_axis = np.abs(directions[:, axis]) > 0.5
+            # Måttlösa villkor längs axeln säger ingenting om den här koordinaten.
+            active = known_length | ~along_axis
+            offsets = np.where(known_length, np.nan_to_num(lengths) * directions[:, axis], 0.0)
+            values, reached, closure = self._solve_axis(starts[active], ends[active], offsets[active], count, index[anchor])
+            positions[:, axis] = values
+            determined &= reached
+            self.max_closure_error = max(self.max_closure_error, closure)
+
+        self.unresolved = {keys[i] for i in np.nonzero(~determined)[0].tolist()}
+        return {keys[i]: tuple(positions[i].tolist()) for i in np.nonzero(determined)[0].tolist()}
+
+    def _solve_axis(self, starts: np.ndarray, ends: np.ndarray, offsets: np.ndarray, count: int, anchor: int):
+        """
+        Minimerar sum((x[end] - x[start] - offset)^2) med x[anchor] = 0.
+        Returnerar (x, nådda punkter, största justering av ett villkor).
+        """
+        edge_count = len(starts)
+        # Grannlistor i CSR-form: varje villkor syns från båda ändarna.
+        heads = np.concatenate([starts, ends])
+        order = np.argsort(heads, kind='stable')
+        neighbors = np.concatenate([ends, starts])[order].tolist()
+        edge_of = np.concatenate([np.arange(edge_count), np.arange(edge_count)])[order].tolist()
+        forward = np.concatenate([np.ones(edge_count, dtype=bool), np.zeros(edge_count, dtype=bool)])[order].tolist()
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(heads, minlength=count))]).tolist()
+
+        # Uppspännande träd (BFS) från ankaret. x[barn] = x[förälder] + sign * offset[kant].
+        parent = [-1] * count
+        parent_edge = [-1] * count
+        parent_sign = [0.0] * count
+        reached = [False] * count
+        tree_edge = [False] * edge_count
+        visit_order = [anchor]
+        reached[anchor] = True
+        queue = deque([anchor])
+        while queue:
+            node = queue.popleft()
+            for k in range(indptr[node], indptr[node + 1]):
+                neighbor = neighbors[k]
+                if reached[neighbor]:
+                    continue
+                reached[neighbor] = True
+                parent[neighbor], parent_edge[neighbor] = node, edge_of[k]
+                parent_sign[neighbor] = 1.0 if forward[k] else -1.0
+                tree_edge[edge_of[k]] = True
+                visit_order.append(neighbor)
+                queue.append(neighbor)
+
+        def propagate(edge_offsets) -> np.ndarray:
+            x = np.zeros(count)
+            for node in visit_order[1:]:
+                x[node] = x[parent[node]] + parent_sign[node] * edge_offsets[parent_edge[node]]
+            return x
+
+        x = propagate(offsets)
+        reached = np.array(reached)
+
+        # Villkor utanför trädet som inte går ihop med trädets lösning.
+        in_component = reached[starts]
+        s, t, c = starts[in_component], ends[in_component], offsets[in_component]
+        if not np.any(~np.array(tree_edge)[in_component]) or np.allclose(x[t] - x[s], c):
+            return x, reached, 0.0
+
+        # Normalekvationerna (A^T A) x = A^T c, där A är villkorens incidens-
+        # matris (+1 i end, -1 i start), med x[anchor] = 0. A^T A är grafens
+        # Laplace-matris: gles, symmetrisk och positivt definit på ankarets del.
+        # Den byggs aldrig; A och A^T tillämpas kant för kant (bincount), så
+        # varje CG-iteration är linjär i antalet villkor. Trädlösningen är
+        # startgissning och Jacobi (graden) förkonditionering.
+        free = reached.copy()
+        free[anchor] = False
+        degree = np.bincount(s, minlength=count) + np.bincount(t, minlength=count)
+        inverse_degree = np.where(free, 1.0 / np.maximum(degree, 1), 0.0)
+
+        def transpose(edge_values: np.ndarray) -> np.ndarray:
+            return np.bincount(t, edge_values, count) - np.bincount(s, edge_values, count)
+
+        r = transpose(c - (x[t] - x[s])) * free
+        z = r * inverse_degree
+        p = z.copy()
+        rz = r @ z
+        tolerance = CG_RELATIVE_TOLERANCE * max(1.0, float(np.linalg.norm(transpose(c))))
+        for _ in range(2 * int(free.sum()) + 10):
+            if np.sqrt(r @ r) <= tolerance:
+                break
+            self.cancel_token.check('topology')
+            q = transpose(p[t] - p[s]) * free
+            alpha = rz / (p @ q)
+            x += alpha * p
+            r -= alpha * q
+            z = r * inverse_degree
+            rz, rz_previous = r @ z, rz
+            p = z + (rz / rz_previous) * p
+
+        # Korrektionen per villkor är minsta-kvadrat-residualen.
+        corrections = (x[t] - x[s]) - c
+        return x, reached, float(np.abs(corrections).max())
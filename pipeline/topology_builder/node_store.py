@@ -0,0 +1,55 @@
+# pipeline/topology_builder/node_store.py
+
+from collections.abc import Mapping
+from typing import Hashable, Iterable, Iterator, List
+
+import numpy as np
+
+from .node_types_v2 import NodeInfo
+
+
+class NodeStore(Mapping):
+    """
+    Kompakt nodregister som ersätter {node.id: node}-ordböcker i Planner,
+    CenterlineBuilder och PlanAdjuster. Posterna ligger i en lista indexerad
+    med nodernas täta heltals-ID (som TopologyBuilder delar ut), och alla
+    koordinater finns dessutom som en (N, 3)-array för vektoriserade steg.
+
+    Noder med andra ID:n (t.ex. handbyggda i tester) fungerar också; då
+    används en ordbok från ID till position istället för direkt indexering.
+    """
+    __slots__ = ('_records', '_position', 'coords')
+
+    def __init__(self, nodes: Iterable[NodeInfo]):
+        self._records: List[NodeInfo] = list(nodes)
+        dense = all(node.id == i for i, node in enumerate(self._records))
+        self._position = None if dense else {node.id: i for i, node in enumerate(self._records)}
+        self.coords = np.array([node.coords for node in self._records], dtype=float).reshape(-1, 3)
+
+    def index_of(self, node_id: Hashable) -> int:
+        """Nodens position i registret (samma som rad i coords)."""
+        if self._position is not None:
+            return self._position[node_id]
+        if type(node_id) is int and 0 <= node_id < len(self._records):
+            return node_id
+        raise KeyError(node_id)
+
+    def __getitem__(self, node_id: Hashable) -> NodeInfo:
+        return self._records[self.index_of(node_id)]
+
+    def __contains__(self, node_id: object) -> bool:
+        try:
+            self.index_of(node_id)
+        except (KeyError, TypeError):
+            return False
+        return True
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return (node.id for node in self._records)
+
+    def coords_of(self, node_ids: Iterable[Hashable]) -> np.ndarray:
+        """Koordinaterna för flera noder på en gång, som en (k, 3)-array."""
+        return self.coords[[self.index_of(node_id) for node_id in node_ids]]
@@ -1,41 +1,50 @@
 # pipeline/2_topology_builder/node_types_v2.py
 
 from dataclasses import dataclass, field
-from typing import Tuple, Optional, List, Any
-import uuid
+from itertools import count
+from typing import Tuple, Optional, Any, Hashable
 
 # Definierar en typ för 3D-vektorer för att göra koden tydligare.
 Vector3D = Tuple[float, float, float]
 
-@dataclass
+# Noder som skapas utanför TopologyBuilder får tillfälliga, negativa ID:n.
+# TopologyBuilder numrerar om sina noder tätt från 0 (se NodeStore).
+_UNASSIGNED_IDS = count(-1, -1)
+
+# slots=True: ingen __dict__ per nod. Noderna är den största allokeringen
+# i stora layouter, så varje post hålls så liten som möjligt.
+@dataclass(slots=True)
 class NodeInfo:
     """Grundläggande datastruktur för en nod i topologin."""
     coords: Vector3D
-    id: str = field(default_factory=lambda: f"node_{uuid.uuid4().hex[:8]}")
+    # Tätt heltalsindex i topologin (och grafens nod-nyckel).
+    id: Hashable = field(default_factory=lambda: next(_UNASSIGNED_IDS))
     node_type: str = "UNKNOWN"
     requires_reducer: bool = False
     # Håller en referens till det "smarta" katalogobjektet för sin spec.
-    assigned_spec: Optional[Any] = None 
+    assigned_spec: Optional[Any] = None
+    # Valfritt externt namn (t.ex. vid export eller felsökning).
+    label: Optional[str] = None
 
-@dataclass
+@dataclass(slots=True)
 class BendNodeInfo(NodeInfo):
     """Specifik data för en böj-nod."""
     node_type: str = "BEND"
     # Vinkeln i grader, beräknad av TopologyBuilder.
     angle: Optional[float] = None
     # De två normaliserade 3D-vektorerna som pekar från grannarna IN TILL denna nod.
-    vectors: List[Vector3D] = field(default_factory=list)
+    vectors: Tuple[Vector3D, ...] = ()
 
-@dataclass
+@dataclass(slots=True)
 class TeeNodeInfo(NodeInfo):
     """Specifik data för en T-korsning."""
     node_type: str = "TEE"
-    # En lista med ID:n för de två noder som utgör huvudloppet ("the run").
-    run_node_ids: List[str] = field(default_factory=list)
+    # ID:n för de två noder som utgör huvudloppet ("the run").
+    run_node_ids: Tuple[Hashable, ...] = ()
     # ID:t för den nod som utgör avsticket ("the branch").
-    branch_node_id: Optional[str] = None
+    branch_node_id: Optional[Hashable] = None
 
-@dataclass
+@dataclass(slots=True)
 class EndpointNodeInfo(NodeInfo):
     """Specifik data för en ändpunkts-nod."""
     node_type: str = "ENDPOINT"
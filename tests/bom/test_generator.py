@@ -0,0 +1,114 @@
+import csv
+import io
+import json
+import pytest
+
+from components_catalog.loader import CatalogLoader
+from pipeline.bom.generator import BOMAggregator, write_cut_list_csv, write_bom_csv, write_bom_json
+from pipeline.component_factory.factory import ComponentFactory
+from pipeline.topology_builder.builder import Vec3
+from pipeline.topology_builder.node_types_v2 import NodeInfo, TeeNodeInfo
+
+# --- Fixtures (Testdata) ---
+
+@pytest.fixture
+def drawing_plans():
+    """En plan med två rör, en böj (tre primitiver) och en expanderande kona."""
+    bend = {'component_id': 'bend_1', 'component_type': 'BEND_90', 'pipe_spec': 'SMS_38'}
+    return [[
+        {'type': 'LINE', 'component_id': 'pipe_1', 'component_type': 'PIPE', 'pipe_spec': 'SMS_38',
+         'start': (0.0, 0.0, 0.0), 'end': (400.0, 0.0, 0.0)},
+        {**bend, 'type': 'LINE', 'start': (400.0, 0.0, 0.0), 'end': (424.0, 0.0, 0.0)},
+        {**bend, 'type': 'ARC', 'start': (424.0, 0.0, 0.0), 'mid': (464.7, 16.7, 0.0), 'end': (481.0, 57.0, 0.0)},
+        {**bend, 'type': 'LINE', 'start': (481.0, 57.0, 0.0), 'end': (481.0, 81.0, 0.0)},
+        {'type': 'LINE', 'component_id': 'pipe_2', 'component_type': 'PIPE', 'pipe_spec': 'SMS_38',
+         'start': (481.0, 81.0, 0.0), 'end': (481.0, 331.5, 0.0)},
+        {'type': 'LINE', 'component_id': 'red_1', 'component_type': 'REDUCER_CONCENTRIC', 'pipe_spec': 'SMS_38',
+         'small_pipe_spec': 'SMS_38', 'to_pipe_spec': 'SMS_51', 'start': (481.0, 331.5, 0.0), 'end': (481.0, 370.5, 0.0)},
+    ]]
+
+# --- Testfall för BOM och kaplista ---
+
+def test_aggregator_counts_fittings_once_and_sums_straights(drawing_plans):
+    """
+    GIVEN: En plan där böjen består av tre primitiver.
+    WHEN:  Planen passerar BOMAggregator.
+    THEN:  Böjen ska räknas en gång, konan som stor->liten och rören summeras per spec.
+    """
+    aggregator = BOMAggregator()
+
+    pieces = list(aggregator.consume(drawing_plans))
+
+    assert [(p.component_id, round(p.length, 1)) for p in pieces] == [('pipe_1', 400.0), ('pipe_2', 250.5)]
+    assert aggregator.fitting_rows() == [('BEND_90', 'SMS_38', 1), ('REDUCER_CONCENTRIC', 'SMS_51->SMS_38', 1)]
+    assert aggregator.straight_rows() == [('SMS_38', 2, pytest.approx(650.5))]
+
+def test_cut_list_streams_as_csv_and_json(drawing_plans):
+    """
+    GIVEN: Samma plan.
+    WHEN:  Kaplistan skrivs som CSV och BOM som JSON.
+    THEN:  CSV ska ha en rad per rakt rör och JSON ska vara giltig med alla delar.
+    """
+    csv_stream, json_stream = io.StringIO(), io.StringIO()
+
+    write_cut_list_csv(drawing_plans, csv_stream)
+    write_bom_json(drawing_plans, json_stream)
+
+    assert csv_stream.getvalue().splitlines() == [
+        "position,component_id,pipe_spec,length_mm", "1,pipe_1,SMS_38,400.0", "2,pipe_2,SMS_38,250.5"]
+    bom = json.loads(json_stream.getvalue())
+    assert [piece['length_mm'] for piece in bom['cut_list']] == [400.0, 250.5]
+    assert bom['straight_totals'] == [{'pipe_spec': 'SMS_38', 'pieces': 2, 'total_length_mm': 650.5}]
+    assert len(bom['fittings']) == 2
+
+def test_fittings_without_component_id_are_counted_separately():
+    """
+    GIVEN: Två T-rör utan component_id.
+    WHEN:  Planen passerar BOMAggregator.
+    THEN:  Båda ska räknas, inte bara det första.
+    """
+    tee = {'type': 'LINE', 'component_type': 'TEE', 'pipe_spec': 'SMS_38', 'start': (0.0, 0.0, 0.0), 'end': (38.0, 0.0, 0.0)}
+    aggregator = BOMAggregator()
+
+    list(aggregator.consume([[dict(tee)], [dict(tee)]]))
+
+    assert aggregator.fitting_rows() == [('TEE', 'SMS_38', 2)]
+
+def test_bom_csv_round_trips(drawing_plans):
+    """
+    GIVEN: BOM-summorna för planen.
+    WHEN:  De skrivs med write_bom_csv och läses tillbaka med csv.DictReader.
+    THEN:  Varje kopplingsdel och rörsumma ska komma tillbaka med samma värden.
+    """
+    aggregator = write_cut_list_csv(drawing_plans, io.StringIO())
+    stream = io.StringIO()
+
+    write_bom_csv(aggregator, stream)
+    rows = list(csv.DictReader(io.StringIO(stream.getvalue())))
+
+    fittings = [(r['component_type'], r['pipe_spec'], int(r['quantity'])) for r in rows if r['item'] == 'FITTING']
+    straights = [(r['pipe_spec'], int(r['quantity']), float(r['total_length_mm'])) for r in rows if r['item'] == 'STRAIGHT']
+    assert fittings == aggregator.fitting_rows()
+    assert straights == [('SMS_38', 2, 650.5)]
+
+def test_reduced_tees_are_keyed_by_run_and_branch():
+    """
+    GIVEN: Två nedminskade T-rör från fabriken, 51x38 och 51x25.
+    WHEN:  Deras primitiver passerar BOMAggregator.
+    THEN:  De ska bli två rader, nycklade som run->branch, inte en rad 'SMS_51' x 2.
+    """
+    factory = ComponentFactory(catalog=CatalogLoader("./components_catalog"))
+    neighbours = [NodeInfo(coords=(-500.0, 0.0, 0.0)), NodeInfo(coords=(500.0, 0.0, 0.0)),
+                  NodeInfo(coords=(0.0, 500.0, 0.0))]
+    nodes_by_id = {node.id: node for node in neighbours}
+    plan = []
+    for branch_spec in ('SMS_38', 'SMS_25'):
+        tee = TeeNodeInfo(coords=(0.0, 0.0, 0.0), run_node_ids=(neighbours[0].id, neighbours[1].id),
+                          branch_node_id=neighbours[2].id)
+        recipe, _, _ = factory.create_tee_recipe(tee, Vec3(0, 0, 0), nodes_by_id, 'SMS_51', branch_spec)
+        plan.extend(recipe)
+    aggregator = BOMAggregator()
+
+    list(aggregator.consume([plan]))
+
+    assert aggregator.fitting_rows() == [('REDUCED_TEE', 'SMS_51->SMS_25', 1), ('REDUCED_TEE', 'SMS_51->SMS_38', 1)]
@@ -0,0 +1,248 @@
+import pytest
+import networkx as nx
+from typing import List
+
+from components_catalog.loader import CatalogLoader
+from pipeline.topology_builder.node_types_v2 import NodeInfo, EndpointNodeInfo, BendNodeInfo
+from pipeline.topology_builder.builder import TopologyBuilder
+from pipeline.planner.planner import Planner
+from pipeline.centerline_builder.builder import CenterlineBuilder
+from pipeline.component_factory.factory import ComponentFactory
+from pipeline.plan_adjuster.adjuster import PlanAdjuster
+from pipeline.shared.cancellation import CancellationToken, OperationCancelled, ON_EXPIRY_PARTIAL
+
+# --- Fixtures (Testdata) ---
+
+@pytest.fixture
+def catalog():
+    """Laddar den riktiga katalogen för att ha tillgång till riktiga komponentdata."""
+    return CatalogLoader("./components_catalog")
+
+def build_l_shape(leg_length: float, catalog: CatalogLoader):
+    """Skapar en L-formad topologi: Ändpunkt -> 90-graders böj -> Ändpunkt."""
+    start = EndpointNodeInfo(id="node_0", coords=(0.0, 0.0, 0.0), direction=(1.0, 0.0, 0.0))
+    bend = BendNodeInfo(id="node_1", coords=(leg_length, 0.0, 0.0), angle=90.0,
+                        vectors=[(-1.0, 0.0, 0.0), (0.0, 1.0, 0.0)], assigned_spec=catalog.get_spec("SMS_38"))
+    end = EndpointNodeInfo(id="node_2", coords=(leg_length, leg_length, 0.0), direction=(0.0, -1.0, 0.0))
+    nodes: List[NodeInfo] = [start, bend, end]
+
+    graph = nx.Graph()
+    graph.add_edge("node_0", "node_1", pipe_spec="SMS_38", length=leg_length)
+    graph.add_edge("node_1", "node_2", pipe_spec="SMS_38", length=leg_length)
+
+    travel_plan = [
+        {'type': 'NODE', 'id': 'node_0'},
+        {'type': 'EDGE', 'id': ('node_0', 'node_1'), 'length': leg_length},
+        {'type': 'NODE', 'id': 'node_1'},
+        {'type': 'EDGE', 'id': ('node_1', 'node_2'), 'length': leg_length},
+        {'type': 'NODE', 'id': 'node_2'},
+    ]
+    return nodes, graph, travel_plan
+
+def run_builder(nodes, graph, travel_plan, catalog, eccentric_reducers=False):
+    adjuster = PlanAdjuster([travel_plan], nodes, graph, catalog)
+    builder = CenterlineBuilder(
+        travel_plans=[travel_plan], nodes=nodes, topology=graph, catalog=catalog,
+        adjuster=adjuster, factory=ComponentFactory(catalog=catalog), eccentric_reducers=eccentric_reducers
+    )
+    return builder.build_drawing_plans()[0]
+
+def build_tee_plans(catalog: CatalogLoader, leg_length: float = 1000.0):
+    """Kör en skiss med ett T-rör (tre lika ben) genom den riktiga kedjan fram till ritningsplanerna."""
+    segments = [
+        {"id": "line_1", "start_point": {"x": 0.0, "y": 0.0}, "end_point": {"x": 86.6, "y": 50.0}},
+        {"id": "line_2", "start_point": {"x": 86.6, "y": 50.0}, "end_point": {"x": 173.2, "y": 100.0}},
+        {"id": "line_3", "start_point": {"x": 86.6, "y": 50.0}, "end_point": {"x": 173.2, "y": 0.0}},
+    ]
+    for segment in segments:
+        segment.update(length_dimension=leg_length, pipe_spec="SMS_38", is_construction=False)
+    nodes, graph = TopologyBuilder({"segments": segments}, catalog).build()
+    travel_plans = Planner(nodes=nodes, topology=graph, catalog=catalog).create_plans()
+    builder = CenterlineBuilder(
+        travel_plans=travel_plans, nodes=nodes, topology=graph, catalog=catalog,
+        adjuster=PlanAdjuster(travel_plans, nodes, graph, catalog), factory=ComponentFactory(catalog=catalog)
+    )
+    return builder.build_drawing_plans()
+
+# --- Testfall för Pass 2 ---
+
+def test_pass_two_adds_straight_pipes(catalog):
+    """
+    GIVEN: En L-form med gott om plats runt böjen.
+    WHEN:  CenterlineBuilder bygger planen.
+    THEN:  Två raka rör ska fylla ut avståndet mellan ändpunkterna och böjen.
+    """
+    nodes, graph, travel_plan = build_l_shape(500.0, catalog)
+
+    plan = run_builder(nodes, graph, travel_plan, catalog)
+
+    pipes = [p for p in plan if p['component_type'] == 'PIPE']
+    assert len(pipes) == 2
+    assert pipes[0]['start'] == pytest.approx((0.0, 0.0, 0.0))
+    assert pipes[1]['end'] == pytest.approx((500.0, 500.0, 0.0))
+    assert all(p['pipe_spec'] == "SMS_38" for p in pipes)
+
+def test_pass_two_resolves_overlap_with_adjuster(catalog):
+    """
+    GIVEN: En L-form där böjens tangenter är längre än benen.
+    WHEN:  CenterlineBuilder bygger planen.
+    THEN:  Tangenterna ska kapas så att böjen slutar exakt i ändpunkterna.
+    """
+    nodes, graph, travel_plan = build_l_shape(70.0, catalog)
+
+    plan = run_builder(nodes, graph, travel_plan, catalog)
+
+    assert not [p for p in plan if p['component_type'] == 'PIPE']
+    lines = [p for p in plan if p['type'] == 'LINE']
+    free_ends = {tuple(round(c, 6) for c in lines[0]['start']), tuple(round(c, 6) for c in lines[1]['end'])}
+    assert free_ends == {(0.0, 0.0, 0.0), (70.0, 70.0, 0.0)}
+
+def test_inline_spec_transition_places_centered_reducer(catalog):
+    """
+    GIVEN: En rak sträcka där dimensionen byts från SMS_51 till SMS_38 mitt på.
+    WHEN:  CenterlineBuilder bygger planen.
+    THEN:  En koncentrisk kona ska centreras över övergången och raka rör fylla ut resten.
+    """
+    start = EndpointNodeInfo(id="node_0", coords=(0.0, 0.0, 0.0), direction=(1.0, 0.0, 0.0))
+    transition = BendNodeInfo(id="node_1", coords=(200.0, 0.0, 0.0), angle=0.0, requires_reducer=True,
+                              vectors=[(-1.0, 0.0, 0.0), (1.0, 0.0, 0.0)], assigned_spec=catalog.get_spec("SMS_51"))
+    end = EndpointNodeInfo(id="node_2", coords=(400.0, 0.0, 0.0), direction=(-1.0, 0.0, 0.0))
+    graph = nx.Graph()
+    graph.add_edge("node_0", "node_1", pipe_spec="SMS_51", length=200.0)
+    graph.add_edge("node_1", "node_2", pipe_spec="SMS_38", length=200.0)
+    travel_plan = [
+        {'type': 'NODE', 'id': 'node_0'},
+        {'type': 'EDGE', 'id': ('node_0', 'node_1'), 'length': 200.0},
+        {'type': 'NODE', 'id': 'node_1'},
+        {'type': 'EDGE', 'id': ('node_1', 'node_2'), 'length': 200.0},
+        {'type': 'NODE', 'id': 'node_2'},
+    ]
+
+    plan = run_builder([start, transition, end], graph, travel_plan, catalog)
+
+    reducers = [p for p in plan if p['component_type'] == 'REDUCER_CONCENTRIC']
+    assert len(reducers) == 1
+    half_length = (51.0 - 38.0) * 3.0 / 2.0
+    assert reducers[0]['start'] == pytest.approx((200.0 - half_length, 0.0, 0.0))
+    assert reducers[0]['end'] == pytest.approx((200.0 + half_length, 0.0, 0.0))
+    pipes = [p for p in plan if p['component_type'] == 'PIPE']
+    assert [p['pipe_spec'] for p in pipes] == ["SMS_51", "SMS_38"]
+    assert pipes[0]['end'] == pytest.approx(reducers[0]['start'])
+
+def test_eccentric_reducer_outlet_connects_to_downstream_pipe(catalog):
+    """
+    GIVEN: Samma raka dimensionsövergång men med excentriska konor.
+    WHEN:  CenterlineBuilder bygger planen.
+    THEN:  Konans utlopp är förskjutet i sidled och nedströmsröret ska börja exakt där.
+    """
+    start = EndpointNodeInfo(id="node_0", coords=(0.0, 0.0, 0.0), direction=(1.0, 0.0, 0.0))
+    transition = BendNodeInfo(id="node_1", coords=(200.0, 0.0, 0.0), angle=0.0, requires_reducer=True,
+                              vectors=[(-1.0, 0.0, 0.0), (1.0, 0.0, 0.0)], assigned_spec=catalog.get_spec("SMS_51"))
+    end = EndpointNodeInfo(id="node_2", coords=(400.0, 0.0, 0.0), direction=(-1.0, 0.0, 0.0))
+    graph = nx.Graph()
+    graph.add_edge("node_0", "node_1", pipe_spec="SMS_51", length=200.0)
+    graph.add_edge("node_1", "node_2", pipe_spec="SMS_38", length=200.0)
+    travel_plan = [
+        {'type': 'NODE', 'id': 'node_0'},
+        {'type': 'EDGE', 'id': ('node_0', 'node_1'), 'length': 200.0},
+        {'type': 'NODE', 'id': 'node_1'},
+        {'type': 'EDGE', 'id': ('node_1', 'node_2'), 'length': 200.0},
+        {'type': 'NODE', 'id': 'node_2'},
+    ]
+
+    plan = run_builder([start, transition, end], graph, travel_plan, catalog, eccentric_reducers=True)
+
+    reducer = next(p for p in plan if p['component_type'] == 'REDUCER_ECCENTRIC')
+    assert reducer['end'][2] != pytest.approx(reducer['start'][2])
+    pipes = [p for p in plan if p['component_type'] == 'PIPE']
+    assert pipes[0]['end'] == pytest.approx(reducer['start'])
+    assert pipes[1]['start'] == pytest.approx(reducer['end'])
+    assert pipes[1]['end'][2] == pytest.approx(reducer['end'][2])
+
+def test_component_ids_are_stable_between_runs(catalog):
+    """
+    GIVEN: Samma L-form byggd två gånger.
+    WHEN:  CenterlineBuilder körs på nytt.
+    THEN:  Alla component_id ska vara identiska, så att en inkrementell executor kan diffa dem.
+    """
+    first = run_builder(*build_l_shape(500.0, catalog), catalog)
+    second = run_builder(*build_l_shape(500.0, catalog), catalog)
+
+    assert [p['component_id'] for p in first] == [p['component_id'] for p in second]
+    assert len({p['component_id'] for p in first}) == 3
+
+def test_tee_is_placed_once_across_run_and_branch_plans(catalog):
+    """
+    GIVEN: En skiss med ett T-rör, som ligger i både löpets och grenens resplan.
+    WHEN:  CenterlineBuilder bygger alla planer.
+    THEN:  T-rörets primitiver ska finnas en gång, och grenens rör ska ändå sluta vid T-rörets port.
+    """
+    plans = build_tee_plans(catalog)
+
+    tee_primitives = [p for plan in plans for p in plan if p['component_type'] == 'TEE']
+    assert len(tee_primitives) == 3
+    assert len({p['id'] for p in tee_primitives}) == 3
+    tee_ports = {tuple(round(c, 6) for c in p['end']) for p in tee_primitives}
+    pipe_ends = {tuple(round(c, 6) for c in point)
+                 for plan in plans for p in plan if p['component_type'] == 'PIPE' for point in (p['start'], p['end'])}
+    assert tee_ports <= pipe_ends
+
+def test_preview_plans_draw_lines_between_nodes(catalog):
+    """
+    GIVEN: En L-form och en CenterlineBuilder utan adjuster och fabrik.
+    WHEN:  Förhandsvisningen byggs med en on_preview-callback.
+    THEN:  Callbacken ska få en trådmodell med en linje per nod-par i resplanen.
+    """
+    nodes, graph, travel_plan = build_l_shape(500.0, catalog)
+    builder = CenterlineBuilder(
+        travel_plans=[travel_plan], nodes=nodes, topology=graph, catalog=catalog,
+        adjuster=None, factory=None
+    )
+    received = []
+
+    previews = builder.build_preview_plans(on_preview=lambda index, plan: received.append((index, plan)))
+
+    assert received == [(0, previews[0])]
+    assert [(line['start'], line['end']) for line in previews[0]] == [
+        ((0.0, 0.0, 0.0), (500.0, 0.0, 0.0)),
+        ((500.0, 0.0, 0.0), (500.0, 500.0, 0.0)),
+    ]
+
+def test_expired_budget_with_partial_policy_returns_finished_plans(catalog):
+    """
+    GIVEN: Två resplaner och en token vars budget går ut under den andra planen.
+    WHEN:  CenterlineBuilder bygger med partial-policy.
+    THEN:  Den färdiga första planen ska returneras och steget markeras som avkortat.
+    """
+    nodes, graph, travel_plan = build_l_shape(500.0, catalog)
+    token = CancellationToken(deadline_s=60.0, on_expiry=ON_EXPIRY_PARTIAL)
+    builder = CenterlineBuilder(
+        travel_plans=[travel_plan, travel_plan], nodes=nodes, topology=graph, catalog=catalog,
+        adjuster=PlanAdjuster([travel_plan], nodes, graph, catalog), factory=ComponentFactory(catalog=catalog),
+        cancel_token=token
+    )
+
+    def expire(index, plan):
+        token.deadline = 0.0
+
+    plans = builder.build_drawing_plans(on_plan=expire)
+
+    assert len(plans) == 1
+    assert token.truncated == ['centerline']
+
+def test_expired_budget_with_default_policy_raises(catalog):
+    """
+    GIVEN: En token vars budget redan har gått ut (standardpolicy).
+    WHEN:  CenterlineBuilder bygger planen.
+    THEN:  OperationCancelled ska kastas istället för ett resultat.
+    """
+    nodes, graph, travel_plan = build_l_shape(500.0, catalog)
+    builder = CenterlineBuilder(
+        travel_plans=[travel_plan], nodes=nodes, topology=graph, catalog=catalog,
+        adjuster=PlanAdjuster([travel_plan], nodes, graph, catalog), factory=ComponentFactory(catalog=catalog),
+        cancel_token=CancellationToken(deadline_s=0.0)
+    )
+
+    with pytest.raises(OperationCancelled) as error:
+        builder.build_drawing_plans()
+    assert error.value.reason == 'deadline'
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from components_catalog.loader import CatalogLoader
+from pipeline.clash_detector.detector import ClashDetector, build_bvh, candidate_pairs, segment_distances
+
+# --- Fixtures (Testdata) ---
+
+@pytest.fixture
+def catalog():
+    """Laddar den riktiga katalogen för att ha tillgång till rördiametrar."""
+    return CatalogLoader("./components_catalog")
+
+def pipe(component_id, start, end, spec="SMS_38"):
+    return {'type': 'LINE', 'component_id': component_id, 'component_type': 'PIPE', 'start': start, 'end': end, 'pipe_spec': spec}
+
+# --- Testfall för bred fas (BVH) ---
+
+def test_bvh_finds_same_pairs_as_brute_force():
+    """
+    GIVEN: 300 slumpade lådor.
+    WHEN:  Kandidatpar söks via BVH:n.
+    THEN:  Resultatet ska vara exakt samma par som en O(n²) jämförelse.
+    """
+    rng = np.random.default_rng(7)
+    lo = rng.uniform(0.0, 1000.0, size=(300, 3))
+    hi = lo + rng.uniform(1.0, 60.0, size=(300, 3))
+
+    found = {tuple(pair) for pair in candidate_pairs(build_bvh(lo, hi), lo, hi).tolist()}
+
+    expected = {(i, j) for i in range(300) for j in range(i + 1, 300)
+                if np.all(lo[i] <= hi[j]) and np.all(lo[j] <= hi[i])}
+    assert found == expected
+
+def test_segment_distance_handles_crossing_and_parallel_segments():
+    """
+    GIVEN: Två korsande segment med 10 mm mellanrum och två parallella segment.
+    WHEN:  Avstånden beräknas radvis.
+    THEN:  Avstånden ska vara 10 respektive 5 mm.
+    """
+    p1 = np.array([[0.0, 0.0, 0.0], [0.0, 0.0, 0.0]])
+    q1 = np.array([[100.0, 0.0, 0.0], [100.0, 0.0, 0.0]])
+    p2 = np.array([[50.0, -50.0, 10.0], [20.0, 5.0, 0.0]])
+    q2 = np.array([[50.0, 50.0, 10.0], [80.0, 5.0, 0.0]])
+
+    distances, _, _ = segment_distances(p1, q1, p2, q2)
+
+    assert distances == pytest.approx([10.0, 5.0])
+
+# --- Testfall för hela detektorn ---
+
+def test_detector_reports_crossing_pipes_but_not_connected_ones(catalog):
+    """
+    GIVEN: Två SMS_38-rör som korsar varandra 10 mm isär (ej ihopkopplade),
+           och en kedja rör -> kort rör -> rör som sitter ihop i portar.
+    WHEN:  Kollisionskontrollen körs.
+    THEN:  Bara de korsande rören ska rapporteras.
+    """
+    plans = [
+        [pipe("a", (0.0, 0.0, 0.0), (200.0, 0.0, 0.0))],
+        [pipe("b", (100.0, -100.0, 10.0), (100.0, 100.0, 10.0))],
+        [pipe("c1", (0.0, 500.0, 0.0), (100.0, 500.0, 0.0)),
+         pipe("c2", (100.0, 500.0, 0.0), (110.0, 500.0, 0.0)),
+         pipe("c3", (110.0, 500.0, 0.0), (200.0, 500.0, 0.0))],
+    ]
+
+    clashes = ClashDetector(catalog).detect(plans)
+
+    assert [(c.component_a, c.component_b) for c in clashes] == [("a", "b")]
+    assert clashes[0].distance == pytest.approx(10.0)
+    assert clashes[0].penetration == pytest.approx(38.0 - 10.0)
@@ -0,0 +1,101 @@
+import math
+import pytest
+
+from components_catalog.loader import CatalogLoader
+from pipeline.component_factory.factory import ComponentFactory
+from pipeline.topology_builder.builder import Vec3
+from pipeline.topology_builder.node_types_v2 import BendNodeInfo
+
+# --- Fixtures (Testdata) ---
+
+@pytest.fixture
+def catalog():
+    """Laddar den riktiga katalogen för att ha tillgång till riktiga komponentdata."""
+    return CatalogLoader("./components_catalog")
+
+# --- Testfall för dimensionsindexet ---
+
+def test_dimension_index_uses_catalog_properties(catalog):
+    """
+    GIVEN: Den riktiga katalogen.
+    WHEN:  ComponentFactory bygger sitt dimensionsindex.
+    THEN:  Måtten ska komma från katalogens dataklasser, inte från hårdkodad data.
+    """
+    factory = ComponentFactory(catalog=catalog)
+
+    bend = factory.get_dimensions("BEND_90", "SMS_38")
+    assert bend.radius == 57.0
+    assert bend.tangent == pytest.approx(76.0 - 57.0)
+
+    tee = factory.get_dimensions("TEE", "SMS_51")
+    assert tee.run_cte == 101.0
+
+    reduced = factory.get_dimensions("REDUCED_TEE", "SMS_51", "SMS_25")
+    assert reduced.branch_pipe_spec == "SMS_25"
+    assert factory.get_dimensions("REDUCED_TEE", "SMS_25", "SMS_51") is None
+
+def test_bend_recipe_is_tagged_with_spec_and_build_operation(catalog):
+    """
+    GIVEN: En 90-graders böj med SMS_25 som tilldelad spec.
+    WHEN:  Fabriken skapar receptet.
+    THEN:  Varje primitiv ska bära sin spec och build_operation från katalogen.
+    """
+    factory = ComponentFactory(catalog=catalog)
+    node = BendNodeInfo(coords=(100.0, 0.0, 0.0), angle=90.0,
+                        vectors=[(-1.0, 0.0, 0.0), (0.0, 1.0, 0.0)], assigned_spec=catalog.get_spec("SMS_25"))
+
+    recipe, pen_pos, pen_dir = factory.create_bend_recipe(node, Vec3(100.0, 0.0, 0.0), Vec3(1.0, 0.0, 0.0))
+
+    assert [p['type'] for p in recipe] == ['LINE', 'ARC', 'LINE']
+    assert all(p['pipe_spec'] == "SMS_25" and p['build_operation'] == "sweep_arc" for p in recipe)
+    assert (pen_pos.x, pen_pos.y, pen_pos.z) == pytest.approx((100.0, 51.0, 0.0))
+
+# --- Testfall för batch-beräkning av böjar ---
+
+def test_bend_batch_matches_single_recipes(catalog):
+    """
+    GIVEN: En 90-graders, en 45-graders och en specialböj.
+    WHEN:  Böjarna beräknas i batch.
+    THEN:  Varje rad ska ge samma geometri som det enskilda receptet.
+    """
+    factory = ComponentFactory(catalog=catalog)
+    spec = catalog.get_spec("SMS_38")
+    s45, c60 = math.sqrt(0.5), math.cos(math.radians(60))
+    nodes = [
+        BendNodeInfo(coords=(100.0, 0.0, 0.0), angle=90.0, vectors=[(-1.0, 0.0, 0.0), (0.0, 1.0, 0.0)], assigned_spec=spec),
+        BendNodeInfo(coords=(0.0, 0.0, 0.0), angle=45.0, vectors=[(-1.0, 0.0, 0.0), (s45, s45, 0.0)], assigned_spec=spec),
+        BendNodeInfo(coords=(0.0, 0.0, 50.0), angle=60.0, vectors=[(-1.0, 0.0, 0.0), (c60, math.sin(math.radians(60)), 0.0)], assigned_spec=spec),
+    ]
+    incoming = [(1.0, 0.0, 0.0)] * 3
+    placements = ['OUTGOING', 'OUTGOING', 'INCOMING']
+
+    buffer = factory.create_bend_recipes(nodes, incoming, placements)
+
+    assert len(buffer) == 3
+    for row, node in enumerate(nodes):
+        expected, expected_pos, expected_dir = factory.create_bend_recipe(node, Vec3(*node.coords), Vec3(*incoming[row]), placements[row])
+        actual, actual_pos, actual_dir = buffer.to_recipe(row)
+        assert [p['type'] for p in actual] == [p['type'] for p in expected]
+        for a, e in zip(actual, expected):
+            assert a['component_type'] == e['component_type']
+            assert a['start'] == pytest.approx(e['start'])
+            assert a['end'] == pytest.approx(e['end'])
+        assert (actual_pos.x, actual_pos.y, actual_pos.z) == pytest.approx((expected_pos.x, expected_pos.y, expected_pos.z))
+
+# --- Testfall för konor ---
+
+def test_reducer_experts_are_cached_per_size_pair(catalog):
+    """
+    GIVEN: Två övergångar mellan samma dimensioner, i olika riktning.
+    WHEN:  Fabriken hämtar kon-experter.
+    THEN:  Samma förberäknade expert ska återanvändas, och excentriska ska förskjutas (A-B)/2.
+    """
+    factory = ComponentFactory(catalog=catalog)
+
+    reducer = factory.get_reducer("SMS_51", "SMS_25")
+    assert reducer is factory.get_reducer("SMS_25", "SMS_51")
+    assert reducer.axial_length == pytest.approx((51.0 - 25.0) * 3.0)
+
+    recipe, end_pos, _ = factory.create_reducer_recipe(Vec3(0, 0, 0), Vec3(1, 0, 0), "SMS_51", "SMS_25", eccentric=True)
+    assert recipe[0]['component_type'] == 'REDUCER_ECCENTRIC'
+    assert (end_pos.x, end_pos.y, end_pos.z) == pytest.approx((78.0, 0.0, 13.0))
@@ -119,4 +119,22 @@ def test_component_tangent_logic(mock_catalog_path):
     clamp = spec.components.get("SMS_CLAMP")
     assert isinstance(clamp, ClampData)
     assert clamp.preferred_min_tangent == 15.0 # Åsidosatt i JSON
-    assert clamp.physical_min_tangent == 8.0   # Fast värde från JSON
\ No newline at end of file
+    assert clamp.physical_min_tangent == 8.0   # Fast värde från JSON
+
+def test_catalog_version_follows_file_content(mock_catalog_path):
+    """
+    GIVEN: En katalog som laddas två gånger, och sedan ändras på disk.
+    WHEN:  Vi jämför CatalogLoader.version.
+    THEN:  Versionen ska vara stabil för samma innehåll och ändras när en fil ändras.
+    """
+    first = CatalogLoader(mock_catalog_path).version
+    second = CatalogLoader(mock_catalog_path).version
+
+    sms_file = f"{mock_catalog_path}/sms.json"
+    data = json.loads(open(sms_file).read())
+    data["SMS_38"]["bend_radius"] = 60.0
+    with open(sms_file, "w") as f:
+        f.write(json.dumps(data))
+
+    assert first == second
+    assert CatalogLoader(mock_catalog_path).version != first
@@ -0,0 +1,85 @@
+import math
+import pytest
+
+from components_catalog.loader import CatalogLoader
+from pipeline.geometry_executor.backends import GeometryBackend, MeshBackend, NullBackend
+
+# --- Fixtures (Testdata) ---
+
+@pytest.fixture
+def catalog():
+    """Laddar den riktiga katalogen för att ha tillgång till rördimensioner."""
+    return CatalogLoader("./components_catalog")
+
+@pytest.fixture
+def drawing_plans():
+    """En plan med ett rakt rör och en 90-graders båge i SMS_25."""
+    s = math.sqrt(0.5)
+    return [[
+        {'type': 'LINE', 'start': (0.0, 0.0, 0.0), 'end': (100.0, 0.0, 0.0), 'pipe_spec': 'SMS_25'},
+        {'type': 'ARC', 'start': (100.0, 0.0, 0.0), 'mid': (100.0 + 38.0 * s, 38.0 - 38.0 * s, 0.0),
+         'end': (138.0, 38.0, 0.0), 'pipe_spec': 'SMS_25'},
+    ]]
+
+# --- Testfall för backends ---
+
+def test_null_backend_counts_primitives(drawing_plans):
+    """
+    GIVEN: En plan med en linje och en båge.
+    WHEN:  NullBackend bygger planen.
+    THEN:  Den ska bara räkna primitiverna.
+    """
+    assert NullBackend().build(drawing_plans) == {'plans': 1, 'LINE': 1, 'ARC': 1}
+
+def test_mesh_backend_sweeps_pipe_profile(drawing_plans, catalog):
+    """
+    GIVEN: En plan med en linje och en båge i SMS_25.
+    WHEN:  MeshBackend bygger planen.
+    THEN:  Det yttre rörets vertexar ska ligga på rördiameterns avstånd från centrumlinjen.
+    """
+    backend = MeshBackend(ring_segments=8, arc_segments=4)
+
+    mesh = backend.build(drawing_plans, catalog)
+
+    # Varje bana: 2 väggar * 2 * n * (M-1) + 2 lock * 2 * n trianglar
+    assert mesh.triangle_count == (4 * 8 * 1 + 4 * 8) + (4 * 8 * 4 + 4 * 8)
+    outer_ring = mesh.vertices[:8]
+    assert [math.hypot(v[1], v[2]) for v in outer_ring] == pytest.approx([12.5] * 8)
+
+def test_mesh_writes_binary_stl_and_ply(drawing_plans, catalog, tmp_path):
+    """
+    GIVEN: Ett byggt triangelnät.
+    WHEN:  Det skrivs till STL och PLY.
+    THEN:  Filstorlekarna ska stämma med de binära formaten.
+    """
+    mesh = MeshBackend(ring_segments=8, arc_segments=4).build(drawing_plans, catalog)
+    stl_path, ply_path = tmp_path / "model.stl", tmp_path / "model.ply"
+
+    mesh.write_stl(str(stl_path))
+    mesh.write_ply(str(ply_path))
+
+    assert stl_path.stat().st_size == 84 + 50 * mesh.triangle_count
+    assert ply_path.read_bytes().startswith(b"ply\nformat binary_little_endian 1.0\n")
+
+def test_mesh_backend_warns_about_primitives_without_spec(catalog, capsys):
+    """
+    GIVEN: En LINE-primitiv utan pipe_spec.
+    WHEN:  MeshBackend bygger planen.
+    THEN:  Inget ska sveps, men en varning ska skrivas ut.
+    """
+    mesh = MeshBackend().build([[{'type': 'LINE', 'start': (0.0, 0.0, 0.0), 'end': (100.0, 0.0, 0.0)}]], catalog)
+
+    assert mesh.triangle_count == 0
+    assert "1 primitiver saknar" in capsys.readouterr().out
+
+def test_geometry_backend_requires_build():
+    """
+    GIVEN: En backend som inte implementerar build.
+    WHEN:  Den instansieras.
+    THEN:  TypeError ska kastas, eftersom GeometryBackend är abstrakt.
+    """
+    class Incomplete(GeometryBackend):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,74 @@
+from pipeline.geometry_executor.executor import BatchGeometryExecutor, merge_line_chains
+
+# --- Testfall för batch-exekveringens förbehandling ---
+
+def test_merge_line_chains_collapses_collinear_runs():
+    """
+    GIVEN: Tre sammanhängande LINE-primitiver där de två första är kolinjära, följt av en båge.
+    WHEN:  Primitiverna slås ihop.
+    THEN:  Linjerna ska bli en polylinje med tre punkter, och bågen ska behållas separat.
+    """
+    plan = [
+        {'type': 'LINE', 'start': (0.0, 0.0, 0.0), 'end': (10.0, 0.0, 0.0)},
+        {'type': 'LINE', 'start': (10.0, 0.0, 0.0), 'end': (25.0, 0.0, 0.0)},
+        {'type': 'LINE', 'start': (25.0, 0.0, 0.0), 'end': (25.0, 5.0, 0.0)},
+        {'type': 'ARC', 'start': (25.0, 5.0, 0.0), 'mid': (26.0, 6.0, 0.0), 'end': (27.0, 7.0, 0.0)},
+    ]
+
+    merged = merge_line_chains(plan)
+
+    assert merged[0] == ('POLYLINE', [(0.0, 0.0, 0.0), (25.0, 0.0, 0.0), (25.0, 5.0, 0.0)])
+    assert merged[1][0] == 'ARC'
+    assert len(merged) == 2
+
+def test_merge_line_chains_splits_disconnected_lines():
+    """
+    GIVEN: Två LINE-primitiver som inte delar ändpunkt.
+    WHEN:  Primitiverna slås ihop.
+    THEN:  De ska bli två separata polylinjer.
+    """
+    plan = [
+        {'type': 'LINE', 'start': (0.0, 0.0, 0.0), 'end': (10.0, 0.0, 0.0)},
+        {'type': 'LINE', 'start': (20.0, 0.0, 0.0), 'end': (30.0, 0.0, 0.0)},
+    ]
+
+    merged = merge_line_chains(plan)
+
+    assert [kind for kind, _ in merged] == ['POLYLINE', 'POLYLINE']
+
+def test_merge_line_chains_joins_lines_by_shared_endpoint():
+    """
+    GIVEN: En plan där böjarnas linjer kommer först och de raka rören sist (som efter pass 2).
+    WHEN:  Primitiverna slås ihop.
+    THEN:  Alla linjer som delar ändpunkt ska bli en enda polylinje, i geometrisk ordning.
+    """
+    plan = [
+        {'type': 'LINE', 'start': (100.0, 0.0, 0.0), 'end': (100.0, 50.0, 0.0)},
+        {'type': 'LINE', 'start': (0.0, 0.0, 0.0), 'end': (60.0, 0.0, 0.0)},
+        {'type': 'LINE', 'start': (60.0, 0.0, 0.0), 'end': (100.0, 0.0, 0.0)},
+        {'type': 'LINE', 'start': (100.0, 50.0, 0.0), 'end': (100.0, 120.0, 0.0)},
+    ]
+
+    merged = merge_line_chains(plan)
+
+    assert len(merged) == 1
+    kind, points = merged[0]
+    assert kind == 'POLYLINE'
+    assert sorted([points[0], points[-1]]) == [(0.0, 0.0, 0.0), (100.0, 120.0, 0.0)]
+    assert (100.0, 0.0, 0.0) in points
+    assert len(points) == 3
+
+def test_batch_executor_shares_vectors_within_tolerance():
+    """
+    GIVEN: En BatchGeometryExecutor med 0.01 mm tolerans.
+    WHEN:  Två punkter som skiljer sig mindre än toleransen hämtas.
+    THEN:  De ska dela samma Vector, medan en punkt längre bort får en egen.
+    """
+    executor = BatchGeometryExecutor([], None, lambda *p: p, tolerance=0.01)
+
+    a = executor._vector((10.0, 0.0, 0.0))
+    b = executor._vector((10.001, 0.0, 0.0))
+    c = executor._vector((10.05, 0.0, 0.0))
+
+    assert a is b
+    assert c is not a
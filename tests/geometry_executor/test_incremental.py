@@ -0,0 +1,47 @@
+from pipeline.geometry_executor.incremental import group_by_component, component_signature, diff_components
+
+# --- Hjälpfunktioner ---
+
+def signatures(plans):
+    return {cid: component_signature(prims) for cid, prims in group_by_component(plans).items()}
+
+def pipe(component_id, start, end):
+    return {'type': 'LINE', 'component_id': component_id, 'start': start, 'end': end, 'pipe_spec': 'SMS_38'}
+
+# --- Testfall för diffen ---
+
+def test_diff_classifies_created_moved_changed_and_deleted():
+    """
+    GIVEN: En tidigare plan med fyra rör och en ny plan där ett rör flyttats,
+           ett förlängts, ett tagits bort och ett nytt tillkommit.
+    WHEN:  Signaturerna diffas.
+    THEN:  Varje component_id ska hamna i rätt kategori.
+    """
+    before = [[pipe("a", (0, 0, 0), (100, 0, 0)), pipe("b", (100, 0, 0), (200, 0, 0)),
+               pipe("c", (200, 0, 0), (300, 0, 0)), pipe("d", (300, 0, 0), (400, 0, 0))]]
+    after = [[pipe("a", (0, 0, 0), (100, 0, 0)), pipe("b", (100, 50, 0), (200, 50, 0)),
+              pipe("c", (200, 0, 0), (350, 0, 0)), pipe("e", (400, 0, 0), (500, 0, 0))]]
+
+    diff = diff_components(signatures(before), signatures(after))
+
+    assert diff.unchanged == ["a"]
+    assert diff.moved == ["b"]
+    assert diff.changed == ["c"]
+    assert diff.created == ["e"]
+    assert diff.deleted == ["d"]
+    assert diff.touched == 4
+
+def test_group_by_component_keeps_first_placement_only():
+    """
+    GIVEN: Två planer som båda innehåller samma T-rör (samma component_id).
+    WHEN:  Primitiverna grupperas per komponent.
+    THEN:  T-röret ska bara bestå av den första planens primitiver.
+    """
+    tee = [pipe("tee_1", (0, 0, 0), (50, 0, 0)), pipe("tee_1", (0, 0, 0), (0, 50, 0))]
+    plans = [tee + [pipe("a", (50, 0, 0), (100, 0, 0))],
+             [dict(item) for item in tee] + [pipe("b", (0, 50, 0), (0, 100, 0))]]
+
+    components = group_by_component(plans)
+
+    assert len(components["tee_1"]) == 2
+    assert all(item is original for item, original in zip(components["tee_1"], tee))
@@ -0,0 +1,102 @@
+import math
+import pytest
+from types import SimpleNamespace
+
+from pipeline.geometry_executor.solid_templates import SolidTemplateCache, arc_occurrence, line_occurrence, plan_occurrences
+
+# --- Hjälpfunktioner ---
+
+def make_elbow(corner, incoming, outgoing, radius=57.0, pipe_spec='SMS_38'):
+    """Skapar en 90-graders båge runt ett hörn, given in- och utgående riktning."""
+    start = tuple(c - i * radius for c, i in zip(corner, incoming))
+    end = tuple(c + o * radius for c, o in zip(corner, outgoing))
+    center = tuple(s + o * radius for s, o in zip(start, outgoing))
+    s = math.sqrt(0.5)
+    mid = tuple(cc - o * radius * s + i * radius * s for cc, o, i in zip(center, outgoing, incoming))
+    return {'type': 'ARC', 'start': start, 'mid': mid, 'end': end, 'pipe_spec': pipe_spec, 'build_operation': 'sweep_arc'}
+
+def to_world(frame, local):
+    return tuple(frame.origin[k] + frame.x_axis[k] * local[0] + frame.y_axis[k] * local[1] + frame.z_axis[k] * local[2]
+                 for k in range(3))
+
+class FakeCatalog:
+    """En minimal katalog med en enda spec, vars mått kan ändras mellan körningar."""
+    def __init__(self, diameter, thickness):
+        self.spec = SimpleNamespace(diameter=diameter, thickness=thickness)
+
+    def get_spec(self, pipe_spec):
+        return self.spec if pipe_spec == 'SMS_38' else None
+
+# --- Testfall för mall-cachens nycklar och placeringar ---
+
+def test_identical_elbows_share_one_template():
+    """
+    GIVEN: Två likadana SMS_38-böjar på olika platser och i olika orientering.
+    WHEN:  Planerna omvandlas till mall-förekomster.
+    THEN:  Båda ska peka på samma mall, men med olika placering.
+    """
+    plans = [[make_elbow((0.0, 0.0, 0.0), (1, 0, 0), (0, 1, 0))],
+             [make_elbow((500.0, 200.0, 0.0), (0, 0, -1), (-1, 0, 0))]]
+
+    occurrences = plan_occurrences(plans)
+
+    assert len(occurrences) == 2
+    assert occurrences[0].key == occurrences[1].key == ('sweep_arc', 'SMS_38', 57.0, 90.0)
+    assert occurrences[0].frame != occurrences[1].frame
+
+def test_arc_frame_maps_template_onto_world_arc():
+    """
+    GIVEN: En böj i en godtycklig orientering.
+    WHEN:  Mallens lokala system beräknas.
+    THEN:  Mallens båge (start i origo, centrum i +Y) ska hamna på världsbågen.
+    """
+    arc = make_elbow((100.0, 50.0, 20.0), (0, 0, -1), (-1, 0, 0))
+
+    occurrence = arc_occurrence(arc)
+    _, _, radius, angle = occurrence.key
+    theta = math.radians(angle)
+    local_end = (math.sin(theta) * radius, radius - math.cos(theta) * radius, 0.0)
+
+    assert to_world(occurrence.frame, (0.0, 0.0, 0.0)) == pytest.approx(arc['start'])
+    assert to_world(occurrence.frame, local_end) == pytest.approx(arc['end'])
+
+def test_eccentric_reducer_frame_keeps_offset_in_y():
+    """
+    GIVEN: En excentrisk kona med förskjutning i Z och axel längs -Y.
+    WHEN:  Mallens lokala system beräknas.
+    THEN:  Nyckeln ska bära axiell längd och förskjutning, och Y-axeln peka mot förskjutningen.
+    """
+    cone = {'type': 'LINE', 'start': (0.0, 0.0, 0.0), 'end': (0.0, -78.0, 6.5), 'axial_dir': (0.0, -1.0, 0.0),
+            'pipe_spec': 'SMS_51', 'to_pipe_spec': 'SMS_38', 'build_operation': 'loft'}
+
+    occurrence = line_occurrence(cone)
+
+    assert occurrence.key == ('loft', 'SMS_51', 'SMS_38', 78.0, 6.5)
+    assert occurrence.frame.y_axis == pytest.approx((0.0, 0.0, 1.0))
+
+def test_straights_of_different_length_share_one_key():
+    """
+    GIVEN: Två raka SMS_38-rör med olika längd.
+    WHEN:  De omvandlas till mall-förekomster.
+    THEN:  Nyckeln ska bara bero på spec, och längden bäras av förekomsten.
+    """
+    plans = [[{'type': 'LINE', 'start': (0.0, 0.0, 0.0), 'end': (123.4, 0.0, 0.0), 'pipe_spec': 'SMS_38'},
+              {'type': 'LINE', 'start': (0.0, 0.0, 0.0), 'end': (0.0, 987.6, 0.0), 'pipe_spec': 'SMS_38'}]]
+
+    occurrences = plan_occurrences(plans)
+
+    assert occurrences[0].key == occurrences[1].key == ('straight', 'SMS_38')
+    assert [o.length for o in occurrences] == pytest.approx([123.4, 987.6])
+
+def test_disk_cache_path_follows_catalog_dimensions(tmp_path):
+    """
+    GIVEN: Samma mallnyckel och samma cache-katalog, men SMS_38:s godstjocklek ändras i katalogen.
+    WHEN:  BREP-sökvägen slås upp före och efter ändringen.
+    THEN:  Sökvägarna ska skilja sig, så att den gamla BREP:en inte återanvänds.
+    """
+    key = ('sweep_arc', 'SMS_38', 57.0, 90.0)
+    before = SolidTemplateCache(None, None, FakeCatalog(38.0, 1.2), str(tmp_path))
+    after = SolidTemplateCache(None, None, FakeCatalog(38.0, 1.5), str(tmp_path))
+
+    assert before._brep_path(key) == SolidTemplateCache(None, None, FakeCatalog(38.0, 1.2), str(tmp_path))._brep_path(key)
+    assert before._brep_path(key) != after._brep_path(key)
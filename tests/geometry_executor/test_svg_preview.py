@@ -0,0 +1,67 @@
+import io
+import math
+import os
+import pickle
+
+import pytest
+
+from pipeline.topology_builder.builder import TopologyBuilder
+from pipeline.geometry_executor.svg_preview import IsometricSvgRenderer, iso_projection, COMPONENT_COLORS
+
+# --- Hjälpfunktioner ---
+
+def l_shaped_plan():
+    """Ett rör längs +X följt av en böj upp mot +Z."""
+    return [[
+        {'type': 'LINE', 'component_type': 'PIPE', 'start': (0.0, 0.0, 0.0), 'end': (100.0, 0.0, 0.0)},
+        {'type': 'ARC', 'component_type': 'BEND_90', 'start': (100.0, 0.0, 0.0),
+         'mid': (100.0 + 50.0 * math.sin(math.pi / 4), 0.0, 50.0 - 50.0 * math.cos(math.pi / 4)), 'end': (150.0, 0.0, 50.0)},
+    ]]
+
+# --- Testfall för SVG-förhandsvisningen ---
+
+def test_projection_inverts_iso_directions():
+    """
+    GIVEN: TopologyBuilders tabell från skissvinkel till 3D-riktning.
+    WHEN:  Varje 3D-riktning projiceras tillbaka.
+    THEN:  Resultatet ska vara enhetsvektorn för skissvinkeln.
+    """
+    projection = iso_projection()
+
+    for angle, direction in TopologyBuilder.ISO_DIRECTIONS.items():
+        expected = (math.cos(math.radians(angle)), math.sin(math.radians(angle)))
+        assert tuple(projection @ direction) == pytest.approx(expected)
+
+def test_render_writes_one_coloured_path_per_component_type():
+    """
+    GIVEN: En plan med ett rör och en böj.
+    WHEN:  Planen renderas till en ström.
+    THEN:  SVG:n ska ha en path per component_type i typens färg, och böjen
+           ska ha delats i flera segment.
+    """
+    out = io.StringIO()
+
+    segments = IsometricSvgRenderer(width=200, height=100).render(l_shaped_plan(), out)
+
+    svg = out.getvalue()
+    assert svg.startswith('<svg') and svg.rstrip().endswith('</svg>')
+    assert f'data-component-type="PIPE" stroke="{COMPONENT_COLORS["PIPE"]}"' in svg
+    assert f'data-component-type="BEND_90" stroke="{COMPONENT_COLORS["BEND_90"]}"' in svg
+    assert segments > 2
+
+def test_render_directory_skips_non_plan_checkpoints(tmp_path):
+    """
+    GIVEN: En checkpoint-katalog med ritningsplaner, resplaner och en tolkad skiss.
+    WHEN:  Katalogen batch-renderas.
+    THEN:  Bara ritningsplanerna ska få en SVG-fil.
+    """
+    with open(tmp_path / "drawing.pkl", 'wb') as f:
+        pickle.dump(l_shaped_plan(), f)
+    with open(tmp_path / "parsed.pkl", 'wb') as f:
+        pickle.dump({'segments': []}, f)
+    with open(tmp_path / "travel.pkl", 'wb') as f:
+        pickle.dump([[{'type': 'NODE', 'id': 0}, {'type': 'STRAIGHT', 'length': 100.0}, {'type': 'NODE', 'id': 1}]], f)
+
+    written = IsometricSvgRenderer().render_directory(str(tmp_path), str(tmp_path / "svg"))
+
+    assert [os.path.basename(path) for path in written] == ["drawing.svg"]
@@ -0,0 +1,75 @@
+import math
+
+import numpy as np
+import pytest
+
+from pipeline.geometry_executor.tessellation import ArcTessellator, fit_arcs, segments_for_tolerance
+
+# --- Hjälpfunktioner ---
+
+def quarter_arc(radius: float, arc_id: str = "arc_1"):
+    """En 90-graders båge i XY-planet runt origo, från (r, 0) till (0, r)."""
+    s = radius / math.sqrt(2.0)
+    return {'id': arc_id, 'type': 'ARC', 'pipe_spec': "SMS_38", 'component_id': "bend_1",
+            'start': (radius, 0.0, 0.0), 'mid': (s, s, 0.0), 'end': (0.0, radius, 0.0)}
+
+# --- Testfall för tessellatorn ---
+
+def test_points_lie_on_arc_within_tolerance():
+    """
+    GIVEN: Två kvartsbågar med olika böjradie.
+    WHEN:  De diskretiseras i samma batch med 0.1 mm tolerans.
+    THEN:  Alla punkter ska ligga på cirkeln, ändpunkterna vara exakta,
+           kordafelet hålla toleransen och den större radien få fler kordor.
+    """
+    batch = ArcTessellator(chord_tolerance=0.1).tessellate([quarter_arc(50.0), quarter_arc(500.0)])
+
+    for index, radius in enumerate((50.0, 500.0)):
+        polyline = batch.polyline(index)
+        assert np.linalg.norm(polyline, axis=1) == pytest.approx(radius)
+        assert tuple(polyline[0]) == (radius, 0.0, 0.0)
+        assert tuple(polyline[-1]) == (0.0, radius, 0.0)
+    assert (batch.sagitta <= 0.1 + 1e-12).all()
+    assert batch.segment_counts[1] > batch.segment_counts[0]
+    assert batch.segment_counts.tolist() == segments_for_tolerance(
+        np.array([50.0, 500.0]), np.full(2, math.pi / 2.0), 0.1).tolist()
+
+def test_tessellate_plans_replaces_arcs_with_connected_lines():
+    """
+    GIVEN: En plan med en linje följd av en båge.
+    WHEN:  Planen diskretiseras.
+    THEN:  Bågen ska bli en kedja LINE-primitiver med bågens taggar och source_id,
+           medan linjen lämnas orörd.
+    """
+    line = {'id': "line_1", 'type': 'LINE', 'start': (100.0, -50.0, 0.0), 'end': (100.0, 0.0, 0.0)}
+    plan = [line, quarter_arc(100.0)]
+
+    flat = ArcTessellator(chord_tolerance=1.0).tessellate_plans([plan])[0]
+
+    assert flat[0] is line
+    chords = flat[1:]
+    assert len(chords) > 1
+    assert all(c['type'] == 'LINE' and c['source_id'] == "arc_1" and c['component_id'] == "bend_1" for c in chords)
+    assert all(a['end'] == b['start'] for a, b in zip(chords, chords[1:]))
+    assert chords[0]['start'] == (100.0, 0.0, 0.0) and chords[-1]['end'] == (0.0, 100.0, 0.0)
+
+def test_fit_arcs_recovers_circle_and_flags_straight_arcs():
+    """
+    GIVEN: En kvartsbåge runt (10, 20, 0) och en rätlinjig "båge".
+    WHEN:  Båda anpassas i samma batch.
+    THEN:  Den första ska få rätt centrum, radie, normal och svepvinkel;
+           den rätlinjiga ska markeras som ogiltig.
+    """
+    arc = quarter_arc(50.0)
+    p1 = np.array([arc['start'], (0.0, 0.0, 0.0)]) + (10.0, 20.0, 0.0)
+    p2 = np.array([arc['mid'], (1.0, 1.0, 1.0)]) + (10.0, 20.0, 0.0)
+    p3 = np.array([arc['end'], (2.0, 2.0, 2.0)]) + (10.0, 20.0, 0.0)
+
+    fit = fit_arcs(p1, p2, p3)
+
+    assert fit.valid.tolist() == [True, False]
+    assert fit.center[0] == pytest.approx((10.0, 20.0, 0.0))
+    assert fit.radius[0] == pytest.approx(50.0)
+    assert fit.normal[0] == pytest.approx((0.0, 0.0, 1.0))
+    assert fit.sweep[0] == pytest.approx(math.pi / 2.0)
+    assert np.isfinite(fit.center).all()
@@ -6,7 +6,7 @@ from typing import List, Tuple, Dict, Any
 # Importera klasser från andra moduler
 from components_catalog.loader import CatalogLoader
 from pipeline.topology_builder.node_types_v2 import NodeInfo, EndpointNodeInfo, BendNodeInfo
-from pipeline.plan_adjuster.adjuster import PlanAdjuster
+from pipeline.plan_adjuster.adjuster import PlanAdjuster, CuttableTangent, ImpossibleBuildError
 from pipeline.shared.types import BuildPlan
 
 # --- Fixtures (Testdata) ---
@@ -100,4 +100,59 @@ def test_pen_draws_adjusted_straight_lines(catalog):
     # Verifiera koordinaterna för den andra linjen
     # Linjen ska börja vid (100,0,0) och gå till slutpunkten (100,100,0).
     assert line2['start'] == pytest.approx([100.0, 0.0, 0.0])
-    assert line2['end'] == pytest.approx([100.0, 100.0, 0.0])
\ No newline at end of file
+    assert line2['end'] == pytest.approx([100.0, 100.0, 0.0])
+
+
+# --- Testfall för underskotts-lösaren ---
+
+def test_shortfall_prefers_single_cut(catalog):
+    """
+    GIVEN: Tre tangenter där endast en har spelrum nog för hela underskottet.
+    WHEN:  Underskottet löses.
+    THEN:  Endast den tangenten ska kapas.
+    """
+    adjuster = PlanAdjuster([], [], nx.Graph(), catalog)
+    tangents = [
+        CuttableTangent("t1", 10.0),
+        CuttableTangent("t2", 40.0, physical_min_tangent=5.0),
+        CuttableTangent("t3", 12.0),
+    ]
+
+    cuts = adjuster.resolve_shortfall(tangents, 30.0)
+
+    assert cuts == {"t2": pytest.approx(30.0)}
+
+
+def test_shortfall_uses_fewest_cuts(catalog):
+    """
+    GIVEN: Tangenter där ingen ensam räcker, men de två största tillsammans gör det.
+    WHEN:  Underskottet löses.
+    THEN:  Exakt två tangenter ska kapas, jämnt fördelat inom sitt spelrum.
+    """
+    adjuster = PlanAdjuster([], [], nx.Graph(), catalog)
+    tangents = [
+        CuttableTangent("t1", 5.0),
+        CuttableTangent("t2", 20.0),
+        CuttableTangent("t3", 8.0),
+        CuttableTangent("t4", 25.0),
+    ]
+
+    cuts = adjuster.resolve_shortfall(tangents, 30.0)
+
+    assert set(cuts) == {"t2", "t4"}
+    assert sum(cuts.values()) == pytest.approx(30.0)
+    assert cuts["t2"] == pytest.approx(15.0)
+
+
+def test_shortfall_raises_when_slack_is_insufficient(catalog):
+    """
+    GIVEN: Ett underskott som är större än det totala spelrummet.
+    WHEN:  Underskottet löses.
+    THEN:  Ett ImpossibleBuildError ska kastas.
+    """
+    adjuster = PlanAdjuster([], [], nx.Graph(), catalog)
+    tee = catalog.get_spec("SMS_25").components["TEE"]
+    tangents = [CuttableTangent.from_component("t1", 20.0, tee)]
+
+    with pytest.raises(ImpossibleBuildError):
+        adjuster.resolve_shortfall(tangents, 10.0)
@@ -13,6 +13,7 @@ sys.path.insert(0, project_root)
 # Importera klassen vi vill testa och de datatyper den behöver
 from pipeline.planner.planner import Planner
 from pipeline.topology_builder.node_types_v2 import EndpointNodeInfo, BendNodeInfo
+from pipeline.shared.cancellation import CancellationToken, OperationCancelled
 
 
 def test_planner_simple_linear_plan():
@@ -67,3 +68,23 @@ def test_planner_simple_linear_plan():
 
     print("\nTest av BuildPlanner lyckades!")
 
+
+
+def test_planner_stops_when_cancelled():
+    """
+    GIVEN: En enkel topologi och en token som redan avbrutits (ny redigering).
+    WHEN:  Planner skapar resplanerna.
+    THEN:  Vandringen ska avbrytas med OperationCancelled.
+    """
+    start_node = EndpointNodeInfo(coords=(0, 0, 0))
+    end_node = EndpointNodeInfo(coords=(100, 0, 0))
+    topology = nx.Graph()
+    topology.add_edge(start_node.id, end_node.id, pipe_spec="SMS_25", length=100.0)
+    token = CancellationToken()
+    token.cancel()
+
+    planner = Planner(nodes=[start_node, end_node], topology=topology, catalog=MagicMock(), cancel_token=token)
+
+    with pytest.raises(OperationCancelled) as error:
+        planner.create_plans()
+    assert (error.value.stage, error.value.reason) == ('planner', 'cancelled')
@@ -0,0 +1,164 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pipeline.service.async_server import AsyncPipelineServer
+from pipeline.service.client import stream_drawing_plans
+
+# --- Hjälpfunktioner (jobb som körs i en trådpool istället för processer) ---
+
+def two_plan_job(proto_data, catalog_path, events, deadline_s=None):
+    events.put({'status': 'plan', 'index': 0, 'plan': [{'type': 'LINE'}]})
+    events.put({'status': 'plan', 'index': 1, 'plan': [{'type': 'ARC'}]})
+    events.put({'status': 'done', 'count': 2})
+    return 2
+
+def make_server(job, **kwargs):
+    return AsyncPipelineServer(job=job, executor=ThreadPoolExecutor(max_workers=4), **kwargs)
+
+async def collect(server, proto_data=b"sketch", deadline_s=None):
+    return [event async for event in server.submit(proto_data, deadline_s)]
+
+class NoDefaultExecutor(ThreadPoolExecutor):
+    """Standard-executor som inte tar emot något arbete."""
+    def submit(self, *args, **kwargs):
+        raise AssertionError("Standard-executorn ska inte användas.")
+
+# --- Testfall för asyncio-servern ---
+
+def test_submit_streams_each_plan_then_done():
+    """
+    GIVEN: Ett jobb som bygger två resplaner.
+    WHEN:  En förfrågan skickas in.
+    THEN:  Planerna ska strömmas i ordning, följt av en 'done'-händelse.
+    """
+    server = make_server(two_plan_job)
+
+    events = asyncio.run(collect(server))
+
+    assert [e['status'] for e in events] == ['plan', 'plan', 'done']
+    assert [e['index'] for e in events[:2]] == [0, 1]
+    assert server.stats['completed'] == 1
+
+def test_submit_rejects_when_queue_is_full():
+    """
+    GIVEN: En server med en arbetsplats, ingen kö och ett jobb som blockerar.
+    WHEN:  En andra förfrågan kommer medan den första byggs.
+    THEN:  Den andra ska avvisas direkt, medan den första går klart.
+    """
+    release = threading.Event()
+
+    def blocking_job(proto_data, catalog_path, events, deadline_s=None):
+        release.wait(5)
+        events.put({'status': 'done', 'count': 0})
+        return 0
+
+    server = make_server(blocking_job, max_workers=1, max_queue=0)
+
+    async def scenario():
+        first = asyncio.create_task(collect(server))
+        await asyncio.sleep(0.05)
+        second = await collect(server)
+        release.set()
+        return await first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert second == [{'status': 'rejected', 'reason': 'overloaded'}]
+    assert first[-1]['status'] == 'done'
+    assert server.stats['rejected'] == 1
+
+def test_submit_reports_deadline_exceeded():
+    """
+    GIVEN: Ett jobb som tar längre tid än förfrågans deadline.
+    WHEN:  Förfrågan skickas in med en kort deadline.
+    THEN:  Klienten ska få 'deadline_exceeded' istället för att vänta.
+    """
+    def slow_job(proto_data, catalog_path, events, deadline_s=None):
+        time.sleep(0.5)
+        events.put({'status': 'done', 'count': 0})
+        return 0
+
+    server = make_server(slow_job)
+
+    events = asyncio.run(collect(server, deadline_s=0.1))
+
+    assert events == [{'status': 'deadline_exceeded', 'stage': 'building'}]
+
+def test_job_receives_remaining_deadline():
+    """
+    GIVEN: En förfrågan med två sekunders deadline.
+    WHEN:  Jobbet startas i poolen.
+    THEN:  Jobbet ska få resten av budgeten, så det kan avbryta sig självt.
+    """
+    received = []
+
+    def recording_job(proto_data, catalog_path, events, deadline_s=None):
+        received.append(deadline_s)
+        events.put({'status': 'done', 'count': 0})
+        return 0
+
+    server = make_server(recording_job)
+
+    asyncio.run(collect(server, deadline_s=2.0))
+
+    assert 1.5 < received[0] <= 2.0
+
+def test_streams_do_not_use_the_default_executor():
+    """
+    GIVEN: Tre samtidiga förfrågningar och en event-loop vars standard-executor vägrar ta arbete.
+    WHEN:  Alla strömmas klart.
+    THEN:  Alla ska få sina planer; händelsekön läses av en egen relätråd per förfrågan.
+    """
+    server = make_server(two_plan_job)
+
+    async def scenario():
+        asyncio.get_running_loop().set_default_executor(NoDefaultExecutor(max_workers=1))
+        return await asyncio.gather(*(collect(server) for _ in range(3)))
+
+    results = asyncio.run(scenario())
+
+    assert all([e['status'] for e in events] == ['plan', 'plan', 'done'] for events in results)
+    assert server.stats['completed'] == 3
+
+def test_job_that_dies_without_terminal_event_reports_error():
+    """
+    GIVEN: Ett jobb som lägger en plan och sedan kastar ett undantag.
+    WHEN:  Förfrågan strömmas.
+    THEN:  Planen ska komma fram, följd av ett 'error' med undantagets meddelande.
+    """
+    def crashing_job(proto_data, catalog_path, events, deadline_s=None):
+        events.put({'status': 'plan', 'index': 0, 'plan': [{'type': 'LINE'}]})
+        raise RuntimeError("arbetaren dog")
+
+    server = make_server(crashing_job)
+
+    events = asyncio.run(collect(server))
+
+    assert [e['status'] for e in events] == ['plan', 'error']
+    assert events[-1]['message'] == "arbetaren dog"
+    assert server.stats['failed'] == 1
+
+def test_stream_client_connects_over_tcp():
+    """
+    GIVEN: En server som lyssnar på loopback-TCP.
+    WHEN:  Klienten strömmar en förfrågan till (värd, port).
+    THEN:  Planerna och 'done' ska komma fram som via Unix-socketen.
+    """
+    server = make_server(two_plan_job)
+    loop = asyncio.new_event_loop()
+    listener = loop.run_until_complete(server.start(port=0))
+    port = listener.sockets[0].getsockname()[1]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        events = list(stream_drawing_plans(b"sketch", ("127.0.0.1", port), deadline_s=5.0))
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(2)
+        listener.close()
+        loop.close()
+
+    assert [e['status'] for e in events] == ['plan', 'plan', 'done']
+    assert events[1]['plan'] == [{'type': 'ARC'}]
@@ -0,0 +1,62 @@
+import os
+import time
+
+from pipeline.service.checkpoints import CheckpointStore, StageCheckpoints, MISSING
+
+# --- Hjälpfunktioner ---
+
+def run_chain(checkpoints, sketch, catalog_version, calls):
+    """Tre steg i kedja, som i runner: varje stegs nyckel bygger på föregående."""
+    def stage(name, value):
+        def compute():
+            calls.append(name)
+            return value
+        return compute
+
+    parsed = checkpoints.run('parsed_sketch', "1", (sketch,), stage('parsed_sketch', sketch.upper()))
+    topology = checkpoints.run('topology', "1", (parsed.key,), stage('topology', parsed.value + "-topo"))
+    drawing = checkpoints.run('drawing_plans', "1", (topology.key, catalog_version), stage('drawing_plans', topology.value + "-" + catalog_version))
+    return drawing
+
+# --- Testfall för checkpoint-cachen ---
+
+def test_catalog_change_only_reruns_downstream_stage(tmp_path):
+    """
+    GIVEN: En kedja som redan körts en gång mot en tom diskcache.
+    WHEN:  Samma skiss körs igen, först oförändrad och sedan med ny katalogversion.
+    THEN:  Andra körningen ska helt komma från cachen, och den tredje bara
+           köra om ritningssteget.
+    """
+    checkpoints = StageCheckpoints(CheckpointStore(str(tmp_path)))
+    calls = []
+
+    first = run_chain(checkpoints, "skiss", "cat-a", calls)
+    again = run_chain(checkpoints, "skiss", "cat-a", calls)
+    tweaked = run_chain(checkpoints, "skiss", "cat-b", calls)
+
+    assert calls == ['parsed_sketch', 'topology', 'drawing_plans', 'drawing_plans']
+    assert again.cached and again.value == first.value == "SKISS-topo-cat-a"
+    assert tweaked.value == "SKISS-topo-cat-b" and not tweaked.cached
+
+
+def test_store_evicts_least_recently_used(tmp_path):
+    """
+    GIVEN: En diskcache som rymmer ungefär tre poster.
+    WHEN:  Den första posten läses och en fjärde läggs till.
+    THEN:  Den minst nyligen använda (andra) posten ska kastas, och storleken hålla sig under gränsen.
+    """
+    payload = b"x" * 1000
+    store = CheckpointStore(str(tmp_path), max_bytes=3500)
+    for key in ("a", "b", "c"):
+        store.put(key, payload)
+        time.sleep(0.01)
+    assert store.get("a") == payload
+    time.sleep(0.01)
+
+    store.put("d", payload)
+
+    assert store.get("b") is MISSING
+    assert all(store.get(key) == payload for key in ("a", "c", "d"))
+    assert store.total_bytes <= 3500
+    assert CheckpointStore(str(tmp_path)).total_bytes == store.total_bytes
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
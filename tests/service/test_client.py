@@ -0,0 +1,108 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import pytest
+
+from pipeline.service.client import request_drawing_plans
+from pipeline.service.protocol import recv_message, send_message, decode_options, encode_response
+from pipeline.shared.cancellation import CancellationToken, OperationCancelled
+
+# --- Hjälpfunktioner ---
+
+@pytest.fixture
+def silent_daemon(tmp_path):
+    """En Unix-socket som tar emot förfrågan men aldrig svarar (en daemon mitt i ett långt bygge)."""
+    path = str(tmp_path / "daemon.sock")
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+    hung_up = threading.Event()
+
+    def serve():
+        connection, _ = server.accept()
+        with connection:
+            while recv_message(connection) is not None:  # blockerar tills klienten lägger på
+                pass
+            hung_up.set()
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield path, hung_up
+    server.close()
+    if os.path.exists(path):
+        os.unlink(path)
+
+@pytest.fixture
+def cancelling_daemon(tmp_path):
+    """En daemon som sparar körningsvalen och svarar att bygget avbröts av tidsbudgeten."""
+    path = str(tmp_path / "daemon.sock")
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+    received = {}
+
+    def serve():
+        connection, _ = server.accept()
+        with connection:
+            received['options'] = decode_options(recv_message(connection))
+            received['sketch'] = recv_message(connection)
+            send_message(connection, encode_response('cancelled', stage='topology', reason='deadline'))
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield path, received
+    server.close()
+    if os.path.exists(path):
+        os.unlink(path)
+
+# --- Testfall för den tunna klienten ---
+
+def test_cancelled_client_stops_waiting_for_daemon(silent_daemon):
+    """
+    GIVEN: En daemon som inte svarar och en token som avbryts efter 0.2 s.
+    WHEN:  Klienten begär ritningsplaner med token.
+    THEN:  OperationCancelled ska kastas direkt efter avbrottet, och anslutningen stängas.
+    """
+    path, hung_up = silent_daemon
+    token = CancellationToken()
+    threading.Timer(0.2, token.cancel).start()
+
+    started = time.monotonic()
+    with pytest.raises(OperationCancelled) as excinfo:
+        request_drawing_plans(b"sketch", path, timeout=10.0, cancel_token=token)
+
+    assert excinfo.value.reason == 'cancelled'
+    assert time.monotonic() - started < 2.0
+    assert hung_up.wait(2.0)
+
+def test_client_forwards_deadline_and_raises_daemon_cancellation(cancelling_daemon):
+    """
+    GIVEN: En token med 5 s tidsbudget och en daemon som avbryter bygget.
+    WHEN:  Klienten begär ritningsplaner med token.
+    THEN:  Budgeten ska skickas före skissen, och daemonens avbrott kastas som OperationCancelled.
+    """
+    path, received = cancelling_daemon
+
+    with pytest.raises(OperationCancelled) as excinfo:
+        request_drawing_plans(b"sketch", path, timeout=10.0, cancel_token=CancellationToken(deadline_s=5.0))
+
+    assert (excinfo.value.stage, excinfo.value.reason) == ('topology', 'deadline')
+    assert 0.0 < received['options']['deadline_s'] <= 5.0
+    assert received['options']['on_expiry'] == 'raise'
+    assert received['sketch'] == b"sketch"
+
+def test_client_import_stays_free_of_the_pipeline():
+    """
+    GIVEN: En ny Python-process (FreeCAD-makrots tunna klientväg).
+    WHEN:  Klienten importeras.
+    THEN:  Varken numpy, katalogen, validatorn eller adjustern ska laddas.
+    """
+    heavy = ["numpy", "networkx", "components_catalog.loader",
+             "pipeline.sketch_validator.validator", "pipeline.plan_adjuster.adjuster"]
+    script = f"import sys, pipeline.service.client; print([m for m in {heavy!r} if m in sys.modules])"
+
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+    assert output.stdout.strip() == "[]"
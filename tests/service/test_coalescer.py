@@ -0,0 +1,73 @@
+import threading
+import time
+import pytest
+
+from pipeline.service.coalescer import RequestCoalescer
+
+# --- Hjälpfunktioner ---
+
+def run_concurrently(coalescer, payloads):
+    """Startar ett anrop per payload i egna trådar och samlar resultaten."""
+    results = [None] * len(payloads)
+
+    def call(index, payload):
+        try:
+            results[index] = coalescer.run(payload)
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=call, args=(i, p)) for i, p in enumerate(payloads)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+# --- Testfall för sammanslagning av förfrågningar ---
+
+def test_identical_concurrent_requests_run_once():
+    """
+    GIVEN: Fem samtidiga förfrågningar med samma skiss.
+    WHEN:  De går genom RequestCoalescer medan den första fortfarande körs.
+    THEN:  Pipelinen ska köras en gång och alla ska få samma resultat.
+    """
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute(proto_data):
+        calls.append(proto_data)
+        started.set()
+        release.wait(5)
+        return {'plans': len(calls)}
+
+    coalescer = RequestCoalescer(compute, catalog_version=lambda: "v1")
+    first_threads, first_results = run_concurrently(coalescer, [b"sketch"])
+    started.wait(5)
+    other_threads, other_results = run_concurrently(coalescer, [b"sketch"] * 4)
+    while coalescer.stats.requests < 5:
+        time.sleep(0.001)
+    release.set()
+    for thread in first_threads + other_threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(result is first_results[0] for result in other_results)
+    assert coalescer.stats.snapshot() == {'requests': 5, 'executed': 1, 'coalesced': 4, 'failed': 0, 'coalesced_ratio': 0.8}
+
+def test_key_includes_catalog_version_and_failures_fan_out():
+    """
+    GIVEN: En coalescer vars katalogversion ändras, och en compute som kastar.
+    WHEN:  Vi beräknar nycklar och kör en förfrågan som misslyckas.
+    THEN:  Ny katalogversion ska ge ny nyckel, och undantaget ska nå anroparen.
+    """
+    version = {'value': "v1"}
+
+    def compute(proto_data):
+        raise ValueError("omöjlig skiss")
+
+    coalescer = RequestCoalescer(compute, catalog_version=lambda: version['value'])
+    key_v1 = coalescer.request_key(b"sketch")
+    version['value'] = "v2"
+
+    assert coalescer.request_key(b"sketch") != key_v1
+    with pytest.raises(ValueError):
+        coalescer.run(b"sketch")
+    assert coalescer.stats.failed == 1
@@ -0,0 +1,98 @@
+import json
+import shutil
+import sys
+import threading
+import time
+import pytest
+
+# Daemonen binder runner, som behöver den genererade Protobuf-koden.
+pytest.importorskip("contracts.generated.python.sketch_pb2")
+
+from pipeline.service import daemon as daemon_module
+from pipeline.service.client import request_drawing_plans
+from pipeline.service.protocol import decode_response
+from pipeline.shared.cancellation import CancellationToken
+from pipeline.shared.errors import ValidationIssue
+
+# --- Hjälpfunktioner ---
+
+@pytest.fixture
+def running_daemon(tmp_path, monkeypatch):
+    """En riktig PipelineDaemon på en Unix-socket, där pipelinen är ett långsamt, räknande bygge."""
+    calls = []
+
+    def slow_build(proto_data, catalog, **kwargs):
+        calls.append(proto_data)
+        time.sleep(0.3)
+        return [[{'type': 'LINE', 'start': (0.0, 0.0, 0.0), 'end': (100.0, 0.0, 0.0)}]]
+    monkeypatch.setattr(daemon_module.runner, "build_drawing_plans", slow_build)
+
+    path = str(tmp_path / "daemon.sock")
+    pipeline_daemon = daemon_module.PipelineDaemon(path)
+    server = daemon_module._UnixServer(path, daemon_module._RequestHandler)
+    server.daemon = pipeline_daemon
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield path, calls
+    server.shutdown()
+    server.server_close()
+
+# --- Testfall för daemonen ---
+
+def test_concurrent_requests_with_tokens_without_deadline_are_coalesced(running_daemon):
+    """
+    GIVEN: En daemon och två klienter med var sin token utan deadline (som FreeCAD-makrot).
+    WHEN:  Båda begär samma skiss samtidigt.
+    THEN:  Pipelinen ska köras en gång och båda få planerna.
+    """
+    path, calls = running_daemon
+    results = []
+
+    def request():
+        results.append(request_drawing_plans(b"sketch", path, timeout=10.0, cancel_token=CancellationToken()))
+    threads = [threading.Thread(target=request) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert len(results) == 2 and all(len(plans) == 1 for plans in results)
+
+def test_errors_from_reloaded_modules_keep_their_status(tmp_path, monkeypatch):
+    """
+    GIVEN: En daemon med --watch där validatorn just laddats om.
+    WHEN:  Pipelinen kastar SketchValidationError från den omladdade modulen.
+    THEN:  Svaret ska vara 'invalid_sketch' med felen, inte ett generellt 'error'.
+    """
+    pipeline_daemon = daemon_module.PipelineDaemon(str(tmp_path / "daemon.sock"), watch=True)
+    pipeline_daemon.reloader._mtimes["pipeline.sketch_validator.validator"] = -1.0
+    pipeline_daemon._refresh()
+    validator = sys.modules["pipeline.sketch_validator.validator"]
+
+    def invalid_build(proto_data, catalog, **kwargs):
+        raise validator.SketchValidationError([ValidationIssue("DANGLING", "Lös ände", ["line_1"])])
+    monkeypatch.setattr(daemon_module.runner, "build_drawing_plans", invalid_build)
+
+    response = decode_response(pipeline_daemon.handle(b"sketch"))
+
+    assert response['status'] == 'invalid_sketch'
+    assert response['issues'][0]['segment_ids'] == ["line_1"]
+
+def test_watch_mode_rebuilds_catalog_when_a_catalog_file_changes(tmp_path):
+    """
+    GIVEN: En daemon med --watch på en kopia av katalogen.
+    WHEN:  En katalogfil ändras och daemonen kontrollerar inför nästa förfrågan.
+    THEN:  Katalogen ska byggas om och få en ny version.
+    """
+    catalog_dir = tmp_path / "catalog"
+    shutil.copytree("./components_catalog", catalog_dir, ignore=shutil.ignore_patterns("*.py", "__pycache__"))
+    pipeline_daemon = daemon_module.PipelineDaemon(str(tmp_path / "daemon.sock"), str(catalog_dir), watch=True)
+    old_catalog, old_version = pipeline_daemon.catalog, pipeline_daemon.catalog.version
+
+    data = json.loads((catalog_dir / "sms.json").read_text(encoding="utf-8"))
+    (catalog_dir / "sms.json").write_text(json.dumps(data, indent=1), encoding="utf-8")
+    pipeline_daemon._refresh()
+
+    assert pipeline_daemon.catalog is not old_catalog
+    assert pipeline_daemon.catalog.version != old_version
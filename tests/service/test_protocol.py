@@ -0,0 +1,42 @@
+import socket
+import threading
+
+from pipeline.service.protocol import send_message, recv_message, encode_response, decode_response
+
+# --- Testfall för daemonens protokoll ---
+
+def test_framed_messages_round_trip_over_socket():
+    """
+    GIVEN: Ett socket-par och två meddelanden, varav ett större än en recv-buffert.
+    WHEN:  De skickas med send_message och tas emot med recv_message.
+    THEN:  Båda ska komma fram oförändrade, och stängd socket ska ge None.
+    """
+    left, right = socket.socketpair()
+    large = bytes(range(256)) * 1000
+
+    def sender():
+        send_message(left, b"sketch")
+        send_message(left, large)
+        left.close()
+    thread = threading.Thread(target=sender)
+    thread.start()
+
+    assert recv_message(right) == b"sketch"
+    assert recv_message(right) == large
+    assert recv_message(right) is None
+    thread.join()
+    right.close()
+
+def test_response_restores_point_tuples():
+    """
+    GIVEN: En serialiserad ritningsplan (JSON gör tupler till listor).
+    WHEN:  Svaret avkodas.
+    THEN:  Punkterna ska vara tupler igen, så att executorn får samma format som i processen.
+    """
+    plans = [[{'type': 'ARC', 'start': (0.0, 0.0, 0.0), 'mid': (1.0, 2.0, 0.0), 'end': (3.0, 3.0, 0.0), 'pipe_spec': 'SMS_38'}]]
+
+    response = decode_response(encode_response('ok', plans))
+
+    assert response['status'] == 'ok'
+    assert response['plans'] == plans
+    assert isinstance(response['plans'][0][0]['mid'], tuple)
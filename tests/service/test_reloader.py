@@ -0,0 +1,29 @@
+import os
+import sys
+
+from pipeline.service.reloader import ModuleReloader
+
+# --- Testfall för utvecklingslägets omladdning ---
+
+def test_reloader_only_reloads_modules_with_new_mtime(tmp_path, monkeypatch):
+    """
+    GIVEN: Två importerade moduler, där bara den ena ändras på disk.
+    WHEN:  reload_changed anropas.
+    THEN:  Bara den ändrade modulen ska laddas om och få sitt nya värde.
+    """
+    (tmp_path / "watched_a.py").write_text("VALUE = 1\n")
+    (tmp_path / "watched_b.py").write_text("VALUE = 1\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    import watched_a, watched_b
+    reloader = ModuleReloader(["watched_a", "watched_b"])
+
+    (tmp_path / "watched_a.py").write_text("VALUE = 2\n")
+    stat = os.stat(tmp_path / "watched_a.py")
+    os.utime(tmp_path / "watched_a.py", (stat.st_atime, stat.st_mtime + 10))
+
+    assert reloader.reload_changed() == ["watched_a"]
+    assert sys.modules["watched_a"].VALUE == 2
+    assert reloader.reload_changed() == []
+
+    for name in ("watched_a", "watched_b"):
+        sys.modules.pop(name, None)
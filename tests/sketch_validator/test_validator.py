@@ -0,0 +1,99 @@
+import pytest
+
+from components_catalog.loader import CatalogLoader
+from pipeline.sketch_validator.validator import SketchValidator, SketchValidationError
+
+# --- Fixtures (Testdata) ---
+
+@pytest.fixture(scope="module")
+def catalog():
+    """Laddar den riktiga komponentkatalogen en gång för alla tester i filen."""
+    return CatalogLoader("./components_catalog")
+
+
+def segment(segment_id, start, end, length=None, pipe_spec="SMS_38", is_construction=False):
+    """Ett segment i samma form som SketchParser levererar."""
+    return {
+        "id": segment_id,
+        "start_point": {"x": start[0], "y": start[1]},
+        "end_point": {"x": end[0], "y": end[1]},
+        "pipe_spec": pipe_spec,
+        "length_dimension": length,
+        "is_construction": is_construction,
+    }
+
+
+def codes(issues):
+    return sorted(issue.code for issue in issues)
+
+# --- Testfall för validatorn ---
+
+def test_valid_l_shape_has_no_issues(catalog):
+    """
+    GIVEN: Ett L-format rör med två måttsatta segment.
+    WHEN:  Skissen valideras.
+    THEN:  Inga fel ska rapporteras.
+    """
+    sketch = {"segments": [segment("s1", (0, 0), (500, 0), 500), segment("s2", (500, 0), (500, 300), 300)]}
+
+    assert SketchValidator(catalog).validate(sketch) == []
+
+
+def test_all_issues_are_reported_at_once(catalog):
+    """
+    GIVEN: En skiss med både okänd spec och ett segment med noll-längd.
+    WHEN:  Skissen valideras.
+    THEN:  Båda felen ska rapporteras tillsammans, med rätt segment-ID.
+    """
+    sketch = {"segments": [
+        segment("s1", (0, 0), (500, 0), 500, pipe_spec="SMS_999"),
+        segment("s2", (500, 0), (500, 300), 300),
+        segment("s3", (500, 300), (500, 300), 0),
+    ]}
+
+    issues = SketchValidator(catalog).validate(sketch)
+
+    by_code = {issue.code: issue for issue in issues}
+    assert by_code["unknown_spec"].segment_ids == ["s1"]
+    assert by_code["zero_length"].segment_ids == ["s3"]
+
+
+def test_degree_and_fold_back_are_flagged(catalog):
+    """
+    GIVEN: Fyra rör som möts i origo, varav ett går tillbaka längs ett annat.
+    WHEN:  Skissen valideras.
+    THEN:  Både för högt gradtal och överlappande rör ska rapporteras.
+    """
+    sketch = {"segments": [
+        segment("a", (0, 0), (100, 0), 100),
+        segment("b", (0, 0), (-100, 0), 100),
+        segment("c", (0, 0), (0, 100), 100),
+        segment("d", (0, 0), (0, -100), 100),
+        segment("e", (0, 0), (50, 0), 50),
+    ]}
+
+    issues = SketchValidator(catalog).validate(sketch)
+
+    assert "degree_too_high" in codes(issues)
+    overlapping = [issue for issue in issues if issue.code == "overlapping_edges"]
+    assert [sorted(issue.segment_ids) for issue in overlapping] == [["a", "e"]]
+
+
+def test_separate_systems_are_valid_but_undimensioned_part_is_not(catalog):
+    """
+    GIVEN: Två separata måttsatta system och en tredje del helt utan mått.
+    WHEN:  Skissen valideras och felen packas i ett SketchValidationError.
+    THEN:  Bara den måttlösa delen ska pekas ut och meddelandet sammanfatta felen.
+    """
+    sketch = {"segments": [
+        segment("s1", (0, 0), (500, 0), 500),
+        segment("s2", (0, 200), (500, 200), 500),
+        segment("s3", (0, 400), (500, 400)),
+    ]}
+
+    issues = SketchValidator(catalog).validate(sketch)
+    error = SketchValidationError(issues)
+
+    assert "undimensioned_part" in codes(issues)
+    assert next(issue for issue in issues if issue.code == "undimensioned_part").segment_ids == ["s3"]
+    assert f"{len(issues)} fel i skissen" in str(error)
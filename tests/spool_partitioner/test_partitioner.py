@@ -0,0 +1,127 @@
+import math
+
+import pytest
+
+from components_catalog.loader import CatalogLoader
+from pipeline.topology_builder.builder import TopologyBuilder
+from pipeline.planner.planner import Planner
+from pipeline.centerline_builder.builder import CenterlineBuilder
+from pipeline.component_factory.factory import ComponentFactory
+from pipeline.plan_adjuster.adjuster import PlanAdjuster
+from pipeline.spool_partitioner.partitioner import SpoolPartitioner, SpoolLimits
+
+# --- Hjälpfunktioner ---
+
+def pipe(component_id, start, end):
+    return {'id': f"{component_id}_line", 'component_id': component_id, 'component_type': 'PIPE',
+            'type': 'LINE', 'start': start, 'end': end, 'pipe_spec': "SMS_38"}
+
+def bend(component_id, corner, radius=50.0):
+    """90-graders böj från +X till +Y, med bågen slutande i corner + (r, r)."""
+    x, y, z = corner
+    s = radius / math.sqrt(2.0)
+    return {'id': f"{component_id}_arc", 'component_id': component_id, 'component_type': 'BEND_90',
+            'type': 'ARC', 'start': (x, y, z), 'mid': (x + s, y + radius - s, z), 'end': (x + radius, y + radius, z)}
+
+def l_shape(leg_x, leg_y):
+    return [[pipe("p1", (0.0, 0.0, 0.0), (leg_x, 0.0, 0.0)), bend("b1", (leg_x, 0.0, 0.0)),
+             pipe("p2", (leg_x + 50.0, 50.0, 0.0), (leg_x + 50.0, 50.0 + leg_y, 0.0))]]
+
+def tee_plans(leg_length=1000.0):
+    """Ritningsplanerna för ett T-rör med tre lika ben, byggda av den riktiga kedjan."""
+    catalog = CatalogLoader("./components_catalog")
+    segments = [
+        {"id": "line_1", "start_point": {"x": 0.0, "y": 0.0}, "end_point": {"x": 86.6, "y": 50.0}},
+        {"id": "line_2", "start_point": {"x": 86.6, "y": 50.0}, "end_point": {"x": 173.2, "y": 100.0}},
+        {"id": "line_3", "start_point": {"x": 86.6, "y": 50.0}, "end_point": {"x": 173.2, "y": 0.0}},
+    ]
+    for segment in segments:
+        segment.update(length_dimension=leg_length, pipe_spec="SMS_38", is_construction=False)
+    nodes, graph = TopologyBuilder({"segments": segments}, catalog).build()
+    travel_plans = Planner(nodes=nodes, topology=graph, catalog=catalog).create_plans()
+    return CenterlineBuilder(
+        travel_plans=travel_plans, nodes=nodes, topology=graph, catalog=catalog,
+        adjuster=PlanAdjuster(travel_plans, nodes, graph, catalog), factory=ComponentFactory(catalog=catalog)
+    ).build_drawing_plans()
+
+UNLIMITED = SpoolLimits(max_length=1e6, max_box=(1e6, 1e6, 1e6))
+
+# --- Testfall för spool-partitioneringen ---
+
+def test_straight_run_is_cut_into_minimum_number_of_spools():
+    """
+    GIVEN: 20 raka rör på 1 m i rad och en maxlängd på 6 m.
+    WHEN:  Systemet partitioneras.
+    THEN:  Det ska bli ceil(20/6) = 4 spooler med 3 fältsvetsar, och all rörlängd ska finnas kvar.
+    """
+    plan = [pipe(f"p{i}", (i * 1000.0, 0.0, 0.0), ((i + 1) * 1000.0, 0.0, 0.0)) for i in range(20)]
+
+    result = SpoolPartitioner(SpoolLimits(max_length=6000.0)).partition([plan])
+
+    assert len(result.spools) == 4
+    assert result.weld_count == 3
+    assert sum(spool.length for spool in result.spools) == pytest.approx(20000.0)
+    assert all(spool.length <= 6000.0 + 1e-6 for spool in result.spools)
+
+def test_cuts_fall_inside_pipes_and_respect_the_box():
+    """
+    GIVEN: En L-form med 5 m och 8 m ben runt en böj, gränser 6 m och en 6 x 2.4 x 2.4 m låda.
+    WHEN:  Systemet partitioneras.
+    THEN:  Böjen ska hållas hel, alla spooler rymmas och svetsarna ligga på rören.
+           De kapade rörbitarna ska peka tillbaka på sitt ursprungsrör.
+    """
+    limits = SpoolLimits(max_length=6000.0, max_box=(6000.0, 2400.0, 2400.0))
+
+    result = SpoolPartitioner(limits).partition(l_shape(5000.0, 8000.0))
+
+    assert result.weld_count == 2
+    assert not any(spool.oversize for spool in result.spools)
+    assert all(limits.fits(spool.length, [0.0] * 3, list(spool.extents)) for spool in result.spools)
+    assert sum(item['component_id'] == "b1" for spool in result.spools for item in spool.plan) == 1
+    assert all(weld[0] in (5000.0, 5050.0) for weld in result.field_welds)
+    assert {item.get('source_id') for spool in result.spools for item in spool.plan if item['component_id'] == "p2"} == {"p2_line"}
+
+def test_fittings_without_pipe_between_are_never_split():
+    """
+    GIVEN: Två böjar som sitter direkt ihop, längre än maxlängden tillsammans.
+    WHEN:  Systemet partitioneras.
+    THEN:  Böjarna ska hamna i samma spool, som flaggas som för stor.
+    """
+    plan = [bend("b1", (0.0, 0.0, 0.0), radius=500.0), bend("b2", (500.0, 500.0, 0.0), radius=500.0)]
+
+    result = SpoolPartitioner(SpoolLimits(max_length=1000.0)).partition([plan])
+
+    assert len(result.spools) == 1
+    assert result.spools[0].oversize
+    assert result.weld_count == 0
+
+def test_tee_legs_are_counted_once_from_real_centerline_plans():
+    """
+    GIVEN: Ritningsplanerna från CenterlineBuilder för ett T-rör med tre ben på 1000 mm.
+    WHEN:  Systemet partitioneras utan gränser.
+    THEN:  Det ska bli en spool med exakt 3000 mm centrumlinje och T-röret en gång.
+    """
+    plans = tee_plans()
+    tee_id = next(item['component_id'] for plan in plans for item in plan if item['component_type'] == 'TEE')
+
+    result = SpoolPartitioner(UNLIMITED).partition(plans)
+
+    assert len(result.spools) == 1
+    assert result.spools[0].length == pytest.approx(3000.0)
+    assert sum(item['component_id'] == tee_id for item in result.spools[0].plan) == 3
+
+def test_tee_repeated_in_a_later_plan_with_new_primitive_ids_is_counted_once():
+    """
+    GIVEN: Samma T-rör, men placerat igen i grenens plan med nya primitiv-ID:n
+           (som när varje resplan fick en egen kopia av T-röret).
+    WHEN:  Systemet partitioneras utan gränser.
+    THEN:  Bara den första placeringen ska räknas: fortfarande 3000 mm.
+    """
+    plans = tee_plans()
+    tee_items = [item for plan in plans for item in plan if item['component_type'] == 'TEE']
+    plans[-1] = [{**item, 'id': f"{item['id']}_copy"} for item in tee_items] + plans[-1]
+
+    result = SpoolPartitioner(UNLIMITED).partition(plans)
+
+    assert sum(spool.length for spool in result.spools) == pytest.approx(3000.0)
+    assert sum(item['component_type'] == 'TEE' for spool in result.spools for item in spool.plan) == len(tee_items)
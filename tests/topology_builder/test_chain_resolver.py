@@ -0,0 +1,127 @@
+import math
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+
+from pipeline.topology_builder.builder import TopologyBuilder
+from pipeline.topology_builder.chain_resolver import ChainConstraint, ConstructionChainResolver
+
+X, Y, Z = (1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (0.0, 0.0, 1.0)
+
+# --- Hjälpfunktioner ---
+
+def iso(x, y, z):
+    """Projicerar en 3D-punkt till skissens 2D-isometri (X 30°, Y 330°, Z 270°)."""
+    c = math.cos(math.radians(30))
+    return {"x": round(c * (x + y), 4), "y": round(0.5 * (x - y) - z, 4)}
+
+
+def segment(segment_id, start, end, length=None, is_construction=False):
+    return {"id": segment_id, "start_point": iso(*start), "end_point": iso(*end), "length_dimension": length,
+            "pipe_spec": "SMS_38", "is_construction": is_construction}
+
+# --- Testfall för resolvern ---
+
+def test_resolver_solves_chain_through_unknown_lengths():
+    """
+    GIVEN: Två konstruktionskedjor med var sin måttlös länk som möts i punkt d.
+    WHEN:  Alla villkor löses tillsammans.
+    THEN:  De okända längderna ska bestämmas av varandra och d hamna rätt.
+    """
+    constraints = [
+        ChainConstraint("a", "b", X, 300.0),
+        ChainConstraint("b", "c", Y, None),
+        ChainConstraint("c", "d", Z, 100.0),
+        ChainConstraint("a", "e", Y, 200.0),
+        ChainConstraint("e", "f", Z, 100.0),
+        ChainConstraint("f", "d", X, None),
+    ]
+    resolver = ConstructionChainResolver()
+
+    positions = resolver.resolve(constraints, anchor="a")
+
+    assert positions["d"] == pytest.approx((300.0, 200.0, 100.0))
+    assert positions["c"] == pytest.approx((300.0, 200.0, 0.0))
+    assert resolver.unresolved == set()
+
+
+def test_resolver_reports_undetermined_points_and_closure():
+    """
+    GIVEN: En måttlös länk utan motvillkor, och två mått mellan samma punkter som skiljer 2 mm.
+    WHEN:  Villkoren löses.
+    THEN:  Den lösa punkten ska vara obestämd och avvikelsen delas lika.
+    """
+    constraints = [
+        ChainConstraint("a", "b", X, 100.0),
+        ChainConstraint("a", "b", X, 102.0),
+        ChainConstraint("b", "loose", Y, None),
+    ]
+    resolver = ConstructionChainResolver()
+
+    positions = resolver.resolve(constraints, anchor="a")
+
+    assert positions["b"] == pytest.approx((101.0, 0.0, 0.0))
+    assert resolver.unresolved == {"loose"}
+    assert resolver.max_closure_error == pytest.approx(1.0)
+
+
+def test_resolver_matches_dense_least_squares_on_inconsistent_grid():
+    """
+    GIVEN: Ett 12x12-rutnät av måttsatta X- och Y-villkor där varje mått avviker lite.
+    WHEN:  Villkoren löses (glest, med konjugerad gradient).
+    THEN:  Positionerna ska vara samma som en tät minsta-kvadrat-lösning med ankaret fast
+           (ett villkor längs en axel ger förskjutningen 0 på de andra).
+    """
+    n = 12
+    rng = np.random.default_rng(7)
+    constraints = []
+    for i in range(n):
+        for j in range(n):
+            if i + 1 < n:
+                constraints.append(ChainConstraint((i, j), (i + 1, j), X, 100.0 + rng.uniform(-0.5, 0.5)))
+            if j + 1 < n:
+                constraints.append(ChainConstraint((i, j), (i, j + 1), Y, 100.0 + rng.uniform(-0.5, 0.5)))
+    resolver = ConstructionChainResolver()
+
+    positions = resolver.resolve(constraints, anchor=(0, 0))
+
+    keys = [(i, j) for i in range(n) for j in range(n)]
+    column = {key: k for k, key in enumerate(keys)}
+    matrix = np.zeros((len(constraints), len(keys)))
+    for r, c in enumerate(constraints):
+        matrix[r, column[c.end]], matrix[r, column[c.start]] = 1.0, -1.0
+    for axis in (0, 1):
+        expected = np.zeros(len(keys))
+        offsets = np.array([c.length * c.direction[axis] for c in constraints])
+        expected[1:] = np.linalg.lstsq(matrix[:, 1:], offsets, rcond=None)[0]
+        assert [positions[key][axis] for key in keys] == pytest.approx(expected.tolist(), abs=1e-6)
+    assert 0.0 < resolver.max_closure_error < 0.5
+
+
+def test_topology_builder_places_special_line_from_construction_chain():
+    """
+    GIVEN: En skiss där speciallinjen b-d bara kan placeras via konstruktionskedjor
+           med måttlösa länkar (går inte att lösa med en genväg i taget).
+    WHEN:  Topologin byggs.
+    THEN:  Speciallinjen ska få rätt längd och d rätt position relativt a.
+    """
+    sketch = {"segments": [
+        segment("pipe_ab", (0, 0, 0), (300, 0, 0), 300.0),
+        segment("c_bc", (300, 0, 0), (300, 200, 0), None, True),
+        segment("c_cd", (300, 200, 0), (300, 200, 100), 100.0, True),
+        segment("c_ae", (0, 0, 0), (0, 200, 0), 200.0, True),
+        segment("c_ef", (0, 200, 0), (0, 200, 100), 100.0, True),
+        segment("c_fd", (0, 200, 100), (300, 200, 100), None, True),
+        segment("pipe_dg", (300, 200, 100), (550, 200, 100), 250.0),
+        segment("pipe_bd", (300, 0, 0), (300, 200, 100), None),
+    ]}
+    builder = TopologyBuilder(parsed_sketch=sketch, catalog=MagicMock())
+
+    _, topology = builder.build()
+
+    a = builder.point_2d_to_3d[builder._point_key(iso(0, 0, 0))]
+    d = builder.point_2d_to_3d[builder._point_key(iso(300, 200, 100))]
+    assert (d.x - a.x, d.y - a.y, d.z - a.z) == pytest.approx((300.0, 200.0, 100.0))
+    assert topology.number_of_edges() == 3
+    special = next(data for _, _, data in topology.edges(data=True) if data['segment_id'] == "pipe_bd")
+    assert special['length'] == pytest.approx(math.hypot(200.0, 100.0))
@@ -0,0 +1,46 @@
+import pytest
+from unittest.mock import MagicMock
+
+from pipeline.topology_builder.builder import TopologyBuilder
+from pipeline.topology_builder.node_store import NodeStore
+from pipeline.topology_builder.node_types_v2 import EndpointNodeInfo, BendNodeInfo, TeeNodeInfo
+
+# --- Testfall för nodregistret ---
+
+def test_builder_numbers_nodes_densely_and_store_indexes_directly():
+    """
+    GIVEN: Ett T-rör byggt av TopologyBuilder.
+    WHEN:  Noderna läggs i en NodeStore.
+    THEN:  ID:n ska vara 0..N-1, grafen använda samma nycklar, posterna sakna
+           __dict__ och T-rörets referenser peka på giltiga noder.
+    """
+    parsed_sketch_data = {"segments": [
+        {"id": "l1", "start_point": {"x": 0.0, "y": 0.0}, "end_point": {"x": 86.6, "y": 50.0}, "length_dimension": 100.0, "pipe_spec": "SMS_38", "is_construction": False},
+        {"id": "l2", "start_point": {"x": 86.6, "y": 50.0}, "end_point": {"x": 173.2, "y": 100.0}, "length_dimension": 100.0, "pipe_spec": "SMS_38", "is_construction": False},
+        {"id": "l3", "start_point": {"x": 86.6, "y": 50.0}, "end_point": {"x": 173.2, "y": 0.0}, "length_dimension": 100.0, "pipe_spec": "SMS_38", "is_construction": False},
+    ]}
+    nodes, topology = TopologyBuilder(parsed_sketch=parsed_sketch_data, catalog=MagicMock()).build()
+
+    store = NodeStore(nodes)
+
+    assert [node.id for node in nodes] == list(range(len(nodes)))
+    assert set(topology.nodes) == set(store)
+    assert not hasattr(nodes[0], '__dict__')
+    tee = next(node for node in nodes if isinstance(node, TeeNodeInfo))
+    assert all(node_id in store for node_id in (*tee.run_node_ids, tee.branch_node_id))
+    assert store.coords_of([tee.id])[0].tolist() == pytest.approx(tee.coords)
+
+
+def test_store_accepts_external_ids():
+    """
+    GIVEN: Handbyggda noder med sträng-ID:n.
+    WHEN:  De läggs i en NodeStore.
+    THEN:  Uppslag ska fungera som en vanlig ordbok, även get() och 'in'.
+    """
+    nodes = [EndpointNodeInfo(id="node_0", coords=(0, 0, 0)), BendNodeInfo(id="node_1", coords=(100, 0, 0), angle=90.0)]
+
+    store = NodeStore(nodes)
+
+    assert store["node_1"] is nodes[1]
+    assert store.get("missing") is None and 0 not in store
+    assert store.coords[1].tolist() == pytest.approx([100.0, 0.0, 0.0])
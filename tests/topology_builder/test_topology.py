@@ -2,6 +2,7 @@
 import sys
 import os
 import pytest
+from concurrent.futures import ProcessPoolExecutor
 from unittest.mock import MagicMock
 import networkx as nx
 from decimal import Decimal
@@ -11,7 +12,9 @@ project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..
 sys.path.insert(0, project_root)
 
 # Importera de klasser som testas
-from pipeline.topology_builder.builder import TopologyBuilder
+from components_catalog.loader import CatalogLoader
+from pipeline.topology_builder.builder import TopologyBuilder, _chunk_components
+from pipeline.shared.cancellation import CancellationToken, OperationCancelled
 from pipeline.topology_builder.node_types_v2 import BendNodeInfo, TeeNodeInfo, NodeInfo
 
 # --- HJÄLPFUNKTION (Standardiserad till att alltid returnera en lista) ---
@@ -20,6 +23,15 @@ def find_nodes_by_type(nodes: list[NodeInfo], node_type: type) -> list[NodeInfo]
     """Hjälpfunktion för att hitta ALLA noder av en specifik typ i en lista."""
     return [node for node in nodes if isinstance(node, node_type)]
 
+def l_shape(prefix: str, x0: float) -> list[dict]:
+    """Ett L-format SMS_25-system (två segment, en böj) som börjar i (x0, 0)."""
+    return [
+        {"id": f"{prefix}_1", "start_point": {"x": x0, "y": 0.0}, "end_point": {"x": x0 + 86.6, "y": 50.0},
+         "length_dimension": 100.0, "pipe_spec": "SMS_25", "is_construction": False},
+        {"id": f"{prefix}_2", "start_point": {"x": x0 + 86.6, "y": 50.0}, "end_point": {"x": x0 + 86.6, "y": 150.0},
+         "length_dimension": 100.0, "pipe_spec": "SMS_25", "is_construction": False},
+    ]
+
 # --- BEFINTLIGA TESTER (Uppdaterade för att använda den nya hjälpfunktionen) ---
 
 def test_topology_builder_simple_bend_scenario():
@@ -141,3 +153,144 @@ def test_creates_non_standard_angle_from_shortcut(shortcut_sketch_data):
 
     edge_ids = [data['segment_id'] for _, _, data in topology.edges(data=True)]
     assert 'l5_shortcut' in edge_ids, "Genvägens segment-ID saknas i den slutliga grafen."
+
+
+def test_collinear_nodes_are_collapsed_with_provenance():
+    """
+    GIVEN: En rak sträcka ritad som tre segment, följd av en böj och ett specbyte.
+    WHEN:  Topologin byggs.
+    THEN:  De raka skarvarna ska försvinna, kanten bära alla segment-ID:n i
+           ordning och summan av längderna, medan specbytet ligger kvar.
+    """
+    parsed_sketch_data = {
+        "segments": [
+            {"id": "a", "start_point": {"x": 0.0, "y": 0.0}, "end_point": {"x": 86.6, "y": 50.0},
+             "length_dimension": 100.0, "pipe_spec": "SMS_25", "is_construction": False},
+            {"id": "b", "start_point": {"x": 86.6, "y": 50.0}, "end_point": {"x": 173.2, "y": 100.0},
+             "length_dimension": 100.0, "pipe_spec": "SMS_25", "is_construction": False},
+            {"id": "c", "start_point": {"x": 173.2, "y": 100.0}, "end_point": {"x": 259.8, "y": 150.0},
+             "length_dimension": 50.0, "pipe_spec": "SMS_25", "is_construction": False},
+            {"id": "d", "start_point": {"x": 259.8, "y": 150.0}, "end_point": {"x": 259.8, "y": 250.0},
+             "length_dimension": 100.0, "pipe_spec": "SMS_25", "is_construction": False},
+            {"id": "e", "start_point": {"x": 259.8, "y": 250.0}, "end_point": {"x": 259.8, "y": 350.0},
+             "length_dimension": 100.0, "pipe_spec": "SMS_38", "is_construction": False},
+        ],
+    }
+
+    nodes, topology = TopologyBuilder(parsed_sketch=parsed_sketch_data, catalog=MagicMock()).build()
+
+    assert topology.number_of_edges() == 3
+    assert len(find_nodes_by_type(nodes, BendNodeInfo)) == 2, "Böjen och specbytet ska finnas kvar"
+    merged = next(data for _, _, data in topology.edges(data=True) if len(data['segment_ids']) > 1)
+    assert merged['segment_ids'] in (["a", "b", "c"], ["c", "b", "a"])
+    assert merged['length'] == pytest.approx(250.0)
+
+    _, uncollapsed = TopologyBuilder(parsed_sketch=parsed_sketch_data, catalog=MagicMock(), collapse_collinear=False).build()
+    assert uncollapsed.number_of_edges() == 5
+
+
+def test_separate_systems_are_all_built_with_own_origins():
+    """
+    GIVEN: En skiss med två fysiskt separata L-formade system.
+    WHEN:  Topologin byggs i tur och ordning respektive via en injicerad pool.
+    THEN:  Båda systemen ska finnas med (inget tappas), med var sitt origo,
+           och resultatet ska vara detsamma oavsett byggsätt.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    parsed_sketch_data = {"segments": l_shape("a", 0.0) + l_shape("b", 1000.0)}
+
+    serial = TopologyBuilder(parsed_sketch=parsed_sketch_data, catalog=MagicMock(), max_workers=1)
+    nodes, topology = serial.build()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        parallel = TopologyBuilder(parsed_sketch=parsed_sketch_data, catalog=MagicMock(), executor=executor)
+        parallel_nodes, _ = parallel.build()
+
+    assert len(nodes) == 6 and topology.number_of_edges() == 4
+    assert len(find_nodes_by_type(nodes, BendNodeInfo)) == 2
+    assert len(serial.component_origins) == 2 and serial.component_origins[0] == (0.0, 0.0, 0.0)
+    assert serial.component_origins[1] != (0.0, 0.0, 0.0)
+    assert {topology.nodes[n]['component'] for n in topology.nodes} == {0, 1}
+    assert sorted(n.coords for n in parallel_nodes) == pytest.approx(sorted(n.coords for n in nodes))
+
+
+def test_separate_systems_build_in_real_process_pool():
+    """
+    GIVEN: En skiss med tre separata L-formade system och en riktig processpool.
+    WHEN:  Topologin byggs via poolen (systemen buntas per arbetsprocess).
+    THEN:  Resultatet ska vara detsamma som vid seriellt bygge.
+    """
+    parsed_sketch_data = {"segments": l_shape("a", 0.0) + l_shape("b", 1000.0) + l_shape("c", 2000.0)}
+    catalog = CatalogLoader("./components_catalog")
+
+    serial_nodes, serial_topology = TopologyBuilder(parsed_sketch=parsed_sketch_data, catalog=catalog).build()
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        nodes, topology = TopologyBuilder(parsed_sketch=parsed_sketch_data, catalog=catalog, executor=executor).build()
+
+    assert [type(n) for n in nodes] == [type(n) for n in serial_nodes]
+    assert [n.coords for n in nodes] == pytest.approx([n.coords for n in serial_nodes])
+    assert sorted(topology.edges) == sorted(serial_topology.edges)
+
+
+def test_chunk_components_balances_segments_per_worker():
+    """
+    GIVEN: Fem system av olika storlek och två arbetsprocesser.
+    WHEN:  Systemen fördelas i buntar.
+    THEN:  Varje system hamnar i exakt en bunt och segmenten fördelas jämnt.
+    """
+    components = [[None] * size for size in (5, 1, 3, 2, 1)]
+    chunks = _chunk_components(components, 2)
+
+    assert sorted(i for chunk in chunks for i in chunk) == [0, 1, 2, 3, 4]
+    assert sorted(sum(len(components[i]) for i in chunk) for chunk in chunks) == [6, 6]
+    assert _chunk_components(components[:1], 4) == [[0]]
+
+
+def test_cancelled_token_stops_every_build_path():
+    """
+    GIVEN: En redan avbruten token, en skiss med ett system och en med tre.
+    WHEN:  Topologin byggs seriellt respektive via en processpool.
+    THEN:  Alla byggen ska avbrytas med OperationCancelled i steget 'topology'.
+    """
+    single = {"segments": l_shape("a", 0.0)}
+    several = {"segments": l_shape("a", 0.0) + l_shape("b", 1000.0) + l_shape("c", 2000.0)}
+    catalog = CatalogLoader("./components_catalog")
+    token = CancellationToken()
+    token.cancel()
+
+    with pytest.raises(OperationCancelled) as excinfo:
+        TopologyBuilder(parsed_sketch=single, catalog=catalog, cancel_token=token).build()
+    assert excinfo.value.stage == 'topology'
+    with pytest.raises(OperationCancelled):
+        TopologyBuilder(parsed_sketch=several, catalog=catalog, cancel_token=token).build()
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        with pytest.raises(OperationCancelled):
+            TopologyBuilder(parsed_sketch=several, catalog=catalog, executor=executor, cancel_token=token).build()
+
+
+def test_nodes_are_labelled_by_the_sketch_segment_ends_they_join():
+    """
+    GIVEN: En L-formad skiss, ritad i två olika ordningar.
+    WHEN:  Topologin byggs.
+    THEN:  Varje nod ska heta efter segmentändarna som möts i den, oberoende
+           av ritordningen (nod-ID:t är bara ett positionsindex).
+    """
+    segments = [
+        {"id": "line_1", "start_point": {"x": 0.0, "y": 0.0}, "end_point": {"x": 86.6, "y": 50.0},
+         "length_dimension": 100.0, "pipe_spec": "SMS_25", "is_construction": False},
+        {"id": "line_2", "start_point": {"x": 86.6, "y": 50.0}, "end_point": {"x": 86.6, "y": 150.0},
+         "length_dimension": 100.0, "pipe_spec": "SMS_25", "is_construction": False},
+    ]
+
+    nodes, _ = TopologyBuilder(parsed_sketch={"segments": segments}, catalog=MagicMock()).build()
+    reversed_nodes, _ = TopologyBuilder(parsed_sketch={"segments": segments[::-1]}, catalog=MagicMock()).build()
+
+    labels = {node.label: node.coords for node in nodes}
+    assert set(labels) == {"line_1.start", "line_1.end+line_2.start", "line_2.end"}
+    assert isinstance(next(n for n in nodes if n.label == "line_1.end+line_2.start"), BendNodeInfo)
+    reversed_labels = {node.label: node.coords for node in reversed_nodes}
+    assert set(reversed_labels) == set(labels)
+    # Origo följer ritordningen, men noderna ligger likadant i förhållande till varandra.
+    def span(by_label):
+        return [e - s for s, e in zip(by_label["line_1.start"], by_label["line_2.end"])]
+    assert span(reversed_labels) == pytest.approx(span(labels))